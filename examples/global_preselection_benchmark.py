@@ -0,0 +1,174 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Offline benchmark of the community report pre-selection of global search.
+
+Global search normally asks the chat model to map every batch of community
+reports; with `max_map_calls` set it only maps the batches of the reports most
+relevant to the query. This script measures what the budget saves and what it
+loses against full-map runs, without calling the chat model again:
+
+    # run a few global searches over every batch and record their key points
+    python global_preselection_benchmark.py record -c graphrag.yml -q queries.txt -o runs.jsonl
+
+    # replay the pre-selection for several budgets against the recorded runs
+    python global_preselection_benchmark.py evaluate -c graphrag.yml -r runs.jsonl -b 2 4 8
+
+For every budget, `evaluate` reports the map calls saved and the recall of the
+full-map key points: a key point found in a batch of the full run counts for
+the share of that batch's reports that the budget still selects, weighted by
+the score the model gave it. This is an approximation (a report rarely carries
+a key point alone), but it only needs the recorded runs and the index.
+
+The community reports must be loaded with their embeddings (the
+`community_reports__summary_embedding_col` or
+`community_reports__content_embedding_col` context option), otherwise the
+reports are pre-selected by rank only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import typing
+
+import pandas as pd
+
+import graphrag_query
+
+
+def _report_ids(context_text: str, context_name: str, column_delimiter: str) -> typing.List[str]:
+    """Returns the report ids of a map batch, as rendered in its context."""
+    # the batches are rendered without their section header, but tolerate one
+    head, _, table = context_text.partition(f"-----{context_name}-----\n")
+    table = (table or head).strip()
+    if not table:
+        return []
+    return pd.read_csv(io.StringIO(table), sep=column_delimiter, dtype=str)["id"].tolist()
+
+
+def _create_client(config: graphrag_query.GraphRAGConfig) -> graphrag_query.GraphRAGClient:
+    config.logging.enabled = False
+    return graphrag_query.GraphRAGClient(config=config)
+
+
+def _create_embedding(config: graphrag_query.GraphRAGConfig) -> graphrag_query.Embedding:
+    return graphrag_query.Embedding(
+        model=config.embedding.model,
+        api_key=config.embedding.api_key,
+        organization=config.embedding.organization,
+        base_url=config.embedding.base_url,
+        timeout=config.embedding.timeout,
+        max_retries=config.embedding.max_retries,
+        **(config.embedding.kwargs or {}),
+    )
+
+
+def record(args: argparse.Namespace) -> None:
+    config = graphrag_query.GraphRAGConfig.from_config_file(args.config)
+    embedding = _create_embedding(config)
+    client = _create_client(config)
+    with open(args.queries, encoding="utf-8") as file:
+        queries = [line.strip() for line in file if line.strip()]
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        for query in queries:
+            response = client.chat(
+                engine="global",
+                message=[{"role": "user", "content": query}],
+                verbose=True,
+                max_map_calls=None,
+                data_max_tokens=args.data_max_tokens,
+            )
+            batches = [
+                {
+                    "report_ids": _report_ids(result.context_text or "", args.context_name, args.column_delimiter),
+                    "points": result.choice.message.content,
+                }
+                for result in response.map_result or []
+            ]
+            out.write(json.dumps({
+                "query": query,
+                "query_embedding": embedding.embed(query),
+                "batches": batches,
+            }) + "\n")
+            print(f"{query!r}: {len(batches)} map calls")
+    client.close()
+
+
+def evaluate(args: argparse.Namespace) -> None:
+    config = graphrag_query.GraphRAGConfig.from_config_file(args.config)
+    client = _create_client(config)
+    context_builder = graphrag_query.GlobalContextBuilder.from_local_context_builder(client.local_context_builder)
+    with open(args.runs, encoding="utf-8") as file:
+        runs = [json.loads(line) for line in file if line.strip()]
+
+    print(f"{'budget':>6} {'map calls':>10} {'saved':>7} {'recall':>7} {'top recall':>10}")
+    for budget in args.budgets:
+        full_calls = selected_calls = 0
+        recalls: typing.List[float] = []
+        top_recalls: typing.List[float] = []
+        for run in runs:
+            _, context_data = context_builder.build_context(
+                max_map_calls=budget,
+                query_embedding=run["query_embedding"],
+                relevance_rank_weight=args.relevance_rank_weight,
+                data_max_tokens=args.data_max_tokens,
+                column_delimiter=args.column_delimiter,
+                context_name=args.context_name,
+            )
+            reports = context_data.get(args.context_name.lower())
+            selected = set() if reports is None else set(reports["id"].astype(str))
+            full_calls += len(run["batches"])
+            selected_calls += min(budget, len(run["batches"]))
+
+            # (score, share of the batch still selected) of every key point
+            points = [
+                (point["score"], len(selected.intersection(batch["report_ids"])) / len(batch["report_ids"]))
+                for batch in run["batches"]
+                if batch["report_ids"]
+                for point in batch["points"]
+                if point.get("score", 0) > 0
+            ]
+            total = sum(score for score, _ in points)
+            if total:
+                recalls.append(sum(score * share for score, share in points) / total)
+            top = sorted(points, key=lambda point: point[0], reverse=True)[:args.top_points]
+            if top:
+                top_recalls.append(sum(share for _, share in top) / len(top))
+
+        saved = 1 - selected_calls / full_calls if full_calls else 0.0
+        recall = sum(recalls) / len(recalls) if recalls else float("nan")
+        top_recall = sum(top_recalls) / len(top_recalls) if top_recalls else float("nan")
+        print(f"{budget:>6} {selected_calls:>4}/{full_calls:<5} {saved:>7.1%} {recall:>7.1%} {top_recall:>10.1%}")
+    client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-c", "--config", required=True, help="The GraphRAG configuration file.")
+    parser.add_argument("--data-max-tokens", type=int, default=8000, help="The token budget of a map batch.")
+    parser.add_argument("--column-delimiter", default="|")
+    parser.add_argument("--context-name", default="Reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Record full-map global searches.")
+    record_parser.add_argument("-q", "--queries", required=True, help="A text file with one query per line.")
+    record_parser.add_argument("-o", "--output", required=True, help="The JSONL file to record the runs to.")
+    record_parser.set_defaults(func=record)
+
+    evaluate_parser = commands.add_parser("evaluate", help="Evaluate map call budgets against recorded runs.")
+    evaluate_parser.add_argument("-r", "--runs", required=True, help="The JSONL file of recorded runs.")
+    evaluate_parser.add_argument("-b", "--budgets", type=int, nargs="+", default=[2, 4, 8])
+    evaluate_parser.add_argument("--relevance-rank-weight", type=float, default=0.1)
+    evaluate_parser.add_argument("--top-points", type=int, default=5, help="The key points counted as top points.")
+    evaluate_parser.set_defaults(func=evaluate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Benchmark of the token count cache of the local context builder.
+
+The context tables are rebuilt on every query from mostly the same rows, so
+`TokenCounter` remembers the token count of every row it has seen. This script
+replays a list of queries against the local context builder of an index and
+reports, per round, how many counts were served from the cache and how long a
+context build took, next to builds with a fresh counter per query (no reuse
+across queries) and builds in estimate mode:
+
+    python token_cache_benchmark.py -c graphrag.yml -q queries.txt --rounds 3
+
+The queries are embedded once up front (with the embedding model of the
+configuration) so that only the context builds are timed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+import typing
+
+import graphrag_query
+from graphrag_query import _utils
+
+
+class _CountingTokenCounter(_utils.TokenCounter):
+    """A `TokenCounter` that counts its lookups and the texts it had to encode."""
+
+    lookups: int
+    encoded: int
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lookups = 0
+        self.encoded = 0
+        encode = self._token_encoder.encode
+
+        def _encode(text: str, *args_: typing.Any, **kwargs_: typing.Any) -> typing.List[int]:
+            self.encoded += 1
+            return encode(text, *args_, **kwargs_)
+
+        self._token_encoder = copy.copy(self._token_encoder)
+        self._token_encoder.encode = _encode  # type: ignore[method-assign]
+
+    def __call__(self, text: str) -> int:
+        self.lookups += 1
+        return super().__call__(text)
+
+
+def _builder_with(
+    builder: graphrag_query.LocalContextBuilder, counter: _utils.TokenCounter
+) -> graphrag_query.LocalContextBuilder:
+    # a shallow copy shares the records and indexes, only the counter differs
+    builder = copy.copy(builder)
+    builder._token_counter = counter
+    return builder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-c", "--config", required=True, help="The GraphRAG configuration file.")
+    parser.add_argument("-q", "--queries", required=True, help="A text file with one query per line.")
+    parser.add_argument("--rounds", type=int, default=3, help="The number of times the queries are replayed.")
+    parser.add_argument("--data-max-tokens", type=int, default=12000)
+    args = parser.parse_args()
+
+    config = graphrag_query.GraphRAGConfig.from_config_file(args.config)
+    config.logging.enabled = False
+    client = graphrag_query.GraphRAGClient(config=config)
+    builder = client.local_context_builder
+    encoder = builder.token_counter.token_encoder
+    with open(args.queries, encoding="utf-8") as file:
+        queries = [line.strip() for line in file if line.strip()]
+    embedding = graphrag_query.Embedding(
+        model=config.embedding.model,
+        api_key=config.embedding.api_key,
+        organization=config.embedding.organization,
+        base_url=config.embedding.base_url,
+        timeout=config.embedding.timeout,
+        max_retries=config.embedding.max_retries,
+        **(config.embedding.kwargs or {}),
+    )
+    query_embeddings = embedding.embed_many(queries)
+
+    def _build(builder_: graphrag_query.LocalContextBuilder, query: str, query_embedding: typing.List[float]) -> None:
+        builder_.build_context(query=query, query_embedding=query_embedding, data_max_tokens=args.data_max_tokens)
+
+    print(f"{'mode':<16} {'lookups':>9} {'encoded':>9} {'hit rate':>9} {'ms/build':>9}")
+
+    def _report(mode: str, lookups: typing.Optional[int], encoded: int, elapsed: float) -> None:
+        hit_rate = f"{1 - encoded / lookups:.1%}" if lookups else "-"
+        print(f"{mode:<16} {lookups or '-':>9} {encoded:>9} {hit_rate:>9} {elapsed / len(queries) * 1000:>9.1f}")
+
+    # a fresh counter for every query: only rows repeated within one build are reused
+    lookups = encoded = 0
+    elapsed = 0.0
+    for query, query_embedding in zip(queries, query_embeddings):
+        counter = _CountingTokenCounter(encoder)
+        started = time.perf_counter()
+        _build(_builder_with(builder, counter), query, query_embedding)
+        elapsed += time.perf_counter() - started
+        lookups, encoded = lookups + counter.lookups, encoded + counter.encoded
+    _report("per query", lookups, encoded, elapsed)
+
+    # one counter shared by every query, as in a running client
+    counter = _CountingTokenCounter(encoder)
+    shared = _builder_with(builder, counter)
+    for round_ in range(1, args.rounds + 1):
+        lookups, encoded = counter.lookups, counter.encoded
+        started = time.perf_counter()
+        for query, query_embedding in zip(queries, query_embeddings):
+            _build(shared, query, query_embedding)
+        elapsed = time.perf_counter() - started
+        _report(f"shared, round {round_}", counter.lookups - lookups, counter.encoded - encoded, elapsed)
+
+    # estimate mode: nothing is encoded
+    estimating = _builder_with(builder, _utils.TokenCounter(encoder, estimate=True))
+    started = time.perf_counter()
+    for query, query_embedding in zip(queries, query_embeddings):
+        _build(estimating, query, query_embedding)
+    _report("estimate", None, 0, time.perf_counter() - started)
+    print(f"{len(counter)} counts cached for {len(queries)} queries")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
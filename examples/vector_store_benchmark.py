@@ -0,0 +1,88 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Benchmark of the entity search latency of the NumPy and LanceDB vector stores.
+
+Local search maps every query to entities with a nearest neighbor search over
+the entity description embeddings. This script loads the same seeded random
+embeddings into a `NumpyVectorStore` and a `LanceDBVectorStore` (in a
+temporary directory) and reports the search latency percentiles of both, and
+the recall of LanceDB against the exact NumPy results:
+
+    python vector_store_benchmark.py --documents 10000 50000 --dimensions 1536 --queries 200
+
+With `--index-min-rows`, LanceDB tables of at least that many rows get an
+approximate (IVF_PQ) index, as with `load_documents_versioned`; without it
+LanceDB searches exhaustively.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import typing
+
+import numpy as np
+
+from graphrag_query import _vector_stores
+
+
+def _latencies(
+    store: _vector_stores.BaseVectorStore, queries: np.ndarray, k: int
+) -> typing.Tuple[np.ndarray, typing.List[typing.List[typing.Union[str, int]]]]:
+    """Returns the latency (in ms) and the result ids of every query, after one warm-up search."""
+    store.similarity_search_by_vector(queries[0].tolist(), k=k)
+    latencies, results = [], []
+    for query in queries:
+        query_ = query.tolist()
+        started = time.perf_counter()
+        found = store.similarity_search_by_vector(query_, k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([result.document.id for result in found])
+    return np.asarray(latencies), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=20, help="The number of neighbors searched per query.")
+    parser.add_argument("--index-min-rows", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'documents':>9} {'store':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    for num_documents in args.documents:
+        # unit vectors, like the OpenAI embeddings, so that LanceDB's L2 ranking matches the cosine ranking
+        vectors = rng.standard_normal((num_documents, args.dimensions)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32)
+        documents = [
+            _vector_stores.VectorStoreDocument(id=str(i), text=f"entity {i}", vector=vector.tolist())
+            for i, vector in enumerate(vectors)
+        ]
+
+        numpy_store = _vector_stores.NumpyVectorStore("entities")
+        numpy_store.load_documents(documents)
+        with tempfile.TemporaryDirectory() as uri:
+            lancedb_store = _vector_stores.LanceDBVectorStore("entities", uri=uri)
+            if args.index_min_rows is None:
+                lancedb_store.load_documents(documents)
+            else:
+                lancedb_store.load_documents_versioned(documents, index_min_rows=args.index_min_rows)
+
+            exact_latencies, exact = _latencies(numpy_store, queries, args.k)
+            lancedb_latencies, found = _latencies(lancedb_store, queries, args.k)
+
+        recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(exact, found) if a])
+        for name, latencies, recall_ in [("numpy", exact_latencies, 1.0), ("lancedb", lancedb_latencies, recall)]:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"{num_documents:>9} {name:<8} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {recall_:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
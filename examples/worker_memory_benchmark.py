@@ -0,0 +1,146 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Benchmark of the memory of server workers sharing a preloaded index.
+
+With `preload_index`, the server loads the local context of the index once in
+the gunicorn master, freezes it with `gc.freeze()` and forks the workers, which
+share its pages copy-on-write instead of each loading their own copy. This
+script reproduces both setups with `os.fork()`: each worker runs the same
+context builds and then reports its resident (RSS), proportional (PSS) and
+unique (USS) memory from `/proc/self/smaps_rollup` (Linux only):
+
+    python worker_memory_benchmark.py -c graphrag.yml --workers 4 --builds 50
+
+PSS splits every shared page between the processes mapping it, so the sum of
+the PSS of the workers (and the master) is the memory the setup really uses.
+The queries are the titles and description embeddings of random entities of
+the index, so no model is called.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import random
+import typing
+
+import graphrag_query
+
+
+def _load_builder(config: graphrag_query.GraphRAGConfig) -> graphrag_query.LocalContextBuilder:
+    """Load the local context as `server.common.graphrag.preload_index` does."""
+    return graphrag_query.load_local_context_builder(config, compact_models=True, store__backend="numpy")
+
+
+def _memory() -> typing.Dict[str, int]:
+    """The RSS, PSS and USS of this process, in KiB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _run_builds(builder: graphrag_query.LocalContextBuilder, builds: int, seed: int) -> None:
+    rng = random.Random(seed)
+    queries = [
+        (entity.title, list(entity.description_embedding))
+        for entity in builder.entities.values() if entity.description_embedding is not None
+    ]
+    for _ in range(builds):
+        query, query_embedding = rng.choice(queries)
+        builder.build_context(query=query, query_embedding=query_embedding)
+
+
+def _fork_workers(
+    num_workers: int,
+    target: typing.Callable[[int], None],
+) -> typing.Tuple[typing.Dict[str, int], typing.List[typing.Dict[str, int]]]:
+    """
+    Fork the workers and run `target` in each. Returns the memory of the master
+    and of every worker, all measured while the workers are alive (the shared
+    pages are only split between the processes mapping them).
+    """
+    release_reader, release_writer = os.pipe()
+    pids, readers = [], []
+    for worker in range(num_workers):
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(reader)
+            os.close(release_writer)
+            status = 0
+            try:
+                target(worker)
+                os.write(writer, json.dumps(_memory()).encode())
+                os.close(writer)
+                # wait for the master to measure itself
+                os.read(release_reader, 1)
+            except BaseException:  # noqa
+                status = 1
+            finally:
+                os._exit(status)
+        os.close(writer)
+        pids.append(pid)
+        readers.append(reader)
+    os.close(release_reader)
+
+    workers = []
+    for reader in readers:
+        with os.fdopen(reader, "rb") as file:
+            workers.append(file.read())
+    master = _memory()
+    os.close(release_writer)
+    for pid, data in zip(pids, workers):
+        _, status = os.waitpid(pid, 0)
+        if status or not data:
+            raise RuntimeError(f"Worker {pid} failed")
+    return master, [json.loads(data) for data in workers]
+
+
+def _report(setup: str, master: typing.Dict[str, int], workers: typing.List[typing.Dict[str, int]]) -> None:
+    for name, memory in [("master", master)] + [(f"worker {i}", memory) for i, memory in enumerate(workers)]:
+        rss, pss, uss = (memory[field] / 1024 for field in ("rss", "pss", "uss"))
+        print(f"{setup:<10} {name:<10} {rss:>9.1f} {pss:>9.1f} {uss:>9.1f}")
+    total = (master["pss"] + sum(memory["pss"] for memory in workers)) / 1024
+    print(f"{setup:<10} {'total PSS':<10} {'':>9} {total:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-c", "--config", required=True, help="The GraphRAG configuration file.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--builds", type=int, default=50, help="The number of context builds run by each worker.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = graphrag_query.GraphRAGConfig.from_config_file(args.config)
+    print(f"{'setup':<10} {'process':<10} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9}")
+
+    # every worker loads its own index
+    def _load_and_build(worker: int) -> None:
+        _run_builds(_load_builder(config), args.builds, args.seed + worker)
+
+    _report("per worker", *_fork_workers(args.workers, _load_and_build))
+
+    # the master loads the index and the workers share it, as with `preload_index` and `gunicorn.conf.py`
+    builder = _load_builder(config)
+    gc.collect()
+    gc.freeze()
+    _report("preloaded", *_fork_workers(
+        args.workers, lambda worker: _run_builds(builder, args.builds, args.seed + worker)
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from . import (
 from ._client import (
     AsyncGraphRAGClient,
     GraphRAGClient,
+    load_local_context_builder,
 )
 from ._config import (
     ChatLLMConfig,
@@ -34,6 +35,7 @@ from ._search import (
     BaseChatLLM,
     BaseContextBuilder,
     BaseEmbedding,
+    BaseEmbeddingCache,
     ChatLLM,
     Embedding,
     GlobalContextBuilder,
@@ -42,11 +44,15 @@ from ._search import (
     LocalContextBuilder,
     LocalContextLoader,
     LocalSearchEngine,
+    MapResultCache,
+    MemoryEmbeddingCache,
     QueryEngine,
     SearchResult,
     SearchResultChunk,
     SearchResultChunkVerbose,
     SearchResultVerbose,
+    SnapshotContextLoader,
+    SqliteEmbeddingCache,
 )
 from ._version import (
     __title__,
@@ -59,6 +65,7 @@ __all__ = [
 
     "AsyncGraphRAGClient",
     "GraphRAGClient",
+    "load_local_context_builder",
 
     "ChatLLMConfig",
     "ContextConfig",
@@ -78,6 +85,7 @@ __all__ = [
     "BaseChatLLM",
     "BaseContextBuilder",
     "BaseEmbedding",
+    "BaseEmbeddingCache",
     "ChatLLM",
     "Embedding",
     "GlobalContextBuilder",
@@ -86,11 +94,15 @@ __all__ = [
     "LocalContextBuilder",
     "LocalContextLoader",
     "LocalSearchEngine",
+    "MapResultCache",
+    "MemoryEmbeddingCache",
     "QueryEngine",
     "SearchResult",
     "SearchResultChunk",
     "SearchResultChunkVerbose",
     "SearchResultVerbose",
+    "SnapshotContextLoader",
+    "SqliteEmbeddingCache",
 
     "__title__",
     "__version__",
@@ -13,6 +13,7 @@ import typing
 from . import (
     _config as _cfg,  # alias for _config attribute of Client class
     _search,
+    _utils,
     types as _types,
 )
 from ._search._engine import _base_engine
@@ -217,6 +218,29 @@ class BaseClient(abc.ABC, typing.Generic[_Response_T]):
             for i in range(len(msg_list) - 1)  # check if the roles are alternating
         ) and msg_list[-1]['role'] == 'user')  # check if the last role is user
 
+    @staticmethod
+    def _batch_query_texts(
+        queries: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Dict[str, str]:
+        """
+        Return the texts a local search embeds for each valid query of a batch,
+        keyed like `queries`.
+        """
+        texts = {}
+        for key, message in queries.items():
+            msg_list = [msg for msg in message if msg['role'] not in ['system', 'function', 'tool']]
+            if not msg_list or not BaseClient._verify_message(msg_list):
+                continue
+            text = _search.LocalContextBuilder.get_query_text(
+                query=msg_list[-1]['content'],
+                conversation_history=_search.ConversationHistory.from_list(msg_list[:-1]),
+                **_utils.filter_kwargs(_search.LocalContextBuilder.get_query_text, kwargs),
+            )
+            if text:
+                texts[key] = text
+        return texts
+
     @abc.abstractmethod
     def close(self) -> typing.Union[None, typing.Awaitable[None]]:
         """
@@ -0,0 +1,287 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Batch queries for the GraphRAG clients.
+
+A batch runs many queries under one concurrency budget. Identical queries are
+run once, the query embeddings of local searches are computed up front in as
+few embedding requests as possible, and the results are handed back as they
+complete together with per-query and aggregate latency and token usage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import json
+import statistics
+import time
+import typing
+
+import typing_extensions
+
+from . import types as _types
+from ._search import _types as _search_types
+
+_Key_T: typing.TypeAlias = str
+
+
+@dataclasses.dataclass
+class BatchItem:
+    """The outcome of one query of a batch."""
+
+    index: int
+    """Position of the query in the batch."""
+
+    response: typing.Optional[_types.Response_T] = None
+    """The response, or None if the query failed."""
+
+    error: typing.Optional[BaseException] = None
+    """The exception raised by the query, or None if it succeeded."""
+
+    latency: float = 0.0
+    """Seconds the query took to run (once, for identical queries)."""
+
+    deduplicated: bool = False
+    """Whether the result is shared with an identical query of the batch that was run instead."""
+
+    @property
+    def usage(self) -> typing.Optional[_search_types.Usage]:
+        return self.response.usage if self.response is not None else None
+
+
+@dataclasses.dataclass
+class BatchSummary:
+    """Aggregate statistics of the completed queries of a batch."""
+
+    queries: int
+    """Number of completed queries, including deduplicated ones."""
+
+    executed: int
+    """Number of queries that were actually run."""
+
+    failed: int
+    """Number of completed queries that failed."""
+
+    wall_time: float
+    """Seconds since the batch started, or its total duration once it is exhausted."""
+
+    latency_mean: float
+    """Mean latency of the executed queries, in seconds."""
+
+    latency_p50: float
+    """Median latency of the executed queries, in seconds."""
+
+    latency_p95: float
+    """95th percentile latency of the executed queries, in seconds."""
+
+    latency_max: float
+    """Maximum latency of the executed queries, in seconds."""
+
+    usage: _search_types.Usage
+    """Token usage summed over the executed queries that reported it."""
+
+    @classmethod
+    def from_items(cls, items: typing.Sequence[BatchItem], wall_time: float) -> BatchSummary:
+        executed = [item for item in items if not item.deduplicated]
+        latencies = sorted(item.latency for item in executed)
+        usages = [item.usage for item in executed if item.usage is not None]
+        return cls(
+            queries=len(items),
+            executed=len(executed),
+            failed=sum(item.error is not None for item in items),
+            wall_time=wall_time,
+            latency_mean=statistics.fmean(latencies) if latencies else 0.0,
+            latency_p50=_percentile(latencies, 0.5),
+            latency_p95=_percentile(latencies, 0.95),
+            latency_max=latencies[-1] if latencies else 0.0,
+            usage=_search_types.Usage(
+                prompt_tokens=sum(usage.prompt_tokens for usage in usages),
+                completion_tokens=sum(usage.completion_tokens for usage in usages),
+                total_tokens=sum(usage.total_tokens for usage in usages),
+            ),
+        )
+
+
+class BatchRun(typing.Iterator[BatchItem]):
+    """
+    Iterator over the items of a running batch, in completion order.
+
+    Attributes:
+        _items: The underlying iterator of items.
+        _completed: The items returned so far.
+        _started: The start time of the batch (performance counter).
+        _finished: The time the batch was exhausted, or None.
+    """
+    _items: typing.Iterator[BatchItem]
+    _completed: typing.List[BatchItem]
+    _started: float
+    _finished: typing.Optional[float]
+
+    @property
+    def summary(self) -> BatchSummary:
+        """Statistics of the items completed so far."""
+        return BatchSummary.from_items(self._completed, (self._finished or time.perf_counter()) - self._started)
+
+    def __init__(self, items: typing.Iterator[BatchItem]) -> None:
+        self._items = items
+        self._completed = []
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @typing_extensions.override
+    def __next__(self) -> BatchItem:
+        try:
+            item = next(self._items)
+        except StopIteration:
+            self._finished = self._finished or time.perf_counter()
+            raise
+        self._completed.append(item)
+        return item
+
+    def close(self) -> None:
+        """Stop the batch, cancelling the queries that have not started."""
+        close = getattr(self._items, "close", None)
+        if close is not None:
+            close()
+        self._finished = self._finished or time.perf_counter()
+
+
+class AsyncBatchRun(typing.AsyncIterator[BatchItem]):
+    """
+    Asynchronous iterator over the items of a running batch, in completion
+    order.
+
+    Attributes:
+        _items: The underlying asynchronous generator of items.
+        _completed: The items returned so far.
+        _started: The start time of the batch (performance counter).
+        _finished: The time the batch was exhausted, or None.
+    """
+    _items: typing.AsyncGenerator[BatchItem, None]
+    _completed: typing.List[BatchItem]
+    _started: float
+    _finished: typing.Optional[float]
+
+    @property
+    def summary(self) -> BatchSummary:
+        """Statistics of the items completed so far."""
+        return BatchSummary.from_items(self._completed, (self._finished or time.perf_counter()) - self._started)
+
+    def __init__(self, items: typing.AsyncGenerator[BatchItem, None]) -> None:
+        self._items = items
+        self._completed = []
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @typing_extensions.override
+    async def __anext__(self) -> BatchItem:
+        try:
+            item = await self._items.__anext__()
+        except StopAsyncIteration:
+            self._finished = self._finished or time.perf_counter()
+            raise
+        self._completed.append(item)
+        return item
+
+    async def aclose(self) -> None:
+        """Stop the batch, cancelling the queries that are still running."""
+        await self._items.aclose()
+        self._finished = self._finished or time.perf_counter()
+
+
+@dataclasses.dataclass
+class BatchPlan:
+    """
+    The deduplicated queries of a batch.
+
+    Attributes:
+        queries: The message list of each distinct query, in first-seen order.
+        indices: The batch positions of each distinct query.
+    """
+    queries: typing.Dict[_Key_T, typing.List[typing.Dict[str, typing.Any]]]
+    indices: typing.Dict[_Key_T, typing.List[int]]
+
+    @classmethod
+    def create(cls, messages: typing.Iterable[_types.MessageParam_T]) -> BatchPlan:
+        queries: typing.Dict[_Key_T, typing.List[typing.Dict[str, typing.Any]]] = {}
+        indices: typing.Dict[_Key_T, typing.List[int]] = {}
+        for index, message in enumerate(messages):
+            msg_list = [dict(msg) for msg in message]
+            key = json.dumps(msg_list, sort_keys=True, default=str)
+            queries.setdefault(key, msg_list)
+            indices.setdefault(key, []).append(index)
+        return cls(queries=queries, indices=indices)
+
+    def items(
+        self,
+        key: _Key_T,
+        response: typing.Optional[_types.Response_T],
+        error: typing.Optional[BaseException],
+        latency: float,
+    ) -> typing.List[BatchItem]:
+        """Build the items of every query of the batch with the given key."""
+        return [
+            BatchItem(index=index, response=response, error=error, latency=latency, deduplicated=n > 0)
+            for n, index in enumerate(self.indices[key])
+        ]
+
+
+def run_batch(
+    plan: BatchPlan,
+    run_query: typing.Callable[[_Key_T], _types.Response_T],
+    max_workers: int,
+) -> typing.Generator[BatchItem, None, None]:
+    """Run the distinct queries of a plan on a thread pool, yielding items as they complete."""
+    def _timed(
+        key: _Key_T,
+    ) -> typing.Tuple[typing.Optional[_types.Response_T], typing.Optional[BaseException], float]:
+        started = time.perf_counter()
+        try:
+            return run_query(key), None, time.perf_counter() - started
+        except Exception as e:
+            return None, e, time.perf_counter() - started
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(_timed, key): key for key in plan.queries}
+        for future in concurrent.futures.as_completed(futures):
+            yield from plan.items(futures[future], *future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def arun_batch(
+    plan: BatchPlan,
+    run_query: typing.Callable[[_Key_T], typing.Awaitable[_types.Response_T]],
+    max_concurrency: int,
+) -> typing.AsyncGenerator[BatchItem, None]:
+    """Run the distinct queries of a plan concurrently, yielding items as they complete."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _timed(
+        key: _Key_T,
+    ) -> typing.Tuple[_Key_T, typing.Optional[_types.Response_T], typing.Optional[BaseException], float]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return key, await run_query(key), None, time.perf_counter() - started
+            except Exception as e:
+                return key, None, e, time.perf_counter() - started
+
+    tasks = [asyncio.ensure_future(_timed(key)) for key in plan.queries]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for item in plan.items(*await next_done):
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _percentile(sorted_values: typing.Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
@@ -7,6 +7,7 @@ import argparse
 import asyncio
 import pathlib
 import sys
+import time
 import typing
 import warnings
 
@@ -18,8 +19,11 @@ from . import (
 )
 from .. import (
     __version__,
+    _config,
+    _search,
     errors as _errors,
 )
+from .._search import _defaults as _search_defaults
 
 
 class _Args(pydantic.BaseModel):
@@ -49,9 +53,87 @@ class _Args(pydantic.BaseModel):
     sys_prompt: typing.Optional[str]
 
 
+class _CompileArgs(pydantic.BaseModel):
+    config_file: typing.Optional[str]
+    context_dir: typing.Optional[str]
+    output_dir: str
+    community_level: typing.Annotated[typing.Optional[int], pydantic.Field(..., ge=0)]
+    encoding_model: typing.Optional[str]
+
+
+def _parse_kwargs(unknown: typing.List[str]) -> typing.Dict[str, typing.Any]:
+    kwargs: typing.Dict[str, typing.Any] = {}
+    for arg in unknown:
+        if arg.startswith("--"):
+            kv = arg[2:].split("=", 1)
+            if len(kv) == 2:
+                kwargs[kv[0]] = kv[1]
+            else:
+                kwargs[kv[0]] = True
+        else:
+            raise _errors.InvalidParameterError(params=[arg], reason=["Unknown argument"])
+    return kwargs
+
+
+def _parse_compile_args(argv: typing.List[str]) -> typing.Tuple[_CompileArgs, typing.Dict[str, typing.Any]]:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compile the Parquet files of an index into a snapshot that loads without decoding or re-processing "
+            "them. Point the context directory of the configuration to the snapshot to use it. Other `--key=value` "
+            "arguments are passed to the loader (e.g. `--entities__id_col=id`)."
+        ),
+        prog="python -m query compile",
+        add_help=True,
+    )
+    parser.add_argument(
+        "--config-file", "-f",
+        type=str,
+        help="configuration file to take the context directory, loader options and local search settings from",
+        default=None,
+    )
+    parser.add_argument(
+        "--context-dir", "-c",
+        type=str,
+        help="directory containing the Parquet files of the index (overrides the configuration)",
+        default=None,
+    )
+    parser.add_argument(
+        "--output-dir", "-o",
+        type=str,
+        required=True,
+        help="directory to write the snapshot to",
+    )
+    parser.add_argument(
+        "--community-level", "-l",
+        type=int,
+        help=(
+            "community level to resolve the entities and reports at (overrides the configuration; "
+            f"defaults to {_search_defaults.DEFAULT__LOCAL_SEARCH__COMMUNITY_LEVEL})"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--encoding-model", "-e",
+        type=str,
+        help=(
+            "encoding to precompute the token counts with (overrides the configuration; "
+            f"defaults to {_search_defaults.DEFAULT__ENCODING_MODEL})"
+        ),
+        default=None,
+    )
+
+    args, unknown = parser.parse_known_args(argv)
+    args_ = _CompileArgs.model_validate(args.__dict__)
+    if args_.config_file is None and args_.context_dir is None:
+        raise _errors.InvalidParameterError(
+            params=["--context-dir"], reason=["Either --context-dir or --config-file is required"]
+        )
+    return args_, _parse_kwargs(unknown)
+
+
 def _parse_args() -> typing.Tuple[_Args, typing.Dict[str, typing.Any]]:
     parser = argparse.ArgumentParser(
-        description="GraphRAG Query CLI",
+        description="GraphRAG Query CLI (run `python -m query compile --help` to compile an index)",
         prog="python -m query",
         add_help=True,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -143,18 +225,7 @@ def _parse_args() -> typing.Tuple[_Args, typing.Dict[str, typing.Any]]:
 
     args, unknown = parser.parse_known_args()
     args_ = _Args.parse_obj(args.__dict__)
-    kwargs: typing.Dict[str, typing.Any] = {}
-    for arg in unknown:
-        if arg.startswith("--"):
-            kv = arg[2:].split("=", 1)
-            if len(kv) == 2:
-                kwargs[kv[0]] = kv[1]
-            else:
-                kwargs[kv[0]] = True
-        else:
-            raise _errors.InvalidParameterError(params=[arg], reason=["Unknown argument"])
-
-    return args_, kwargs
+    return args_, _parse_kwargs(unknown)
 
 
 def main() -> int:
@@ -174,6 +245,9 @@ def main() -> int:
 
 
 def _main() -> None:
+    if sys.argv[1:2] == ["compile"]:
+        _compile(sys.argv[2:])
+        return
     try:
         args, kwargs = _parse_args()
     except pydantic.ValidationError as err:
@@ -239,6 +313,43 @@ def _main() -> None:
         _qt.main(cli, sys_prompt=sys_prompt, **kwargs)
 
 
+def _compile(argv: typing.List[str]) -> None:
+    try:
+        args, kwargs = _parse_compile_args(argv)
+    except pydantic.ValidationError as err:
+        raise _errors.InvalidParameterError.from_pydantic_validation_error(err)
+
+    context_dir = args.context_dir
+    community_level = args.community_level
+    encoding_model = args.encoding_model
+    if args.config_file is not None:
+        config = _config.GraphRAGConfig.from_config_file(args.config_file)
+        context_dir = context_dir or config.context.directory
+        community_level = community_level if community_level is not None else config.local_search.community_level
+        encoding_model = encoding_model or config.local_search.encoding_model
+        kwargs = {**(config.context.kwargs or {}), **(config.local_search.kwargs or {}), **kwargs}
+    # resolved as the local search engine resolves them
+    community_level = community_level or _search_defaults.DEFAULT__LOCAL_SEARCH__COMMUNITY_LEVEL
+    encoding_model = encoding_model or _search_defaults.DEFAULT__ENCODING_MODEL
+
+    sys.stdout.write(f"Loading the index from {context_dir}...\n")
+    sys.stdout.flush()
+    started = time.perf_counter()
+    loader = _search.LocalContextLoader.from_parquet_directory(typing.cast(str, context_dir), **kwargs)
+    sys.stdout.write(f"Compiling at community level {community_level} with encoding {encoding_model}...\n")
+    sys.stdout.flush()
+    snapshot_loader = _search.SnapshotContextLoader.compile(
+        loader,
+        args.output_dir,
+        community_level=community_level,
+        encoding_model=encoding_model,
+        **kwargs,
+    )
+    sys.stdout.write(f"{snapshot_loader}\n")
+    sys.stdout.write(f"Snapshot written to {args.output_dir} in {time.perf_counter() - started:.1f}s.\n")
+    sys.stdout.flush()
+
+
 async def _chat_loop(cli: _api.AsyncGraphRAGCli, **kwargs) -> None:
     async with cli:
         while True:
@@ -3,6 +3,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import os
 import pathlib
 import types
@@ -13,17 +15,21 @@ import typing_extensions
 
 from . import (
     _base_client,
+    _batch,
     _config as _cfg,  # alias for _config attribute of Client class
     _defaults,
     _search,
+    _singleflight,
     errors as _errors,
     types as _types,
 )
+from ._search import _defaults as _search_defaults
 from ._search._engine import _base_engine
 
 __all__ = [
     'GraphRAGClient',
     'AsyncGraphRAGClient',
+    'load_local_context_builder',
 ]
 
 
@@ -64,6 +70,11 @@ class GraphRAGClient(
     def logger(self, logger: _base_engine.Logger) -> None:
         self._logger = logger
 
+    @property
+    def local_context_builder(self) -> _search.LocalContextBuilder:
+        """The context builder of the local search engine, which can be shared with other clients."""
+        return self._local_search_engine.context_builder
+
     @property
     def chat_llm(self) -> _search.BaseChatLLM:
         return self._chat_llm
@@ -93,6 +104,7 @@ class GraphRAGClient(
         chat_llm: typing.Optional[_search.BaseChatLLM] = None,
         embedding: typing.Optional[_search.BaseEmbedding] = None,
         logger: typing.Optional[_base_engine.Logger] = None,
+        local_context_builder: typing.Optional[_search.LocalContextBuilder] = None,
     ) -> None:
         """
         Initializes the GraphRAGClient with the given configuration and logger.
@@ -103,6 +115,12 @@ class GraphRAGClient(
                 Optional logger for logging client events. If not provided, a
                 default logger will be created based on the configuration
                 settings.
+            local_context_builder:
+                Optional local context builder already loaded (e.g. by another
+                client, or before a server forks its workers). The client
+                shares its records and indexes instead of loading the context
+                directory; the configured context and local search options that
+                shape the index are then ignored.
         """
         self._config = config
         self._logger = logger or _defaults.get_default_logger(
@@ -153,16 +171,33 @@ class GraphRAGClient(
                 )
                 if self._config.embedding.token_encoder
                 else None,
+                cache=_create_embedding_cache(self._config.embedding),
                 **(self._config.embedding.kwargs or {}),
             )
 
         # Initialize ContextLoader objects
-        if self._logger:
-            self._logger.info(f'Initializing the LocalContextLoader with directory: {self._config.context.directory}')
-        local_context_loader = _search.LocalContextLoader.from_parquet_directory(
-            self._config.context.directory,
-            **(self._config.context.kwargs or {}),
-        )
+        if local_context_builder is not None:
+            if self._logger:
+                self._logger.info(f'Using the provided LocalContextBuilder: {local_context_builder}')
+            local_context_loader = None
+            local_context_builder = local_context_builder.with_text_embedder(self._embedding)
+        elif _search.SnapshotContextLoader.is_snapshot(self._config.context.directory):
+            if self._logger:
+                self._logger.info(
+                    f'Initializing the SnapshotContextLoader with directory: {self._config.context.directory}'
+                )
+            local_context_loader = _search.SnapshotContextLoader.from_directory(
+                self._config.context.directory, **(self._config.context.kwargs or {}),
+            )
+        else:
+            if self._logger:
+                self._logger.info(
+                    f'Initializing the LocalContextLoader with directory: {self._config.context.directory}'
+                )
+            local_context_loader = _search.LocalContextLoader.from_parquet_directory(
+                self._config.context.directory,
+                **(self._config.context.kwargs or {}),
+            )
 
         if self._logger:
             self._logger.info(f'Initializing the GlobalContextLoader with directory: {self._config.context.directory}')
@@ -186,6 +221,7 @@ class GraphRAGClient(
             chat_llm=self._chat_llm,
             embedding=self._embedding,
             context_loader=local_context_loader,
+            context_builder=local_context_builder,
             sys_prompt=sys_prompt,
             community_level=self._config.local_search.community_level,
             store_coll_name=self._config.local_search.store_coll_name,
@@ -210,6 +246,12 @@ class GraphRAGClient(
             no_data_answer=self._config.global_search.no_data_answer,
             json_mode=self._config.global_search.json_mode,
             max_data_tokens=self._config.global_search.max_data_tokens,
+            max_map_calls=self._config.global_search.max_map_calls,
+            hierarchical=self._config.global_search.hierarchical,
+            drill_down_threshold=self._config.global_search.drill_down_threshold,
+            max_map_tokens=self._config.global_search.max_map_tokens,
+            map_cache=_create_map_cache(self._config.global_search),
+            multi_stage_reduce=self._config.global_search.multi_stage_reduce,
             community_level=self._config.global_search.community_level,
             encoding_model=self._config.global_search.encoding_model,
             logger=self._logger,
@@ -297,6 +339,87 @@ class GraphRAGClient(
 
         return response
 
+    def chat_many(
+        self,
+        *,
+        engine: typing.Literal['local', 'global'] = 'local',
+        messages: typing.Iterable[_types.MessageParam_T],
+        verbose: bool = False,
+        max_concurrency: typing.Optional[int] = None,
+        **kwargs: typing.Any
+    ) -> _batch.BatchRun:
+        """
+        Runs a batch of chat interactions with one search engine and returns
+        their results as they complete.
+
+        Identical messages are run once and share their result. For local
+        searches, the queries are embedded up front with
+        `BaseEmbedding.embed_many`, which groups them into as few embedding
+        requests as possible. The queries then run on a thread pool and share
+        the context builder, which keeps its per-query values out of the shared
+        records.
+
+        Args:
+            engine:
+                Specifies whether to use the local or global search engine.
+                Defaults to 'local'.
+            messages:
+                The messages of the queries, each in the format of the
+                `message` argument of `chat`.
+            verbose:
+                If True, returns detailed responses. Defaults to False.
+            max_concurrency:
+                The maximum number of queries run at once. Defaults to
+                `DEFAULT__CONCURRENT_THREADS`.
+            **kwargs: Additional arguments for every query, as for `chat`.
+
+        Returns:
+            An iterator over the `BatchItem` of each query, in completion
+            order. A failed query is reported in its item instead of being
+            raised. The `summary` property of the iterator aggregates the
+            latency and usage of the queries completed so far.
+
+        Raises:
+            InvalidEngineError: If the specified engine is not recognized.
+        """
+        if engine not in ['local', 'global']:
+            raise _errors.InvalidEngineError(engine)
+        plan = _batch.BatchPlan.create(messages)
+        return _batch.BatchRun(self._run_batch(plan, engine, verbose, max_concurrency, kwargs))
+
+    def _run_batch(
+        self,
+        plan: _batch.BatchPlan,
+        engine: typing.Literal['local', 'global'],
+        verbose: bool,
+        max_concurrency: typing.Optional[int],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Generator[_batch.BatchItem, None, None]:
+        query_embeddings: typing.Dict[str, typing.List[float]] = {}
+        if engine == 'local':
+            texts = self._batch_query_texts(plan.queries, kwargs)
+            try:
+                query_embeddings = dict(zip(texts, self._embedding.embed_many(list(texts.values()))))
+            except Exception as e:
+                # fall back to embedding each query on its own
+                if self._logger:
+                    self._logger.warning(f'Failed to embed the batch queries up front: {e}')
+
+        def _run(key: str) -> _types.Response_T:
+            query_embedding = query_embeddings.get(key)
+            return typing.cast(_types.Response_T, self.chat(
+                engine=engine,
+                message=typing.cast(_types.MessageParam_T, plan.queries[key]),
+                stream=False,
+                verbose=verbose,
+                **({'query_embedding': query_embedding} if query_embedding else {}),
+                **kwargs
+            ))
+
+        if self._logger:
+            self._logger.info(f'Running a batch of {len(plan.queries)} distinct {engine} queries')
+        yield from _batch.run_batch(plan, _run, max_concurrency or _search_defaults.DEFAULT__CONCURRENT_THREADS)
+
     @typing_extensions.override
     def close(self) -> None:
         """
@@ -346,13 +469,17 @@ class AsyncGraphRAGClient(
         _logger:
             Optional logger for recording internal events and debugging
             information.
+        _single_flight:
+            Coalesces identical chat interactions that are in flight at the
+            same time, or None if coalescing is disabled.
     """
     _config: _cfg.GraphRAGConfig
     _chat_llm: _search.BaseAsyncChatLLM
-    _embedding: _search.BaseEmbedding
+    _embedding: typing.Union[_search.BaseEmbedding, _search.BaseAsyncEmbedding]
     _local_search_engine: _search.AsyncLocalSearchEngine
     _global_search_engine: _search.AsyncGlobalSearchEngine
     _logger: typing.Optional[_base_engine.Logger]
+    _single_flight: typing.Optional[_singleflight.SingleFlight]
 
     @property
     def logger(self) -> typing.Optional[_base_engine.Logger]:
@@ -362,6 +489,16 @@ class AsyncGraphRAGClient(
     def logger(self, logger: _base_engine.Logger) -> None:
         self._logger = logger
 
+    @property
+    def coalescing_stats(self) -> typing.Optional[_singleflight.SingleFlightStats]:
+        """Counters of the coalesced chat interactions, or None if coalescing is disabled."""
+        return self._single_flight.stats if self._single_flight is not None else None
+
+    @property
+    def local_context_builder(self) -> _search.LocalContextBuilder:
+        """The context builder of the local search engine, which can be shared with other clients."""
+        return self._local_search_engine.context_builder
+
     @property
     def chat_llm(self) -> _search.BaseAsyncChatLLM:
         return self._chat_llm
@@ -387,8 +524,11 @@ class AsyncGraphRAGClient(
         *,
         config: _cfg.GraphRAGConfig,
         chat_llm: typing.Optional[_search.BaseAsyncChatLLM] = None,
-        embedding: typing.Optional[_search.BaseEmbedding] = None,
+        embedding: typing.Optional[typing.Union[_search.BaseEmbedding, _search.BaseAsyncEmbedding]] = None,
         logger: typing.Optional[_base_engine.Logger] = None,
+        local_context_builder: typing.Optional[_search.LocalContextBuilder] = None,
+        global_map_semaphore: typing.Optional[asyncio.Semaphore] = None,
+        coalesce: bool = True,
     ) -> None:
         """
         Initializes the AsyncGraphRAGClient with the given configuration and
@@ -400,8 +540,24 @@ class AsyncGraphRAGClient(
                 Optional logger for logging client events. If not provided, a
                 default logger will be created based on the configuration
                 settings.
+            local_context_builder:
+                Optional local context builder already loaded (e.g. by another
+                client, or before a server forks its workers). The client
+                shares its records and indexes instead of loading the context
+                directory; the configured context and local search options that
+                shape the index are then ignored.
+            global_map_semaphore:
+                Optional semaphore bounding the concurrent LLM calls of global
+                searches. Pass the same semaphore to several clients to bound
+                their calls together. If not provided, the global search engine
+                creates its own.
+            coalesce:
+                If True (the default), identical chat interactions in flight at
+                the same time run once and share their response; streamed
+                responses are broadcast to every caller.
         """
         self._config = config
+        self._single_flight = _singleflight.SingleFlight() if coalesce else None
         self._logger = logger or _defaults.get_default_logger(
             level=self._config.logging.level,
             fmt=self._config.logging.format,
@@ -436,7 +592,7 @@ class AsyncGraphRAGClient(
         else:
             if self._logger:
                 self._logger.info(f'Initializing the Embedding with model: {self._config.embedding.model}')
-            self._embedding = _search.Embedding(
+            self._embedding = _search.AsyncEmbedding(
                 model=self._config.embedding.model,
                 api_key=self._config.embedding.api_key,
                 organization=self._config.embedding.organization,
@@ -449,14 +605,31 @@ class AsyncGraphRAGClient(
                 )
                 if self._config.embedding.token_encoder
                 else None,
+                cache=_create_embedding_cache(self._config.embedding),
                 **(self._config.embedding.kwargs or {}),
             )
 
-        if self._logger:
-            self._logger.info(f'Initializing the LocalContextLoader with directory: {self._config.context.directory}')
-        local_context_loader = _search.LocalContextLoader.from_parquet_directory(
-            self._config.context.directory, **(self._config.context.kwargs or {}),
-        )
+        if local_context_builder is not None:
+            if self._logger:
+                self._logger.info(f'Using the provided LocalContextBuilder: {local_context_builder}')
+            local_context_loader = None
+            local_context_builder = local_context_builder.with_text_embedder(self._embedding)
+        elif _search.SnapshotContextLoader.is_snapshot(self._config.context.directory):
+            if self._logger:
+                self._logger.info(
+                    f'Initializing the SnapshotContextLoader with directory: {self._config.context.directory}'
+                )
+            local_context_loader = _search.SnapshotContextLoader.from_directory(
+                self._config.context.directory, **(self._config.context.kwargs or {}),
+            )
+        else:
+            if self._logger:
+                self._logger.info(
+                    f'Initializing the LocalContextLoader with directory: {self._config.context.directory}'
+                )
+            local_context_loader = _search.LocalContextLoader.from_parquet_directory(
+                self._config.context.directory, **(self._config.context.kwargs or {}),
+            )
 
         if self._logger:
             self._logger.info('Initializing the LocalSearchEngine')
@@ -476,6 +649,7 @@ class AsyncGraphRAGClient(
             chat_llm=self._chat_llm,
             embedding=self._embedding,
             context_loader=local_context_loader,
+            context_builder=local_context_builder,
             sys_prompt=sys_prompt,
             community_level=self._config.local_search.community_level,
             store_coll_name=self._config.local_search.store_coll_name,
@@ -501,8 +675,19 @@ class AsyncGraphRAGClient(
             no_data_answer=self._config.global_search.no_data_answer,
             json_mode=self._config.global_search.json_mode,
             max_data_tokens=self._config.global_search.max_data_tokens,
+            max_map_calls=self._config.global_search.max_map_calls,
+            hierarchical=self._config.global_search.hierarchical,
+            drill_down_threshold=self._config.global_search.drill_down_threshold,
+            max_map_tokens=self._config.global_search.max_map_tokens,
+            map_cache=_create_map_cache(self._config.global_search),
+            multi_stage_reduce=self._config.global_search.multi_stage_reduce,
+            progressive_reduce=self._config.global_search.progressive_reduce,
+            reduce_quorum=self._config.global_search.reduce_quorum,
+            fill_threshold=self._config.global_search.fill_threshold,
+            map_deadline=self._config.global_search.map_deadline,
             community_level=self._config.global_search.community_level,
             encoding_model=self._config.global_search.encoding_model,
+            semaphore=global_map_semaphore,
             logger=self._logger,
             **(self._config.global_search.kwargs or {}),
         )
@@ -557,9 +742,38 @@ class AsyncGraphRAGClient(
         message = [msg for msg in message if msg['role'] not in ['system', 'function', 'tool']]
         if not self._verify_message(message):
             raise _errors.InvalidMessageError()
+        if engine not in ['local', 'global']:
+            raise _errors.InvalidEngineError(engine)
 
         # Convert iterable objects to list
         msg_list = [typing.cast(typing.Dict[typing.Literal["role", "content"], str], msg) for msg in message]
+        if self._single_flight is None:
+            return await self._chat(engine, msg_list, stream, verbose, kwargs)
+
+        key = _singleflight.single_flight_key(
+            engine,
+            [(msg['role'], ' '.join(msg['content'].split())) for msg in msg_list],
+            stream,
+            verbose,
+            kwargs,
+        )
+        if stream:
+            return await self._single_flight.do_stream(
+                key, lambda: typing.cast(
+                    typing.Awaitable[_types.AsyncStreamResponse_T],
+                    self._chat(engine, msg_list, stream, verbose, kwargs),
+                )
+            )
+        return await self._single_flight.do(key, lambda: self._chat(engine, msg_list, stream, verbose, kwargs))
+
+    async def _chat(
+        self,
+        engine: typing.Literal['local', 'global'],
+        msg_list: typing.List[typing.Dict[typing.Literal["role", "content"], str]],
+        stream: bool,
+        verbose: bool,
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Union[_types.Response_T, _types.AsyncStreamResponse_T]:
         conversation_history = _search.ConversationHistory.from_list(msg_list[:-1])
         if engine == 'local':
             if self._logger:
@@ -586,6 +800,94 @@ class AsyncGraphRAGClient(
 
         return response
 
+    def abatch(
+        self,
+        *,
+        engine: typing.Literal['local', 'global'] = 'local',
+        messages: typing.Iterable[_types.MessageParam_T],
+        verbose: bool = False,
+        max_concurrency: typing.Optional[int] = None,
+        **kwargs: typing.Any
+    ) -> _batch.AsyncBatchRun:
+        """
+        Runs a batch of chat interactions with one search engine and returns
+        their results as they complete.
+
+        Identical messages are run once and share their result. For local
+        searches, the queries are embedded up front with
+        `BaseAsyncEmbedding.aembed_many`, which groups them into as few
+        embedding requests as possible. The queries then run concurrently
+        under one semaphore.
+
+        Args:
+            engine:
+                Specifies whether to use the local or global search engine.
+                Defaults to 'local'.
+            messages:
+                The messages of the queries, each in the format of the
+                `message` argument of `chat`.
+            verbose:
+                If True, returns detailed responses. Defaults to False.
+            max_concurrency:
+                The maximum number of queries run at once. Defaults to
+                `DEFAULT__CONCURRENT_COROUTINES`.
+            **kwargs: Additional arguments for every query, as for `chat`.
+
+        Returns:
+            An asynchronous iterator over the `BatchItem` of each query, in
+            completion order. A failed query is reported in its item instead
+            of being raised. The `summary` property of the iterator aggregates
+            the latency and usage of the queries completed so far.
+
+        Raises:
+            InvalidEngineError: If the specified engine is not recognized.
+        """
+        if engine not in ['local', 'global']:
+            raise _errors.InvalidEngineError(engine)
+        plan = _batch.BatchPlan.create(messages)
+        return _batch.AsyncBatchRun(self._arun_batch(plan, engine, verbose, max_concurrency, kwargs))
+
+    async def _arun_batch(
+        self,
+        plan: _batch.BatchPlan,
+        engine: typing.Literal['local', 'global'],
+        verbose: bool,
+        max_concurrency: typing.Optional[int],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.AsyncGenerator[_batch.BatchItem, None]:
+        query_embeddings: typing.Dict[str, typing.List[float]] = {}
+        if engine == 'local':
+            texts = self._batch_query_texts(plan.queries, kwargs)
+            try:
+                if isinstance(self._embedding, _search.BaseAsyncEmbedding):
+                    embeddings = await self._embedding.aembed_many(list(texts.values()))
+                else:
+                    embeddings = await asyncio.to_thread(self._embedding.embed_many, list(texts.values()))
+                query_embeddings = dict(zip(texts, embeddings))
+            except Exception as e:
+                # fall back to embedding each query on its own
+                if self._logger:
+                    self._logger.warning(f'Failed to embed the batch queries up front: {e}')
+
+        async def _run(key: str) -> _types.Response_T:
+            query_embedding = query_embeddings.get(key)
+            return typing.cast(_types.Response_T, await self.chat(
+                engine=engine,
+                message=typing.cast(_types.MessageParam_T, plan.queries[key]),
+                stream=False,
+                verbose=verbose,
+                **({'query_embedding': query_embedding} if query_embedding else {}),
+                **kwargs
+            ))
+
+        if self._logger:
+            self._logger.info(f'Running a batch of {len(plan.queries)} distinct {engine} queries')
+        async with contextlib.aclosing(_batch.arun_batch(
+            plan, _run, max_concurrency or _search_defaults.DEFAULT__CONCURRENT_COROUTINES
+        )) as items:
+            async for item in items:
+                yield item
+
     @typing_extensions.override
     async def close(self) -> None:
         """
@@ -609,3 +911,71 @@ class AsyncGraphRAGClient(
     ) -> typing.Literal[False]:
         await self.close()
         return False
+
+
+def load_local_context_builder(
+    config: _cfg.GraphRAGConfig,
+    *,
+    embedding: typing.Optional[typing.Union[_search.BaseEmbedding, _search.BaseAsyncEmbedding]] = None,
+    **kwargs: typing.Any,
+) -> _search.LocalContextBuilder:
+    """
+    Loads the local context builder of a configuration as the clients do, but
+    without creating a client: no chat LLM, embedding model, cache or search
+    engine is created.
+
+    This is how an index is loaded once to be shared by several clients (e.g.
+    before a server forks its workers), each passing it as their
+    `local_context_builder`.
+
+    Args:
+        config:
+            The configuration of the GraphRAG system; its context and local
+            search options are used.
+        embedding:
+            The embedding model the builder embeds queries with. If not
+            provided, the builder must be handed to a client, which sets its
+            own.
+        **kwargs:
+            Keyword arguments overriding the `kwargs` of the local search
+            configuration (e.g. `compact_models`).
+
+    Returns:
+        The loaded LocalContextBuilder.
+    """
+    directory = config.context.directory
+    if _search.SnapshotContextLoader.is_snapshot(directory):
+        context_loader: typing.Union[_search.SnapshotContextLoader, _search.LocalContextLoader] = (
+            _search.SnapshotContextLoader.from_directory(directory, **(config.context.kwargs or {}))
+        )
+    else:
+        context_loader = _search.LocalContextLoader.from_parquet_directory(directory, **(config.context.kwargs or {}))
+    local_search = config.local_search
+    return context_loader.to_context_builder(
+        embedder=typing.cast(typing.Union[_search.BaseEmbedding, _search.BaseAsyncEmbedding], embedding),
+        community_level=local_search.community_level or _search_defaults.DEFAULT__LOCAL_SEARCH__COMMUNITY_LEVEL,
+        store_coll_name=local_search.store_coll_name or _search_defaults.DEFAULT__VECTOR_STORE__COLLECTION_NAME,
+        store_uri=local_search.store_uri or _search_defaults.DEFAULT__VECTOR_STORE__URI,
+        encoding_model=local_search.encoding_model or _search_defaults.DEFAULT__ENCODING_MODEL,
+        **{**(local_search.kwargs or {}), **kwargs},
+    )
+
+
+def _create_embedding_cache(config: _cfg.EmbeddingConfig) -> typing.Optional[_search.BaseEmbeddingCache]:
+    """Create the query embedding cache selected by the configuration, if any."""
+    if config.cache_backend == 'memory':
+        return _search.MemoryEmbeddingCache(max_entries=config.cache_max_entries, ttl=config.cache_ttl)
+    if config.cache_backend == 'sqlite':
+        return _search.SqliteEmbeddingCache(
+            config.cache_path, max_entries=config.cache_max_entries, ttl=config.cache_ttl
+        )
+    return None
+
+
+def _create_map_cache(config: _cfg.GlobalSearchConfig) -> typing.Optional[_search.MapResultCache]:
+    """Create the global search map result cache if the configuration enables it."""
+    if config.map_cache:
+        return _search.MapResultCache(
+            config.map_cache_path, max_entries=config.map_cache_max_entries, ttl=config.map_cache_ttl
+        )
+    return None
@@ -87,6 +87,22 @@ class EmbeddingConfig(pydantic.BaseModel):
         typing.Optional[str],
         pydantic.Field(..., env="TOKEN_ENCODER", pattern=r"^[a-zA-Z0-9_]+$")
     ] = None
+    cache_backend: typing.Annotated[
+        typing.Optional[typing.Literal['memory', 'sqlite']],
+        pydantic.Field(..., env="CACHE_BACKEND")
+    ] = None
+    cache_path: typing.Annotated[
+        typing.Optional[str],
+        pydantic.Field(..., env="CACHE_PATH", min_length=1)
+    ] = None
+    cache_max_entries: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="CACHE_MAX_ENTRIES", ge=1)
+    ] = None
+    cache_ttl: typing.Annotated[
+        typing.Optional[float],
+        pydantic.Field(..., env="CACHE_TTL", gt=0)
+    ] = None
     kwargs: typing.Annotated[
         typing.Optional[typing.Dict[str, typing.Any]],
         pydantic.Field(..., env="KWARGS")
@@ -215,6 +231,58 @@ class GlobalSearchConfig(pydantic.BaseModel):
         typing.Optional[int],
         pydantic.Field(..., env="MAX_DATA_TOKENS", ge=1)
     ] = None
+    max_map_calls: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="MAX_MAP_CALLS", ge=1)
+    ] = None
+    hierarchical: typing.Annotated[
+        typing.Optional[bool],
+        pydantic.Field(..., env="HIERARCHICAL")
+    ] = None
+    drill_down_threshold: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="DRILL_DOWN_THRESHOLD", ge=0, le=100)
+    ] = None
+    max_map_tokens: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="MAX_MAP_TOKENS", ge=1)
+    ] = None
+    map_cache: typing.Annotated[
+        typing.Optional[bool],
+        pydantic.Field(..., env="MAP_CACHE")
+    ] = None
+    map_cache_path: typing.Annotated[
+        typing.Optional[str],
+        pydantic.Field(..., env="MAP_CACHE_PATH", min_length=1)
+    ] = None
+    map_cache_max_entries: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="MAP_CACHE_MAX_ENTRIES", ge=1)
+    ] = None
+    map_cache_ttl: typing.Annotated[
+        typing.Optional[float],
+        pydantic.Field(..., env="MAP_CACHE_TTL", gt=0)
+    ] = None
+    multi_stage_reduce: typing.Annotated[
+        typing.Optional[bool],
+        pydantic.Field(..., env="MULTI_STAGE_REDUCE")
+    ] = None
+    progressive_reduce: typing.Annotated[
+        typing.Optional[bool],
+        pydantic.Field(..., env="PROGRESSIVE_REDUCE")
+    ] = None
+    reduce_quorum: typing.Annotated[
+        typing.Optional[float],
+        pydantic.Field(..., env="REDUCE_QUORUM", gt=0, le=1)
+    ] = None
+    fill_threshold: typing.Annotated[
+        typing.Optional[int],
+        pydantic.Field(..., env="FILL_THRESHOLD", ge=0, le=100)
+    ] = None
+    map_deadline: typing.Annotated[
+        typing.Optional[float],
+        pydantic.Field(..., env="MAP_DEADLINE", gt=0)
+    ] = None
     encoding_model: typing.Annotated[
         typing.Optional[str],
         pydantic.Field(..., env="ENCODING_MODEL", min_length=1)
@@ -16,6 +16,7 @@ from ._context import (
     GlobalContextLoader,
     LocalContextBuilder,
     LocalContextLoader,
+    SnapshotContextLoader,
 )
 from ._engine import (
     AsyncGlobalSearchEngine,
@@ -23,6 +24,7 @@ from ._engine import (
     AsyncQueryEngine,
     GlobalSearchEngine,
     LocalSearchEngine,
+    MapResultCache,
     QueryEngine,
 )
 from ._llm import (
@@ -32,16 +34,22 @@ from ._llm import (
     BaseAsyncEmbedding,
     BaseChatLLM,
     BaseEmbedding,
+    BaseEmbeddingCache,
     ChatLLM,
     Embedding,
+    MemoryEmbeddingCache,
+    SqliteEmbeddingCache,
 )
 from ._model import (
     Community,
     CommunityReport,
     Covariate,
     Document,
+    EmbeddingMatrix,
     Entity,
     Identified,
+    ModelStore,
+    ModelView,
     Named,
     Relationship,
     TextUnit,
@@ -63,12 +71,14 @@ __all__ = [
     "GlobalContextLoader",
     "LocalContextBuilder",
     "LocalContextLoader",
+    "SnapshotContextLoader",
 
     "AsyncGlobalSearchEngine",
     "AsyncLocalSearchEngine",
     "AsyncQueryEngine",
     "GlobalSearchEngine",
     "LocalSearchEngine",
+    "MapResultCache",
     "QueryEngine",
 
     "AsyncChatLLM",
@@ -77,15 +87,21 @@ __all__ = [
     "BaseAsyncEmbedding",
     "BaseChatLLM",
     "BaseEmbedding",
+    "BaseEmbeddingCache",
     "ChatLLM",
     "Embedding",
+    "MemoryEmbeddingCache",
+    "SqliteEmbeddingCache",
 
     "Community",
     "CommunityReport",
     "Covariate",
     "Document",
+    "EmbeddingMatrix",
     "Entity",
     "Identified",
+    "ModelStore",
+    "ModelView",
     "Named",
     "Relationship",
     "TextUnit",
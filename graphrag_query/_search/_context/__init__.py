@@ -16,6 +16,7 @@ from ._loaders import (
     BaseContextLoader,
     GlobalContextLoader,
     LocalContextLoader,
+    SnapshotContextLoader,
 )
 
 __all__ = [
@@ -29,4 +30,5 @@ __all__ = [
     "BaseContextLoader",
     "GlobalContextLoader",
     "LocalContextLoader",
+    "SnapshotContextLoader",
 ]
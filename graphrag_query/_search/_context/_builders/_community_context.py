@@ -8,6 +8,8 @@ framework.
 Functions:
     build_community_context:
         Prepares community report data as context for system prompts.
+    score_community_reports:
+        Scores community reports by their relevance to a query embedding.
     _compute_community_weights:
         Calculates community weight based on associated entities and text units.
     _rank_report_context:
@@ -21,6 +23,7 @@ from __future__ import annotations
 import random
 import typing
 
+import numpy as np
 import pandas as pd
 import tiktoken
 
@@ -32,7 +35,7 @@ from .... import _utils
 def build_community_context(
     community_reports: typing.List[_model.CommunityReport],
     entities: typing.Optional[typing.List[_model.Entity]] = None,
-    token_encoder: typing.Optional[tiktoken.Encoding] = None,
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
     use_community_summary: bool = True,
     column_delimiter: str = "|",
     shuffle_data: bool = True,
@@ -46,6 +49,8 @@ def build_community_context(
     single_batch: bool = True,
     context_name: str = "Reports",
     random_state: int = 86,
+    max_batches: typing.Optional[int] = None,
+    batch_column: typing.Optional[str] = None,
 ) -> _types.Context_T:
     """
     Prepares community report data as a context table for system prompts.
@@ -55,7 +60,9 @@ def build_community_context(
             A list of community reports to include in the context.
         entities:
             An optional list of entities associated with the community reports.
-        token_encoder: An optional token encoder for calculating token counts.
+        token_encoder:
+            An optional token encoder (or `TokenCounter`) for calculating token
+            counts.
         use_community_summary:
             Whether to use the community summary or the full content.
         column_delimiter:
@@ -80,6 +87,13 @@ def build_community_context(
         random_state:
             A seed used to shuffle the community reports (if shuffle_data is
             True).
+        max_batches:
+            The maximum number of batches to build (when not in single batch
+            mode); the reports that do not fit are left out, so the reports
+            should come first in order of preference.
+        batch_column:
+            If given, the name of a column added to the returned records (but
+            not to the context text) with the index of the batch of each row.
 
     Returns:
         A tuple containing the formatted context string and a dictionary with
@@ -104,7 +118,9 @@ def build_community_context(
         report: _model.CommunityReport, attr: typing.List[str]
     ) -> typing.Tuple[str, typing.List[str]]:
         ctx = [report.short_id if report.short_id else "", report.title, *[
-            str(report.attributes.get(field, "")) if report.attributes else ""
+            str(community_weights.get(report.community_id, ""))
+            if community_weights is not None and field == community_weight_name
+            else str(report.attributes.get(field, "")) if report.attributes else ""
             for field in attr
         ], report.summary if use_community_summary else report.full_content]
         if include_community_rank:
@@ -121,11 +137,13 @@ def build_community_context(
                     or community_weight_name not in community_reports[0].attributes
             )
     )
+    # the weights are kept by community rather than written into the reports,
+    # which are shared by concurrent builds
+    community_weights: typing.Optional[typing.Dict[str, float]] = None
     if compute_community_weights:
-        community_reports = _compute_community_weights(
+        community_weights = _compute_community_weights(
             community_reports=community_reports,
             entities=entities,
-            weight_attribute=community_weight_name,
             normalize=normalize_community_weight,
         )
 
@@ -135,8 +153,9 @@ def build_community_context(
         return [], {}
 
     if shuffle_data:
-        random.seed(random_state)
-        random.shuffle(selected_reports)
+        # a generator of its own (same sequence as seeding the global one) so
+        # concurrent builds do not reseed each other
+        random.Random(random_state).shuffle(selected_reports)
 
     # "global" variables
     attributes = (
@@ -144,6 +163,8 @@ def build_community_context(
         if community_reports[0].attributes
         else []
     )
+    if community_weights is not None:
+        attributes.append(community_weight_name)
     header = _get_header(attributes)
     all_context_text: typing.List[str] = []
     all_context_records: typing.List[pd.DataFrame] = []
@@ -174,6 +195,8 @@ def build_community_context(
         if len(record_df) == 0:
             return
         current_context_text = record_df.to_csv(index=False, sep=column_delimiter)
+        if batch_column is not None:
+            record_df[batch_column] = all_context_text.__len__()
         all_context_text.append(current_context_text)
         all_context_records.append(record_df)
 
@@ -189,6 +212,9 @@ def build_community_context(
             _cut_batch()
             if single_batch:
                 break
+            if max_batches is not None and all_context_text.__len__() >= max_batches:
+                batch_records = []
+                break
             _init_batch()
 
         # add current report to the current batch
@@ -208,31 +234,64 @@ def build_community_context(
     }
 
 
+def score_community_reports(
+    query_embedding: typing.Sequence[float],
+    embeddings: np.ndarray,
+    ranks: np.ndarray,
+    rank_weight: float = 0.1,
+) -> np.ndarray:
+    """
+    Scores community reports by their relevance to a query: the cosine
+    similarity of the query embedding with the report embeddings, plus the
+    report ranks normalized by the highest rank and scaled by `rank_weight`.
+
+    Args:
+        query_embedding: The embedding of the query.
+        embeddings:
+            A (reports, dimensions) matrix of the report embeddings with rows
+            of unit norm; reports without an embedding have a zero row (and so
+            are scored by their rank only).
+        ranks: The rank of each report (0 if it has none).
+        rank_weight: The weight of the normalized rank in the score.
+
+    Returns:
+        The score of each report.
+    """
+    query = np.asarray(query_embedding, dtype=embeddings.dtype)
+    if query.shape != (embeddings.shape[1],):
+        raise ValueError(
+            f"Expected a query embedding of {embeddings.shape[1]} dimensions, got {query.shape[0]}"
+        )
+    norm = np.linalg.norm(query)
+    similarities = embeddings @ (query / norm) if norm > 0 else np.zeros(embeddings.shape[0])
+    max_rank = ranks.max() if ranks.__len__() > 0 else 0
+    if max_rank <= 0:
+        return similarities.astype(np.float64)
+    return similarities.astype(np.float64) + rank_weight * ranks / max_rank
+
+
 def _compute_community_weights(
     community_reports: typing.List[_model.CommunityReport],
     entities: typing.Optional[typing.List[_model.Entity]],
-    weight_attribute: str = "occurrence",
     normalize: bool = True,
-) -> typing.List[_model.CommunityReport]:
+) -> typing.Dict[str, float]:
     """
     Calculates a community's weight as the count of text units associated with
     entities in the community.
 
     Args:
         community_reports:
-            A list of community reports to update with weight information.
+            A list of community reports to calculate the weights of.
         entities:
             A list of entities to use for calculating the community weights.
-        weight_attribute:
-            The name of the attribute to store the calculated weight.
         normalize:
             Whether to normalize the weights across all community reports.
 
     Returns:
-        A list of community reports with updated weight information.
+        The weight of each community of the reports, keyed by community ID.
     """
     if not entities:
-        return community_reports
+        return {}
 
     community_text_units: typing.Dict[str, typing.List[str]] = {}
     for entity in entities:
@@ -241,26 +300,15 @@ def _compute_community_weights(
                 if community_id not in community_text_units:
                     community_text_units[community_id] = []
                 community_text_units[community_id].extend(entity.text_unit_ids or [])
-    for report in community_reports:
-        if not report.attributes:
-            report.attributes = {}
-        report.attributes[weight_attribute] = len(
-            set(community_text_units.get(report.community_id, []))
-        )
-    if normalize:
+    weights: typing.Dict[str, float] = {
+        report.community_id: len(set(community_text_units.get(report.community_id, [])))
+        for report in community_reports
+    }
+    if normalize and weights:
         # normalize by max weight
-        all_weights = [
-            report.attributes[weight_attribute]
-            for report in community_reports
-            if report.attributes
-        ]
-        max_weight = max(all_weights)
-        for report in community_reports:
-            if report.attributes:
-                report.attributes[weight_attribute] = (
-                        report.attributes[weight_attribute] / max_weight
-                )
-    return community_reports
+        max_weight = max(weights.values())
+        weights = {community_id: weight / max_weight for community_id, weight in weights.items()}
+    return weights
 
 
 def _rank_report_context(
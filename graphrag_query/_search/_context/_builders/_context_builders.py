@@ -4,9 +4,13 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+import copy
+import threading
 import typing
 import warnings
 
+import numpy as np
 import pandas as pd
 import tiktoken
 import typing_extensions
@@ -25,6 +29,8 @@ from ... import (
 )
 from ..._input._retrieval import (
     _community_reports,
+    _entities,
+    _relationships,
     _text_units,
 )
 from .... import (
@@ -57,14 +63,38 @@ class GlobalContextBuilder(BaseContextBuilder):
         _token_encoder:
             An optional token encoder used to calculate token counts, ensuring
             consistency with the encoder used by the LLM.
+        _token_counter:
+            Counts (or estimates) the tokens of the context rows with
+            `_token_encoder`, remembering the counts across queries.
         _random_state:
             A random seed used to shuffle the data during community context
             construction.
+        _batch_cache:
+            A cache of the query-independent community report batches, keyed by
+            the parameters used to build them. The batches only depend on the
+            (static) community reports and entities, so they are built once and
+            reused across queries.
+        _batch_cache_lock:
+            A lock guarding the construction of the cached batches and of the
+            report embedding matrices.
+        _report_embeddings:
+            The unit-norm embedding matrices of the community reports used to
+            select the reports relevant to a query, keyed by embedding field
+            (None if no report has an embedding in that field).
+        _community_hierarchy:
+            The community reports of every level indexed by their parent
+            community, used to drill down from the top-level reports (None if
+            it was not loaded).
     """
     _community_reports: typing.List[_model.CommunityReport]
     _entities: typing.Optional[typing.List[_model.Entity]]
     _token_encoder: typing.Optional[tiktoken.Encoding]
+    _token_counter: _utils.TokenCounter
     _random_state: int
+    _batch_cache: typing.Dict[typing.Tuple[typing.Any, ...], _types.Context_T]
+    _batch_cache_lock: threading.Lock
+    _report_embeddings: typing.Dict[str, typing.Optional[np.ndarray]]
+    _community_hierarchy: typing.Optional[_community_reports.CommunityHierarchy]
 
     @classmethod
     def from_local_context_builder(
@@ -77,7 +107,8 @@ class GlobalContextBuilder(BaseContextBuilder):
         save on construction costs.
 
         This method reuses the data and structures already present in a
-        LocalContextBuilder to quickly initialize a GlobalContextBuilder.
+        LocalContextBuilder (including its remembered token counts) to quickly
+        initialize a GlobalContextBuilder.
 
         Args:
             local_context_builder:
@@ -94,7 +125,9 @@ class GlobalContextBuilder(BaseContextBuilder):
             community_reports=list(local_context_builder.community_reports.values()),
             entities=list(local_context_builder.entities.values()),
             token_encoder=local_context_builder.token_encoder,
+            token_counter=local_context_builder.token_counter,
             random_state=random_state,
+            community_hierarchy=local_context_builder.community_hierarchy,
         )
 
     @property
@@ -109,18 +142,42 @@ class GlobalContextBuilder(BaseContextBuilder):
     def token_encoder(self) -> typing.Optional[tiktoken.Encoding]:
         return self._token_encoder
 
+    @property
+    def token_counter(self) -> _utils.TokenCounter:
+        return self._token_counter
+
+    @property
+    def community_hierarchy(self) -> typing.Optional[_community_reports.CommunityHierarchy]:
+        return self._community_hierarchy
+
     def __init__(
         self,
         *,
         community_reports: typing.List[_model.CommunityReport],
         entities: typing.Optional[typing.List[_model.Entity]] = None,
         token_encoder: typing.Optional[tiktoken.Encoding] = None,
+        estimate_tokens: bool = False,
+        token_counter: typing.Optional[_utils.TokenCounter] = None,
         random_state: int = 42,
+        community_hierarchy: typing.Optional[_community_reports.CommunityHierarchy] = None,
     ):
         self._community_reports = community_reports
         self._entities = entities
         self._token_encoder = token_encoder
+        self._token_counter = (
+            token_counter if token_counter is not None else _utils.TokenCounter(token_encoder, estimate=estimate_tokens)
+        )
         self._random_state = random_state
+        self._batch_cache = {}
+        self._batch_cache_lock = threading.Lock()
+        self._report_embeddings = {}
+        self._community_hierarchy = community_hierarchy
+
+    def clear_cache(self) -> None:
+        """Drop all cached community report batches and embedding matrices."""
+        with self._batch_cache_lock:
+            self._batch_cache.clear()
+            self._report_embeddings.clear()
 
     @typing_extensions.override
     def build_context(
@@ -140,6 +197,10 @@ class GlobalContextBuilder(BaseContextBuilder):
         context_name: str = "Reports",
         conversation_history_user_turns_only: bool = True,
         conversation_history_max_turns: int = 5,
+        max_map_calls: typing.Optional[int] = None,
+        query_embedding: typing.Optional[typing.List[float]] = None,
+        relevance_rank_weight: float = 0.1,
+        community_ids: typing.Optional[typing.List[str]] = None,
         **kwargs: typing.Any,
     ) -> _types.Context_T:
         """
@@ -152,6 +213,19 @@ class GlobalContextBuilder(BaseContextBuilder):
         parameters and token limits, ensuring that the constructed context fits
         within the designated token window.
 
+        By default every report is batched, so the map phase makes one call per
+        batch whatever the query. With `max_map_calls`, only the reports most
+        relevant to the query are batched, at most `max_map_calls` batches:
+        the reports are scored by the similarity of their embedding (the
+        summary embedding, or the full content embedding if
+        `use_community_summary` is False) with `query_embedding`, plus their
+        rank weighted by `relevance_rank_weight`, and packed in order of
+        score. Reports without an embedding are scored by their rank only.
+
+        With `community_ids`, only the reports of these communities of the
+        community hierarchy (of any level) are batched, in the given order;
+        this is how the drill-down of global search maps a level at a time.
+
         Args:
             conversation_history:
                 Optional conversation history to provide additional context.
@@ -179,8 +253,29 @@ class GlobalContextBuilder(BaseContextBuilder):
                 If True, only include user turns in conversation history.
             conversation_history_max_turns:
                 The maximum number of conversation turns to include.
+            max_map_calls:
+                The maximum number of batches (i.e. of map calls) to build from
+                the reports most relevant to the query, or None to batch every
+                report. `shuffle_data` is ignored when it is set.
+            query_embedding:
+                The embedding of the query, used with `max_map_calls`; without
+                it the reports are selected by rank only.
+            relevance_rank_weight:
+                The weight of the normalized report rank in the relevance score
+                of a report, next to its cosine similarity with the query.
+            community_ids:
+                The communities of `community_hierarchy` to batch, or None to
+                batch the community reports of the builder. `shuffle_data` and
+                `max_map_calls` are ignored when it is set, and the records
+                of the reports get a "batch" column with the index of their
+                batch.
             **kwargs: Additional arguments for future expansion.
 
+        Raises:
+            ValueError:
+                If `community_ids` is set but no community hierarchy was
+                loaded.
+
         Returns:
             he constructed context data as either a single string or a list of
             context strings, along with any associated metadata.
@@ -202,13 +297,169 @@ class GlobalContextBuilder(BaseContextBuilder):
             if conversation_history_context != "":
                 final_context_data = conversation_history_context_data
 
-        community_context, community_context_data = _community_context.build_community_context(
-            community_reports=self._community_reports,
+        if community_ids is not None:
+            community_context, community_context_data = self._build_hierarchy_batches(
+                community_ids=community_ids,
+                use_community_summary=use_community_summary,
+                column_delimiter=column_delimiter,
+                include_community_rank=include_community_rank,
+                min_community_rank=min_community_rank,
+                community_rank_name=community_rank_name,
+                data_max_tokens=data_max_tokens,
+                context_name=context_name,
+            )
+        elif max_map_calls is not None:
+            community_context, community_context_data = self._build_relevant_batches(
+                max_map_calls=max_map_calls,
+                query_embedding=query_embedding,
+                relevance_rank_weight=relevance_rank_weight,
+                use_community_summary=use_community_summary,
+                column_delimiter=column_delimiter,
+                include_community_rank=include_community_rank,
+                min_community_rank=min_community_rank,
+                community_rank_name=community_rank_name,
+                include_community_weight=include_community_weight,
+                community_weight_name=community_weight_name,
+                normalize_community_weight=normalize_community_weight,
+                data_max_tokens=data_max_tokens,
+                context_name=context_name,
+            )
+        else:
+            community_context, community_context_data = self._build_community_batches(
+                use_community_summary=use_community_summary,
+                column_delimiter=column_delimiter,
+                shuffle_data=shuffle_data,
+                include_community_rank=include_community_rank,
+                min_community_rank=min_community_rank,
+                community_rank_name=community_rank_name,
+                include_community_weight=include_community_weight,
+                community_weight_name=community_weight_name,
+                normalize_community_weight=normalize_community_weight,
+                data_max_tokens=data_max_tokens,
+                context_name=context_name,
+            )
+        final_context_data.update(community_context_data)
+        if isinstance(community_context, list):
+            return [
+                f"{conversation_history_context}\n\n{context}"
+                for context in community_context
+            ], final_context_data
+        else:
+            return f"{conversation_history_context}\n\n{community_context}", final_context_data
+
+    def _build_community_batches(
+        self,
+        *,
+        use_community_summary: bool,
+        column_delimiter: str,
+        shuffle_data: bool,
+        include_community_rank: bool,
+        min_community_rank: int,
+        community_rank_name: str,
+        include_community_weight: bool,
+        community_weight_name: str,
+        normalize_community_weight: bool,
+        data_max_tokens: int,
+        context_name: str,
+    ) -> _types.Context_T:
+        """
+        Returns the community report batches for the map phase, building them
+        on the first call for a given set of parameters.
+
+        None of the parameters depend on the query, so the weighting, shuffling,
+        tokenization and DataFrame construction done by
+        `_community_context.build_community_context` only has to happen once per
+        parameter set. The returned DataFrames are shared between calls and
+        must not be modified in place.
+        """
+        key = (
+            use_community_summary,
+            column_delimiter,
+            shuffle_data,
+            include_community_rank,
+            min_community_rank,
+            community_rank_name,
+            include_community_weight,
+            community_weight_name,
+            normalize_community_weight,
+            data_max_tokens,
+            context_name,
+            self._random_state,
+        )
+        cached = self._batch_cache.get(key)
+        if cached is None:
+            with self._batch_cache_lock:
+                cached = self._batch_cache.get(key)
+                if cached is None:
+                    cached = _community_context.build_community_context(
+                        community_reports=self._community_reports,
+                        entities=self._entities,
+                        token_encoder=self._token_counter,
+                        use_community_summary=use_community_summary,
+                        column_delimiter=column_delimiter,
+                        shuffle_data=shuffle_data,
+                        include_community_rank=include_community_rank,
+                        min_community_rank=min_community_rank,
+                        community_rank_name=community_rank_name,
+                        include_community_weight=include_community_weight,
+                        community_weight_name=community_weight_name,
+                        normalize_community_weight=normalize_community_weight,
+                        data_max_tokens=data_max_tokens,
+                        single_batch=False,
+                        context_name=context_name,
+                        random_state=self._random_state,
+                    )
+                    self._batch_cache[key] = cached
+        community_context, community_context_data = cached
+        return community_context, dict(community_context_data)
+
+    def _build_relevant_batches(
+        self,
+        *,
+        max_map_calls: int,
+        query_embedding: typing.Optional[typing.List[float]],
+        relevance_rank_weight: float,
+        use_community_summary: bool,
+        column_delimiter: str,
+        include_community_rank: bool,
+        min_community_rank: int,
+        community_rank_name: str,
+        include_community_weight: bool,
+        community_weight_name: str,
+        normalize_community_weight: bool,
+        data_max_tokens: int,
+        context_name: str,
+    ) -> _types.Context_T:
+        """
+        Returns at most `max_map_calls` batches of the community reports most
+        relevant to the query, in order of relevance.
+
+        Unlike `_build_community_batches` the batches depend on the query and
+        are not cached, but only the selected reports are rendered.
+        """
+        if max_map_calls < 1:
+            raise ValueError(f"max_map_calls must be at least 1, got {max_map_calls}")
+        ranks = np.array([report.rank or 0 for report in self._community_reports], dtype=np.float64)
+        embeddings = (
+            self._get_report_embeddings("summary_embedding" if use_community_summary else "full_content_embedding")
+            if query_embedding is not None else None
+        )
+        scores = (
+            _community_context.score_community_reports(
+                query_embedding, embeddings, ranks, rank_weight=relevance_rank_weight
+            )
+            if query_embedding is not None and embeddings is not None
+            else ranks
+        )
+        # stable, so that equally scored reports keep their order
+        order = np.argsort(-scores, kind="stable")
+        return _community_context.build_community_context(
+            community_reports=[self._community_reports[index] for index in order],
             entities=self._entities,
-            token_encoder=self._token_encoder,
+            token_encoder=self._token_counter,
             use_community_summary=use_community_summary,
             column_delimiter=column_delimiter,
-            shuffle_data=shuffle_data,
+            shuffle_data=False,
             include_community_rank=include_community_rank,
             min_community_rank=min_community_rank,
             community_rank_name=community_rank_name,
@@ -218,16 +469,78 @@ class GlobalContextBuilder(BaseContextBuilder):
             data_max_tokens=data_max_tokens,
             single_batch=False,
             context_name=context_name,
-            random_state=self._random_state,
+            max_batches=max_map_calls,
         )
-        final_context_data.update(community_context_data)
-        if isinstance(community_context, list):
-            return [
-                f"{conversation_history_context}\n\n{context}"
-                for context in community_context
-            ], final_context_data
-        else:
-            return f"{conversation_history_context}\n\n{community_context}", final_context_data
+
+    def _build_hierarchy_batches(
+        self,
+        *,
+        community_ids: typing.List[str],
+        use_community_summary: bool,
+        column_delimiter: str,
+        include_community_rank: bool,
+        min_community_rank: int,
+        community_rank_name: str,
+        data_max_tokens: int,
+        context_name: str,
+    ) -> _types.Context_T:
+        """
+        Returns the batches of the reports of some communities of the community
+        hierarchy, in the given order, with the batch index of every record.
+
+        The entities only belong to the community of one level, so the
+        community weights (computed from them) are left out.
+        """
+        if self._community_hierarchy is None:
+            raise ValueError(
+                "No community hierarchy was loaded; load the context from the Parquet files of the index, "
+                "or compile the snapshot again"
+            )
+        reports = [
+            report for report in map(self._community_hierarchy.get, community_ids) if report is not None
+        ]
+        return _community_context.build_community_context(
+            community_reports=reports,
+            entities=None,
+            token_encoder=self._token_counter,
+            use_community_summary=use_community_summary,
+            column_delimiter=column_delimiter,
+            shuffle_data=False,
+            include_community_rank=include_community_rank,
+            min_community_rank=min_community_rank,
+            community_rank_name=community_rank_name,
+            include_community_weight=False,
+            data_max_tokens=data_max_tokens,
+            single_batch=False,
+            context_name=context_name,
+            batch_column="batch",
+        )
+
+    def _get_report_embeddings(self, field: str) -> typing.Optional[np.ndarray]:
+        """
+        Returns the unit-norm embedding matrix of the community reports for an
+        embedding field (zero rows for the reports without one), building it
+        on first use, or None (with a warning) if no report has an embedding.
+        """
+        if field not in self._report_embeddings:
+            with self._batch_cache_lock:
+                if field not in self._report_embeddings:
+                    embeddings = _model.EmbeddingMatrix.from_lists(
+                        [getattr(report, field) for report in self._community_reports]
+                    )
+                    matrix: typing.Optional[np.ndarray] = None
+                    if embeddings.present.any():
+                        matrix = np.array(embeddings.matrix, dtype=np.float32)
+                        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                        np.divide(matrix, norms, out=matrix, where=norms > 0)
+                    else:
+                        warnings.warn(
+                            f"No community report has a {field}, selecting the reports by rank only; "
+                            f"load the embeddings with the community_reports__*_embedding_col options",
+                            RuntimeWarning,
+                        )
+                    self._report_embeddings[field] = matrix
+        return self._report_embeddings[field]
 
 
 class LocalContextBuilder(BaseContextBuilder):
@@ -241,6 +554,9 @@ class LocalContextBuilder(BaseContextBuilder):
         _entities:
             A dictionary mapping entity IDs to their corresponding entity
             objects in the graph index.
+        _entity_index:
+            A lookup index over the entities, used to resolve vector store
+            hits to entities without scanning every entity.
         _community_reports:
             A dictionary mapping community report IDs to community report
             objects.
@@ -248,6 +564,9 @@ class LocalContextBuilder(BaseContextBuilder):
         _relationships:
             A dictionary mapping relationship (edge) IDs to relationship objects
             in the graph.
+        _relationship_index:
+            An adjacency index over the relationships, used to look up edges
+            by entity and text unit without scanning the whole graph.
         _covariates:
             A dictionary mapping covariate (claim) IDs to lists of covariates.
         _entity_text_embeddings:
@@ -255,28 +574,47 @@ class LocalContextBuilder(BaseContextBuilder):
             lookup.
         _text_embedder:
             The text embedding model used for generating embeddings, consistent
-            with the vector store.
+            with the vector store. An asynchronous embedding model can only be
+            used with `abuild_context`.
         _token_encoder:
             An optional encoder used to calculate the number of tokens in text,
             for alignment with LLMs.
+        _token_counter:
+            Counts (or estimates) the tokens of the context rows with
+            `_token_encoder`. The rows are rendered from mostly the same
+            records on every query, so their counts are remembered across
+            queries.
         _embedding_vectorstore_key:
             A key used to identify entities when searching for matching results,
             though this could be redesigned for a more streamlined approach.
+        _community_hierarchy:
+            The community reports of every level indexed by their parent
+            community. Local search does not use it; it is handed over to the
+            global context builders created from this builder (see
+            `GlobalContextBuilder.from_local_context_builder`).
     """
     _entities: typing.Dict[str, _model.Entity]
+    _entity_index: _entities.EntityIndex
     _community_reports: typing.Dict[str, _model.CommunityReport]
     _text_units: typing.Dict[str, _model.TextUnit]
     _relationships: typing.Dict[str, _model.Relationship]
+    _relationship_index: _relationships.RelationshipIndex
     _covariates: typing.Dict[str, typing.List[_model.Covariate]]
     _entity_text_embeddings: _vector_stores.BaseVectorStore
-    _text_embedder: _llm.BaseEmbedding
+    _text_embedder: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding]
     _token_encoder: typing.Optional[tiktoken.Encoding]
+    _token_counter: _utils.TokenCounter
     _embedding_vectorstore_key: str
+    _community_hierarchy: typing.Optional[_community_reports.CommunityHierarchy]
 
     @property
     def entities(self) -> typing.Dict[str, _model.Entity]:
         return self._entities
 
+    @property
+    def entity_index(self) -> _entities.EntityIndex:
+        return self._entity_index
+
     @property
     def community_reports(self) -> typing.Dict[str, _model.CommunityReport]:
         return self._community_reports
@@ -289,6 +627,10 @@ class LocalContextBuilder(BaseContextBuilder):
     def relationships(self) -> typing.Dict[str, _model.Relationship]:
         return self._relationships
 
+    @property
+    def relationship_index(self) -> _relationships.RelationshipIndex:
+        return self._relationship_index
+
     @property
     def covariates(self) -> typing.Dict[str, typing.List[_model.Covariate]]:
         return self._covariates
@@ -297,18 +639,28 @@ class LocalContextBuilder(BaseContextBuilder):
     def token_encoder(self) -> typing.Optional[tiktoken.Encoding]:
         return self._token_encoder
 
+    @property
+    def token_counter(self) -> _utils.TokenCounter:
+        return self._token_counter
+
+    @property
+    def community_hierarchy(self) -> typing.Optional[_community_reports.CommunityHierarchy]:
+        return self._community_hierarchy
+
     def __init__(
         self,
         *,
         entities: typing.List[_model.Entity],
         entity_text_embeddings: _vector_stores.BaseVectorStore,
-        text_embedder: _llm.BaseEmbedding,
+        text_embedder: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
         text_units: typing.Optional[typing.List[_model.TextUnit]] = None,
         community_reports: typing.Optional[typing.List[_model.CommunityReport]] = None,
         relationships: typing.Optional[typing.List[_model.Relationship]] = None,
         covariates: typing.Optional[typing.Dict[str, typing.List[_model.Covariate]]] = None,
         token_encoder: typing.Optional[tiktoken.Encoding] = None,
+        estimate_tokens: bool = False,
         embedding_vectorstore_key: str = _entity_extraction.EntityVectorStoreKey.ID,
+        community_hierarchy: typing.Optional[_community_reports.CommunityHierarchy] = None,
     ) -> None:
         community_reports = community_reports or []
         relationships = relationships or []
@@ -318,6 +670,7 @@ class LocalContextBuilder(BaseContextBuilder):
         self._entities = {
             entity.id: entity for entity in entities
         }
+        self._entity_index = _entities.EntityIndex(self._entities.values())
         self._community_reports = {
             community.id: community for community in community_reports
         }
@@ -327,12 +680,31 @@ class LocalContextBuilder(BaseContextBuilder):
         self._relationships = {
             relationship.id: relationship for relationship in relationships
         }
+        self._relationship_index = _relationships.RelationshipIndex(self._relationships.values())
 
         self._covariates = covariates
         self._entity_text_embeddings = entity_text_embeddings
         self._text_embedder = text_embedder
         self._token_encoder = token_encoder
+        self._token_counter = _utils.TokenCounter(token_encoder, estimate=estimate_tokens)
         self._embedding_vectorstore_key = embedding_vectorstore_key
+        self._community_hierarchy = community_hierarchy
+
+    def with_text_embedder(
+        self,
+        text_embedder: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
+    ) -> LocalContextBuilder:
+        """
+        Returns a shallow copy of the builder that embeds queries with another
+        text embedder.
+
+        The copy shares the records, indexes, vector store and token counts of
+        this builder, so an index loaded once (e.g. before a server forks its
+        workers) can serve several clients without being loaded again.
+        """
+        builder = copy.copy(self)
+        builder._text_embedder = text_embedder
+        return builder
 
     def filter_by_entity_keys(self, entity_keys: typing.Union[typing.List[int], typing.List[str]]) -> None:
         """Filter entity text embeddings by entity keys."""
@@ -363,6 +735,7 @@ class LocalContextBuilder(BaseContextBuilder):
         min_community_rank: int = 0,
         community_context_name: str = "Reports",
         column_delimiter: str = "|",
+        query_embedding: typing.Optional[typing.List[float]] = None,
         **kwargs: typing.Any,
     ) -> _types.Context_T:
         """
@@ -420,17 +793,164 @@ class LocalContextBuilder(BaseContextBuilder):
                 The name to use for the community context section.
             column_delimiter:
                 The delimiter to use for separating columns in the context data.
+            query_embedding:
+                The embedding of the text returned by `get_query_text`, if it
+                was already computed (e.g. for a batch of queries); the query
+                is then not embedded again.
             **kwargs: Additional arguments for future expansion.
 
         Returns:
             The constructed context and associated data, ready to be used in
             local search queries.
         """
-        include_entity_names = include_entity_names or []
-        exclude_entity_names = exclude_entity_names or []
+        if isinstance(self._text_embedder, _llm.BaseAsyncEmbedding):
+            raise TypeError("An asynchronous text embedder requires `abuild_context`.")
+        query = self._prepare_query(
+            query=query,
+            conversation_history=conversation_history,
+            conversation_history_max_turns=conversation_history_max_turns,
+            community_prop=community_prop,
+            text_unit_prop=text_unit_prop,
+        )
+        selected_entities = _entity_extraction.map_query_to_entities(
+            query=query,
+            text_embedding_vectorstore=self._entity_text_embeddings,
+            text_embedder=self._text_embedder,
+            all_entities=self._entity_index,
+            embedding_vectorstore_key=self._embedding_vectorstore_key,
+            include_entity_names=include_entity_names or [],
+            exclude_entity_names=exclude_entity_names or [],
+            k=top_k_mapped_entities,
+            oversample_scaler=2,
+            query_embedding=query_embedding,
+        )
+        return self._build_context_from_entities(
+            selected_entities=selected_entities,
+            data_max_tokens=data_max_tokens,
+            text_unit_prop=text_unit_prop,
+            community_prop=community_prop,
+            top_k_relationships=top_k_relationships,
+            include_community_rank=include_community_rank,
+            include_entity_rank=include_entity_rank,
+            rank_description=rank_description,
+            include_relationship_weight=include_relationship_weight,
+            relationship_ranking_attribute=relationship_ranking_attribute,
+            return_candidate_context=return_candidate_context,
+            use_community_summary=use_community_summary,
+            min_community_rank=min_community_rank,
+            community_context_name=community_context_name,
+            column_delimiter=column_delimiter,
+        )
+
+    async def abuild_context(
+        self,
+        *,
+        query: str,
+        conversation_history: typing.Optional[_conversation_history.ConversationHistory] = None,
+        include_entity_names: typing.Optional[typing.List[str]] = None,
+        exclude_entity_names: typing.Optional[typing.List[str]] = None,
+        conversation_history_max_turns: int = 5,
+        conversation_history_user_turns_only: bool = True,
+        data_max_tokens: int = 8000,
+        text_unit_prop: float = 0.5,
+        community_prop: float = 0.25,
+        top_k_mapped_entities: int = 10,
+        top_k_relationships: int = 10,
+        include_community_rank: bool = False,
+        include_entity_rank: bool = False,
+        rank_description: str = "number of relationships",
+        include_relationship_weight: bool = False,
+        relationship_ranking_attribute: str = "rank",
+        return_candidate_context: bool = False,
+        use_community_summary: bool = False,
+        min_community_rank: int = 0,
+        community_context_name: str = "Reports",
+        column_delimiter: str = "|",
+        query_embedding: typing.Optional[typing.List[float]] = None,
+        **kwargs: typing.Any,
+    ) -> _types.Context_T:
+        """
+        Asynchronous version of `build_context`, taking the same arguments.
+
+        The query is embedded with `BaseAsyncEmbedding.aembed` (a synchronous
+        embedder is run in a worker thread) and the entity search is awaited
+        through the vector store; assembling the context tables is CPU-bound
+        and runs in a worker thread, so the event loop is free to serve other
+        requests meanwhile. The builds keep their per-query values (match
+        counts, orders, links and combined ranks) in local dicts keyed by ID
+        and never write them into the shared models, so any number of them
+        can run at once.
+        """
+        query = self._prepare_query(
+            query=query,
+            conversation_history=conversation_history,
+            conversation_history_max_turns=conversation_history_max_turns,
+            community_prop=community_prop,
+            text_unit_prop=text_unit_prop,
+        )
+        selected_entities = await _entity_extraction.amap_query_to_entities(
+            query=query,
+            text_embedding_vectorstore=self._entity_text_embeddings,
+            text_embedder=self._text_embedder,
+            all_entities=self._entity_index,
+            embedding_vectorstore_key=self._embedding_vectorstore_key,
+            include_entity_names=include_entity_names or [],
+            exclude_entity_names=exclude_entity_names or [],
+            k=top_k_mapped_entities,
+            oversample_scaler=2,
+            query_embedding=query_embedding,
+        )
+        return await asyncio.to_thread(
+            self._build_context_from_entities,
+            selected_entities=selected_entities,
+            data_max_tokens=data_max_tokens,
+            text_unit_prop=text_unit_prop,
+            community_prop=community_prop,
+            top_k_relationships=top_k_relationships,
+            include_community_rank=include_community_rank,
+            include_entity_rank=include_entity_rank,
+            rank_description=rank_description,
+            include_relationship_weight=include_relationship_weight,
+            relationship_ranking_attribute=relationship_ranking_attribute,
+            return_candidate_context=return_candidate_context,
+            use_community_summary=use_community_summary,
+            min_community_rank=min_community_rank,
+            community_context_name=community_context_name,
+            column_delimiter=column_delimiter,
+        )
+
+    @staticmethod
+    def _prepare_query(
+        *,
+        query: str,
+        conversation_history: typing.Optional[_conversation_history.ConversationHistory],
+        conversation_history_max_turns: int,
+        community_prop: float,
+        text_unit_prop: float,
+    ) -> str:
+        """
+        Validate the token proportions and return the text to map to entities.
+        """
         if community_prop + text_unit_prop > 1:
             raise ValueError("The sum of community_prop and text_unit_prop should not exceed 1.")
 
+        return LocalContextBuilder.get_query_text(
+            query=query,
+            conversation_history=conversation_history,
+            conversation_history_max_turns=conversation_history_max_turns,
+        )
+
+    @staticmethod
+    def get_query_text(
+        *,
+        query: str,
+        conversation_history: typing.Optional[_conversation_history.ConversationHistory] = None,
+        conversation_history_max_turns: int = 5,
+    ) -> str:
+        """
+        Return the text that is embedded to map a query to entities: the query
+        followed by the recent conversation turns, if any.
+        """
         # map user query to entities
         # if there is conversation history, attached the previous user questions to the current query
         if conversation_history:
@@ -440,19 +960,31 @@ class LocalContextBuilder(BaseContextBuilder):
                 conversation_history.get_all_turns(conversation_history_max_turns)
             )
             query = f"{query}\n{pre_user_questions}"
+        return query
 
-        selected_entities = _entity_extraction.map_query_to_entities(
-            query=query,
-            text_embedding_vectorstore=self._entity_text_embeddings,
-            text_embedder=self._text_embedder,
-            all_entities=list(self._entities.values()),
-            embedding_vectorstore_key=self._embedding_vectorstore_key,
-            include_entity_names=include_entity_names,
-            exclude_entity_names=exclude_entity_names,
-            k=top_k_mapped_entities,
-            oversample_scaler=2,
-        )
-
+    def _build_context_from_entities(
+        self,
+        *,
+        selected_entities: typing.List[_model.Entity],
+        data_max_tokens: int,
+        text_unit_prop: float,
+        community_prop: float,
+        top_k_relationships: int,
+        include_community_rank: bool,
+        include_entity_rank: bool,
+        rank_description: str,
+        include_relationship_weight: bool,
+        relationship_ranking_attribute: str,
+        return_candidate_context: bool,
+        use_community_summary: bool,
+        min_community_rank: int,
+        community_context_name: str,
+        column_delimiter: str,
+    ) -> _types.Context_T:
+        """
+        Build the community, local and text unit context around the entities
+        mapped from the query.
+        """
         # build context
         final_context: typing.List[str] = []
         final_context_data: typing.Dict[str, pd.DataFrame] = {}
@@ -553,25 +1085,20 @@ class LocalContextBuilder(BaseContextBuilder):
                 for community_id in entity.community_ids:
                     community_matches[community_id] = community_matches.get(community_id, 0) + 1
 
-        # sort communities by number of matched entities and rank
+        # sort communities by number of matched entities and rank (the counts
+        # stay local: the reports are shared by concurrent builds)
         selected_communities = [
             self._community_reports[community_id]
             for community_id in community_matches if community_id in self._community_reports
         ]
-        for community in selected_communities:
-            if community.attributes is None:
-                community.attributes = {}
-            community.attributes["matches"] = community_matches[community.id]
         selected_communities.sort(
-            key=lambda x: (x.attributes["matches"], x.rank),  # type: ignore
+            key=lambda x: (community_matches[x.id], x.rank),  # type: ignore
             reverse=True,  # type: ignore
         )
-        for community in selected_communities:
-            del community.attributes["matches"]  # type: ignore
 
         context_text, context_data = _community_context.build_community_context(
             community_reports=selected_communities,
-            token_encoder=self._token_encoder,
+            token_encoder=self._token_counter,
             use_community_summary=use_community_summary,
             column_delimiter=column_delimiter,
             shuffle_data=False,
@@ -638,35 +1165,28 @@ class LocalContextBuilder(BaseContextBuilder):
             return "", {context_name.lower(): pd.DataFrame()}
 
         selected_text_units = []
-        text_unit_ids_set = set()
+        # (entity order, -number of relationships) of each selected text unit,
+        # kept local as the text units are shared by concurrent builds
+        text_unit_order: typing.Dict[str, typing.Tuple[int, int]] = {}
 
         for index, entity in enumerate(selected_entities):
             for text_id in entity.text_unit_ids or []:
-                if text_id not in text_unit_ids_set and text_id in self._text_units:
-                    text_unit_ids_set.add(text_id)
+                if text_id not in text_unit_order and text_id in self._text_units:
                     selected_unit = self._text_units[text_id]
                     num_relationships = _source_context.count_relationships(
-                        selected_unit, entity, self._relationships
+                        selected_unit, entity, self._relationship_index
                     )
-                    if selected_unit.attributes is None:
-                        selected_unit.attributes = {}
-                    selected_unit.attributes["entity_order"] = index
-                    selected_unit.attributes["num_relationships"] = num_relationships
+                    text_unit_order[text_id] = (index, -num_relationships)
                     selected_text_units.append(selected_unit)
 
-        selected_text_units.sort(
-            key=lambda x: (
-                x.attributes["entity_order"], -x.attributes["num_relationships"],  # type: ignore
-            )
-        )
+        selected_text_units.sort(key=lambda x: text_unit_order[x.id])
 
-        for unit in selected_text_units:
-            unit.attributes.pop("entity_order", None)  # type: ignore
-            unit.attributes.pop("num_relationships", None)  # type: ignore
+        # read the texts of lazily loaded text units in one batch rather than one by one
+        _model.prefetch(selected_text_units, "text")
 
         context_text, context_data = _source_context.build_text_unit_context(
             text_units=selected_text_units,
-            token_encoder=self._token_encoder,
+            token_encoder=self._token_counter,
             data_max_tokens=data_max_tokens,
             shuffle_data=False,
             context_name=context_name,
@@ -735,65 +1255,36 @@ class LocalContextBuilder(BaseContextBuilder):
         # build entity context
         entity_context, entity_context_data = _local_context.build_entity_context(
             selected_entities=selected_entities,
-            token_encoder=self._token_encoder,
+            token_encoder=self._token_counter,
             data_max_tokens=data_max_tokens,
             column_delimiter=column_delimiter,
             include_entity_rank=include_entity_rank,
             rank_description=rank_description,
             context_name="Entities",
         )
-        entity_tokens = _utils.num_tokens(entity_context, self._token_encoder)
+        entity_tokens = self._token_counter(entity_context)
 
         # build relationship-covariate context
-        added_entities = []
-        final_context = []
-        final_context_data = {}
+        assembler = _local_context.LocalContextAssembler(
+            relationships=self._relationship_index,
+            covariates=self._covariates,
+            token_encoder=self._token_counter,
+            data_max_tokens=data_max_tokens,
+            column_delimiter=column_delimiter,
+            include_relationship_weight=include_relationship_weight,
+            top_k_relationships=top_k_relationships,
+            relationship_ranking_attribute=relationship_ranking_attribute,
+        )
 
         # gradually add entities and associated metadata to the context until we reach limit
+        assembler.prefetch(selected_entities)
         for entity in selected_entities:
-            current_context = []
-            current_context_data = {}
-            added_entities.append(entity)
-
-            # build relationship context
-            (
-                relationship_context,
-                relationship_context_data,
-            ) = _local_context.build_relationship_context(
-                selected_entities=added_entities,
-                relationships=list(self._relationships.values()),
-                token_encoder=self._token_encoder,
-                data_max_tokens=data_max_tokens,
-                column_delimiter=column_delimiter,
-                top_k_relationships=top_k_relationships,
-                include_relationship_weight=include_relationship_weight,
-                relationship_ranking_attribute=relationship_ranking_attribute,
-                context_name="Relationships",
-            )
-            current_context.append(relationship_context)
-            current_context_data["relationships"] = relationship_context_data
-            total_tokens = entity_tokens + _utils.num_tokens(relationship_context, self._token_encoder)
-
-            # build covariate context
-            for covariate in self._covariates:
-                covariate_context, covariate_context_data = _local_context.build_covariates_context(
-                    selected_entities=added_entities,
-                    covariates=self._covariates[covariate],
-                    token_encoder=self._token_encoder,
-                    data_max_tokens=data_max_tokens,
-                    column_delimiter=column_delimiter,
-                    context_name=covariate,
-                )
-                total_tokens += _utils.num_tokens(covariate_context, self._token_encoder)
-                current_context.append(covariate_context)
-                current_context_data[covariate.lower()] = covariate_context_data
-
+            total_tokens = entity_tokens + assembler.add_entity(entity)
             if total_tokens > data_max_tokens:
                 warnings.warn("Reached token limit - reverting to previous context state", RuntimeWarning)
                 break
-
-            final_context = current_context
-            final_context_data = current_context_data
+            assembler.commit()
+        final_context, final_context_data = assembler.to_context()
 
         # attach entity context to final context
         final_context_text = entity_context + "\n\n" + "\n\n".join(final_context)
@@ -806,7 +1297,7 @@ class LocalContextBuilder(BaseContextBuilder):
             candidate_context_data = _local_context.get_candidate_context(
                 selected_entities=selected_entities,
                 entities=list(self._entities.values()),
-                relationships=list(self._relationships.values()),
+                relationships=self._relationship_index,
                 covariates=self._covariates,
                 include_entity_rank=include_entity_rank,
                 entity_rank_description=rank_description,
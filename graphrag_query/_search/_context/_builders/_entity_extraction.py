@@ -3,11 +3,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import enum
 import typing
 
 from ... import _llm, _model
-from ..._input._retrieval import _entities
+from ..._input._retrieval import _entities, _relationships
 from .... import _vector_stores
 
 
@@ -31,30 +32,122 @@ def map_query_to_entities(
     query: str,
     text_embedding_vectorstore: _vector_stores.BaseVectorStore,
     text_embedder: _llm.BaseEmbedding,
-    all_entities: typing.List[_model.Entity],
+    all_entities: typing.Union[typing.List[_model.Entity], _entities.EntityIndex],
     embedding_vectorstore_key: str = EntityVectorStoreKey.ID,
     include_entity_names: typing.Optional[typing.List[str]] = None,
     exclude_entity_names: typing.Optional[typing.List[str]] = None,
     k: int = 10,
     oversample_scaler: int = 2,
+    query_embedding: typing.Optional[typing.List[float]] = None,
 ) -> typing.List[_model.Entity]:
     """
     Extract entities that match a given query using semantic similarity of text
     embeddings of query and entity descriptions.
+
+    Pass an `EntityIndex` as `all_entities` to resolve the search hits with
+    dictionary lookups instead of scanning the entity list, and the embedding
+    of `query` as `query_embedding` if it was already computed (e.g. in a
+    batch) to skip embedding it again.
     """
-    if include_entity_names is None:
-        include_entity_names = []
-    if exclude_entity_names is None:
-        exclude_entity_names = []
-    matched_entities = []
+    search_results = None
     if query != "":
         # get entities with the highest semantic similarity to query
         # oversample to account for excluded entities
-        search_results = text_embedding_vectorstore.similarity_search_by_text(
+        if query_embedding is not None:
+            search_results = text_embedding_vectorstore.similarity_search_by_vector(
+                query_embedding, k=k * oversample_scaler
+            )
+        else:
+            search_results = text_embedding_vectorstore.similarity_search_by_text(
+                text=query,
+                text_embedder=lambda t: text_embedder.embed(t),
+                k=k * oversample_scaler,
+            )
+    return _select_entities(
+        search_results,
+        all_entities=all_entities,
+        embedding_vectorstore_key=embedding_vectorstore_key,
+        include_entity_names=include_entity_names,
+        exclude_entity_names=exclude_entity_names,
+        k=k,
+    )
+
+
+async def amap_query_to_entities(
+    query: str,
+    text_embedding_vectorstore: _vector_stores.BaseVectorStore,
+    text_embedder: typing.Union[_llm.BaseAsyncEmbedding, _llm.BaseEmbedding],
+    all_entities: typing.Union[typing.List[_model.Entity], _entities.EntityIndex],
+    embedding_vectorstore_key: str = EntityVectorStoreKey.ID,
+    include_entity_names: typing.Optional[typing.List[str]] = None,
+    exclude_entity_names: typing.Optional[typing.List[str]] = None,
+    k: int = 10,
+    oversample_scaler: int = 2,
+    query_embedding: typing.Optional[typing.List[float]] = None,
+) -> typing.List[_model.Entity]:
+    """
+    Asynchronous version of `map_query_to_entities`.
+
+    The query is embedded with `BaseAsyncEmbedding.aembed` (a synchronous
+    embedder is run in a worker thread), the vector search goes through
+    `BaseVectorStore.asimilarity_search_by_text`, and matching the results
+    back to entities runs in a worker thread, so the event loop is never
+    blocked.
+    """
+    search_results = None
+    if query != "" and query_embedding is not None:
+        search_results = await text_embedding_vectorstore.asimilarity_search_by_vector(
+            query_embedding, k=k * oversample_scaler
+        )
+    elif query != "":
+        if isinstance(text_embedder, _llm.BaseAsyncEmbedding):
+            async_embedder = text_embedder
+
+            async def _embed(t: str) -> typing.List[float]:
+                return await async_embedder.aembed(t)
+        else:
+            sync_embedder = text_embedder
+
+            async def _embed(t: str) -> typing.List[float]:
+                return await asyncio.to_thread(sync_embedder.embed, t)
+
+        # get entities with the highest semantic similarity to query
+        # oversample to account for excluded entities
+        search_results = await text_embedding_vectorstore.asimilarity_search_by_text(
             text=query,
-            text_embedder=lambda t: text_embedder.embed(t),
+            text_embedder=_embed,
             k=k * oversample_scaler,
         )
+    return await asyncio.to_thread(
+        _select_entities,
+        search_results,
+        all_entities=all_entities,
+        embedding_vectorstore_key=embedding_vectorstore_key,
+        include_entity_names=include_entity_names,
+        exclude_entity_names=exclude_entity_names,
+        k=k,
+    )
+
+
+def _select_entities(
+    search_results: typing.Optional[typing.List[_vector_stores.VectorStoreSearchResult]],
+    *,
+    all_entities: typing.Union[typing.List[_model.Entity], _entities.EntityIndex],
+    embedding_vectorstore_key: str,
+    include_entity_names: typing.Optional[typing.List[str]],
+    exclude_entity_names: typing.Optional[typing.List[str]],
+    k: int,
+) -> typing.List[_model.Entity]:
+    """
+    Match vector search results back to entities (or take the top ranked
+    entities if there was no query), then apply the include/exclude lists.
+    """
+    if include_entity_names is None:
+        include_entity_names = []
+    if exclude_entity_names is None:
+        exclude_entity_names = []
+    matched_entities = []
+    if search_results is not None:
         for result in search_results:
             matched = _entities.get_entity_by_key(
                 entities=all_entities,
@@ -63,6 +156,8 @@ def map_query_to_entities(
             )
             if matched:
                 matched_entities.append(matched)
+    elif isinstance(all_entities, _entities.EntityIndex):
+        matched_entities = all_entities.top_ranked(k)
     else:
         all_entities.sort(key=lambda x: x.rank if x.rank else 0, reverse=True)
         matched_entities = all_entities[:k]
@@ -85,13 +180,18 @@ def map_query_to_entities(
 def find_nearest_neighbors_by_graph_embeddings(
     entity_id: str,
     graph_embedding_vectorstore: _vector_stores.BaseVectorStore,
-    all_entities: typing.List[_model.Entity],
+    all_entities: typing.Union[typing.List[_model.Entity], _entities.EntityIndex],
     exclude_entity_names: typing.Optional[typing.List[str]] = None,
     embedding_vectorstore_key: str = EntityVectorStoreKey.ID,
     k: int = 10,
     oversample_scaler: int = 2,
 ) -> typing.List[_model.Entity]:
-    """Retrieve related entities by graph embeddings."""
+    """
+    Retrieve related entities by graph embeddings.
+
+    Pass an `EntityIndex` as `all_entities` to resolve the search hits with
+    dictionary lookups instead of scanning the entity list.
+    """
     if exclude_entity_names is None:
         exclude_entity_names = []
     # find nearest neighbors of this entity using graph embedding
@@ -130,8 +230,8 @@ def find_nearest_neighbors_by_graph_embeddings(
 
 def find_nearest_neighbors_by_entity_rank(
     entity_name: str,
-    all_entities: typing.List[_model.Entity],
-    all_relationships: typing.List[_model.Relationship],
+    all_entities: typing.Union[typing.List[_model.Entity], _entities.EntityIndex],
+    all_relationships: typing.Union[typing.List[_model.Relationship], _relationships.RelationshipIndex],
     exclude_entity_names: typing.Optional[typing.List[str]] = None,
     k: int = 10,
 ) -> typing.List[_model.Entity]:
@@ -141,11 +241,9 @@ def find_nearest_neighbors_by_entity_rank(
     """
     if exclude_entity_names is None:
         exclude_entity_names = []
-    entity_relationships = [
-        rel
-        for rel in all_relationships
-        if rel.source == entity_name or rel.target == entity_name
-    ]
+    entity_relationships = _relationships.RelationshipIndex.from_relationships(
+        all_relationships
+    ).get_by_entity(entity_name)
     source_entity_names = {rel.source for rel in entity_relationships}
     target_entity_names = {rel.target for rel in entity_relationships}
     related_entity_names = (source_entity_names.union(target_entity_names)).difference(
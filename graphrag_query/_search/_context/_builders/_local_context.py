@@ -5,6 +5,11 @@
 Module for building context data tables for system prompts, including entities,
 relationships, and covariates, for use in the GraphRAG framework.
 
+Classes:
+    LocalContextAssembler:
+        Incrementally assembles relationship and covariate context tables as
+        entities are added.
+
 Functions:
     build_entity_context: Prepares entity data as context for system prompts.
     build_covariates_context:
@@ -21,10 +26,12 @@ Functions:
 from __future__ import annotations
 
 import collections
+import itertools
 import typing
 
 import pandas as pd
 import tiktoken
+import typing_extensions
 
 from ... import _model
 from ..._input._retrieval import (
@@ -37,7 +44,7 @@ from .... import _utils
 
 def build_entity_context(
     selected_entities: typing.List[_model.Entity],
-    token_encoder: typing.Optional[tiktoken.Encoding] = None,
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
     data_max_tokens: int = 8000,
     include_entity_rank: bool = True,
     rank_description: str = "number of relationships",
@@ -49,7 +56,9 @@ def build_entity_context(
 
     Args:
         selected_entities: A list of entities to include in the context.
-        token_encoder: An optional token encoder to calculate token counts.
+        token_encoder:
+            An optional token encoder (or `TokenCounter`) to calculate token
+            counts.
         data_max_tokens:
             The maximum number of tokens allowed in the context data.
         include_entity_rank: Whether to include entity ranking information.
@@ -116,7 +125,7 @@ def build_entity_context(
 def build_covariates_context(
     selected_entities: typing.List[_model.Entity],
     covariates: typing.List[_model.Covariate],
-    token_encoder: typing.Optional[tiktoken.Encoding] = None,
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
     data_max_tokens: int = 8000,
     column_delimiter: str = "|",
     context_name: str = "_model.Covariates",
@@ -127,7 +136,9 @@ def build_covariates_context(
     Args:
         selected_entities: A list of entities to include in the context.
         covariates: A list of covariates related to the selected entities.
-        token_encoder: An optional token encoder to calculate token counts.
+        token_encoder:
+            An optional token encoder (or `TokenCounter`) to calculate token
+            counts.
         data_max_tokens:
             The maximum number of tokens allowed in the context data.
         column_delimiter:
@@ -142,17 +153,13 @@ def build_covariates_context(
     if len(selected_entities) == 0 or len(covariates) == 0:
         return "", pd.DataFrame()
 
-    selected_covariates = typing.List[_model.Covariate]()
-    record_df = pd.DataFrame()
+    selected_covariates: typing.List[_model.Covariate] = []
 
     # add context header
     current_context_text = f"-----{context_name}-----" + "\n"
 
     # add header
-    header = ["id", "entity"]
-    attributes = covariates[0].attributes or {} if len(covariates) > 0 else {}
-    attribute_cols = list(attributes.keys()) if len(covariates) > 0 else []
-    header.extend(attribute_cols)
+    header, attribute_cols = _covariate_header(covariates)
     current_context_text += column_delimiter.join(header) + "\n"
     current_tokens = _utils.num_tokens(current_context_text, token_encoder)
 
@@ -165,18 +172,7 @@ def build_covariates_context(
         )
 
     for covariate in selected_covariates:
-        new_context = [
-            covariate.short_id if covariate.short_id else "",
-            covariate.subject_id,
-        ]
-        for field in attribute_cols:
-            field_value = (
-                str(covariate.attributes.get(field))
-                if covariate.attributes and covariate.attributes.get(field)
-                else ""
-            )
-            new_context.append(field_value)
-
+        new_context = _covariate_record(covariate, attribute_cols)
         new_context_text = column_delimiter.join(new_context) + "\n"
         new_tokens = _utils.num_tokens(new_context_text, token_encoder)
         if current_tokens + new_tokens > data_max_tokens:
@@ -185,20 +181,47 @@ def build_covariates_context(
         all_context_records.append(new_context)
         current_tokens += new_tokens
 
-        if len(all_context_records) > 1:
-            record_df = pd.DataFrame(
-                all_context_records[1:], columns=typing.cast(typing.Any, all_context_records[0])
-            )
-        else:
-            record_df = pd.DataFrame()
+    if len(all_context_records) > 1:
+        record_df = pd.DataFrame(
+            all_context_records[1:], columns=typing.cast(typing.Any, all_context_records[0])
+        )
+    else:
+        record_df = pd.DataFrame()
 
     return current_context_text, record_df
 
 
+def _covariate_header(
+    covariates: typing.List[_model.Covariate],
+) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """Returns the covariate table header and the attribute columns in it."""
+    header = ["id", "entity"]
+    attributes = covariates[0].attributes or {} if len(covariates) > 0 else {}
+    attribute_cols = list(attributes.keys()) if len(covariates) > 0 else []
+    header.extend(attribute_cols)
+    return header, attribute_cols
+
+
+def _covariate_record(covariate: _model.Covariate, attribute_cols: typing.List[str]) -> typing.List[str]:
+    """Returns the covariate table row for a covariate."""
+    record = [
+        covariate.short_id if covariate.short_id else "",
+        covariate.subject_id,
+    ]
+    for field in attribute_cols:
+        field_value = (
+            str(covariate.attributes.get(field))
+            if covariate.attributes and covariate.attributes.get(field)
+            else ""
+        )
+        record.append(field_value)
+    return record
+
+
 def build_relationship_context(
     selected_entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
-    token_encoder: typing.Optional[tiktoken.Encoding] = None,
+    relationships: typing.Union[typing.List[_model.Relationship], _relationships.RelationshipIndex],
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
     include_relationship_weight: bool = False,
     data_max_tokens: int = 8000,
     top_k_relationships: int = 10,
@@ -211,8 +234,12 @@ def build_relationship_context(
 
     Args:
         selected_entities: A list of entities for which to gather relationships.
-        relationships: A list of relationships between entities.
-        token_encoder: An optional token encoder to calculate token counts.
+        relationships:
+            A list of relationships between entities, or a prebuilt
+            `RelationshipIndex` over them.
+        token_encoder:
+            An optional token encoder (or `TokenCounter`) to calculate token
+            counts.
         include_relationship_weight:
             Whether to include relationship weights in the context.
         data_max_tokens:
@@ -240,37 +267,14 @@ def build_relationship_context(
 
     # add headers
     current_context_text = f"-----{context_name}-----" + "\n"
-    header = ["id", "source", "target", "description"]
-    if include_relationship_weight:
-        header.append("weight")
-    attribute_cols = (
-        list(selected_relationships[0].attributes.keys())
-        if selected_relationships[0].attributes
-        else []
-    )
-    attribute_cols = [col for col in attribute_cols if col not in header]
-    header.extend(attribute_cols)
+    header, attribute_cols = _relationship_header(selected_relationships, include_relationship_weight)
 
     current_context_text += column_delimiter.join(header) + "\n"
     current_tokens = _utils.num_tokens(current_context_text, token_encoder)
 
     all_context_records = [header]
     for rel in selected_relationships:
-        new_context = [
-            rel.short_id if rel.short_id else "",
-            rel.source,
-            rel.target,
-            rel.description if rel.description else "",
-        ]
-        if include_relationship_weight:
-            new_context.append(str(rel.weight if rel.weight else ""))
-        for field in attribute_cols:
-            field_value = (
-                str(rel.attributes.get(field))
-                if rel.attributes and rel.attributes.get(field)
-                else ""
-            )
-            new_context.append(field_value)
+        new_context = _relationship_record(rel, include_relationship_weight, attribute_cols)
         new_context_text = column_delimiter.join(new_context) + "\n"
         new_tokens = _utils.num_tokens(new_context_text, token_encoder)
         if current_tokens + new_tokens > data_max_tokens:
@@ -289,9 +293,51 @@ def build_relationship_context(
     return current_context_text, record_df
 
 
+def _relationship_header(
+    selected_relationships: typing.List[_model.Relationship],
+    include_relationship_weight: bool,
+) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """Returns the relationship table header and the attribute columns in it."""
+    header = ["id", "source", "target", "description"]
+    if include_relationship_weight:
+        header.append("weight")
+    attribute_cols = (
+        list(selected_relationships[0].attributes.keys())
+        if selected_relationships[0].attributes
+        else []
+    )
+    attribute_cols = [col for col in attribute_cols if col not in header]
+    header.extend(attribute_cols)
+    return header, attribute_cols
+
+
+def _relationship_record(
+    rel: _model.Relationship,
+    include_relationship_weight: bool,
+    attribute_cols: typing.List[str],
+) -> typing.List[str]:
+    """Returns the relationship table row for a relationship."""
+    record = [
+        rel.short_id if rel.short_id else "",
+        rel.source,
+        rel.target,
+        rel.description if rel.description else "",
+    ]
+    if include_relationship_weight:
+        record.append(str(rel.weight if rel.weight else ""))
+    for field in attribute_cols:
+        field_value = (
+            str(rel.attributes.get(field))
+            if rel.attributes and rel.attributes.get(field)
+            else ""
+        )
+        record.append(field_value)
+    return record
+
+
 def _filter_relationships(
     selected_entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
+    relationships: typing.Union[typing.List[_model.Relationship], _relationships.RelationshipIndex],
     top_k_relationships: int = 10,
     relationship_ranking_attribute: str = "rank",
 ) -> typing.List[_model.Relationship]:
@@ -306,7 +352,9 @@ def _filter_relationships(
     Args:
         selected_entities:
             A list of entities to use for filtering relationships.
-        relationships: A list of all relationships to filter and rank.
+        relationships:
+            A list of all relationships to filter and rank, or a prebuilt
+            `RelationshipIndex` over them.
         top_k_relationships:
             The maximum number of relationships to include per entity.
         relationship_ranking_attribute:
@@ -315,6 +363,8 @@ def _filter_relationships(
     Returns:
         A list of filtered and ranked relationships.
     """
+    relationships = _relationships.RelationshipIndex.from_relationships(relationships)
+
     # First priority: in-network relationships (i.e. relationships between selected entities)
     in_network_relationships = _relationships.get_in_network_relationships(
         selected_entities=selected_entities,
@@ -334,55 +384,43 @@ def _filter_relationships(
 
     # within out-of-network relationships, prioritize mutual relationships
     # (i.e. relationships with out-network entities that are shared with multiple selected entities)
-    selected_entity_names = [entity.title for entity in selected_entities]
-    out_network_source_names = [
-        relationship.source
-        for relationship in out_network_relationships
-        if relationship.source not in selected_entity_names
-    ]
-    out_network_target_names = [
-        relationship.target
-        for relationship in out_network_relationships
-        if relationship.target not in selected_entity_names
-    ]
-    out_network_entity_names = list(
-        set(out_network_source_names + out_network_target_names)
-    )
+    selected_entity_names = {entity.title for entity in selected_entities}
+    out_network_neighbors: typing.Dict[str, typing.Set[str]] = collections.defaultdict(set)
+    for relationship in out_network_relationships:
+        out_network_neighbors[relationship.source].add(relationship.target)
+        out_network_neighbors[relationship.target].add(relationship.source)
     out_network_entity_links = collections.defaultdict(int)
-    for entity_name in out_network_entity_names:
-        targets = [
-            relationship.target
-            for relationship in out_network_relationships
-            if relationship.source == entity_name
-        ]
-        sources = [
-            relationship.source
-            for relationship in out_network_relationships
-            if relationship.target == entity_name
-        ]
-        out_network_entity_links[entity_name] = len(set(targets + sources))
-
-    # sort out-network relationships by number of links and rank_attributes
-    for rel in out_network_relationships:
-        if rel.attributes is None:
-            rel.attributes = {}
-        rel.attributes["links"] = (
+    for entity_name, neighbors in out_network_neighbors.items():
+        if entity_name not in selected_entity_names:
+            out_network_entity_links[entity_name] = len(neighbors)
+
+    # sort out-network relationships by number of links and rank_attributes; the links (and the combined ranks of
+    # relationships without the ranking attribute) stay local, as the relationships are shared by concurrent builds
+    links = {
+        rel.id: (
             out_network_entity_links[rel.source]
             if rel.source in out_network_entity_links
             else out_network_entity_links[rel.target]
         )
+        for rel in out_network_relationships
+    }
 
-    # sort by attributes[links] first, then by ranking_attribute
+    # sort by links first, then by ranking_attribute
     if relationship_ranking_attribute == "weight":
         out_network_relationships.sort(
-            key=lambda x: (x.attributes["links"], x.weight),  # type: ignore
+            key=lambda x: (links[x.id], x.weight),  # type: ignore
             reverse=True,  # type: ignore
         )
     else:
+        combined_ranks = _relationships.calculate_relationship_combined_rank(
+            out_network_relationships, selected_entities
+        )
         out_network_relationships.sort(
             key=lambda x: (
-                x.attributes["links"],  # type: ignore
-                x.attributes[relationship_ranking_attribute],  # type: ignore
+                links[x.id],
+                x.attributes[relationship_ranking_attribute]
+                if x.attributes and relationship_ranking_attribute in x.attributes
+                else combined_ranks[x.id],
             ),  # type: ignore
             reverse=True,
         )
@@ -394,7 +432,7 @@ def _filter_relationships(
 def get_candidate_context(
     selected_entities: typing.List[_model.Entity],
     entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
+    relationships: typing.Union[typing.List[_model.Relationship], _relationships.RelationshipIndex],
     covariates: typing.Dict[str, typing.List[_model.Covariate]],
     include_entity_rank: bool = True,
     entity_rank_description: str = "number of relationships",
@@ -411,7 +449,9 @@ def get_candidate_context(
     Args:
         selected_entities: A list of selected entities relevant to the context.
         entities: A list of all entities in the dataset.
-        relationships: A list of relationships to consider.
+        relationships:
+            A list of relationships to consider, or a prebuilt
+            `RelationshipIndex` over them.
         covariates: A dictionary of covariates grouped by type.
         include_entity_rank:
             Whether to include the rank of entities in the context.
@@ -451,3 +491,291 @@ def get_candidate_context(
         )
 
     return candidate_context
+
+
+class LocalContextAssembler:
+    """
+    Assembles the relationship and covariate tables of the local context one
+    entity at a time.
+
+    Produces the same tables as calling `build_relationship_context` and
+    `build_covariates_context` on a growing entity selection, without
+    rebuilding and re-tokenizing them from scratch for every added entity:
+
+    - Covariate rows only ever get appended as entities are added, so each
+      entity's covariates are rendered and tokenized once.
+    - The relationship selection is re-ranked for every added entity (the
+      in-network/out-of-network ranking depends on the whole selection), but
+      each distinct row is tokenized only once.
+
+    Rows are admitted against running sums of the header and row counts, as
+    in `build_relationship_context`, but the total of a table is the token
+    count of its whole text: BPE token counts do not add up across rows (a
+    row starting with whitespace, or with "/" under o200k_base, merges with
+    the end of the previous one, and the length-based estimates are rounded
+    up per text). A covariate table is counted again only when rows were
+    appended to it.
+
+    Attributes:
+        _relationships: The relationships to select from.
+        _covariates: A dictionary of covariates grouped by type.
+        _covariates_by_subject:
+            Per covariate type, the covariates grouped by subject, in their
+            original order.
+        _token_counter:
+            The token counter of the rows; rows are only tokenized the first
+            time they are seen.
+        _data_max_tokens: The maximum number of tokens allowed per table.
+        _column_delimiter: The delimiter used to separate columns.
+        _include_relationship_weight:
+            Whether to include relationship weights in the context.
+        _top_k_relationships: The maximum number of relationships per entity.
+        _relationship_ranking_attribute:
+            The attribute used to rank relationships.
+        _selected_entities: The entities added so far.
+        _relationship_table: The relationship table for the added entities.
+        _covariate_tables: Per covariate type, the covariate table so far.
+        _committed:
+            The committed state: the relationship table and the number of rows
+            of each covariate table, or None if nothing was committed.
+    """
+    _relationships: _relationships.RelationshipIndex
+    _covariates: typing.Dict[str, typing.List[_model.Covariate]]
+    _covariates_by_subject: typing.Dict[str, typing.Dict[str, typing.List[_model.Covariate]]]
+    _token_counter: _utils.TokenCounter
+    _data_max_tokens: int
+    _column_delimiter: str
+    _include_relationship_weight: bool
+    _top_k_relationships: int
+    _relationship_ranking_attribute: str
+    _selected_entities: typing.List[_model.Entity]
+    _relationship_table: _ContextTable
+    _covariate_tables: typing.Dict[str, _ContextTable]
+    _committed: typing.Optional[typing.Tuple[_ContextTable, typing.Dict[str, int]]]
+
+    def __init__(
+        self,
+        *,
+        relationships: typing.Union[typing.List[_model.Relationship], _relationships.RelationshipIndex],
+        covariates: typing.Dict[str, typing.List[_model.Covariate]],
+        token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
+        data_max_tokens: int = 8000,
+        column_delimiter: str = "|",
+        include_relationship_weight: bool = False,
+        top_k_relationships: int = 10,
+        relationship_ranking_attribute: str = "rank",
+    ) -> None:
+        self._relationships = _relationships.RelationshipIndex.from_relationships(relationships)
+        self._covariates = covariates
+        self._covariates_by_subject = {}
+        for name, covariate_list in covariates.items():
+            by_subject: typing.Dict[str, typing.List[_model.Covariate]] = {}
+            for cov in covariate_list:
+                by_subject.setdefault(cov.subject_id, []).append(cov)
+            self._covariates_by_subject[name] = by_subject
+        self._token_counter = (
+            token_encoder if isinstance(token_encoder, _utils.TokenCounter) else _utils.TokenCounter(token_encoder)
+        )
+        self._data_max_tokens = data_max_tokens
+        self._column_delimiter = column_delimiter
+        self._include_relationship_weight = include_relationship_weight
+        self._top_k_relationships = top_k_relationships
+        self._relationship_ranking_attribute = relationship_ranking_attribute
+
+        self._selected_entities = []
+        self._relationship_table = _ContextTable.empty()
+        self._covariate_tables = {
+            name: (
+                _ContextTable.start(
+                    name, _covariate_header(covariate_list)[0], column_delimiter, self._token_counter
+                )
+                if len(covariate_list) > 0
+                else _ContextTable.empty()
+            )
+            for name, covariate_list in covariates.items()
+        }
+        self._committed = None
+
+    def prefetch(self, entities: typing.List[_model.Entity]) -> None:
+        """
+        Reads the attributes of the covariates of entities in one batch, if
+        they are lazily loaded (see `_model.LazyColumn`).
+        """
+        for name, by_subject in self._covariates_by_subject.items():
+            _model.prefetch(
+                itertools.chain(
+                    self._covariates[name][:1],
+                    *(by_subject.get(entity.title, []) for entity in entities),
+                ),
+                "attributes",
+            )
+
+    def add_entity(self, entity: _model.Entity) -> int:
+        """
+        Adds an entity to the selection and updates the tables.
+
+        Returns:
+            The total number of tokens of the relationship and covariate
+            tables for the entities added so far.
+        """
+        self._selected_entities.append(entity)
+        self._relationship_table = self._build_relationship_table()
+        total_tokens = self._relationship_table.tokens
+
+        for name, table in self._covariate_tables.items():
+            if table.is_open:
+                _, attribute_cols = _covariate_header(self._covariates[name])
+                for cov in self._covariates_by_subject[name].get(entity.title, []):
+                    if not table.append(_covariate_record(cov, attribute_cols), self._data_max_tokens):
+                        break
+            total_tokens += table.tokens
+        return total_tokens
+
+    def commit(self) -> None:
+        """Marks the current tables as the state returned by `to_context`."""
+        self._committed = (
+            self._relationship_table,
+            {name: len(table.records) for name, table in self._covariate_tables.items()},
+        )
+
+    def to_context(self) -> typing.Tuple[typing.List[str], typing.Dict[str, pd.DataFrame]]:
+        """
+        Returns the committed tables as a list of context texts (relationships
+        first, then one per covariate type) and a dictionary of DataFrames.
+        """
+        if self._committed is None:
+            return [], {}
+        relationship_table, covariate_rows = self._committed
+        context = [relationship_table.to_text()]
+        context_data = {"relationships": relationship_table.to_dataframe()}
+        for name, table in self._covariate_tables.items():
+            table = table.head(covariate_rows[name])
+            context.append(table.to_text())
+            context_data[name.lower()] = table.to_dataframe()
+        return context, context_data
+
+    def _build_relationship_table(self) -> _ContextTable:
+        selected_relationships = _filter_relationships(
+            selected_entities=self._selected_entities,
+            relationships=self._relationships,
+            top_k_relationships=self._top_k_relationships,
+            relationship_ranking_attribute=self._relationship_ranking_attribute,
+        )
+        if len(selected_relationships) == 0:
+            return _ContextTable.empty()
+
+        header, attribute_cols = _relationship_header(selected_relationships, self._include_relationship_weight)
+        table = _ContextTable.start("Relationships", header, self._column_delimiter, self._token_counter)
+        for rel in selected_relationships:
+            if not table.append(
+                _relationship_record(rel, self._include_relationship_weight, attribute_cols),
+                self._data_max_tokens,
+            ):
+                break
+        return table
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(num_entities={len(self._selected_entities)})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class _ContextTable:
+    """
+    A context table being filled row by row under a token budget.
+
+    Attributes:
+        header: The column names, or None for an empty table without text.
+        delimiter: The column delimiter.
+        texts: The section title and header line followed by the row lines.
+        records: The rows added so far.
+        running_tokens:
+            The sum of the header and row token counts, which the budget is
+            checked against.
+        is_open: Whether rows can still be added within the budget.
+        _num_tokens: The (cached) token counter used for the rows.
+        _counted:
+            The number of texts and the token count of the table text when it
+            was last counted, or None.
+    """
+    header: typing.Optional[typing.List[str]]
+    delimiter: str
+    texts: typing.List[str]
+    records: typing.List[typing.List[str]]
+    running_tokens: int
+    is_open: bool
+    _num_tokens: typing.Optional[typing.Callable[[str], int]]
+    _counted: typing.Optional[typing.Tuple[int, int]]
+
+    def __init__(
+        self,
+        header: typing.Optional[typing.List[str]],
+        delimiter: str,
+        texts: typing.List[str],
+        records: typing.List[typing.List[str]],
+        running_tokens: int,
+        num_tokens: typing.Optional[typing.Callable[[str], int]] = None,
+    ) -> None:
+        self.header = header
+        self.delimiter = delimiter
+        self.texts = texts
+        self.records = records
+        self.running_tokens = running_tokens
+        self.is_open = header is not None
+        self._num_tokens = num_tokens
+        self._counted = None
+
+    @property
+    def tokens(self) -> int:
+        """The token count of the whole table text."""
+        if self._num_tokens is None:
+            return self.running_tokens
+        if self._counted is None or self._counted[0] != self.texts.__len__():
+            self._counted = (self.texts.__len__(), self._num_tokens(self.to_text()))
+        return self._counted[1]
+
+    @classmethod
+    def empty(cls) -> _ContextTable:
+        return cls(None, "", [], [], 0)
+
+    @classmethod
+    def start(
+        cls,
+        context_name: str,
+        header: typing.List[str],
+        delimiter: str,
+        num_tokens: typing.Callable[[str], int],
+    ) -> _ContextTable:
+        text = f"-----{context_name}-----" + "\n" + delimiter.join(header) + "\n"
+        return cls(header, delimiter, [text], [], num_tokens(text), num_tokens)
+
+    def append(self, record: typing.List[str], data_max_tokens: int) -> bool:
+        """Appends a row if it fits in the budget, otherwise closes the table."""
+        text = self.delimiter.join(record) + "\n"
+        new_tokens = typing.cast(typing.Callable[[str], int], self._num_tokens)(text)
+        if self.running_tokens + new_tokens > data_max_tokens:
+            self.is_open = False
+            return False
+        self.texts.append(text)
+        self.records.append(record)
+        self.running_tokens += new_tokens
+        return True
+
+    def head(self, num_records: int) -> _ContextTable:
+        """Returns a closed copy of the table with its first `num_records` rows."""
+        table = _ContextTable(
+            self.header, self.delimiter, self.texts[:num_records + 1], self.records[:num_records], 0
+        )
+        table.is_open = False
+        return table
+
+    def to_text(self) -> str:
+        return "".join(self.texts)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        if len(self.records) == 0:
+            return pd.DataFrame()
+        return pd.DataFrame(self.records, columns=typing.cast(typing.Any, self.header))
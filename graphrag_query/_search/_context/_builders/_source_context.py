@@ -18,12 +18,13 @@ import pandas as pd
 import tiktoken
 
 from ... import _model
+from ..._input._retrieval import _relationships
 from .... import _utils
 
 
 def build_text_unit_context(
     text_units: typing.List[_model.TextUnit],
-    token_encoder: typing.Optional[tiktoken.Encoding] = None,
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, _utils.TokenCounter]] = None,
     column_delimiter: str = "|",
     shuffle_data: bool = True,
     data_max_tokens: int = 8000,
@@ -35,7 +36,9 @@ def build_text_unit_context(
 
     Args:
         text_units: A list of text units to include in the context.
-        token_encoder: An optional token encoder to calculate token counts.
+        token_encoder:
+            An optional token encoder (or `TokenCounter`) to calculate token
+            counts.
         column_delimiter:
             The delimiter to use for separating columns in the context data.
         shuffle_data:
@@ -101,7 +104,9 @@ def build_text_unit_context(
 
 
 def count_relationships(
-    text_unit: _model.TextUnit, entity: _model.Entity, relationships: typing.Dict[str, _model.Relationship]
+    text_unit: _model.TextUnit,
+    entity: _model.Entity,
+    relationships: typing.Union[typing.Dict[str, _model.Relationship], _relationships.RelationshipIndex],
 ) -> int:
     """
     Counts the number of relationships associated with a text unit for a given
@@ -110,12 +115,25 @@ def count_relationships(
     Args:
         text_unit: The text unit whose relationships will be counted.
         entity: The entity for which relationships will be checked.
-        relationships: A dictionary of all relationships in the dataset.
+        relationships:
+            A dictionary of all relationships in the dataset, or a
+            `RelationshipIndex` over them.
 
     Returns:
         The number of relationships associated with the text unit for the given
         entity.
     """
+    if isinstance(relationships, _relationships.RelationshipIndex):
+        if text_unit.relationship_ids is None:
+            text_unit_relationships = relationships.get_by_text_unit(text_unit.id)
+        else:
+            text_unit_relationships = [
+                rel for rel in map(relationships.get, text_unit.relationship_ids) if rel is not None
+            ]
+        return sum(
+            1 for rel in text_unit_relationships if rel.source == entity.title or rel.target == entity.title
+        )
+
     if text_unit.relationship_ids is None:
         entity_relationships = [
             rel for rel in relationships.values() if rel.source == entity.title or rel.target == entity.title
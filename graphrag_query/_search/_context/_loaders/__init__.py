@@ -7,10 +7,12 @@ from ._base import BaseContextLoader
 from ._context_loaders import (
     GlobalContextLoader,
     LocalContextLoader,
+    SnapshotContextLoader,
 )
 
 __all__ = [
     "BaseContextLoader",
     "LocalContextLoader",
     "GlobalContextLoader",
+    "SnapshotContextLoader",
 ]
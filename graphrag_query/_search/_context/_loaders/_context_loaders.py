@@ -5,15 +5,18 @@ from __future__ import annotations
 
 import os
 import pathlib
+import sys
 import typing
 
 import pandas as pd
+import pyarrow.parquet as pq
 import tiktoken
 import typing_extensions
 
-from . import _base, _defaults, _utils
+from . import _base, _defaults, _lazy, _snapshot, _utils
 from .. import _builders
-from ... import _llm
+from .._builders import _source_context
+from ... import _llm, _model
 from .... import _utils as _common_utils
 
 
@@ -42,6 +45,15 @@ class LocalContextLoader(_base.BaseContextLoader):
         _covariates:
             An optional DataFrame containing covariates (claims) associated with
             entities.
+        _lazy_text_units:
+            The Parquet file the text of the text units is read from on
+            demand, if `_text_units` was loaded without it.
+        _lazy_covariates:
+            The Parquet file the attributes of the covariates are read from on
+            demand, if `_covariates` was loaded without them.
+        _lazy_max_entries:
+            The maximum number of lazily read values kept in memory, per
+            column.
     """
     _nodes: pd.DataFrame
     _entities: pd.DataFrame
@@ -49,6 +61,9 @@ class LocalContextLoader(_base.BaseContextLoader):
     _text_units: pd.DataFrame
     _relationships: pd.DataFrame
     _covariates: typing.Optional[pd.DataFrame] = None
+    _lazy_text_units: typing.Optional[pathlib.Path] = None
+    _lazy_covariates: typing.Optional[pathlib.Path] = None
+    _lazy_max_entries: int
 
     @property
     def nodes(self) -> pd.DataFrame:
@@ -85,6 +100,8 @@ class LocalContextLoader(_base.BaseContextLoader):
         text_units_file: typing.Optional[str] = None,
         relationships_file: typing.Optional[str] = None,
         covariates_file: typing.Optional[str] = None,
+        lazy: bool = False,
+        lazy_max_entries: int = 4096,
         **kwargs: typing.Any
     ) -> typing.Self:
         """
@@ -94,6 +111,12 @@ class LocalContextLoader(_base.BaseContextLoader):
         and creates a LocalContextLoader instance. Each file can either be
         provided explicitly or default filenames will be used.
 
+        In lazy mode, the text of the text units and the (default) attribute
+        columns of the covariates are not read: the context builder reads the
+        rows it renders from the files on demand (see `_lazy`), keeping the
+        most recently used ones in memory, so the memory held scales with the
+        working set of the queries rather than with the size of the index.
+
         Args:
             directory: The path to the directory containing the Parquet files.
             nodes_file:
@@ -114,6 +137,12 @@ class LocalContextLoader(_base.BaseContextLoader):
             covariates_file:
                 Optional filename for the covariates data. If not provided, the
                 default filename is used.
+            lazy:
+                Whether to read the text of the text units and the attributes
+                of the covariates on demand rather than up front.
+            lazy_max_entries:
+                In lazy mode, the maximum number of text unit texts (and of
+                covariate attributes) kept in memory.
             **kwargs: Additional arguments for future extensibility.
 
         Returns:
@@ -131,12 +160,17 @@ class LocalContextLoader(_base.BaseContextLoader):
             directory / (community_reports_file or _defaults.PARQUET_FILE_NAME__COMMUNITY_REPORTS)
         )
 
-        text_units = pd.read_parquet(directory / (text_units_file or _defaults.PARQUET_FILE_NAME__TEXT_UNITS))
+        text_units_path = directory / (text_units_file or _defaults.PARQUET_FILE_NAME__TEXT_UNITS)
+        text_units = _read_parquet(
+            text_units_path, exclude=[_defaults.COLUMN__TEXT_UNIT__TEXT] if lazy else []
+        )
         relationships = pd.read_parquet(
             directory / (relationships_file or _defaults.PARQUET_FILE_NAME__RELATIONSHIPS)
         )
         covariates_path = directory / (covariates_file or _defaults.PARQUET_FILE_NAME__COVARIATES)
-        covariates = pd.read_parquet(covariates_path) if covariates_path.exists() else None
+        covariates = _read_parquet(
+            covariates_path, exclude=_defaults.COLUMN__COVARIATE__ATTRIBUTES if lazy else []
+        ) if covariates_path.exists() else None
         return cls(
             nodes=nodes,
             entities=entities,
@@ -144,6 +178,9 @@ class LocalContextLoader(_base.BaseContextLoader):
             text_units=text_units,
             relationships=relationships,
             covariates=covariates,
+            lazy_text_units=text_units_path if lazy else None,
+            lazy_covariates=covariates_path if lazy and covariates is not None else None,
+            lazy_max_entries=lazy_max_entries,
         )
 
     def __init__(
@@ -155,6 +192,9 @@ class LocalContextLoader(_base.BaseContextLoader):
         text_units: pd.DataFrame,
         relationships: pd.DataFrame,
         covariates: typing.Optional[pd.DataFrame],
+        lazy_text_units: typing.Optional[pathlib.Path] = None,
+        lazy_covariates: typing.Optional[pathlib.Path] = None,
+        lazy_max_entries: int = 4096,
     ) -> None:
         self._nodes = nodes
         self._entities = entities
@@ -162,15 +202,92 @@ class LocalContextLoader(_base.BaseContextLoader):
         self._text_units = text_units
         self._relationships = relationships
         self._covariates = covariates
+        self._lazy_text_units = lazy_text_units
+        self._lazy_covariates = lazy_covariates
+        self._lazy_max_entries = lazy_max_entries
+
+    def to_models(self, community_level: int, **kwargs: typing.Any) -> _snapshot.SnapshotModels:
+        """
+        Resolves the loaded data into the models of a community level: the
+        entities, community reports, text units, relationships and covariates
+        (as claims) that `to_context_builder` builds its context builder from.
+
+        Args:
+            community_level: The level of community data to include.
+            **kwargs:
+                Additional keyword arguments, with the prefixes described in
+                `to_context_builder`. Other keyword arguments are ignored.
+
+        Returns:
+            The resolved models; in lazy mode, the text units and covariates
+            are views of stores that read their lazy columns on demand. The
+            community hierarchy holds the community reports of every level
+            (sharing those of the community level).
+        """
+        text_units_kwargs = _common_utils.filter_kwargs(_utils.get_text_units, kwargs, prefix="text_units__")
+        covariates_kwargs = _common_utils.filter_kwargs(_utils.get_covariates, kwargs, prefix="covariates__")
+        community_reports_kwargs = _common_utils.filter_kwargs(
+            _utils.get_community_reports, kwargs, prefix="community_reports__"
+        )
+        community_reports = _utils.get_community_reports(
+            community_reports=self._community_reports,
+            nodes=self._nodes,
+            community_level=community_level,
+            **community_reports_kwargs
+        )
+        text_units = _utils.get_text_units(
+            text_units=(
+                self._text_units if self._lazy_text_units is None
+                else self._text_units.assign(**{_defaults.COLUMN__TEXT_UNIT__TEXT: ""})
+            ),
+            **text_units_kwargs
+        )
+        if self._lazy_text_units is not None:
+            text_units = _lazy.lazy_text_units(
+                text_units, self._lazy_text_units, max_entries=self._lazy_max_entries
+            )
+        covariates = (
+            _utils.get_covariates(self._covariates, **covariates_kwargs) if self._covariates is not None else []
+        )
+        if self._lazy_covariates is not None:
+            covariates = _lazy.lazy_covariates(
+                covariates,
+                self._lazy_covariates,
+                attributes_cols=covariates_kwargs.get("attributes_cols"),
+                max_entries=self._lazy_max_entries,
+            )
+        return _snapshot.SnapshotModels(
+            entities=_utils.get_entities(
+                nodes=self._nodes,
+                entities=self._entities,
+                community_level=community_level,
+                **_common_utils.filter_kwargs(_utils.get_entities, kwargs, prefix="entities__")
+            ),
+            community_reports=community_reports,
+            text_units=text_units,
+            relationships=_utils.get_relationships(
+                relationships=self._relationships,
+                **_common_utils.filter_kwargs(_utils.get_relationships, kwargs, prefix="relationships__")
+            ),
+            covariates={"claims": covariates},
+            community_hierarchy=_utils.get_community_hierarchy(
+                community_reports=self._community_reports,
+                nodes=self._nodes,
+                reports=community_reports,
+                **_common_utils.filter_kwargs(_utils.get_community_hierarchy, community_reports_kwargs)
+            ),
+        )
 
     @typing_extensions.override
     def to_context_builder(
         self,
         community_level: int,
-        embedder: _llm.BaseEmbedding,
+        embedder: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
         store_coll_name: str,
         store_uri: str,
         encoding_model: str,
+        compact_models: bool = False,
+        estimate_tokens: bool = False,
         **kwargs: typing.Any
     ) -> _builders.LocalContextBuilder:
         """
@@ -190,46 +307,51 @@ class LocalContextLoader(_base.BaseContextLoader):
                 embeddings are stored.
             store_uri: The URI for connecting to the vector store.
             encoding_model: The model used for token encoding.
+            compact_models:
+                Whether to repack the loaded entities, community reports, text
+                units, relationships and covariates into compact column stores
+                (see `_model.ModelStore`) once the vector store is built, to
+                reduce the memory held by the context builder. Lazily loaded
+                text units and covariates are compact already.
+            estimate_tokens:
+                Whether to estimate the token counts of the context rows from
+                their length instead of encoding them. Faster, but the context
+                may over- or under-fill its token budgets.
             **kwargs:
                 Additional keyword arguments, can be prefixed with 'entities__'
                 for `_utils.get_entities`, 'community_reports__' for
                 `_utils.get_community_reports`, 'text_units__' for
                 `_utils.get_text_units`, 'relationships__' for
-                `_utils.get_relationships`, and 'covariates__' for
-                `_utils.get_covariates`. See details in the specific method
-                documentation and source code.
+                `_utils.get_relationships`, 'covariates__' for
+                `_utils.get_covariates`, and 'store__' for `_utils.get_store`.
+                See details in the specific method documentation and source
+                code.
 
         Returns:
             A LocalContextBuilder instance ready for building local search
             contexts.
         """
-        entities_list = _utils.get_entities(
-            nodes=self._nodes,
-            entities=self._entities,
-            community_level=community_level,
-            **_common_utils.filter_kwargs(_utils.get_entities, kwargs, prefix="entities__")
-        )
-        community_reports_list = _utils.get_community_reports(
-            community_reports=self._community_reports,
-            nodes=self._nodes,
-            community_level=community_level,
-            **_common_utils.filter_kwargs(_utils.get_community_reports, kwargs, prefix="community_reports__")
-        )
-        text_units_list = _utils.get_text_units(
-            text_units=self._text_units,
-            **_common_utils.filter_kwargs(_utils.get_text_units, kwargs, prefix="text_units__")
-        )
-        relationships_list = _utils.get_relationships(
-            relationships=self._relationships,
-            **_common_utils.filter_kwargs(_utils.get_relationships, kwargs, prefix="relationships__")
+        models = self.to_models(community_level, **kwargs)
+        entities_list = models.entities
+        community_reports_list = models.community_reports
+        text_units_list = models.text_units
+        relationships_list = models.relationships
+        covariates_dict = models.covariates
+        community_hierarchy = models.community_hierarchy
+        store = _utils.get_store(
+            entities_list,
+            coll_name=store_coll_name,
+            uri=store_uri,
+            **_common_utils.filter_kwargs(_utils.get_store, kwargs, prefix="store__")
         )
-        covariates_dict = {
-            "claims": _utils.get_covariates(
-                self._covariates,
-                **_common_utils.filter_kwargs(_utils.get_covariates, kwargs, prefix="covariates__")
-            ) if self._covariates is not None else []
-        }
-        store = _utils.get_store(entities_list, coll_name=store_coll_name, uri=store_uri)
+        if compact_models:
+            entities_list = _utils.compact(_model.Entity, entities_list)
+            community_reports_list = _utils.compact(_model.CommunityReport, community_reports_list)
+            text_units_list = _utils.compact(_model.TextUnit, text_units_list)
+            relationships_list = _utils.compact(_model.Relationship, relationships_list)
+            covariates_dict = {
+                name: _utils.compact(_model.Covariate, covariates) for name, covariates in covariates_dict.items()
+            }
         return _builders.LocalContextBuilder(
             entities=entities_list,
             entity_text_embeddings=store,
@@ -239,6 +361,8 @@ class LocalContextLoader(_base.BaseContextLoader):
             covariates=covariates_dict,
             text_embedder=embedder,
             token_encoder=tiktoken.get_encoding(encoding_model),
+            estimate_tokens=estimate_tokens,
+            community_hierarchy=community_hierarchy,
         )
 
     @typing_extensions.override
@@ -259,6 +383,221 @@ class LocalContextLoader(_base.BaseContextLoader):
         return self.__str__()
 
 
+class SnapshotContextLoader:
+    """
+    SnapshotContextLoader loads the context of local search from a snapshot
+    compiled by `compile`, instead of the Parquet files of the index.
+
+    Compiling runs the Parquet decoding and the pandas pipeline of
+    `LocalContextLoader` once, for one community level, and writes the
+    resolved models as uncompressed Arrow IPC files. Loading memory-maps them:
+    the embeddings stay in the mapped pages (shared by every process that maps
+    the same snapshot), only the scalar fields are decoded, and the token
+    counts of the context rows computed while compiling are handed to the
+    context builder.
+
+    Attributes:
+        _snapshot: The memory-mapped snapshot.
+    """
+    _snapshot: _snapshot.Snapshot
+
+    @property
+    def snapshot(self) -> _snapshot.Snapshot:
+        return self._snapshot
+
+    @property
+    def community_level(self) -> int:
+        return self._snapshot.community_level
+
+    @property
+    def encoding_model(self) -> str:
+        return self._snapshot.encoding_model
+
+    @staticmethod
+    def is_snapshot(directory: typing.Union[str, os.PathLike[str], pathlib.Path]) -> bool:
+        """Whether a directory holds a compiled snapshot."""
+        return _snapshot.is_snapshot(directory)
+
+    @classmethod
+    def from_directory(
+        cls,
+        directory: typing.Union[str, os.PathLike[str], pathlib.Path],
+        lazy: bool = False,
+        lazy_max_entries: int = 4096,
+        **kwargs: typing.Any
+    ) -> typing.Self:
+        """
+        Loads a compiled snapshot.
+
+        Args:
+            directory: The directory the snapshot was compiled to.
+            lazy:
+                Whether to read the text of the text units and the attributes
+                of the covariates from the mapped files on demand rather than
+                decoding them up front.
+            lazy_max_entries:
+                In lazy mode, the maximum number of text unit texts (and of
+                covariate attributes) kept in memory.
+            **kwargs:
+                Ignored, so that the options of
+                `LocalContextLoader.from_parquet_directory` can be passed
+                along.
+
+        Returns:
+            A SnapshotContextLoader instance over the memory-mapped snapshot.
+        """
+        return cls(_snapshot.read_snapshot(directory, lazy=lazy, lazy_max_entries=lazy_max_entries))
+
+    @classmethod
+    def compile(
+        cls,
+        context_loader: LocalContextLoader,
+        directory: typing.Union[str, os.PathLike[str], pathlib.Path],
+        *,
+        community_level: int,
+        encoding_model: str,
+        **kwargs: typing.Any
+    ) -> typing.Self:
+        """
+        Compiles the data of a LocalContextLoader into a snapshot.
+
+        The models are resolved at `community_level` and written first. The
+        token counts are then computed over the written snapshot, for the rows
+        every global search renders (the community report batches, with the
+        default parameters) and for the text unit rows of local search, so
+        that serving starts with them already counted. Other rows are counted
+        on first use, as without a snapshot.
+
+        Args:
+            context_loader: The loaded Parquet data of the index.
+            directory: The directory to write the snapshot to.
+            community_level: The level of community data to include.
+            encoding_model: The model used for token encoding.
+            **kwargs:
+                Additional keyword arguments for `LocalContextLoader.to_models`
+                (the column options of the Parquet files).
+
+        Returns:
+            A SnapshotContextLoader instance over the compiled snapshot.
+        """
+        _snapshot.write_snapshot(
+            directory,
+            context_loader.to_models(community_level, **kwargs),
+            community_level=community_level,
+            encoding_model=encoding_model,
+        )
+        models = _snapshot.read_snapshot(directory).models
+        token_counter = _common_utils.TokenCounter(tiktoken.get_encoding(encoding_model), max_entries=sys.maxsize)
+        _builders.GlobalContextBuilder(
+            community_reports=models.community_reports,
+            entities=models.entities,
+            token_counter=token_counter,
+        ).build_context()
+        _source_context.build_text_unit_context(
+            text_units=models.text_units,
+            token_encoder=token_counter,
+            shuffle_data=False,
+            data_max_tokens=sys.maxsize,
+        )
+        _snapshot.write_token_counts(directory, token_counter.digests())
+        return cls.from_directory(directory)
+
+    def __init__(self, snapshot: _snapshot.Snapshot) -> None:
+        self._snapshot = snapshot
+
+    def to_context_builder(
+        self,
+        community_level: int,
+        embedder: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
+        store_coll_name: str,
+        store_uri: str,
+        encoding_model: str,
+        estimate_tokens: bool = False,
+        **kwargs: typing.Any
+    ) -> _builders.LocalContextBuilder:
+        """
+        Converts the snapshot into a LocalContextBuilder, as
+        `LocalContextLoader.to_context_builder` does for Parquet data.
+
+        The models are always compact (their stores are the snapshot), so
+        `compact_models` is ignored, and so are the column options, which were
+        applied when compiling.
+
+        Args:
+            community_level:
+                The level of community data to include; it must be the level
+                the snapshot was compiled at.
+            embedder: The text embedding model to use for embedding the entities.
+            store_coll_name:
+                The name of the collection in the vector store where entity
+                embeddings are stored.
+            store_uri: The URI for connecting to the vector store.
+            encoding_model:
+                The model used for token encoding. The precomputed token counts
+                are used only if it is the model the snapshot was compiled
+                with.
+            estimate_tokens:
+                Whether to estimate the token counts of the context rows from
+                their length instead of encoding them.
+            **kwargs:
+                Additional keyword arguments, can be prefixed with 'store__'
+                for `_utils.get_store`.
+
+        Returns:
+            A LocalContextBuilder instance ready for building local search
+            contexts.
+
+        Raises:
+            ValueError: If the snapshot was compiled at another community level.
+        """
+        if community_level != self._snapshot.community_level:
+            raise ValueError(
+                f"The snapshot was compiled at community level {self._snapshot.community_level}, "
+                f"not {community_level}; compile it again at this level"
+            )
+        models = self._snapshot.models
+        store = _utils.get_store(
+            models.entities,
+            coll_name=store_coll_name,
+            uri=store_uri,
+            **_common_utils.filter_kwargs(_utils.get_store, kwargs, prefix="store__")
+        )
+        context_builder = _builders.LocalContextBuilder(
+            entities=models.entities,
+            entity_text_embeddings=store,
+            community_reports=models.community_reports,
+            text_units=models.text_units,
+            relationships=models.relationships,
+            covariates=models.covariates,
+            text_embedder=embedder,
+            token_encoder=tiktoken.get_encoding(encoding_model),
+            estimate_tokens=estimate_tokens,
+            community_hierarchy=models.community_hierarchy,
+        )
+        if encoding_model == self._snapshot.encoding_model:
+            context_builder.token_counter.precompute(self._snapshot.token_counts)
+        return context_builder
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        models = self._snapshot.models
+        return (
+            f"{self.__class__.__name__}(\n"
+            f"\tcommunity_level={self._snapshot.community_level}, \n"
+            f"\tnum_entities={len(models.entities)}, \n"
+            f"\tnum_community_reports={len(models.community_reports)}, \n"
+            f"\tnum_text_units={len(models.text_units)}, \n"
+            f"\tnum_relationships={len(models.relationships)}, \n"
+            f"\tnum_covariates={sum(len(covariates) for covariates in models.covariates.values())}, \n"
+            f"\tnum_token_counts={len(self._snapshot.token_counts)}\n"
+            f")"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 class GlobalContextLoader(_base.BaseContextLoader):
     """
     GlobalContextLoader is responsible for loading nodes, entities, and
@@ -385,6 +724,8 @@ class GlobalContextLoader(_base.BaseContextLoader):
         self,
         community_level: int,
         encoding_model: str,
+        compact_models: bool = False,
+        estimate_tokens: bool = False,
         **kwargs: typing.Any
     ) -> _builders.GlobalContextBuilder:
         """
@@ -398,6 +739,14 @@ class GlobalContextLoader(_base.BaseContextLoader):
         Args:
             community_level: The level of community data to include.
             encoding_model: The model used for token encoding.
+            compact_models:
+                Whether to repack the loaded entities and community reports
+                into compact column stores (see `_model.ModelStore`) to reduce
+                the memory held by the context builder.
+            estimate_tokens:
+                Whether to estimate the token counts of the context rows from
+                their length instead of encoding them. Faster, but the context
+                may over- or under-fill its token budgets.
             **kwargs:
                 Additional keyword arguments, can be prefixed with
                 'entities__' for `_utils.get_entities` and 'community_reports__'
@@ -407,11 +756,20 @@ class GlobalContextLoader(_base.BaseContextLoader):
         Returns:
             A GlobalContextBuilder instance ready for building global search contexts.
         """
+        community_reports_kwargs = _common_utils.filter_kwargs(
+            _utils.get_community_reports, kwargs, prefix="community_reports__"
+        )
         community_reports_list = _utils.get_community_reports(
             community_reports=self._community_reports,
             nodes=self._nodes,
             community_level=community_level,
-            **_common_utils.filter_kwargs(_utils.get_community_reports, kwargs, prefix="community_reports__")
+            **community_reports_kwargs
+        )
+        community_hierarchy = _utils.get_community_hierarchy(
+            community_reports=self._community_reports,
+            nodes=self._nodes,
+            reports=community_reports_list,
+            **_common_utils.filter_kwargs(_utils.get_community_hierarchy, community_reports_kwargs)
         )
         entities_list = _utils.get_entities(
             nodes=self._nodes,
@@ -419,10 +777,15 @@ class GlobalContextLoader(_base.BaseContextLoader):
             community_level=community_level,
             **_common_utils.filter_kwargs(_utils.get_entities, kwargs, prefix="entities__")
         )
+        if compact_models:
+            community_reports_list = _utils.compact(_model.CommunityReport, community_reports_list)
+            entities_list = _utils.compact(_model.Entity, entities_list)
         return _builders.GlobalContextBuilder(
             community_reports=community_reports_list,
             entities=entities_list,
             token_encoder=tiktoken.get_encoding(encoding_model),
+            estimate_tokens=estimate_tokens,
+            community_hierarchy=community_hierarchy,
         )
 
     @typing_extensions.override
@@ -438,3 +801,10 @@ class GlobalContextLoader(_base.BaseContextLoader):
     @typing_extensions.override
     def __repr__(self) -> str:
         return self.__str__()
+
+
+def _read_parquet(path: pathlib.Path, exclude: typing.List[str]) -> pd.DataFrame:
+    """Read a Parquet file without the `exclude` columns (those missing from the file are ignored)."""
+    if not exclude:
+        return pd.read_parquet(path)
+    return pd.read_parquet(path, columns=[name for name in pq.read_schema(path).names if name not in exclude])
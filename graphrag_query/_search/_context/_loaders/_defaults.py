@@ -40,5 +40,6 @@ COLUMN__COVARIATE__SHORT_ID: str = "human_readable_id"
 COLUMN__COVARIATE__ATTRIBUTES: typing.List[str] = ["object_id", "status", "start_date", "end_date", "description"]
 COLUMN__COVARIATE__TEXT_UNIT_IDS: typing.Optional[str] = None
 
+COLUMN__TEXT_UNIT__TEXT: str = "text"
 COLUMN__TEXT_UNIT__SHORT_ID: typing.Optional[str] = None
 COLUMN__TEXT_UNIT__COVARIATES: typing.Optional[str] = None
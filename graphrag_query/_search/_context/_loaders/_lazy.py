@@ -0,0 +1,194 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Lazily loaded text units and covariates.
+
+The text of the text units (and, to a lesser extent, the attributes of the
+covariates) is by far the largest part of an index, but a local query only
+renders the few rows referenced by its selected entities. Instead of reading
+these columns up front, the models are built without them and the columns are
+replaced by `_model.LazyColumn`s that read the rows they are asked for from the
+Parquet file, keeping only the row offsets of the row groups in memory.
+
+Parquet files can only be read a row group at a time, so the rows requested
+together are grouped by row group and each row group is read once, for the
+lazy columns only; files written with small row groups are cheaper to read
+from than files written as a single one. Compiled snapshots (see `_snapshot`)
+are read row by row instead.
+
+Classes:
+    ParquetRowReader: Reads rows of a Parquet file by position.
+
+Functions:
+    lazy_text_units: Replace the text of text units by a lazy column.
+    lazy_covariates: Replace the attributes of covariates by a lazy column.
+"""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import threading
+import typing
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import typing_extensions
+
+from . import _defaults
+from ... import _model
+from ..._input._loaders import _utils as _input_utils
+
+
+class ParquetRowReader:
+    """
+    Reads rows of a Parquet file by their position, for a fixed set of
+    columns, one row group at a time.
+
+    Attributes:
+        _file: The open Parquet file.
+        _columns: The columns read (those missing from the file are skipped).
+        _offsets:
+            The position of the first row of each row group, followed by the
+            number of rows of the file.
+        _lock: Serializes the reads of the file.
+    """
+    _file: pq.ParquetFile
+    _columns: typing.List[str]
+    _offsets: np.ndarray
+    _lock: threading.Lock
+
+    @property
+    def columns(self) -> typing.List[str]:
+        return self._columns
+
+    @property
+    def num_row_groups(self) -> int:
+        return self._offsets.__len__() - 1
+
+    def __init__(
+        self,
+        path: typing.Union[str, os.PathLike[str], pathlib.Path],
+        columns: typing.List[str],
+    ) -> None:
+        self._file = pq.ParquetFile(path)
+        names = set(self._file.schema_arrow.names)
+        self._columns = [column for column in columns if column in names]
+        metadata = self._file.metadata
+        self._offsets = np.cumsum(
+            [0] + [metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)],
+            dtype=np.int64,
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def read(self, rows: typing.Sequence[int]) -> pd.DataFrame:
+        """
+        Read rows by their position in the file, returned in the order given
+        (with a default index).
+        """
+        positions = np.asarray(rows, dtype=np.int64)
+        if positions.size > 0 and (positions.min() < 0 or positions.max() >= self.__len__()):
+            raise IndexError(f"Row positions out of range for {self.__len__()} rows")
+        row_groups = np.searchsorted(self._offsets, positions, side="right") - 1
+        order = np.argsort(row_groups, kind="stable")
+        tables: typing.List[pa.Table] = []
+        with self._lock:
+            for row_group in np.unique(row_groups):
+                selected = order[row_groups[order] == row_group]
+                table = self._file.read_row_group(int(row_group), columns=self._columns)
+                tables.append(table.take(pa.array(positions[selected] - self._offsets[row_group])))
+        if not tables:
+            return pd.DataFrame(columns=self._columns)
+        # the rows come out grouped by row group; put them back in the requested order
+        table = pa.concat_tables(tables).take(pa.array(np.argsort(order, kind="stable")))
+        return table.to_pandas()
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(rows={self.__len__()}, row_groups={self.num_row_groups}, "
+            f"columns={self._columns})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def lazy_text_units(
+    text_units: typing.List[_model.TextUnit],
+    path: typing.Union[str, os.PathLike[str], pathlib.Path],
+    *,
+    max_entries: int = 4096,
+) -> typing.List[_model.TextUnit]:
+    """
+    Pack text units into a `_model.ModelStore` whose text is read on demand
+    from the Parquet file they were read from.
+
+    Args:
+        text_units:
+            The text units, in the row order of the file, read without their
+            text.
+        path: The Parquet file of the text units.
+        max_entries: The maximum number of texts kept in memory.
+
+    Returns:
+        The views over the store rows.
+    """
+    reader = ParquetRowReader(path, [_defaults.COLUMN__TEXT_UNIT__TEXT])
+    _check_length(reader, text_units)
+
+    def _fetch(rows: typing.List[int]) -> typing.List[str]:
+        return _input_utils.to_str_column(reader.read(rows), _defaults.COLUMN__TEXT_UNIT__TEXT)
+
+    store = _model.ModelStore.from_models(_model.TextUnit, text_units)
+    return store.with_columns(text=_model.LazyColumn(_fetch, len(store), max_entries=max_entries)).views
+
+
+def lazy_covariates(
+    covariates: typing.List[_model.Covariate],
+    path: typing.Union[str, os.PathLike[str], pathlib.Path],
+    *,
+    attributes_cols: typing.Optional[typing.List[str]] = None,
+    max_entries: int = 4096,
+) -> typing.List[_model.Covariate]:
+    """
+    Pack covariates into a `_model.ModelStore` whose attributes are read on
+    demand from the Parquet file they were read from.
+
+    Args:
+        covariates:
+            The covariates, in the row order of the file, read without their
+            attribute columns.
+        path: The Parquet file of the covariates.
+        attributes_cols:
+            The attribute columns, as for `_utils.get_covariates`; defaults to
+            `_defaults.COLUMN__COVARIATE__ATTRIBUTES`.
+        max_entries: The maximum number of attribute dictionaries kept in memory.
+
+    Returns:
+        The views over the store rows.
+    """
+    attributes_cols = attributes_cols or _defaults.COLUMN__COVARIATE__ATTRIBUTES
+    reader = ParquetRowReader(path, attributes_cols)
+    _check_length(reader, covariates)
+
+    def _fetch(rows: typing.List[int]) -> typing.List[typing.Optional[typing.Dict[str, typing.Any]]]:
+        return _input_utils.to_attributes_column(reader.read(rows), attributes_cols)
+
+    store = _model.ModelStore.from_models(_model.Covariate, covariates)
+    return store.with_columns(attributes=_model.LazyColumn(_fetch, len(store), max_entries=max_entries)).views
+
+
+def _check_length(reader: ParquetRowReader, models: typing.List[typing.Any]) -> None:
+    if len(reader) != len(models):
+        raise ValueError(
+            f"Expected {len(models)} rows in the Parquet file, found {len(reader)}; "
+            f"the models must be read from every row of the file, in order"
+        )
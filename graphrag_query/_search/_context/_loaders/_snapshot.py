@@ -0,0 +1,388 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Compiled snapshots of an index.
+
+Loading an index from its Parquet files decompresses and decodes every table
+and runs the pandas merges that resolve the entities and community reports of
+a community level, on every start. A snapshot is the result of that work,
+written once as a directory of uncompressed Arrow IPC files (one per record
+type) that are memory-mapped when read: scalar fields are decoded into Python
+lists, but embeddings are fixed-size float32 lists that become NumPy matrices
+over the mapped pages without a copy. The snapshot also carries the token
+counts of the context rows computed while compiling, keyed by text digest.
+
+A snapshot can also be read lazily: the text of the text units and the
+attributes of the covariates are then not decoded up front, but read row by
+row from the mapped files when first used (see `_model.LazyColumn`).
+
+Functions:
+    is_snapshot: Whether a directory holds a snapshot.
+    write_snapshot: Write the resolved models of an index as a snapshot.
+    write_token_counts: Replace the token counts of a snapshot.
+    read_snapshot: Memory-map a snapshot.
+
+Classes:
+    SnapshotModels: The resolved models of an index.
+    Snapshot: A memory-mapped snapshot.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import pathlib
+import time
+import typing
+
+import numpy as np
+import pyarrow as pa
+import pydantic
+
+from . import _utils
+from ... import _model
+from ..._input._retrieval import _community_reports
+
+SNAPSHOT_VERSION: int = 1
+
+MANIFEST_FILE_NAME: str = "snapshot.json"
+TOKEN_COUNTS_FILE_NAME: str = "token_counts.arrow"
+
+_ENTITIES: str = "entities"
+_COMMUNITY_REPORTS: str = "community_reports"
+_TEXT_UNITS: str = "text_units"
+_RELATIONSHIPS: str = "relationships"
+_COVARIATES: str = "covariates"
+_COMMUNITY_HIERARCHY: str = "community_hierarchy"
+
+# the columns read on demand when reading lazily, per table
+_LAZY_COLUMNS: typing.Dict[str, typing.List[str]] = {
+    _TEXT_UNITS: ["text"],
+    _COVARIATES: ["attributes"],
+}
+
+# field metadata marking the columns stored as JSON text
+_ENCODING_KEY: bytes = b"graphrag.encoding"
+_ENCODING_JSON: bytes = b"json"
+
+_ARROW_TYPES: typing.Dict[typing.Any, pa.DataType] = {
+    str: pa.large_string(),
+    typing.Optional[str]: pa.large_string(),
+    int: pa.int64(),
+    typing.Optional[int]: pa.int64(),
+    float: pa.float64(),
+    typing.Optional[float]: pa.float64(),
+    typing.Optional[typing.List[str]]: pa.list_(pa.large_string()),
+}
+
+
+@dataclasses.dataclass
+class SnapshotModels:
+    """The models of an index resolved at one community level."""
+
+    entities: typing.List[_model.Entity]
+    community_reports: typing.List[_model.CommunityReport]
+    text_units: typing.List[_model.TextUnit]
+    relationships: typing.List[_model.Relationship]
+    covariates: typing.Dict[str, typing.List[_model.Covariate]]
+    community_hierarchy: typing.Optional[_community_reports.CommunityHierarchy] = None
+    """The community reports of every level, by parent community (if loaded)."""
+
+
+@dataclasses.dataclass
+class Snapshot:
+    """
+    A memory-mapped snapshot.
+
+    The models are the row views of `ModelStore`s whose embedding matrices are
+    read-only views of the mapped files (as are the lazy columns, if read
+    lazily).
+    """
+
+    models: SnapshotModels
+    community_level: int
+    encoding_model: str
+    token_counts: typing.Dict[bytes, int]
+    """The precomputed token counts of context rows, keyed by `text_digest`."""
+
+
+def is_snapshot(directory: typing.Union[str, os.PathLike[str], pathlib.Path]) -> bool:
+    """Whether a directory holds a snapshot written by `write_snapshot`."""
+    return (pathlib.Path(directory) / MANIFEST_FILE_NAME).is_file()
+
+
+def write_snapshot(
+    directory: typing.Union[str, os.PathLike[str], pathlib.Path],
+    models: SnapshotModels,
+    *,
+    community_level: int,
+    encoding_model: str,
+    token_counts: typing.Optional[typing.Mapping[bytes, int]] = None,
+) -> pathlib.Path:
+    """
+    Write the resolved models of an index as a snapshot.
+
+    The manifest is written last, so a directory whose writing was interrupted
+    is not taken for a snapshot. Dictionary attributes (and any field whose
+    values do not fit its declared type) are stored as JSON; attribute values
+    that are not JSON types are stored as their string form. The reports of
+    the community hierarchy that are not reports of the community level are
+    stored in a table of their own, and the parents in the manifest.
+
+    Args:
+        directory: The directory to write to, created if missing.
+        models: The models to write.
+        community_level: The community level the models were resolved at.
+        encoding_model: The encoding the token counts were computed with.
+        token_counts: Token counts keyed by `text_digest`, if any.
+
+    Returns:
+        The path of the manifest.
+    """
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest_path = directory / MANIFEST_FILE_NAME
+    manifest_path.unlink(missing_ok=True)
+
+    tables: typing.Dict[str, typing.Tuple[typing.Type[pydantic.BaseModel], typing.Sequence[typing.Any]]] = {
+        _ENTITIES: (_model.Entity, models.entities),
+        _COMMUNITY_REPORTS: (_model.CommunityReport, models.community_reports),
+        _TEXT_UNITS: (_model.TextUnit, models.text_units),
+        _RELATIONSHIPS: (_model.Relationship, models.relationships),
+        **{
+            f"{_COVARIATES}.{name}": (_model.Covariate, covariates)
+            for name, covariates in models.covariates.items()
+        },
+    }
+    if models.community_hierarchy is not None:
+        resolved = {report.community_id for report in models.community_reports}
+        tables[_COMMUNITY_HIERARCHY] = (_model.CommunityReport, [
+            report for report in models.community_hierarchy.reports if report.community_id not in resolved
+        ])
+    files: typing.Dict[str, str] = {}
+    for name, (model_type, records) in tables.items():
+        files[name] = f"{name}.arrow"
+        _write_table(directory / files[name], _to_table(model_type, records))
+
+    write_token_counts(directory, token_counts or {})
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created": int(time.time()),
+        "community_level": community_level,
+        "encoding_model": encoding_model,
+        "tables": files,
+        "token_counts": TOKEN_COUNTS_FILE_NAME,
+    }
+    if models.community_hierarchy is not None:
+        manifest["community_parents"] = models.community_hierarchy.parents
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest_path
+
+
+def write_token_counts(
+    directory: typing.Union[str, os.PathLike[str], pathlib.Path],
+    token_counts: typing.Mapping[bytes, int],
+) -> None:
+    """Replace the token counts of a snapshot with counts keyed by `text_digest`."""
+    digests = list(token_counts.items())
+    _write_table(pathlib.Path(directory) / TOKEN_COUNTS_FILE_NAME, pa.table({
+        "digest": pa.array([digest for digest, _ in digests], type=pa.binary(16)),
+        "tokens": pa.array([count for _, count in digests], type=pa.int32()),
+    }))
+
+
+def read_snapshot(
+    directory: typing.Union[str, os.PathLike[str], pathlib.Path],
+    *,
+    lazy: bool = False,
+    lazy_max_entries: int = 4096,
+) -> Snapshot:
+    """
+    Memory-map a snapshot written by `write_snapshot`.
+
+    Args:
+        directory: The directory of the snapshot.
+        lazy:
+            Whether to read the text of the text units and the attributes of
+            the covariates on demand rather than up front.
+        lazy_max_entries:
+            In lazy mode, the maximum number of values kept in memory per lazy
+            column.
+
+    Raises:
+        FileNotFoundError: If the directory does not hold a snapshot.
+        ValueError: If the snapshot was written by an unsupported version.
+    """
+    directory = pathlib.Path(directory)
+    manifest_path = directory / MANIFEST_FILE_NAME
+    if not manifest_path.is_file():
+        raise FileNotFoundError(f"Snapshot manifest not found: {manifest_path}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot version {manifest.get('version')} (expected {SNAPSHOT_VERSION}), "
+            f"compile the index again: {directory}"
+        )
+
+    files: typing.Dict[str, str] = manifest["tables"]
+    covariate_prefix = f"{_COVARIATES}."
+
+    def _read(model_type: typing.Type[pydantic.BaseModel], name: str, file: str) -> typing.List[typing.Any]:
+        return _to_models(
+            model_type,
+            _read_table(directory / file),
+            lazy_columns=_LAZY_COLUMNS.get(name, []) if lazy else [],
+            lazy_max_entries=lazy_max_entries,
+        )
+
+    models = SnapshotModels(
+        entities=_read(_model.Entity, _ENTITIES, files[_ENTITIES]),
+        community_reports=_read(_model.CommunityReport, _COMMUNITY_REPORTS, files[_COMMUNITY_REPORTS]),
+        text_units=_read(_model.TextUnit, _TEXT_UNITS, files[_TEXT_UNITS]),
+        relationships=_read(_model.Relationship, _RELATIONSHIPS, files[_RELATIONSHIPS]),
+        covariates={
+            name[covariate_prefix.__len__():]: _read(_model.Covariate, _COVARIATES, file)
+            for name, file in files.items() if name.startswith(covariate_prefix)
+        },
+    )
+    if _COMMUNITY_HIERARCHY in files:
+        models.community_hierarchy = _community_reports.CommunityHierarchy(
+            [
+                *models.community_reports,
+                *_read(_model.CommunityReport, _COMMUNITY_HIERARCHY, files[_COMMUNITY_HIERARCHY]),
+            ],
+            manifest.get("community_parents", {}),
+        )
+    token_counts = _read_table(directory / manifest["token_counts"])
+    return Snapshot(
+        models=models,
+        community_level=manifest["community_level"],
+        encoding_model=manifest["encoding_model"],
+        token_counts=dict(zip(
+            token_counts.column("digest").to_pylist(),
+            token_counts.column("tokens").to_pylist(),
+        )),
+    )
+
+
+def _write_table(path: pathlib.Path, table: pa.Table) -> None:
+    # uncompressed and in a single record batch, so every column maps to one contiguous buffer
+    options = pa.ipc.IpcWriteOptions(compression=None)
+    partial = path.with_name(f"{path.name}.partial")
+    with pa.OSFile(str(partial), "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table.combine_chunks(), max_chunksize=max(table.num_rows, 1))
+    # replaced rather than overwritten: processes that have the previous file mapped keep reading it
+    os.replace(partial, path)
+
+
+def _read_table(path: pathlib.Path) -> pa.Table:
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _to_table(model_type: typing.Type[pydantic.BaseModel], records: typing.List[typing.Any]) -> pa.Table:
+    store = _utils.model_store_of(records)
+    if store is None or store.model_type is not model_type:
+        store = _model.ModelStore.from_models(model_type, records)
+    fields: typing.List[pa.Field] = []
+    arrays: typing.List[pa.Array] = []
+    for name, field in model_type.model_fields.items():
+        if name in store.embedding_fields:
+            fields.append(pa.field(name, _embedding_type(store.embeddings(name))))
+            arrays.append(_embedding_array(store.embeddings(name)))
+            continue
+        # a list copy, so that lazy columns are read in one batch
+        values = list(store.column(name))
+        arrow_type = _ARROW_TYPES.get(field.annotation)
+        if arrow_type is not None:
+            try:
+                arrays.append(pa.array(values, type=arrow_type))
+                fields.append(pa.field(name, arrow_type))
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        arrays.append(pa.array(
+            [None if value is None else json.dumps(value, default=_json_default) for value in values],
+            type=pa.large_string(),
+        ))
+        fields.append(pa.field(name, pa.large_string(), metadata={_ENCODING_KEY: _ENCODING_JSON}))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _to_models(
+    model_type: typing.Type[pydantic.BaseModel],
+    table: pa.Table,
+    *,
+    lazy_columns: typing.List[str],
+    lazy_max_entries: int,
+) -> typing.List[typing.Any]:
+    columns: typing.Dict[str, typing.Union[typing.List[typing.Any], _model.LazyColumn]] = {}
+    embeddings: typing.Dict[str, _model.EmbeddingMatrix] = {}
+    for field in table.schema:
+        column = table.column(field.name)
+        is_json = bool(field.metadata and field.metadata.get(_ENCODING_KEY) == _ENCODING_JSON)
+        if pa.types.is_fixed_size_list(field.type) or pa.types.is_null(field.type):
+            embeddings[field.name] = _embedding_matrix(column)
+        elif field.name in lazy_columns:
+            columns[field.name] = _model.LazyColumn(
+                _lazy_fetch(column, is_json), column.__len__(), max_entries=lazy_max_entries
+            )
+        else:
+            columns[field.name] = _decode(column.to_pylist(), is_json)
+    return _model.ModelStore(model_type, columns, embeddings).views
+
+
+def _decode(values: typing.List[typing.Any], is_json: bool) -> typing.List[typing.Any]:
+    return [None if value is None else json.loads(value) for value in values] if is_json else values
+
+
+def _lazy_fetch(
+    column: pa.ChunkedArray, is_json: bool
+) -> typing.Callable[[typing.List[int]], typing.List[typing.Any]]:
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+    def _fetch(rows: typing.List[int]) -> typing.List[typing.Any]:
+        # `take` copies only the selected values out of the mapped buffers
+        return _decode(array.take(pa.array(rows, type=pa.int64())).to_pylist(), is_json)
+
+    return _fetch
+
+
+def _embedding_type(embeddings: _model.EmbeddingMatrix) -> pa.DataType:
+    return pa.list_(pa.float32(), embeddings.dimensions) if embeddings.dimensions > 0 else pa.null()
+
+
+def _embedding_array(embeddings: _model.EmbeddingMatrix) -> pa.Array:
+    if embeddings.dimensions == 0:
+        return pa.nulls(embeddings.__len__())
+    values = pa.array(np.ascontiguousarray(embeddings.matrix, dtype=np.float32).reshape(-1))
+    return pa.FixedSizeListArray.from_arrays(
+        values,
+        embeddings.dimensions,
+        mask=None if embeddings.present.all() else pa.array(~embeddings.present),
+    )
+
+
+def _embedding_matrix(column: pa.ChunkedArray) -> _model.EmbeddingMatrix:
+    if pa.types.is_null(column.type):
+        return _model.EmbeddingMatrix(
+            np.zeros((column.__len__(), 0), dtype=np.float32), np.zeros(column.__len__(), dtype=bool)
+        )
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    dimensions = array.type.list_size
+    # the child array holds every slot (rows without an embedding are zero), so it maps to a dense matrix
+    values = array.values.slice(array.offset * dimensions, array.__len__() * dimensions)
+    matrix = values.to_numpy(zero_copy_only=True).reshape(array.__len__(), dimensions)
+    present = array.is_valid().to_numpy(zero_copy_only=False)
+    return _model.EmbeddingMatrix(matrix, present)
+
+
+def _json_default(value: typing.Any) -> typing.Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
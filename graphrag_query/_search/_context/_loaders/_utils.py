@@ -11,22 +11,34 @@ Functions:
         frames.
     get_community_reports:
         Fetch and process community report data based on community levels.
+    get_community_hierarchy:
+        Index the community reports of every level by their parent community.
     get_relationships: Fetch and process relationship data from a DataFrame.
     get_covariates: Fetch and process covariate data from a DataFrame.
     get_text_units: Fetch and process text unit data from a DataFrame.
-    get_store: Store entity embeddings into a LanceDBVectorStore.
+    get_store: Store entity embeddings into a vector store.
+    compact: Repack a list of models into a compact ModelStore.
+    model_store_of: The store a list of models are the views of, if any.
 """
 
 from __future__ import annotations
 
 import typing
 
+import numpy as np
 import pandas as pd
 
 from . import _defaults
 from ... import _model
 from ..._input._loaders import _dfs
-from ...._vector_stores import LanceDBVectorStore
+from ..._input._retrieval import _community_reports
+from ...._vector_stores import (
+    BaseVectorStore,
+    LanceDBVectorStore,
+    NumpyVectorStore,
+)
+
+_Model_T = typing.TypeVar("_Model_T", bound=_model.Identified)
 
 
 def get_entities(
@@ -175,6 +187,65 @@ def get_community_reports(
     )
 
 
+def get_community_hierarchy(
+    community_reports: pd.DataFrame,
+    nodes: pd.DataFrame,
+    *,
+    reports: typing.Optional[typing.List[_model.CommunityReport]] = None,
+    id_col: typing.Optional[str] = None,
+    short_id_col: typing.Optional[str] = None,
+    summary_embedding_col: typing.Optional[str] = None,
+    content_embedding_col: typing.Optional[str] = None,
+) -> _community_reports.CommunityHierarchy:
+    """
+    Index the community reports of every level by their parent community.
+
+    The parent of a community is read from the nodes: a node belongs to one
+    community per level, so the community of a node at a level is the parent
+    of its community at the next level.
+
+    Args:
+        community_reports: DataFrame containing community report data.
+        nodes: DataFrame containing the graph's node data.
+        reports:
+            Community reports already read (e.g. by `get_community_reports`),
+            reused instead of reading their rows again.
+        id_col: Column name for the community report ID.
+        short_id_col: Column name for the community report's short ID.
+        summary_embedding_col: Column name for the summary embeddings.
+        content_embedding_col: Column name for the content embeddings.
+
+    Returns:
+        The community hierarchy.
+    """
+    # One row per node and level; the communities of consecutive levels of a
+    # node are a child and its parent
+    nodes_ = nodes.loc[nodes['community'].notna(), ['title', 'level', 'community']].copy()
+    nodes_['community'] = nodes_['community'].astype(int).astype(str)
+    nodes_ = nodes_[nodes_['community'] != '-1']
+    parents_ = nodes_.assign(level=nodes_['level'] + 1).rename(columns={'community': 'parent'})
+    links = nodes_.merge(parents_, on=['title', 'level'], how='inner')[['community', 'parent']]
+    links = links[links['community'] != links['parent']].drop_duplicates(subset=['community'])
+
+    known = {report.community_id: report for report in reports or []}
+    community_reports_ = community_reports[
+        ~community_reports['community'].astype(str).isin(known.keys())
+    ]
+    return _community_reports.CommunityHierarchy(
+        [
+            *known.values(),
+            *_dfs.read_community_reports(
+                community_reports_,
+                id_col=id_col or _defaults.COLUMN__COMMUNITY_REPORT__ID,
+                short_id_col=short_id_col or _defaults.COLUMN__COMMUNITY_REPORT__SHORT_ID,
+                summary_embedding_col=summary_embedding_col or _defaults.COLUMN__COMMUNITY_REPORT__SUMMARY_EMBEDDING,
+                content_embedding_col=content_embedding_col or _defaults.COLUMN__COMMUNITY_REPORT__CONTENT_EMBEDDING,
+            ),
+        ],
+        dict(zip(links['community'], links['parent'])),
+    )
+
+
 def get_relationships(
     relationships: pd.DataFrame,
     *,
@@ -262,22 +333,117 @@ def get_text_units(
     )
 
 
-def get_store(entities: typing.List[_model.Entity], coll_name: str, uri: str) -> LanceDBVectorStore:
+def get_store(
+    entities: typing.List[_model.Entity],
+    coll_name: str,
+    uri: str,
+    *,
+    backend: typing.Literal["lancedb", "numpy"] = "lancedb",
+    versioned: bool = True,
+    index_min_rows: typing.Optional[int] = 100_000,
+    index_type: str = "IVF_PQ",
+    nprobes: typing.Optional[int] = None,
+    refine_factor: typing.Optional[int] = None,
+) -> BaseVectorStore:
     """
-    Store entity embeddings into a LanceDBVectorStore and return the store.
+    Store entity embeddings into a vector store and return the store.
 
     Args:
         entities:
             A list of processed Entity objects whose embeddings will be stored.
         coll_name: The name of the collection in the vector store.
         uri: The URI of the LanceDB vector store.
+        backend:
+            The vector store to use: "lancedb" for a `LanceDBVectorStore` at
+            `uri`, or "numpy" for an in-process `NumpyVectorStore` doing exact
+            search (nothing is written to `uri`; the LanceDB options below are
+            ignored).
+        versioned:
+            Whether to store the embeddings in a table versioned by their
+            content, which is written once and reused by later runs (and other
+            processes) as long as the entities do not change. Otherwise the
+            `coll_name` table is overwritten.
+        index_min_rows:
+            The number of entities from which an approximate nearest neighbor
+            index is built over a versioned table, or None to never build one.
+        index_type: The LanceDB index type of the approximate index.
+        nprobes:
+            The number of index partitions probed by approximate searches.
+        refine_factor:
+            The factor of extra candidates re-ranked with the exact vectors by
+            approximate searches.
 
     Returns:
-        A LanceDBVectorStore object.
+        A LanceDBVectorStore or NumpyVectorStore object.
     """
+    if backend == "numpy":
+        numpy_store = NumpyVectorStore(collection_name=coll_name)
+        model_store = model_store_of(entities)
+        if model_store is not None and "description_embedding" in model_store.embedding_fields:
+            # compact entities: load the embedding matrix as is instead of one list of floats per entity
+            embeddings = model_store.embeddings("description_embedding")
+            rows = np.flatnonzero(embeddings.present)
+            selected = [entities[row] for row in rows.tolist()]
+            numpy_store.load_matrix(
+                ids=[entity.id for entity in selected],
+                texts=[entity.description for entity in selected],
+                attributes=[
+                    {"title": entity.title, **entity.attributes} if entity.attributes else {"title": entity.title}
+                    for entity in selected
+                ],
+                matrix=embeddings.matrix if rows.shape[0] == entities.__len__() else embeddings.matrix[rows],
+            )
+        else:
+            _dfs.store_entity_semantic_embeddings(entities=entities, vectorstore=numpy_store)
+        return numpy_store
+    if backend != "lancedb":
+        raise ValueError(f"Unknown vector store backend: {backend}")
     store = LanceDBVectorStore(
         collection_name=coll_name,
         uri=uri,
+        nprobes=nprobes,
+        refine_factor=refine_factor,
     )
-    _dfs.store_entity_semantic_embeddings(entities=entities, vectorstore=store)
+    if versioned:
+        store.load_documents_versioned(
+            _dfs.entity_semantic_documents(entities),
+            index_min_rows=index_min_rows,
+            index_type=index_type,
+        )
+    else:
+        _dfs.store_entity_semantic_embeddings(entities=entities, vectorstore=store)
     return store
+
+
+def model_store_of(models: typing.List[_Model_T]) -> typing.Optional[_model.ModelStore]:
+    """Return the store whose rows `models` are (in row order), if `models` is the view list of a store."""
+    if models and isinstance(models[0], _model.ModelView) and models is models[0].store.views:
+        return models[0].store
+    return None
+
+
+def compact(
+    model_type: typing.Type[_Model_T],
+    models: typing.List[_Model_T],
+) -> typing.List[_Model_T]:
+    """
+    Repack models into a `ModelStore` and return its row views.
+
+    The views expose the same attributes as the models, but scalar fields are
+    stored column-wise and embeddings in one float32 matrix per field, which
+    takes a fraction of the memory of the pydantic models.
+
+    Models that are already the views of a store (e.g. lazily loaded ones,
+    whose lazy columns repacking would read in full) are returned as is.
+
+    Args:
+        model_type: The type of the models.
+        models: The models to repack.
+
+    Returns:
+        The views over the store rows, in the order of `models`.
+    """
+    store = model_store_of(models)
+    if store is not None and store.model_type is model_type:
+        return models
+    return _model.ModelStore.from_models(model_type, models).views
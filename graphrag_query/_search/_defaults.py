@@ -15,7 +15,16 @@ __all__ = [
     "DEFAULT__LOCAL_SEARCH__COMMUNITY_LEVEL",
     "DEFAULT__GLOBAL_SEARCH__COMMUNITY_LEVEL",
     "DEFAULT__GLOBAL_SEARCH__DATA_MAX_TOKENS",
+    "DEFAULT__GLOBAL_SEARCH__DRILL_DOWN_THRESHOLD",
+    "DEFAULT__GLOBAL_SEARCH__FILL_THRESHOLD",
     "DEFAULT__CONCURRENT_COROUTINES",
+    "DEFAULT__CONCURRENT_THREADS",
+    "DEFAULT__EMBEDDING__MAX_BATCH_SIZE",
+    "DEFAULT__EMBEDDING__MAX_BATCH_TOKENS",
+    "DEFAULT__EMBEDDING_CACHE__MAX_ENTRIES",
+    "DEFAULT__EMBEDDING_CACHE__PATH",
+    "DEFAULT__MAP_CACHE__MAX_ENTRIES",
+    "DEFAULT__MAP_CACHE__PATH",
 ]
 
 GLOBAL_SEARCH__MAP__SYS_PROMPT = """
@@ -288,5 +297,15 @@ DEFAULT__VECTOR_STORE__URI: str = "./lancedb"
 DEFAULT__LOCAL_SEARCH__COMMUNITY_LEVEL: int = 2
 DEFAULT__GLOBAL_SEARCH__COMMUNITY_LEVEL: int = 2
 DEFAULT__GLOBAL_SEARCH__DATA_MAX_TOKENS: int = 8000
+DEFAULT__GLOBAL_SEARCH__DRILL_DOWN_THRESHOLD: int = 50
+DEFAULT__GLOBAL_SEARCH__FILL_THRESHOLD: int = 50
 
 DEFAULT__CONCURRENT_COROUTINES: int = 16
+DEFAULT__CONCURRENT_THREADS: int = 16
+
+DEFAULT__EMBEDDING__MAX_BATCH_SIZE: int = 64
+DEFAULT__EMBEDDING__MAX_BATCH_TOKENS: int = 100_000
+DEFAULT__EMBEDDING_CACHE__MAX_ENTRIES: int = 4096
+DEFAULT__EMBEDDING_CACHE__PATH: str = "./cache/embeddings.sqlite"
+DEFAULT__MAP_CACHE__MAX_ENTRIES: int = 16384
+DEFAULT__MAP_CACHE__PATH: str = "./cache/map_results.sqlite"
@@ -15,6 +15,10 @@ from ._local import (
     AsyncLocalSearchEngine,
     LocalSearchEngine,
 )
+from ._map_cache import (
+    MapResultCache,
+    map_cache_key,
+)
 
 __all__ = [
     "QueryEngine",
@@ -23,4 +27,6 @@ __all__ = [
     "AsyncLocalSearchEngine",
     "GlobalSearchEngine",
     "AsyncGlobalSearchEngine",
+    "MapResultCache",
+    "map_cache_key",
 ]
@@ -370,7 +370,7 @@ class AsyncQueryEngine(abc.ABC):
         _logger: Optional logger for logging internal engine events.
     """
     _chat_llm: _llm.BaseAsyncChatLLM
-    _embedding: _llm.BaseEmbedding
+    _embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding]
     _context_builder: _context.BaseContextBuilder
     _logger: typing.Optional[Logger]
 
@@ -414,7 +414,7 @@ class AsyncQueryEngine(abc.ABC):
         self,
         *,
         chat_llm: _llm.BaseAsyncChatLLM,
-        embedding: _llm.BaseEmbedding,
+        embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
         context_builder: _context.BaseContextBuilder,
         logger: typing.Optional[Logger] = None,
     ):
@@ -650,7 +650,10 @@ class AsyncQueryEngine(abc.ABC):
 
     async def aclose(self) -> None:
         await self._chat_llm.aclose()
-        self._embedding.close()
+        if isinstance(self._embedding, _llm.BaseAsyncEmbedding):
+            await self._embedding.aclose()
+        else:
+            self._embedding.close()
 
     @typing_extensions.override
     def __str__(self) -> str:
@@ -4,22 +4,30 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import math
+import re
 import time
 import typing
 import warnings
 
 import jinja2
 import openai
+import pandas as pd
 import tiktoken
 import typing_extensions
 
-from . import _base_engine
+from . import (
+    _base_engine,
+    _map_cache,
+)
 from .. import (
     _context,
     _defaults,
     _llm,
     _types,
 )
+from .._input._retrieval import _community_reports
 from ... import (
     _utils,
     errors as _errors,
@@ -70,6 +78,37 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         _data_max_tokens:
             The maximum number of tokens allowed for input context during the
             map phase.
+        _max_map_calls:
+            The default maximum number of map calls of a search, spent on the
+            community reports most relevant to the query (see
+            `GlobalContextBuilder.build_context`), or None to map over every
+            report. In hierarchical mode, the budget of the drill-down.
+        _hierarchical:
+            Whether searches drill down the community hierarchy by default:
+            the top-level community reports are mapped first, then only the
+            children of the communities whose key points score at least
+            `_drill_down_threshold`, level by level, until the map call and
+            token budgets are spent.
+        _drill_down_threshold:
+            The minimum score of a key point for the drill-down to expand the
+            communities it comes from.
+        _max_map_tokens:
+            The default maximum number of context tokens sent to the map phase
+            by a drill-down, or None for no limit.
+        _map_cache:
+            An optional persistent cache of the key points of map calls, keyed
+            by batch, normalized query, map prompt, model and request options;
+            only the batches it misses are sent to the LLM.
+        _multi_stage_reduce:
+            Whether searches reduce in stages by default when the key points
+            of the map phase exceed `_data_max_tokens`: the key points are
+            grouped into chunks of at most `_data_max_tokens` tokens, each
+            chunk is reduced to an intermediate answer concurrently, and the
+            answers are reduced again, as many times as needed for them to fit
+            in a single reduce call.
+        _executor:
+            The thread pool that runs the map phase, bounding the number of
+            concurrent map calls across all searches of this engine.
     """
     _chat_llm: _llm.BaseChatLLM
     _embedding: _llm.BaseEmbedding
@@ -83,6 +122,13 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
     _no_data_answer: str
     _json_mode: bool
     _data_max_tokens: int
+    _max_map_calls: typing.Optional[int]
+    _hierarchical: bool
+    _drill_down_threshold: int
+    _max_map_tokens: typing.Optional[int]
+    _map_cache: typing.Optional[_map_cache.MapResultCache]
+    _multi_stage_reduce: bool
+    _executor: concurrent.futures.ThreadPoolExecutor
 
     @typing_extensions.override
     @property
@@ -100,6 +146,10 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         self._chat_llm.close()
         self._chat_llm = value
 
+    @property
+    def map_cache(self) -> typing.Optional[_map_cache.MapResultCache]:
+        return self._map_cache
+
     def __init__(
         self,
         *,
@@ -118,6 +168,13 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         json_mode: typing.Optional[bool] = None,
         max_data_tokens: typing.Optional[int] = None,
         encoding_model: typing.Optional[str] = None,
+        concurrent_threads: typing.Optional[int] = None,
+        max_map_calls: typing.Optional[int] = None,
+        hierarchical: typing.Optional[bool] = None,
+        drill_down_threshold: typing.Optional[int] = None,
+        max_map_tokens: typing.Optional[int] = None,
+        map_cache: typing.Optional[_map_cache.MapResultCache] = None,
+        multi_stage_reduce: typing.Optional[bool] = None,
 
         logger: typing.Optional[_base_engine.Logger] = None,
         **kwargs: typing.Any,
@@ -164,6 +221,19 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         self._no_data_answer = no_data_answer or _defaults.GLOBAL_SEARCH__REDUCE__NO_DATA_ANSWER
         self._json_mode = json_mode if json_mode is not None else True
         self._data_max_tokens = max_data_tokens or _defaults.DEFAULT__GLOBAL_SEARCH__DATA_MAX_TOKENS
+        self._max_map_calls = max_map_calls
+        self._hierarchical = hierarchical if hierarchical is not None else False
+        self._drill_down_threshold = (
+            drill_down_threshold if drill_down_threshold is not None
+            else _defaults.DEFAULT__GLOBAL_SEARCH__DRILL_DOWN_THRESHOLD
+        )
+        self._max_map_tokens = max_map_tokens
+        self._map_cache = map_cache
+        self._multi_stage_reduce = multi_stage_reduce if multi_stage_reduce is not None else False
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrent_threads or _defaults.DEFAULT__CONCURRENT_THREADS,
+            thread_name_prefix="graphrag-global-map",
+        )
 
     @typing_extensions.override
     def search(
@@ -218,7 +288,14 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
                 Additional keyword arguments, can be prefixed with 'map__' for
                 `self._map` or 'reduce__' for `self._reduce` or not prefixed for
                 `GlobalContextBuilder.build_context`. See details in the
-                specific method documentation and source code.
+                specific method documentation and source code. A
+                `max_map_calls` keyword argument overrides the engine's map
+                call budget for this search; when a budget is set, the query is
+                embedded to select the most relevant community reports.
+                `hierarchical`, `drill_down_threshold` and `max_map_tokens`
+                keyword arguments override the engine's drill-down settings
+                (see `_drill_down`), and a `multi_stage_reduce` keyword
+                argument the engine's reduce mode.
 
         Returns:
             A search result object or a stream of search result chunks,
@@ -234,20 +311,39 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         elif isinstance(conversation_history, list):
             conversation_history = _context.ConversationHistory.from_list(conversation_history)
 
-        context_chunks, context_records = self._context_builder.build_context(
-            conversation_history=conversation_history,
-            **kwargs,
-        )
-        # TODO: Parallelize the map phase
-        map_result = [self._map(
-            query=query,
-            context=context,
-            verbose=verbose,
-            map_sys_prompt=map_sys_prompt,
-            chat_llm=chat_llm,
-            json_mode=self._json_mode,
-            **kwargs
-        ) for context in context_chunks]
+        max_map_calls = kwargs.pop("max_map_calls", self._max_map_calls)
+        hierarchical = kwargs.pop("hierarchical", self._hierarchical)
+        drill_down_threshold = kwargs.pop("drill_down_threshold", self._drill_down_threshold)
+        max_map_tokens = kwargs.pop("max_map_tokens", self._max_map_tokens)
+        multi_stage_reduce = kwargs.pop("multi_stage_reduce", self._multi_stage_reduce)
+        if hierarchical:
+            map_result = self._drill_down(
+                query=query,
+                conversation_history=conversation_history,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                max_map_calls=max_map_calls,
+                max_map_tokens=max_map_tokens,
+                drill_down_threshold=drill_down_threshold,
+                **kwargs
+            )
+        else:
+            if max_map_calls is not None and kwargs.get("query_embedding") is None:
+                kwargs["query_embedding"] = self._embedding.embed(query)
+            context_chunks, context_records = self._context_builder.build_context(
+                conversation_history=conversation_history,
+                max_map_calls=max_map_calls,
+                **kwargs,
+            )
+            map_result = self._map_all(
+                query=query,
+                contexts=context_chunks,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                **kwargs
+            )
         return self._reduce(
             map_results=map_result,
             query=query,
@@ -256,9 +352,92 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
             reduce_sys_prompt=reduce_sys_prompt,
             general_knowledge_sys_prompt=general_knowledge_sys_prompt,
             chat_llm=chat_llm,
+            multi_stage=multi_stage_reduce,
             **kwargs
         )
 
+    def _map_all(
+        self,
+        *,
+        query: str,
+        contexts: typing.List[str],
+        verbose: bool,
+        map_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseChatLLM,
+        **kwargs: typing.Any,
+    ) -> typing.List[_types.SearchResult_T]:
+        """Runs the map phase over contexts on the engine's thread pool, returning the results in order."""
+        map_futures = [self._executor.submit(
+            self._map,
+            query=query,
+            context=context,
+            verbose=verbose,
+            map_sys_prompt=map_sys_prompt,
+            chat_llm=chat_llm,
+            json_mode=self._json_mode,
+            **kwargs
+        ) for context in contexts]
+        try:
+            # collect in submission order, so the results line up with the
+            # contexts and the first failing context's error is raised
+            return [future.result() for future in map_futures]
+        except BaseException:
+            for future in map_futures:
+                future.cancel()
+            raise
+
+    def _drill_down(
+        self,
+        *,
+        query: str,
+        conversation_history: _context.ConversationHistory,
+        verbose: bool,
+        map_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseChatLLM,
+        max_map_calls: typing.Optional[int],
+        max_map_tokens: typing.Optional[int],
+        drill_down_threshold: int,
+        **kwargs: typing.Any,
+    ) -> typing.List[_types.SearchResult_T]:
+        """
+        Runs the map phase down the community hierarchy.
+
+        The reports of the top-level communities are mapped first. The key
+        points scoring at least `drill_down_threshold` select the communities
+        to expand: those the points cite (as "[Data: Reports (ids)]"), or
+        every community of their batch if they cite none. The children of the
+        selected communities, most relevant first, are mapped next, and so on
+        level by level, until no community is selected or the map call or
+        context token budget is spent.
+
+        Returns:
+            The results of the map calls, level by level.
+
+        Raises:
+            ValueError: If the context builder has no community hierarchy.
+        """
+        drill_down = _DrillDown(
+            self._context_builder,
+            conversation_history=conversation_history,
+            max_map_calls=max_map_calls,
+            max_map_tokens=max_map_tokens,
+            threshold=drill_down_threshold,
+            token_encoder=self._token_encoder,
+            logger=self._logger,
+            **kwargs
+        )
+        while drill_down.contexts:
+            results = self._map_all(
+                query=query,
+                contexts=drill_down.contexts,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                **kwargs
+            )
+            drill_down.advance(dict(enumerate(results)))
+        return drill_down.map_results
+
     def _map(
         self,
         *,
@@ -305,7 +484,23 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         if self._logger:
             self._logger.info(f"Starting map for query: {query} at {created}")
 
-        prompt = jinja2.Template(map_sys_prompt or self._map_sys_prompt).render(context_data=context, query=query)
+        map_sys_prompt = map_sys_prompt or self._map_sys_prompt
+        chat_kwargs = _utils.filter_kwargs(chat_llm.chat, kwargs, prefix='map__')
+        # JSON mode changes the response (and whether it parses), so it is part of the key
+        cache_key = _map_cache.map_cache_key(
+            model=chat_llm.model, context=context, query=query, map_sys_prompt=map_sys_prompt, json_mode=json_mode,
+            **chat_kwargs
+        ) if self._map_cache is not None else None
+        if cache_key is not None:
+            points = self._map_cache.get(cache_key)
+            if points is not None:
+                if self._logger:
+                    self._logger.info(f"Map result served from the cache: {cache_key}")
+                return _cached_map_result(
+                    points, model=chat_llm.model, context=context, created=created, verbose=verbose
+                )
+
+        prompt = jinja2.Template(map_sys_prompt).render(context_data=context, query=query)
         msg = [{"role": "system", "content": prompt}, {"role": "user", "content": query}]
         if self._logger:
             self._logger.debug(f"Constructed messages: {msg}")
@@ -315,10 +510,12 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
                 msg=typing.cast(_llm.MessageParam_T, msg),
                 stream=False,
                 response_format={"type": "json_object"} if json_mode else openai.NOT_GIVEN,
-                **_utils.filter_kwargs(chat_llm.chat, kwargs, prefix='map__')
+                **chat_kwargs
             )
         )
         result = self._parse_map(response)
+        if cache_key is not None and _is_cacheable(response, result):
+            self._map_cache.set(cache_key, result)
 
         usage = _types.Usage(
             completion_tokens=response.usage.completion_tokens,
@@ -390,6 +587,7 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         reduce_sys_prompt: typing.Optional[str] = None,
         general_knowledge_sys_prompt: typing.Optional[str] = None,
         chat_llm: _llm.BaseChatLLM = None,
+        multi_stage: bool = False,
 
         **kwargs: typing.Any
     ) -> typing.Union[_types.SearchResult_T, _types.StreamSearchResult_T]:
@@ -422,6 +620,9 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
             chat_llm:
                 A temporary chat language model to override the default chat
                 language model for this search.
+            multi_stage:
+                If True, key points exceeding the data token limit are reduced
+                in stages (see `_reduce_stages`) instead of being truncated.
             **kwargs:
                 Additional keyword arguments. Should be prefixed with 'reduce__'
                 for `ChatLLM.chat` method. See details in the specific method
@@ -435,22 +636,11 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         if self._logger:
             self._logger.info(f"Starting reduce for query: {query} at {created}")
 
-        key_points: typing.List[typing.Dict[str, typing.Any]] = []
-        for idx, map_ in enumerate(map_results):
-            if not isinstance(map_.choice.message.content, list):
-                continue
-            for ele in map_.choice.message.content:
-                if not isinstance(ele, dict) or "answer" not in ele or "score" not in ele:
-                    continue
-                key_points.append(
-                    {
-                        "analyst": idx,
-                        "answer":  ele["answer"],
-                        "score":   ele["score"]
-                    }
-                )
-
-        key_points = [kp for kp in key_points if isinstance(kp["score"], (int, float)) and kp["score"] > 0]
+        key_points = [
+            {"analyst": idx, "answer": ele["answer"], "score": ele["score"]}
+            for idx, map_ in enumerate(map_results)
+            for ele in _positive_key_points(map_)
+        ]
 
         if not key_points.__len__() and not self._allow_general_knowledge:
             warnings.warn("No key points found from the map phase", _errors.GraphRAGWarning)
@@ -486,13 +676,15 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
         )
         if self._logger:
             self._logger.info(f"Key points found: {key_points}")
+        if multi_stage:
+            key_points = self._reduce_stages(
+                key_points, query=query, reduce_sys_prompt=reduce_sys_prompt, chat_llm=chat_llm, **kwargs
+            )
 
         data: typing.List[str] = []
         total_tokens = 0
         for kp in key_points:
-            formatted_response = '\n'.join(
-                [f'----Analyst {kp["analyst"] + 1}----', f'Importance score: {kp["score"]}', kp["answer"]]
-            )
+            formatted_response = _format_key_point(kp["analyst"], kp)
             total_tokens += _utils.num_tokens(formatted_response, self._token_encoder)
             if total_tokens > self._data_max_tokens:
                 warnings.warn("Data exceeds maximum token limit", _errors.GraphRAGWarning)
@@ -538,6 +730,78 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
                 reduce_context_text=report_data,
             )
 
+    def _reduce_stages(
+        self,
+        key_points: typing.List[typing.Dict[str, typing.Any]],
+        *,
+        query: str,
+        reduce_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseChatLLM,
+        **kwargs: typing.Any,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Reduces key points in stages until they fit in `_data_max_tokens`.
+
+        At each stage, the key points (by descending score) are grouped into
+        chunks of at most `_data_max_tokens` tokens, and every chunk is
+        reduced to an intermediate answer on the engine's thread pool. The
+        answers become the key points of the next stage, scored by the best
+        key point of their chunk, so the number of stages grows with the
+        volume of the key points. The stages stop early if no two key points
+        fit in one chunk.
+
+        Returns:
+            The key points of the last stage, by descending score.
+        """
+        stage = 0
+        while True:
+            chunks = _chunk_key_points(key_points, self._data_max_tokens, self._token_encoder)
+            if chunks.__len__() <= 1 or chunks.__len__() >= key_points.__len__():
+                return key_points
+            stage += 1
+            if self._logger:
+                self._logger.info(f"Reduce stage {stage}: {len(key_points)} key points in {len(chunks)} chunks")
+            futures = [self._executor.submit(
+                self._reduce_chunk,
+                chunk,
+                query=query,
+                reduce_sys_prompt=reduce_sys_prompt,
+                chat_llm=chat_llm,
+                **kwargs
+            ) for chunk in chunks]
+            try:
+                answers = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            key_points = _stage_key_points(chunks, answers)
+
+    def _reduce_chunk(
+        self,
+        chunk: typing.List[typing.Dict[str, typing.Any]],
+        *,
+        query: str,
+        reduce_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseChatLLM,
+        **kwargs: typing.Any,
+    ) -> str:
+        """Reduces a chunk of key points to an intermediate answer."""
+        msg = _reduce_chunk_messages(chunk, query=query, reduce_sys_prompt=reduce_sys_prompt or self._reduce_sys_prompt)
+        response = typing.cast(_llm.ChatResponse_T, chat_llm.chat(
+            msg=typing.cast(_llm.MessageParam_T, msg),
+            stream=False,
+            **_utils.filter_kwargs(chat_llm.chat, kwargs, prefix='reduce__')
+        ))
+        return response.choices[0].message.content or ""
+
+    @typing_extensions.override
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._map_cache is not None:
+            self._map_cache.close()
+        super().close()
+
     @typing_extensions.override
     def __str__(self) -> str:
         return (
@@ -555,7 +819,13 @@ class GlobalSearchEngine(_base_engine.QueryEngine):
             f"{'...' if len(self._general_knowledge_sys_prompt) > 50 else ''}, \n"
             f"\tno_data_answer={self._no_data_answer.__repr__()}, \n"
             f"\tjson_mode={self._json_mode}, \n"
-            f"\tdata_max_tokens={self._data_max_tokens} \n"
+            f"\tdata_max_tokens={self._data_max_tokens}, \n"
+            f"\tmax_map_calls={self._max_map_calls}, \n"
+            f"\thierarchical={self._hierarchical}, \n"
+            f"\tdrill_down_threshold={self._drill_down_threshold}, \n"
+            f"\tmax_map_tokens={self._max_map_tokens}, \n"
+            f"\tmap_cache={self._map_cache}, \n"
+            f"\tmulti_stage_reduce={self._multi_stage_reduce} \n"
             f")"
         )
 
@@ -609,9 +879,61 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         _data_max_tokens:
             The maximum number of tokens allowed for input context during the
             map phase.
+        _max_map_calls:
+            The default maximum number of map calls of a search, spent on the
+            community reports most relevant to the query (see
+            `GlobalContextBuilder.build_context`), or None to map over every
+            report. In hierarchical mode, the budget of the drill-down.
+        _hierarchical:
+            Whether searches drill down the community hierarchy by default:
+            the top-level community reports are mapped first, then only the
+            children of the communities whose key points score at least
+            `_drill_down_threshold`, level by level, until the map call and
+            token budgets are spent.
+        _drill_down_threshold:
+            The minimum score of a key point for the drill-down to expand the
+            communities it comes from.
+        _max_map_tokens:
+            The default maximum number of context tokens sent to the map phase
+            by a drill-down, or None for no limit.
+        _map_cache:
+            An optional persistent cache of the key points of map calls, keyed
+            by batch, normalized query, map prompt, model and request options;
+            only the batches it misses are sent to the LLM.
+        _multi_stage_reduce:
+            Whether searches reduce in stages by default when the key points
+            of the map phase exceed `_data_max_tokens`: the key points are
+            grouped into chunks of at most `_data_max_tokens` tokens, each
+            chunk is reduced to an intermediate answer concurrently, and the
+            answers are reduced again, as many times as needed for them to fit
+            in a single reduce call.
+        _progressive_reduce:
+            Whether searches start the reduce phase before every map call has
+            returned by default: as soon as the key points scoring at least
+            `_fill_threshold` returned so far fill `_data_max_tokens`, or
+            `_reduce_quorum` of the map calls have returned. The map calls
+            still in flight are then cancelled.
+        _reduce_quorum:
+            The default fraction of the map calls of a progressive search
+            after which the reduce phase starts, in (0, 1], or None to wait
+            for all of them (unless the key points fill the reduce context
+            first).
+        _fill_threshold:
+            The default minimum score of the key points that count towards
+            filling the reduce context of a progressive search. Lower-scoring
+            key points would be displaced by better ones still in flight, so
+            they cannot end the map phase.
+        _map_deadline:
+            The default number of seconds a map call may take (not counting
+            the wait for the semaphore) before it is dropped, or None for no
+            deadline.
+        _semaphore:
+            Bounds the number of concurrent LLM calls of the map and reduce
+            phases. It may be shared by several engines (e.g. by the requests
+            of one server worker) to bound their calls together.
     """
     _chat_llm: _llm.BaseAsyncChatLLM
-    _embedding: _llm.BaseEmbedding
+    _embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding]
     _context_builder: _context.GlobalContextBuilder
     _logger: typing.Optional[_base_engine.Logger]
     _token_encoder: tiktoken.Encoding
@@ -622,6 +944,16 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
     _no_data_answer: str
     _json_mode: bool
     _data_max_tokens: int
+    _max_map_calls: typing.Optional[int]
+    _hierarchical: bool
+    _drill_down_threshold: int
+    _max_map_tokens: typing.Optional[int]
+    _map_cache: typing.Optional[_map_cache.MapResultCache]
+    _multi_stage_reduce: bool
+    _progressive_reduce: bool
+    _reduce_quorum: typing.Optional[float]
+    _fill_threshold: int
+    _map_deadline: typing.Optional[float]
     _semaphore: asyncio.Semaphore
 
     @typing_extensions.override
@@ -640,11 +972,19 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         asyncio.run(self._chat_llm.aclose())
         self._chat_llm = value
 
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        return self._semaphore
+
+    @property
+    def map_cache(self) -> typing.Optional[_map_cache.MapResultCache]:
+        return self._map_cache
+
     def __init__(
         self,
         *,
         chat_llm: _llm.BaseAsyncChatLLM,
-        embedding: _llm.BaseEmbedding,
+        embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
 
         context_builder: typing.Optional[_context.GlobalContextBuilder] = None,
         context_loader: typing.Optional[_context.GlobalContextLoader] = None,
@@ -659,6 +999,17 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         max_data_tokens: typing.Optional[int] = None,
         encoding_model: typing.Optional[str] = None,
         concurrent_coroutines: typing.Optional[int] = None,
+        semaphore: typing.Optional[asyncio.Semaphore] = None,
+        max_map_calls: typing.Optional[int] = None,
+        hierarchical: typing.Optional[bool] = None,
+        drill_down_threshold: typing.Optional[int] = None,
+        max_map_tokens: typing.Optional[int] = None,
+        map_cache: typing.Optional[_map_cache.MapResultCache] = None,
+        multi_stage_reduce: typing.Optional[bool] = None,
+        progressive_reduce: typing.Optional[bool] = None,
+        reduce_quorum: typing.Optional[float] = None,
+        fill_threshold: typing.Optional[int] = None,
+        map_deadline: typing.Optional[float] = None,
 
         logger: typing.Optional[_base_engine.Logger] = None,
         **kwargs: typing.Any,
@@ -667,6 +1018,7 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
             logger.debug(f"Creating AsyncGlobalSearchEngine with context_loader: {context_loader}")
         if not context_builder and not context_loader:
             raise ValueError("Either context_builder or context_loader must be provided")
+        _check_quorum(reduce_quorum)
 
         if context_loader:
             context_builder = context_loader.to_context_builder(
@@ -692,9 +1044,26 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         self._no_data_answer = no_data_answer or _defaults.GLOBAL_SEARCH__REDUCE__NO_DATA_ANSWER
         self._json_mode = json_mode if json_mode is not None else True
         self._data_max_tokens = max_data_tokens or _defaults.DEFAULT__GLOBAL_SEARCH__DATA_MAX_TOKENS
+        self._max_map_calls = max_map_calls
+        self._hierarchical = hierarchical if hierarchical is not None else False
+        self._drill_down_threshold = (
+            drill_down_threshold if drill_down_threshold is not None
+            else _defaults.DEFAULT__GLOBAL_SEARCH__DRILL_DOWN_THRESHOLD
+        )
+        self._max_map_tokens = max_map_tokens
+        self._map_cache = map_cache
+        self._multi_stage_reduce = multi_stage_reduce if multi_stage_reduce is not None else False
+        self._progressive_reduce = progressive_reduce if progressive_reduce is not None else False
+        self._reduce_quorum = reduce_quorum
+        self._fill_threshold = (
+            fill_threshold if fill_threshold is not None else _defaults.DEFAULT__GLOBAL_SEARCH__FILL_THRESHOLD
+        )
+        self._map_deadline = map_deadline
         self._token_encoder = tiktoken.get_encoding(encoding_model or _defaults.DEFAULT__ENCODING_MODEL)
         self._logger = logger
-        self._semaphore = asyncio.Semaphore(concurrent_coroutines or _defaults.DEFAULT__CONCURRENT_COROUTINES)
+        self._semaphore = semaphore or asyncio.Semaphore(
+            concurrent_coroutines or _defaults.DEFAULT__CONCURRENT_COROUTINES
+        )
 
     @typing_extensions.override
     async def asearch(
@@ -749,12 +1118,23 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
                 Additional keyword arguments, can be prefixed with 'map__' for
                 `self._map` or 'reduce__' for `self._reduce` or not prefixed for
                 `GlobalContextBuilder.build_context`. See details in the
-                specific method documentation and source code.
+                specific method documentation and source code. A
+                `max_map_calls` keyword argument overrides the engine's map
+                call budget for this search; when a budget is set, the query is
+                embedded to select the most relevant community reports.
+                `hierarchical`, `drill_down_threshold` and `max_map_tokens`
+                keyword arguments override the engine's drill-down settings
+                (see `_drill_down`), and `progressive_reduce`, `reduce_quorum`,
+                `fill_threshold` and `map_deadline` keyword arguments its map
+                collection settings (see `_map_all`); a drill-down does not
+                reduce progressively. A `multi_stage_reduce` keyword argument
+                overrides the engine's reduce mode.
 
         Returns:
             A search result object or a stream of search result chunks,
             depending on the value of `stream`.
         """
+        chat_llm = chat_llm or self._chat_llm
         created = time.time()
         self._logger.info(f"Starting search for query: {query} at {created}") if self._logger else None
 
@@ -763,41 +1143,199 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         elif isinstance(conversation_history, list):
             conversation_history = _context.ConversationHistory.from_list(conversation_history)
 
-        context_chunks, context_records = self._context_builder.build_context(
-            conversation_history=conversation_history,
-            **kwargs,
-        )
-        map_results = list(
-            await asyncio.gather(
-                *[self._map(
-                    query=query,
-                    context=context,
-                    verbose=verbose,
-                    map_sys_prompt=map_sys_prompt,
-                    chat_llm=chat_llm,
-                    **kwargs
-                ) for context in context_chunks]
+        max_map_calls = kwargs.pop("max_map_calls", self._max_map_calls)
+        hierarchical = kwargs.pop("hierarchical", self._hierarchical)
+        drill_down_threshold = kwargs.pop("drill_down_threshold", self._drill_down_threshold)
+        max_map_tokens = kwargs.pop("max_map_tokens", self._max_map_tokens)
+        progressive_reduce = kwargs.pop("progressive_reduce", self._progressive_reduce)
+        reduce_quorum = kwargs.pop("reduce_quorum", self._reduce_quorum)
+        fill_threshold = kwargs.pop("fill_threshold", self._fill_threshold)
+        map_deadline = kwargs.pop("map_deadline", self._map_deadline)
+        multi_stage_reduce = kwargs.pop("multi_stage_reduce", self._multi_stage_reduce)
+        if hierarchical:
+            map_results = await self._drill_down(
+                query=query,
+                conversation_history=conversation_history,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                max_map_calls=max_map_calls,
+                max_map_tokens=max_map_tokens,
+                drill_down_threshold=drill_down_threshold,
+                map_deadline=map_deadline,
+                **kwargs
+            )
+        else:
+            if max_map_calls is not None and kwargs.get("query_embedding") is None:
+                kwargs["query_embedding"] = await self._aembed(query)
+            context_chunks, context_records = self._context_builder.build_context(
+                conversation_history=conversation_history,
+                max_map_calls=max_map_calls,
+                **kwargs,
+            )
+            map_results = await self._map_all(
+                query=query,
+                contexts=context_chunks,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                map_deadline=map_deadline,
+                quorum=reduce_quorum if progressive_reduce else None,
+                fill_tokens=self._data_max_tokens if progressive_reduce else None,
+                fill_threshold=fill_threshold,
+                **kwargs
             )
-        )
         return await self._reduce(
-            map_results=map_results,
+            map_results=list(map_results.values()),
             query=query,
             verbose=verbose,
             stream=stream,
             reduce_sys_prompt=reduce_sys_prompt,
             general_knowledge_sys_prompt=general_knowledge_sys_prompt,
             chat_llm=chat_llm,
+            multi_stage=multi_stage_reduce,
             **kwargs
         )
 
+    async def _map_all(
+        self,
+        *,
+        query: str,
+        contexts: typing.List[str],
+        verbose: bool,
+        map_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseAsyncChatLLM,
+        map_deadline: typing.Optional[float] = None,
+        quorum: typing.Optional[float] = None,
+        fill_tokens: typing.Optional[int] = None,
+        fill_threshold: int = 0,
+        **kwargs: typing.Any,
+    ) -> typing.Dict[int, _types.SearchResult_T]:
+        """
+        Runs the map phase over contexts concurrently, returning the results
+        keyed by the index of their context, in that order (the indices of
+        the dropped map calls are missing).
+
+        The results are collected as the map calls complete. A map call that
+        misses `map_deadline` is dropped with a warning. The collection stops
+        early once `quorum` (a fraction in (0, 1]) of the map calls have
+        returned, or once the positive key points scoring at least
+        `fill_threshold` returned so far, formatted for the reduce phase, fill
+        `fill_tokens` tokens; the map calls still in flight are then
+        cancelled. If a map call fails, the others are cancelled and its error
+        is raised (that of the first failing context, if several calls failed
+        at once).
+
+        Raises:
+            ValueError: If `quorum` is outside (0, 1].
+        """
+        _check_quorum(quorum)
+        tasks = {
+            asyncio.ensure_future(self._map(
+                query=query,
+                context=context,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                json_mode=self._json_mode,
+                deadline=map_deadline,
+                **kwargs
+            )): index for index, context in enumerate(contexts)
+        }
+        required = math.ceil(quorum * tasks.__len__()) if quorum is not None else tasks.__len__()
+        results: typing.Dict[int, _types.SearchResult_T] = {}
+        pending = set(tasks)
+        data_tokens = 0
+        try:
+            while pending and results.__len__() < required and (fill_tokens is None or data_tokens < fill_tokens):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # retrieve the outcome of every finished call before raising, so that no failure goes unretrieved
+                errors: typing.List[BaseException] = []
+                for task in sorted(done, key=tasks.__getitem__):
+                    try:
+                        result = task.result()
+                    except asyncio.TimeoutError:
+                        warnings.warn(f"Map call missed its deadline of {map_deadline}s", _errors.GraphRAGWarning)
+                        if self._logger:
+                            self._logger.warning(f"Map call {tasks[task]} missed its deadline of {map_deadline}s")
+                        continue
+                    except BaseException as e:
+                        errors.append(e)
+                        continue
+                    results[tasks[task]] = result
+                    if fill_tokens is not None:
+                        data_tokens += sum(
+                            _utils.num_tokens(_format_key_point(tasks[task], point), self._token_encoder)
+                            for point in _positive_key_points(result) if point["score"] >= fill_threshold
+                        )
+                if errors:
+                    raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        if pending and self._logger:
+            self._logger.info(f"Reducing after {results.__len__()} of {tasks.__len__()} map calls returned")
+        return {index: results[index] for index in sorted(results)}
+
+    async def _drill_down(
+        self,
+        *,
+        query: str,
+        conversation_history: _context.ConversationHistory,
+        verbose: bool,
+        map_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseAsyncChatLLM,
+        max_map_calls: typing.Optional[int],
+        max_map_tokens: typing.Optional[int],
+        drill_down_threshold: int,
+        map_deadline: typing.Optional[float] = None,
+        **kwargs: typing.Any,
+    ) -> typing.List[_types.SearchResult_T]:
+        """
+        Runs the map phase down the community hierarchy, as
+        `GlobalSearchEngine._drill_down` does; the map calls that miss
+        `map_deadline` are dropped.
+        """
+        drill_down = _DrillDown(
+            self._context_builder,
+            conversation_history=conversation_history,
+            max_map_calls=max_map_calls,
+            max_map_tokens=max_map_tokens,
+            threshold=drill_down_threshold,
+            token_encoder=self._token_encoder,
+            logger=self._logger,
+            **kwargs
+        )
+        while drill_down.contexts:
+            drill_down.advance(await self._map_all(
+                query=query,
+                contexts=drill_down.contexts,
+                verbose=verbose,
+                map_sys_prompt=map_sys_prompt,
+                chat_llm=chat_llm,
+                map_deadline=map_deadline,
+                **kwargs
+            ))
+        return drill_down.map_results
+
+    async def _aembed(self, text: str) -> typing.List[float]:
+        """Embeds a text with the engine's embedding model, in a worker thread if it is synchronous."""
+        if isinstance(self._embedding, _llm.BaseAsyncEmbedding):
+            return await self._embedding.aembed(text)
+        return await asyncio.to_thread(self._embedding.embed, text)
+
     async def _map(
         self,
         *,
         query: str,
         context: str,
         verbose: bool,
-        sys_prompt: typing.Optional[str] = None,
+        map_sys_prompt: typing.Optional[str] = None,
         chat_llm: _llm.BaseAsyncChatLLM = None,
+        json_mode: bool = True,
+        deadline: typing.Optional[float] = None,
         **kwargs: typing.Any
     ) -> _types.SearchResult_T:
         """
@@ -817,11 +1355,16 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
             verbose:
                 If True, returns a detailed SearchResultVerbose object,
                 otherwise returns a basic SearchResult object.
-            sys_prompt:
+            map_sys_prompt:
                 A temporary prompt to override the default map system prompt.
             chat_llm:
                 A temporary chat language model to override the default chat
                 language model for this search.
+            json_mode:
+                Whether to ask the LLM for a JSON response.
+            deadline:
+                The number of seconds the LLM call may take, or None for no
+                deadline.
             **kwargs:
                 Additional keyword arguments. Should be prefixed with 'map__'
                 for `ChatLLM.chat` method. See details in the specific method
@@ -830,12 +1373,32 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         Returns:
             A SearchResult or SearchResultVerbose object, depending on the
             verbosity setting.
+
+        Raises:
+            asyncio.TimeoutError: If the LLM call misses the deadline.
         """
         created = time.time()
         if self._logger:
             self._logger.info(f"Starting map for query: {query} at {created}")
 
-        prompt = jinja2.Template(sys_prompt or self._map_sys_prompt).render(context_data=context, query=query)
+        map_sys_prompt = map_sys_prompt or self._map_sys_prompt
+        chat_kwargs = _utils.filter_kwargs(chat_llm.achat, kwargs, prefix='map__')
+        # JSON mode changes the response (and whether it parses), so it is part of the key
+        cache_key = _map_cache.map_cache_key(
+            model=chat_llm.model, context=context, query=query, map_sys_prompt=map_sys_prompt, json_mode=json_mode,
+            **chat_kwargs
+        ) if self._map_cache is not None else None
+        if cache_key is not None:
+            # the cache is a SQLite database; keep its I/O off the event loop
+            points = await asyncio.to_thread(self._map_cache.get, cache_key)
+            if points is not None:
+                if self._logger:
+                    self._logger.info(f"Map result served from the cache: {cache_key}")
+                return _cached_map_result(
+                    points, model=chat_llm.model, context=context, created=created, verbose=verbose
+                )
+
+        prompt = jinja2.Template(map_sys_prompt).render(context_data=context, query=query)
         msg = [{"role": "system", "content": prompt}, {"role": "user", "content": query}]
 
         if self._logger:
@@ -843,13 +1406,16 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
 
         async with self._semaphore:
             response = typing.cast(
-                _llm.ChatResponse_T, (await chat_llm.achat(
+                _llm.ChatResponse_T, (await asyncio.wait_for(chat_llm.achat(
                     msg=typing.cast(_llm.MessageParam_T, msg),
                     stream=False,
-                    **_utils.filter_kwargs(chat_llm.achat, kwargs, prefix='map__')
-                ))
+                    response_format={"type": "json_object"} if json_mode else openai.NOT_GIVEN,
+                    **chat_kwargs
+                ), deadline))
             )
         result = self._parse_map(response)
+        if cache_key is not None and _is_cacheable(response, result):
+            await asyncio.to_thread(self._map_cache.set, cache_key, result)
 
         usage = _types.Usage(
             completion_tokens=response.usage.completion_tokens,
@@ -921,6 +1487,7 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         reduce_sys_prompt: typing.Optional[str] = None,
         general_knowledge_sys_prompt: typing.Optional[str] = None,
         chat_llm: _llm.BaseAsyncChatLLM = None,
+        multi_stage: bool = False,
 
         **kwargs: typing.Any
     ) -> typing.Union[_types.SearchResult_T, _types.AsyncStreamSearchResult_T]:
@@ -953,6 +1520,9 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
             chat_llm:
                 A temporary chat language model to override the default chat
                 language model for this search.
+            multi_stage:
+                If True, key points exceeding the data token limit are reduced
+                in stages (see `_reduce_stages`) instead of being truncated.
             **kwargs:
                 Additional keyword arguments. Should be prefixed with 'reduce__'
                 for `ChatLLM.chat` method. See details in the specific method
@@ -966,22 +1536,11 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         if self._logger:
             self._logger.info(f"Starting reduce for query: {query} at {created}")
 
-        key_points: typing.List[typing.Dict[str, typing.Any]] = []
-        for idx, map_ in enumerate(map_results):
-            if not isinstance(map_.choice.message.content, list):
-                continue
-            for ele in map_.choice.message.content:
-                if not isinstance(ele, dict) or "answer" not in ele or "score" not in ele:
-                    continue
-                key_points.append(
-                    {
-                        "analyst": idx,
-                        "answer":  ele["answer"],
-                        "score":   ele["score"]
-                    }
-                )
-
-        key_points = [kp for kp in key_points if isinstance(kp["score"], (int, float)) and kp["score"] > 0]
+        key_points = [
+            {"analyst": idx, "answer": ele["answer"], "score": ele["score"]}
+            for idx, map_ in enumerate(map_results)
+            for ele in _positive_key_points(map_)
+        ]
 
         if not key_points.__len__() and not self._allow_general_knowledge:
             warnings.warn("No key points found from the map phase", _errors.GraphRAGWarning)
@@ -1017,13 +1576,15 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
         )
         if self._logger:
             self._logger.info(f"Key points found: {key_points}")
+        if multi_stage:
+            key_points = await self._reduce_stages(
+                key_points, query=query, reduce_sys_prompt=reduce_sys_prompt, chat_llm=chat_llm, **kwargs
+            )
 
         data: typing.List[str] = []
         total_tokens = 0
         for kp in key_points:
-            formatted_response = '\n'.join(
-                [f'----Analyst {kp["analyst"] + 1}----', f'Importance score: {kp["score"]}', kp["answer"]]
-            )
+            formatted_response = _format_key_point(kp["analyst"], kp)
             total_tokens += _utils.num_tokens(formatted_response, self._token_encoder)
             if total_tokens > self._data_max_tokens:
                 warnings.warn("Data exceeds maximum token limit", _errors.GraphRAGWarning)
@@ -1071,6 +1632,62 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
                 reduce_context_text=report_data,
             )
 
+    async def _reduce_stages(
+        self,
+        key_points: typing.List[typing.Dict[str, typing.Any]],
+        *,
+        query: str,
+        reduce_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseAsyncChatLLM,
+        **kwargs: typing.Any,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Reduces key points in stages until they fit in `_data_max_tokens`, as
+        `GlobalSearchEngine._reduce_stages` does; the chunks of a stage are
+        reduced concurrently under the engine's semaphore.
+        """
+        stage = 0
+        while True:
+            chunks = _chunk_key_points(key_points, self._data_max_tokens, self._token_encoder)
+            if chunks.__len__() <= 1 or chunks.__len__() >= key_points.__len__():
+                return key_points
+            stage += 1
+            if self._logger:
+                self._logger.info(f"Reduce stage {stage}: {len(key_points)} key points in {len(chunks)} chunks")
+            answers = await asyncio.gather(*[self._reduce_chunk(
+                chunk,
+                query=query,
+                reduce_sys_prompt=reduce_sys_prompt,
+                chat_llm=chat_llm,
+                **kwargs
+            ) for chunk in chunks])
+            key_points = _stage_key_points(chunks, answers)
+
+    async def _reduce_chunk(
+        self,
+        chunk: typing.List[typing.Dict[str, typing.Any]],
+        *,
+        query: str,
+        reduce_sys_prompt: typing.Optional[str],
+        chat_llm: _llm.BaseAsyncChatLLM,
+        **kwargs: typing.Any,
+    ) -> str:
+        """Reduces a chunk of key points to an intermediate answer."""
+        msg = _reduce_chunk_messages(chunk, query=query, reduce_sys_prompt=reduce_sys_prompt or self._reduce_sys_prompt)
+        async with self._semaphore:
+            response = typing.cast(_llm.ChatResponse_T, await chat_llm.achat(
+                msg=typing.cast(_llm.MessageParam_T, msg),
+                stream=False,
+                **_utils.filter_kwargs(chat_llm.achat, kwargs, prefix='reduce__')
+            ))
+        return response.choices[0].message.content or ""
+
+    @typing_extensions.override
+    async def aclose(self) -> None:
+        if self._map_cache is not None:
+            await asyncio.to_thread(self._map_cache.close)
+        await super().aclose()
+
     @typing_extensions.override
     def __str__(self) -> str:
         return (
@@ -1088,10 +1705,318 @@ class AsyncGlobalSearchEngine(_base_engine.AsyncQueryEngine):
             f"{'...' if len(self._general_knowledge_sys_prompt) > 50 else ''}, \n"
             f"\tno_data_answer={self._no_data_answer.__repr__()}, \n"
             f"\tjson_mode={self._json_mode}, \n"
-            f"\tdata_max_tokens={self._data_max_tokens} \n"
+            f"\tdata_max_tokens={self._data_max_tokens}, \n"
+            f"\tmax_map_calls={self._max_map_calls}, \n"
+            f"\thierarchical={self._hierarchical}, \n"
+            f"\tdrill_down_threshold={self._drill_down_threshold}, \n"
+            f"\tmax_map_tokens={self._max_map_tokens}, \n"
+            f"\tmap_cache={self._map_cache}, \n"
+            f"\tmulti_stage_reduce={self._multi_stage_reduce}, \n"
+            f"\tprogressive_reduce={self._progressive_reduce}, \n"
+            f"\treduce_quorum={self._reduce_quorum}, \n"
+            f"\tfill_threshold={self._fill_threshold}, \n"
+            f"\tmap_deadline={self._map_deadline} \n"
             f")"
         )
 
     @typing_extensions.override
     def __repr__(self) -> str:
         return self.__str__()
+
+
+# the report references of a key point, e.g. "[Data: Reports (2, 7, 64, +more)]"
+_REPORT_REFERENCES: typing.Pattern[str] = re.compile(r"Reports\s*\(([^)]*)\)")
+
+
+class _DrillDown:
+    """
+    The state of a drill-down of the map phase down the community hierarchy
+    (see `GlobalSearchEngine._drill_down`), shared by the engines, which only
+    run the map calls of each level.
+
+    Attributes:
+        hierarchy: The community hierarchy of the context builder.
+        contexts:
+            The batches of the current level that fit in the budgets, to be
+            mapped next; empty once the drill-down is over.
+        map_results: The results of the map calls so far, level by level.
+        _context_builder: The context builder rendering the batches.
+        _conversation_history: The conversation history of the search.
+        _max_map_calls: The map call budget, or None for no limit.
+        _max_map_tokens: The context token budget, or None for no limit.
+        _threshold:
+            The minimum score of a key point for its communities to be
+            expanded.
+        _token_encoder: The encoder counting the context tokens.
+        _logger: An optional logger.
+        _kwargs: The keyword arguments of `GlobalContextBuilder.build_context`.
+        _records: The records of the batches of the current level, or None.
+        _num_batches: The number of batches of the current level.
+        _map_tokens: The context tokens spent so far.
+    """
+    hierarchy: _community_reports.CommunityHierarchy
+    contexts: typing.List[str]
+    map_results: typing.List[_types.SearchResult_T]
+    _context_builder: _context.GlobalContextBuilder
+    _conversation_history: typing.Optional[_context.ConversationHistory]
+    _max_map_calls: typing.Optional[int]
+    _max_map_tokens: typing.Optional[int]
+    _threshold: int
+    _token_encoder: tiktoken.Encoding
+    _logger: typing.Optional[_base_engine.Logger]
+    _kwargs: typing.Dict[str, typing.Any]
+    _records: typing.Optional[pd.DataFrame]
+    _num_batches: int
+    _map_tokens: int
+
+    def __init__(
+        self,
+        context_builder: _context.GlobalContextBuilder,
+        *,
+        conversation_history: typing.Optional[_context.ConversationHistory],
+        max_map_calls: typing.Optional[int],
+        max_map_tokens: typing.Optional[int],
+        threshold: int,
+        token_encoder: tiktoken.Encoding,
+        logger: typing.Optional[_base_engine.Logger] = None,
+        **kwargs: typing.Any,
+    ) -> None:
+        """
+        Raises:
+            ValueError: If the context builder has no community hierarchy.
+        """
+        self.hierarchy = _community_hierarchy_of(context_builder)
+        self.map_results = []
+        self._context_builder = context_builder
+        self._conversation_history = conversation_history
+        self._max_map_calls = max_map_calls
+        self._max_map_tokens = max_map_tokens
+        self._threshold = threshold
+        self._token_encoder = token_encoder
+        self._logger = logger
+        self._kwargs = kwargs
+        self._map_tokens = 0
+        self._start_level(self.hierarchy.roots)
+
+    def advance(self, results: typing.Mapping[int, _types.SearchResult_T]) -> None:
+        """
+        Records the results of the map calls of the current level, keyed by
+        the index of their context, and moves to the children of the
+        communities they select.
+        """
+        if self._logger:
+            self._logger.info(f"Drill-down mapped {len(self.contexts)} of {self._num_batches} batches")
+        self.map_results.extend(results.values())
+        self._start_level(_expand_communities(self.hierarchy, self._records, results, self._threshold))
+
+    def _start_level(self, community_ids: typing.List[str]) -> None:
+        self.contexts, self._records, self._num_batches = [], None, 0
+        if not community_ids:
+            return
+        context_chunks, context_records = self._context_builder.build_context(
+            conversation_history=self._conversation_history,
+            community_ids=community_ids,
+            **self._kwargs,
+        )
+        self.contexts, self._map_tokens = _fit_budget(
+            typing.cast(typing.List[str], context_chunks),
+            map_calls=self.map_results.__len__(),
+            map_tokens=self._map_tokens,
+            max_map_calls=self._max_map_calls,
+            max_map_tokens=self._max_map_tokens,
+            token_encoder=self._token_encoder,
+        )
+        self._records = context_records.get(self._kwargs.get("context_name", "Reports").lower())
+        self._num_batches = context_chunks.__len__()
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(map_calls={self.map_results.__len__()}, map_tokens={self._map_tokens}, "
+            f"batches={self.contexts.__len__()})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def _community_hierarchy_of(
+    context_builder: _context.GlobalContextBuilder,
+) -> _community_reports.CommunityHierarchy:
+    if context_builder.community_hierarchy is None:
+        raise ValueError(
+            "Hierarchical global search needs a community hierarchy; load the context from the Parquet files of "
+            "the index, or compile the snapshot again"
+        )
+    return context_builder.community_hierarchy
+
+
+def _check_quorum(quorum: typing.Optional[float]) -> None:
+    if quorum is not None and not 0 < quorum <= 1:
+        raise ValueError(f"reduce_quorum must be in (0, 1], got {quorum}")
+
+
+def _positive_key_points(map_result: _types.SearchResult_T) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Returns the key points of a map result with a positive score."""
+    if not isinstance(map_result.choice.message.content, list):
+        return []
+    return [
+        point for point in map_result.choice.message.content
+        if isinstance(point, dict) and "answer" in point and "score" in point
+        and isinstance(point["score"], (int, float)) and point["score"] > 0
+    ]
+
+
+def _is_cacheable(response: _llm.ChatResponse_T, points: typing.List[typing.Dict[str, typing.Any]]) -> bool:
+    """
+    Whether the key points parsed from a map response may be cached: not
+    when the response was cut short or could not be parsed.
+    """
+    return response.choices[0].finish_reason == "stop" and points != [{"answer": "", "score": 0}]
+
+
+def _cached_map_result(
+    points: typing.List[typing.Dict[str, typing.Any]],
+    *,
+    model: str,
+    context: str,
+    created: float,
+    verbose: bool,
+) -> _types.SearchResult_T:
+    """Builds the result of a map call served from the map cache."""
+    choice = _types.Choice(finish_reason="stop", message=_types.Message(content=points))
+    if verbose:
+        return _types.SearchResultVerbose(
+            created=created.__int__(),
+            model=model,
+            choice=choice,
+            usage=None,
+            context_data=None,
+            context_text=context,
+            completion_time=time.time() - created,
+            llm_calls=0,
+        )
+    return _types.SearchResult(created=created.__int__(), model=model, choice=choice, usage=None)
+
+
+def _format_key_point(analyst: int, key_point: typing.Dict[str, typing.Any]) -> str:
+    """Formats a key point of the map result of an analyst for the reduce context."""
+    return '\n'.join(
+        [f'----Analyst {analyst + 1}----', f'Importance score: {key_point["score"]}', key_point["answer"]]
+    )
+
+
+def _fit_budget(
+    contexts: typing.List[str],
+    *,
+    map_calls: int,
+    map_tokens: int,
+    max_map_calls: typing.Optional[int],
+    max_map_tokens: typing.Optional[int],
+    token_encoder: tiktoken.Encoding,
+) -> typing.Tuple[typing.List[str], int]:
+    """
+    Returns the leading contexts that fit in what is left of the map call and
+    token budgets, and the number of tokens spent with them.
+    """
+    fitted: typing.List[str] = []
+    for context in contexts:
+        if max_map_calls is not None and map_calls + fitted.__len__() >= max_map_calls:
+            break
+        tokens = _utils.num_tokens(context, token_encoder) if max_map_tokens is not None else 0
+        if max_map_tokens is not None and map_tokens + tokens > max_map_tokens:
+            break
+        map_tokens += tokens
+        fitted.append(context)
+    return fitted, map_tokens
+
+
+def _expand_communities(
+    hierarchy: _community_reports.CommunityHierarchy,
+    records: typing.Optional[pd.DataFrame],
+    map_results: typing.Mapping[int, _types.SearchResult_T],
+    threshold: int,
+) -> typing.List[str]:
+    """
+    Returns the children of the communities selected by the key points of
+    mapped batches, keyed by batch number (the records of the batches have a
+    "batch" column), those of the highest scoring communities first.
+    """
+    if records is None or records.empty:
+        return []
+    scores: typing.Dict[str, float] = {}
+    for batch, result in map_results.items():
+        batch_ids = [
+            community_id
+            for community_id in map(hierarchy.resolve, records.loc[records["batch"] == batch, "id"].astype(str))
+            if community_id is not None
+        ]
+        points = result.choice.message.content if isinstance(result.choice.message.content, list) else []
+        for point in points:
+            score = point.get("score") if isinstance(point, dict) else None
+            if not isinstance(score, (int, float)) or score <= 0 or score < threshold:
+                continue
+            cited = [
+                community_id
+                for match in _REPORT_REFERENCES.finditer(str(point.get("answer", "")))
+                for community_id in map(hierarchy.resolve, (ref.strip() for ref in match.group(1).split(",")))
+                if community_id in batch_ids
+            ]
+            for community_id in cited or batch_ids:
+                scores[community_id] = max(scores.get(community_id, score), score)
+    return [
+        child
+        for community_id in sorted(scores, key=lambda community_id: -scores[community_id])
+        for child in hierarchy.children(community_id)
+    ]
+
+
+def _chunk_key_points(
+    key_points: typing.List[typing.Dict[str, typing.Any]],
+    max_tokens: int,
+    token_encoder: tiktoken.Encoding,
+) -> typing.List[typing.List[typing.Dict[str, typing.Any]]]:
+    """
+    Groups key points, in order, into chunks of at most `max_tokens` tokens
+    once formatted (a key point larger than that gets a chunk of its own).
+    """
+    chunks: typing.List[typing.List[typing.Dict[str, typing.Any]]] = []
+    chunk: typing.List[typing.Dict[str, typing.Any]] = []
+    chunk_tokens = 0
+    for key_point in key_points:
+        tokens = _utils.num_tokens(_format_key_point(key_point["analyst"], key_point), token_encoder)
+        if chunk and chunk_tokens + tokens > max_tokens:
+            chunks.append(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(key_point)
+        chunk_tokens += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _reduce_chunk_messages(
+    chunk: typing.List[typing.Dict[str, typing.Any]],
+    *,
+    query: str,
+    reduce_sys_prompt: str,
+) -> typing.List[typing.Dict[str, str]]:
+    """Builds the messages of the intermediate reduce call of a chunk of key points."""
+    report_data = '\n\n'.join(_format_key_point(key_point["analyst"], key_point) for key_point in chunk)
+    prompt = jinja2.Template(reduce_sys_prompt).render(report_data=report_data)
+    return [{"role": "system", "content": prompt}, {"role": "user", "content": query}]
+
+
+def _stage_key_points(
+    chunks: typing.List[typing.List[typing.Dict[str, typing.Any]]],
+    answers: typing.Sequence[str],
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Returns the key points of the next reduce stage: the non-empty answer of
+    each chunk, scored by the best key point of the chunk.
+    """
+    return [
+        {"analyst": idx, "answer": answer, "score": max(key_point["score"] for key_point in chunk)}
+        for idx, (chunk, answer) in enumerate(zip(chunks, answers)) if answer.strip()
+    ]
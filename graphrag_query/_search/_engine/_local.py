@@ -72,7 +72,9 @@ class LocalSearchEngine(_base_engine.QueryEngine):
         chat_llm: _llm.BaseChatLLM,
         embedding: _llm.BaseEmbedding,
 
-        context_loader: typing.Optional[_context.LocalContextLoader] = None,
+        context_loader: typing.Optional[
+            typing.Union[_context.LocalContextLoader, _context.SnapshotContextLoader]
+        ] = None,
         context_builder: typing.Optional[_context.LocalContextBuilder] = None,
 
         sys_prompt: typing.Optional[str] = None,
@@ -254,7 +256,7 @@ class AsyncLocalSearchEngine(_base_engine.AsyncQueryEngine):
             to inject the real context data.
     """
     _chat_llm: _llm.BaseAsyncChatLLM
-    _embedding: _llm.BaseEmbedding
+    _embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding]
     _context_builder: _context.LocalContextBuilder
     _logger: typing.Optional[_base_engine.Logger]
     _sys_prompt: str
@@ -279,9 +281,11 @@ class AsyncLocalSearchEngine(_base_engine.AsyncQueryEngine):
         self,
         *,
         chat_llm: _llm.BaseAsyncChatLLM,
-        embedding: _llm.BaseEmbedding,
+        embedding: typing.Union[_llm.BaseEmbedding, _llm.BaseAsyncEmbedding],
 
-        context_loader: typing.Optional[_context.LocalContextLoader] = None,
+        context_loader: typing.Optional[
+            typing.Union[_context.LocalContextLoader, _context.SnapshotContextLoader]
+        ] = None,
         context_builder: typing.Optional[_context.LocalContextBuilder] = None,
 
         sys_prompt: typing.Optional[str] = None,
@@ -367,7 +371,7 @@ class AsyncLocalSearchEngine(_base_engine.AsyncQueryEngine):
                 language model for this search.
             **kwargs:
                 Additional keyword arguments for
-                `LocalContextBuilder.build_context` or `ChatLLM.chat`. See
+                `LocalContextBuilder.abuild_context` or `ChatLLM.chat`. See
                 details in the specific method documentation and source code.
 
         Returns:
@@ -385,7 +389,7 @@ class AsyncLocalSearchEngine(_base_engine.AsyncQueryEngine):
         elif isinstance(conversation_history, list):
             conversation_history = _context.ConversationHistory.from_list(conversation_history)
 
-        context_text, context_records = self._context_builder.build_context(
+        context_text, context_records = await self._context_builder.abuild_context(
             query=query,
             conversation_history=conversation_history,
             **kwargs,
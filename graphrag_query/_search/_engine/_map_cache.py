@@ -0,0 +1,181 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+A persistent cache of global search map results.
+
+The batches of community reports built by `GlobalContextBuilder` are
+deterministic for an unchanged index, so asking the same question (or one
+normalizing to it) again maps the same batches again. The cache maps a key
+derived from the batch, the query, the map prompt, the model and the request
+options to the key points parsed from the map response, so that only the
+batches missing from the cache are sent to the LLM.
+
+Classes:
+    MapResultCache: An on-disk cache backed by a SQLite database.
+
+Functions:
+    map_cache_key: Builds the cache key of a map call.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+import unicodedata
+
+import typing_extensions
+
+from .. import _defaults
+
+
+def map_cache_key(
+    *,
+    model: str,
+    context: str,
+    query: str,
+    map_sys_prompt: str,
+    **kwargs: typing.Any,
+) -> str:
+    """
+    Builds the cache key of a map call.
+
+    The query is normalized (NFC, surrounding whitespace stripped and inner
+    whitespace collapsed) so trivially different spellings of a question
+    share an entry; the batch and the prompt template are hashed as they are,
+    and request options that change the response (e.g. `temperature`) are
+    part of the key.
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", query).split())
+    options = json.dumps(kwargs, sort_keys=True, default=str) if kwargs else ""
+    parts = [
+        model,
+        options,
+        hashlib.sha256(context.encode("utf-8")).hexdigest(),
+        hashlib.sha256(map_sys_prompt.encode("utf-8")).hexdigest(),
+        normalized,
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class MapResultCache:
+    """
+    An on-disk cache of map results backed by a SQLite database, so cached
+    key points survive restarts and can be shared by processes on one host.
+
+    The cache is bounded by a maximum number of entries with
+    least-recently-used eviction and an optional time-to-live. It is safe to
+    use from several threads.
+
+    Attributes:
+        _path: The path of the database file.
+        _max_entries: The maximum number of entries kept in the cache.
+        _ttl:
+            The number of seconds an entry stays valid, or None if entries do
+            not expire.
+        _connection: The connection to the database.
+        _lock: Serializes the use of `_connection` across threads.
+    """
+    _path: pathlib.Path
+    _max_entries: int
+    _ttl: typing.Optional[float]
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @property
+    def ttl(self) -> typing.Optional[float]:
+        return self._ttl
+
+    def __init__(
+        self,
+        path: typing.Optional[typing.Union[str, os.PathLike[str]]] = None,
+        *,
+        max_entries: typing.Optional[int] = None,
+        ttl: typing.Optional[float] = None,
+    ) -> None:
+        max_entries = max_entries or _defaults.DEFAULT__MAP_CACHE__MAX_ENTRIES
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be positive, got {ttl}")
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._path = pathlib.Path(path or _defaults.DEFAULT__MAP_CACHE__PATH)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS map_results ("
+            "key TEXT PRIMARY KEY, points TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS map_results_accessed ON map_results (accessed)")
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> typing.Optional[typing.List[typing.Dict[str, typing.Any]]]:
+        """Return the cached key points of a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT points, created FROM map_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            points, created = row
+            if self._ttl is not None and created + self._ttl <= now:
+                self._connection.execute("DELETE FROM map_results WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE map_results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(points)
+
+    def set(self, key: str, points: typing.List[typing.Dict[str, typing.Any]]) -> None:
+        """Cache the key points of a key, evicting the least recently used entries."""
+        now = time.time()
+        blob = json.dumps(points, default=str)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO map_results (key, points, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM map_results WHERE key IN ("
+                "SELECT key FROM map_results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._connection.execute("DELETE FROM map_results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM map_results").fetchone()[0]
+
+    def close(self) -> None:
+        """Release the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(path={self._path}, max_entries={self._max_entries}, ttl={self._ttl})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -30,37 +30,51 @@ def read_entities(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.Entity]:
     """Read entities from a dataframe."""
-    entities = []
-    for idx, row in df.iterrows():
-        entity = _model.Entity(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            title=_utils.to_str(row, title_col),
-            type=_utils.to_optional_str(row, type_col),
-            description=_utils.to_optional_str(row, description_col),
-            name_embedding=_utils.to_optional_list(row, name_embedding_col, item_type=float),
-            description_embedding=_utils.to_optional_list(
-                row, description_embedding_col, item_type=float
-            ),
-            graph_embedding=_utils.to_optional_list(row, graph_embedding_col, item_type=float),
-            community_ids=_utils.to_optional_list(row, community_col, item_type=str),
-            text_unit_ids=_utils.to_optional_list(row, text_unit_ids_col),
-            document_ids=_utils.to_optional_list(row, document_ids_col),
-            rank=_utils.to_optional_int(row, rank_col) or 0,
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.Entity.model_construct(
+            id=id_,
+            short_id=short_id,
+            title=title,
+            type=type_,
+            description=description,
+            name_embedding=name_embedding,
+            description_embedding=description_embedding,
+            graph_embedding=graph_embedding,
+            community_ids=community_ids,
+            text_unit_ids=text_unit_ids,
+            document_ids=document_ids,
+            rank=rank or 0,
+            attributes=attributes,
+        )
+        for (
+            id_, short_id, title, type_, description, name_embedding, description_embedding, graph_embedding,
+            community_ids, text_unit_ids, document_ids, rank, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, title_col),
+            _utils.to_optional_str_column(df, type_col),
+            _utils.to_optional_str_column(df, description_col),
+            _utils.to_optional_list_column(df, name_embedding_col, item_type=float),
+            _utils.to_optional_list_column(df, description_embedding_col, item_type=float),
+            _utils.to_optional_list_column(df, graph_embedding_col, item_type=float),
+            _utils.to_optional_list_column(df, community_col, item_type=str),
+            _utils.to_optional_list_column(df, text_unit_ids_col),
+            _utils.to_optional_list_column(df, document_ids_col),
+            _utils.to_optional_int_column(df, rank_col),
+            _utils.to_attributes_column(df, attributes_cols),
         )
-        entities.append(entity)
-    return entities
+    ]
 
 
-def store_entity_semantic_embeddings(
-    entities: typing.List[_model.Entity],
-    vectorstore: _vector_stores.BaseVectorStore,
-) -> _vector_stores.BaseVectorStore:
-    """Store entity semantic embeddings in a vectorstore."""
-    documents = [
+def entity_semantic_documents(entities: typing.List[_model.Entity]) -> typing.List[_vector_stores.VectorStoreDocument]:
+    """Convert entities into vectorstore documents of their semantic embeddings."""
+    return [
         _vector_stores.VectorStoreDocument(
             id=entity.id,
             text=entity.description,
@@ -71,7 +85,14 @@ def store_entity_semantic_embeddings(
         )
         for entity in entities
     ]
-    vectorstore.load_documents(documents=documents)
+
+
+def store_entity_semantic_embeddings(
+    entities: typing.List[_model.Entity],
+    vectorstore: _vector_stores.BaseVectorStore,
+) -> _vector_stores.BaseVectorStore:
+    """Store entity semantic embeddings in a vectorstore."""
+    vectorstore.load_documents(documents=entity_semantic_documents(entities))
     return vectorstore
 
 
@@ -109,26 +130,40 @@ def read_relationships(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.Relationship]:
     """Read relationships from a dataframe."""
-    relationships = []
-    for idx, row in df.iterrows():
-        rel = _model.Relationship(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            source=_utils.to_str(row, source_col),
-            target=_utils.to_str(row, target_col),
-            description=_utils.to_optional_str(row, description_col),
-            description_embedding=_utils.to_optional_list(
-                row, description_embedding_col, item_type=float
-            ),
-            weight=_utils.to_optional_float(row, weight_col) or 0.0,
-            text_unit_ids=_utils.to_optional_list(row, text_unit_ids_col, item_type=str),
-            document_ids=_utils.to_optional_list(row, document_ids_col, item_type=str),
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.Relationship.model_construct(
+            id=id_,
+            short_id=short_id,
+            source=source,
+            target=target,
+            description=description,
+            description_embedding=description_embedding,
+            weight=weight or 0.0,
+            text_unit_ids=text_unit_ids,
+            document_ids=document_ids,
+            attributes=attributes,
+        )
+        for (
+            id_, short_id, source, target, description, description_embedding, weight, text_unit_ids,
+            document_ids, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, source_col),
+            _utils.to_str_column(df, target_col),
+            _utils.to_optional_str_column(df, description_col),
+            _utils.to_optional_list_column(df, description_embedding_col, item_type=float),
+            _utils.to_optional_float_column(df, weight_col),
+            _utils.to_optional_list_column(df, text_unit_ids_col, item_type=str),
+            _utils.to_optional_list_column(df, document_ids_col, item_type=str),
+            _utils.to_attributes_column(df, attributes_cols),
         )
-        relationships.append(rel)
-    return relationships
+    ]
 
 
 def read_covariates(
@@ -143,26 +178,35 @@ def read_covariates(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.Covariate]:
     """Read covariates from a dataframe."""
-    covariates = []
-    for idx, row in df.iterrows():
-        cov = _model.Covariate(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            subject_id=_utils.to_str(row, subject_col),
-            subject_type=(
-                _utils.to_str(row, subject_type_col) if subject_type_col else "entity"
-            ),
-            covariate_type=(
-                _utils.to_str(row, covariate_type_col) if covariate_type_col else "claim"
-            ),
-            text_unit_ids=_utils.to_optional_list(row, text_unit_ids_col, item_type=str),
-            document_ids=_utils.to_optional_list(row, document_ids_col, item_type=str),
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.Covariate.model_construct(
+            id=id_,
+            short_id=short_id,
+            subject_id=subject_id,
+            subject_type=subject_type,
+            covariate_type=covariate_type,
+            text_unit_ids=text_unit_ids,
+            document_ids=document_ids,
+            attributes=attributes,
         )
-        covariates.append(cov)
-    return covariates
+        for (
+            id_, short_id, subject_id, subject_type, covariate_type, text_unit_ids, document_ids, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, subject_col),
+            _utils.to_str_column(df, subject_type_col) if subject_type_col else ["entity"] * len(df),
+            _utils.to_str_column(df, covariate_type_col) if covariate_type_col else ["claim"] * len(df),
+            _utils.to_optional_list_column(df, text_unit_ids_col, item_type=str),
+            _utils.to_optional_list_column(df, document_ids_col, item_type=str),
+            _utils.to_attributes_column(df, attributes_cols),
+        )
+    ]
 
 
 def read_communities(
@@ -177,24 +221,33 @@ def read_communities(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.Community]:
     """Read communities from a dataframe."""
-    communities = []
-    for idx, row in df.iterrows():
-        comm = _model.Community(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            title=_utils.to_str(row, title_col),
-            level=_utils.to_str(row, level_col),
-            entity_ids=_utils.to_optional_list(row, entities_col, item_type=str),
-            relationship_ids=_utils.to_optional_list(row, relationships_col, item_type=str),
-            covariate_ids=_utils.to_optional_dict(
-                row, covariates_col, key_type=str, value_type=str
-            ),
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.Community.model_construct(
+            id=id_,
+            short_id=short_id,
+            title=title,
+            level=level,
+            entity_ids=entity_ids,
+            relationship_ids=relationship_ids,
+            covariate_ids=covariate_ids,
+            attributes=attributes,
         )
-        communities.append(comm)
-    return communities
+        for id_, short_id, title, level, entity_ids, relationship_ids, covariate_ids, attributes in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, title_col),
+            _utils.to_str_column(df, level_col),
+            _utils.to_optional_list_column(df, entities_col, item_type=str),
+            _utils.to_optional_list_column(df, relationships_col, item_type=str),
+            _utils.to_optional_dict_column(df, covariates_col, key_type=str, value_type=str),
+            _utils.to_attributes_column(df, attributes_cols),
+        )
+    ]
 
 
 def read_community_reports(
@@ -211,28 +264,40 @@ def read_community_reports(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.CommunityReport]:
     """Read community reports from a dataframe."""
-    reports = []
-    for idx, row in df.iterrows():
-        report = _model.CommunityReport(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            title=_utils.to_str(row, title_col),
-            community_id=_utils.to_str(row, community_col),
-            summary=_utils.to_str(row, summary_col),
-            full_content=_utils.to_str(row, content_col),
-            rank=_utils.to_optional_float(row, rank_col) or 0.0,
-            summary_embedding=_utils.to_optional_list(
-                row, summary_embedding_col, item_type=float
-            ),
-            full_content_embedding=_utils.to_optional_list(
-                row, content_embedding_col, item_type=float
-            ),
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.CommunityReport.model_construct(
+            id=id_,
+            short_id=short_id,
+            title=title,
+            community_id=community_id,
+            summary=summary,
+            full_content=full_content,
+            rank=rank or 0.0,
+            summary_embedding=summary_embedding,
+            full_content_embedding=full_content_embedding,
+            attributes=attributes,
         )
-        reports.append(report)
-    return reports
+        for (
+            id_, short_id, title, community_id, summary, full_content, rank, summary_embedding,
+            full_content_embedding, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, title_col),
+            _utils.to_str_column(df, community_col),
+            _utils.to_str_column(df, summary_col),
+            _utils.to_str_column(df, content_col),
+            _utils.to_optional_float_column(df, rank_col),
+            _utils.to_optional_list_column(df, summary_embedding_col, item_type=float),
+            _utils.to_optional_list_column(df, content_embedding_col, item_type=float),
+            _utils.to_attributes_column(df, attributes_cols),
+        )
+    ]
 
 
 def read_text_units(
@@ -249,26 +314,40 @@ def read_text_units(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.TextUnit]:
     """Read text units from a dataframe."""
-    text_units = []
-    for idx, row in df.iterrows():
-        chunk = _model.TextUnit(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            text=_utils.to_str(row, text_col),
-            entity_ids=_utils.to_optional_list(row, entities_col, item_type=str),
-            relationship_ids=_utils.to_optional_list(row, relationships_col, item_type=str),
-            covariate_ids=_utils.to_optional_dict(
-                row, covariates_col, key_type=str, value_type=str
-            ),
-            text_embedding=_utils.to_optional_list(row, embedding_col, item_type=float),  # type: ignore
-            n_tokens=_utils.to_optional_int(row, tokens_col),
-            document_ids=_utils.to_optional_list(row, document_ids_col, item_type=str),
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.TextUnit.model_construct(
+            id=id_,
+            short_id=short_id,
+            text=text,
+            entity_ids=entity_ids,
+            relationship_ids=relationship_ids,
+            covariate_ids=covariate_ids,
+            text_embedding=text_embedding,
+            n_tokens=n_tokens,
+            document_ids=document_ids,
+            attributes=attributes,
+        )
+        for (
+            id_, short_id, text, entity_ids, relationship_ids, covariate_ids, text_embedding, n_tokens,
+            document_ids, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, text_col),
+            _utils.to_optional_list_column(df, entities_col, item_type=str),
+            _utils.to_optional_list_column(df, relationships_col, item_type=str),
+            _utils.to_optional_dict_column(df, covariates_col, key_type=str, value_type=str),
+            _utils.to_optional_list_column(df, embedding_col, item_type=float),
+            _utils.to_optional_int_column(df, tokens_col),
+            _utils.to_optional_list_column(df, document_ids_col, item_type=str),
+            _utils.to_attributes_column(df, attributes_cols),
         )
-        text_units.append(chunk)
-    return text_units
+    ]
 
 
 def read_documents(
@@ -285,25 +364,37 @@ def read_documents(
     attributes_cols: typing.Optional[typing.List[str]] = None,
 ) -> typing.List[_model.Document]:
     """Read documents from a dataframe."""
-    docs = []
-    for idx, row in df.iterrows():
-        doc = _model.Document(
-            id=_utils.to_str(row, id_col),
-            short_id=_utils.to_optional_str(row, short_id_col) if short_id_col else str(idx),
-            title=_utils.to_str(row, title_col),
-            type=_utils.to_str(row, type_col),
-            summary=_utils.to_optional_str(row, summary_col),
-            raw_content=_utils.to_str(row, raw_content_col),
-            summary_embedding=_utils.to_optional_list(
-                row, summary_embedding_col, item_type=float
-            ),
-            raw_content_embedding=_utils.to_optional_list(
-                row, content_embedding_col, item_type=float
-            ),
-            text_units=to_list(row, text_units_col, item_type=str),  # type: ignore
-            attributes=(
-                {col: row.get(col) for col in attributes_cols} if attributes_cols else None
-            ),
+    if len(df) == 0:
+        return []
+    short_ids = (
+        _utils.to_optional_str_column(df, short_id_col) if short_id_col else [str(idx) for idx in df.index]
+    )
+    return [
+        _model.Document.model_construct(
+            id=id_,
+            short_id=short_id,
+            title=title,
+            type=type_,
+            summary=summary,
+            raw_content=raw_content,
+            summary_embedding=summary_embedding,
+            raw_content_embedding=raw_content_embedding,
+            text_unit_ids=text_unit_ids,
+            attributes=attributes,
+        )
+        for (
+            id_, short_id, title, type_, summary, raw_content, summary_embedding, raw_content_embedding,
+            text_unit_ids, attributes,
+        ) in zip(
+            _utils.to_str_column(df, id_col),
+            short_ids,
+            _utils.to_str_column(df, title_col),
+            _utils.to_str_column(df, type_col),
+            _utils.to_optional_str_column(df, summary_col),
+            _utils.to_str_column(df, raw_content_col),
+            _utils.to_optional_list_column(df, summary_embedding_col, item_type=float),
+            _utils.to_optional_list_column(df, content_embedding_col, item_type=float),
+            _utils.to_list_column(df, text_units_col, item_type=str),
+            _utils.to_attributes_column(df, attributes_cols),
         )
-        docs.append(doc)
-    return docs
+    ]
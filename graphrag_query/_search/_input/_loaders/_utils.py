@@ -212,3 +212,157 @@ def to_optional_dict(
         return value
 
     raise ValueError(f"Column {column_name} not found in data")
+
+
+def column_values(df: pd.DataFrame, column_name: str) -> list:
+    """
+    Return the values of a column as a list of Python objects.
+
+    Values are boxed the same way `DataFrame.iterrows` boxes them, so the
+    column converters below accept and reject exactly what their row-wise
+    counterparts do.
+    """
+    if column_name not in df.columns:
+        raise ValueError(f"Column {column_name} not found in data")
+    if any(pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) for dtype in df.dtypes):
+        # frames with object columns are interleaved as object rows: numeric
+        # columns are boxed to Python scalars, which is what `tolist` does for
+        # NumPy dtypes
+        column = df[column_name]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biuf":
+            return column.tolist()
+        return column.astype(object).tolist()
+    # homogeneous frames keep (or upcast to) their common dtype per row
+    return df.to_numpy()[:, df.columns.get_loc(column_name)].tolist()
+
+
+def to_str_column(df: pd.DataFrame, column_name: typing.Optional[str]) -> typing.List[str]:
+    """Convert and validate a column to strings."""
+    if column_name is None:
+        raise ValueError("Column name is None")
+    return [str(value) for value in column_values(df, column_name)]
+
+
+def to_optional_str_column(
+    df: pd.DataFrame, column_name: typing.Optional[str]
+) -> typing.List[typing.Optional[str]]:
+    """Convert and validate a column to optional strings."""
+    if column_name is None:
+        raise ValueError("Column name is None")
+    return [None if value is None else str(value) for value in column_values(df, column_name)]
+
+
+def to_list_column(
+    df: pd.DataFrame, column_name: typing.Optional[str], item_type: typing.Optional[type] = None
+) -> typing.List[list]:
+    """Convert and validate a column to lists."""
+    if column_name is None:
+        raise ValueError("Column name is None")
+    return [_as_list(value, item_type) for value in column_values(df, column_name)]
+
+
+def to_optional_list_column(
+    df: pd.DataFrame, column_name: typing.Optional[str], item_type: typing.Optional[type] = None
+) -> typing.List[typing.Optional[list]]:
+    """Convert and validate a column to optional lists."""
+    if column_name is None or column_name not in df.columns:
+        return [None] * len(df)
+    return [None if value is None else _as_list(value, item_type) for value in column_values(df, column_name)]
+
+
+def to_optional_int_column(
+    df: pd.DataFrame, column_name: typing.Optional[str]
+) -> typing.List[typing.Optional[int]]:
+    """Convert and validate a column to optional ints."""
+    if column_name is None:
+        return [None] * len(df)
+    values = column_values(df, column_name)
+    if all(type(value) is int for value in values):
+        return values
+    return [None if value is None else _as_int(value) for value in values]
+
+
+def to_optional_float_column(
+    df: pd.DataFrame, column_name: typing.Optional[str]
+) -> typing.List[typing.Optional[float]]:
+    """Convert and validate a column to optional floats."""
+    if column_name is None:
+        return [None] * len(df)
+    values = column_values(df, column_name)
+    if all(type(value) is float for value in values):
+        return values
+    for value in values:
+        if value is not None and not isinstance(value, float):
+            raise ValueError(f"value is not a float: {value} ({type(value)})")
+    return [None if value is None else float(value) for value in values]
+
+
+def to_optional_dict_column(
+    df: pd.DataFrame,
+    column_name: typing.Optional[str],
+    key_type: typing.Optional[type] = None,
+    value_type: typing.Optional[type] = None,
+) -> typing.List[typing.Optional[dict]]:
+    """Convert and validate a column to optional dicts."""
+    if column_name is None:
+        return [None] * len(df)
+    return [
+        None if value is None else _as_dict(value, key_type, value_type)
+        for value in column_values(df, column_name)
+    ]
+
+
+def to_attributes_column(
+    df: pd.DataFrame, attributes_cols: typing.Optional[typing.List[str]]
+) -> typing.List[typing.Optional[typing.Dict[str, typing.Any]]]:
+    """Collect the attribute columns into one dict per row (missing columns map to None)."""
+    if not attributes_cols:
+        return [None] * len(df)
+    columns = [
+        column_values(df, col) if col in df.columns else [None] * len(df)
+        for col in attributes_cols
+    ]
+    return [dict(zip(attributes_cols, values)) for values in zip(*columns)]
+
+
+def _as_list(value: typing.Any, item_type: typing.Optional[type]) -> list:
+    if isinstance(value, np.ndarray):
+        if item_type is float and value.dtype.kind == "f":
+            # floating arrays convert to Python floats, no per-item check needed
+            return value.tolist()
+        value = value.tolist()
+
+    if not isinstance(value, list):
+        raise ValueError(f"value is not a list: {value} ({type(value)})")
+
+    if item_type is not None:
+        for v in value:
+            if not isinstance(v, item_type):
+                raise TypeError(f"list item has item that is not {item_type}: {v} ({type(v)})")
+    return value
+
+
+def _as_int(value: typing.Any) -> int:
+    if isinstance(value, float):
+        value = int(value)
+    if not isinstance(value, int):
+        raise ValueError(f"value is not an int: {value} ({type(value)})")
+    return int(value)
+
+
+def _as_dict(
+    value: typing.Any, key_type: typing.Optional[type], value_type: typing.Optional[type]
+) -> dict:
+    if not isinstance(value, dict):
+        raise TypeError(f"value is not a dict: {value} ({type(value)})")
+
+    if key_type is not None:
+        for v in value:
+            if not isinstance(v, key_type):
+                raise TypeError(f"dict key has item that is not {key_type}: {v} ({type(v)})")
+
+    if value_type is not None:
+        for v in value.values():
+            if not isinstance(v, value_type):
+                raise TypeError(f"dict value has item that is not {value_type}: {v} ({type(v)})")
+    return value
@@ -6,10 +6,131 @@ from __future__ import annotations
 import typing
 
 import pandas as pd
+import typing_extensions
 
 from ... import _model
 
 
+class CommunityHierarchy:
+    """
+    Parent-to-children index over the community reports of every level.
+
+    The communities of an index form a tree: each community of a level is
+    split into the communities of the next level. The index keeps the reports
+    of every level (not only those of the community level a context builder
+    was resolved at), so that a search can start from the top-level reports
+    and descend into the children of the relevant ones. A community without a
+    report is skipped: its children hang from its nearest ancestor with a
+    report, or are roots if there is none.
+
+    Attributes:
+        _reports: Maps a community ID to its report.
+        _by_short_id:
+            Maps the short ID of a report (its ID in the rendered context) to
+            its community ID.
+        _children:
+            Maps a community ID to the IDs of its child communities, by
+            descending rank.
+        _parents: Maps a community ID to the ID of its parent community.
+        _roots: The IDs of the communities without a parent, by descending rank.
+    """
+    _reports: typing.Dict[str, _model.CommunityReport]
+    _by_short_id: typing.Dict[str, str]
+    _children: typing.Dict[str, typing.List[str]]
+    _parents: typing.Dict[str, str]
+    _roots: typing.List[str]
+
+    @property
+    def reports(self) -> typing.List[_model.CommunityReport]:
+        return list(self._reports.values())
+
+    @property
+    def parents(self) -> typing.Dict[str, str]:
+        return self._parents
+
+    @property
+    def roots(self) -> typing.List[str]:
+        return self._roots
+
+    def __init__(
+        self,
+        reports: typing.Iterable[_model.CommunityReport],
+        parents: typing.Mapping[str, str],
+    ) -> None:
+        """
+        Args:
+            reports: The community reports of every level.
+            parents:
+                Maps a community ID to the ID of its parent community; it may
+                name communities without a report.
+        """
+        self._reports = {report.community_id: report for report in reports}
+        self._by_short_id = {
+            report.short_id: community_id
+            for community_id, report in self._reports.items() if report.short_id is not None
+        }
+        self._children = {}
+        self._parents = {}
+        self._roots = []
+        for community_id in self._reports:
+            parent = parents.get(community_id)
+            seen = {community_id}
+            # climb to the nearest ancestor with a report (guarding against cycles)
+            while parent is not None and parent not in self._reports and parent not in seen:
+                seen.add(parent)
+                parent = parents.get(parent)
+            if parent is None or parent not in self._reports or parent in seen:
+                self._roots.append(community_id)
+            else:
+                self._parents[community_id] = parent
+                self._children.setdefault(parent, []).append(community_id)
+
+        def _by_rank(community_id: str) -> float:
+            return -(self._reports[community_id].rank or 0.0)
+
+        self._roots.sort(key=_by_rank)
+        for children in self._children.values():
+            children.sort(key=_by_rank)
+
+    def __len__(self) -> int:
+        return self._reports.__len__()
+
+    def __contains__(self, community_id: object) -> bool:
+        return community_id in self._reports
+
+    def get(self, community_id: str) -> typing.Optional[_model.CommunityReport]:
+        """Get the report of a community."""
+        return self._reports.get(community_id)
+
+    def children(self, community_id: str) -> typing.List[str]:
+        """Get the IDs of the child communities of a community, by descending rank."""
+        return self._children.get(community_id, [])
+
+    def resolve(self, short_id: str) -> typing.Optional[str]:
+        """Get the community ID of a report from its short ID."""
+        return self._by_short_id.get(short_id)
+
+    def depth(self) -> int:
+        """Return the number of levels of the tree."""
+        depth = 0
+        level = self._roots
+        while level:
+            depth += 1
+            level = [child for community_id in level for child in self.children(community_id)]
+        return depth
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(communities={self._reports.__len__()}, roots={self._roots.__len__()}, "
+            f"depth={self.depth()})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 def get_candidate_communities(
     selected_entities: typing.List[_model.Entity],
     community_reports: typing.List[_model.CommunityReport],
@@ -7,14 +7,118 @@ import uuid
 import typing
 
 import pandas as pd
+import typing_extensions
 
 from ... import _model
 
 
+class EntityIndex:
+    """
+    Lookup index over a fixed list of entities.
+
+    The index is built once from the full entity list and resolves vector
+    store hits (by id or title, accepting UUIDs with or without dashes) and
+    entity names without scanning every entity. Lookups return the first
+    matching entity in the order of the original list, so results match a
+    full scan.
+
+    Attributes:
+        _entities: The indexed entities, in their original order.
+        _by_key:
+            Per entity attribute, maps an attribute value to the position of
+            the first entity that has it. The "id" and "title" attributes are
+            indexed up front, others on first use.
+        _by_title: Maps a title to the positions of the entities with it.
+        _ranked:
+            The positions of the entities sorted by descending rank (ties in
+            their original order), computed on first use.
+    """
+    _entities: typing.List[_model.Entity]
+    _by_key: typing.Dict[str, typing.Dict[typing.Any, int]]
+    _by_title: typing.Dict[str, typing.List[int]]
+    _ranked: typing.Optional[typing.List[int]]
+
+    @classmethod
+    def from_entities(
+        cls,
+        entities: typing.Union[typing.Iterable[_model.Entity], EntityIndex],
+    ) -> EntityIndex:
+        """Return `entities` if it is already an index, otherwise index it."""
+        if isinstance(entities, EntityIndex):
+            return entities
+        return cls(entities)
+
+    @property
+    def entities(self) -> typing.List[_model.Entity]:
+        return self._entities
+
+    def __init__(self, entities: typing.Iterable[_model.Entity]) -> None:
+        self._entities = list(entities)
+        self._by_key = {}
+        self._by_title = {}
+        self._ranked = None
+        for pos, entity in enumerate(self._entities):
+            self._by_title.setdefault(entity.title, []).append(pos)
+        self._index_key("id")
+        self._index_key("title")
+
+    def __len__(self) -> int:
+        return self._entities.__len__()
+
+    def __iter__(self) -> typing.Iterator[_model.Entity]:
+        return self._entities.__iter__()
+
+    def get_by_key(self, key: str, value: str | int) -> typing.Optional[_model.Entity]:
+        """
+        Get the entity whose `key` attribute equals `value`. A UUID with dashes
+        also matches the same UUID stored without them.
+        """
+        by_value = self._by_key.get(key)
+        if by_value is None:
+            by_value = self._index_key(key)
+        pos = by_value.get(value)
+        if isinstance(value, str) and "-" in value and is_valid_uuid(value):
+            stripped_pos = by_value.get(value.replace("-", ""))
+            if stripped_pos is not None and (pos is None or stripped_pos < pos):
+                pos = stripped_pos
+        return self._entities[pos] if pos is not None else None
+
+    def get_by_name(self, entity_name: str) -> typing.List[_model.Entity]:
+        """Get all entities titled `entity_name`."""
+        return [self._entities[pos] for pos in self._by_title.get(entity_name, [])]
+
+    def top_ranked(self, k: int) -> typing.List[_model.Entity]:
+        """Get the `k` entities with the highest rank."""
+        if self._ranked is None:
+            self._ranked = sorted(
+                range(self._entities.__len__()),
+                key=lambda pos: self._entities[pos].rank or 0,
+                reverse=True,
+            )
+        return [self._entities[pos] for pos in self._ranked[:k]]
+
+    def _index_key(self, key: str) -> typing.Dict[typing.Any, int]:
+        by_value: typing.Dict[typing.Any, int] = {}
+        for pos, entity in enumerate(self._entities):
+            by_value.setdefault(getattr(entity, key), pos)
+        self._by_key[key] = by_value
+        return by_value
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(entities={self._entities.__len__()})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 def get_entity_by_key(
-    entities: typing.Iterable[_model.Entity], key: str, value: str | int
+    entities: typing.Union[typing.Iterable[_model.Entity], EntityIndex], key: str, value: str | int
 ) -> typing.Optional[_model.Entity]:
     """Get entity by key."""
+    if isinstance(entities, EntityIndex):
+        return entities.get_by_key(key, value)
     for entity in entities:
         if isinstance(value, str) and is_valid_uuid(value):
             if getattr(entity, key) == value or getattr(entity, key) == value.replace("-", ""):
@@ -25,8 +129,12 @@ def get_entity_by_key(
     return None
 
 
-def get_entity_by_name(entities: typing.Iterable[_model.Entity], entity_name: str) -> typing.List[_model.Entity]:
+def get_entity_by_name(
+    entities: typing.Union[typing.Iterable[_model.Entity], EntityIndex], entity_name: str
+) -> typing.List[_model.Entity]:
     """Get entities by name."""
+    if isinstance(entities, EntityIndex):
+        return entities.get_by_name(entity_name)
     return [entity for entity in entities if entity.title == entity_name]
 
 
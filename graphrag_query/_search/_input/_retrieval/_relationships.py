@@ -6,22 +6,162 @@ from __future__ import annotations
 import typing
 
 import pandas as pd
+import typing_extensions
 
 from ... import _model
 
 
+class RelationshipIndex:
+    """
+    Adjacency index over a fixed list of relationships.
+
+    The index is built once from the full relationship list and answers the
+    lookups used during context building (edges by source, by target, by
+    (source, target) pair, by text unit and by id) without scanning the whole
+    graph. Lookups return relationships in the order of the original list, so
+    results (and the order of ties after sorting) match a full scan.
+
+    Attributes:
+        _relationships: The indexed relationships, in their original order.
+        _by_id: Maps a relationship ID to its position in `_relationships`.
+        _by_source: Maps a source entity name to the positions of its edges.
+        _by_target: Maps a target entity name to the positions of its edges.
+        _by_pair:
+            Maps a (source, target) pair to the position of the first edge
+            between them.
+        _by_text_unit:
+            Maps a text unit ID to the positions of the edges that appear in
+            it.
+    """
+    _relationships: typing.List[_model.Relationship]
+    _by_id: typing.Dict[str, int]
+    _by_source: typing.Dict[str, typing.List[int]]
+    _by_target: typing.Dict[str, typing.List[int]]
+    _by_pair: typing.Dict[typing.Tuple[str, str], int]
+    _by_text_unit: typing.Dict[str, typing.List[int]]
+
+    @classmethod
+    def from_relationships(
+        cls,
+        relationships: typing.Union[typing.List[_model.Relationship], RelationshipIndex],
+    ) -> RelationshipIndex:
+        """Return `relationships` if it is already an index, otherwise index it."""
+        if isinstance(relationships, RelationshipIndex):
+            return relationships
+        return cls(relationships)
+
+    @property
+    def relationships(self) -> typing.List[_model.Relationship]:
+        return self._relationships
+
+    def __init__(self, relationships: typing.Iterable[_model.Relationship]) -> None:
+        self._relationships = list(relationships)
+        self._by_id = {}
+        self._by_source = {}
+        self._by_target = {}
+        self._by_pair = {}
+        self._by_text_unit = {}
+        for pos, rel in enumerate(self._relationships):
+            self._by_id.setdefault(rel.id, pos)
+            self._by_source.setdefault(rel.source, []).append(pos)
+            self._by_target.setdefault(rel.target, []).append(pos)
+            self._by_pair.setdefault((rel.source, rel.target), pos)
+            for text_unit_id in set(rel.text_unit_ids or []):
+                self._by_text_unit.setdefault(text_unit_id, []).append(pos)
+
+    def __len__(self) -> int:
+        return self._relationships.__len__()
+
+    def __iter__(self) -> typing.Iterator[_model.Relationship]:
+        return self._relationships.__iter__()
+
+    def get(self, relationship_id: str) -> typing.Optional[_model.Relationship]:
+        """Get a relationship by ID."""
+        pos = self._by_id.get(relationship_id)
+        return self._relationships[pos] if pos is not None else None
+
+    def get_by_pair(self, source: str, target: str) -> typing.Optional[_model.Relationship]:
+        """Get the relationship from `source` to `target`."""
+        pos = self._by_pair.get((source, target))
+        return self._relationships[pos] if pos is not None else None
+
+    def get_by_source(self, source: str) -> typing.List[_model.Relationship]:
+        """Get all relationships whose source is `source`."""
+        return [self._relationships[pos] for pos in self._by_source.get(source, [])]
+
+    def get_by_target(self, target: str) -> typing.List[_model.Relationship]:
+        """Get all relationships whose target is `target`."""
+        return [self._relationships[pos] for pos in self._by_target.get(target, [])]
+
+    def get_by_entity(self, entity_name: str) -> typing.List[_model.Relationship]:
+        """Get all relationships that have `entity_name` as source or target."""
+        return self._select(
+            {*self._by_source.get(entity_name, []), *self._by_target.get(entity_name, [])}
+        )
+
+    def get_by_text_unit(self, text_unit_id: str) -> typing.List[_model.Relationship]:
+        """Get all relationships that appear in the given text unit."""
+        return [self._relationships[pos] for pos in self._by_text_unit.get(text_unit_id, [])]
+
+    def in_network(self, entity_names: typing.Collection[str]) -> typing.List[_model.Relationship]:
+        """Get all relationships whose source and target are both in `entity_names`."""
+        return self._select(
+            pos
+            for name in set(entity_names)
+            for pos in self._by_source.get(name, [])
+            if self._relationships[pos].target in entity_names
+        )
+
+    def out_network(
+        self, entity_names: typing.Collection[str]
+    ) -> typing.Tuple[typing.List[_model.Relationship], typing.List[_model.Relationship]]:
+        """
+        Get the relationships that leave `entity_names` (source inside, target
+        outside) and the ones that enter it (target inside, source outside).
+        """
+        names = set(entity_names)
+        outgoing = self._select(
+            pos
+            for name in names
+            for pos in self._by_source.get(name, [])
+            if self._relationships[pos].target not in names
+        )
+        incoming = self._select(
+            pos
+            for name in names
+            for pos in self._by_target.get(name, [])
+            if self._relationships[pos].source not in names
+        )
+        return outgoing, incoming
+
+    def adjacent(self, entity_names: typing.Collection[str]) -> typing.List[_model.Relationship]:
+        """Get all relationships that have a source or target in `entity_names`."""
+        positions: typing.Set[int] = set()
+        for name in set(entity_names):
+            positions.update(self._by_source.get(name, []))
+            positions.update(self._by_target.get(name, []))
+        return self._select(positions)
+
+    def _select(self, positions: typing.Iterable[int]) -> typing.List[_model.Relationship]:
+        return [self._relationships[pos] for pos in sorted(positions)]
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(num_relationships={len(self._relationships)})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 def get_in_network_relationships(
     selected_entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
+    relationships: typing.Union[typing.List[_model.Relationship], RelationshipIndex],
     ranking_attribute: str = "rank",
 ) -> typing.List[_model.Relationship]:
     """Get all directed relationships between selected entities, sorted by ranking_attribute."""
-    selected_entity_names = [entity.title for entity in selected_entities]
-    selected_relationships = [
-        relationship
-        for relationship in relationships
-        if relationship.source in selected_entity_names and relationship.target in selected_entity_names
-    ]
+    selected_entity_names = {entity.title for entity in selected_entities}
+    selected_relationships = RelationshipIndex.from_relationships(relationships).in_network(selected_entity_names)
     if len(selected_relationships) <= 1:
         return selected_relationships
 
@@ -33,22 +173,15 @@ def get_in_network_relationships(
 
 def get_out_network_relationships(
     selected_entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
+    relationships: typing.Union[typing.List[_model.Relationship], RelationshipIndex],
     ranking_attribute: str = "rank",
 ) -> typing.List[_model.Relationship]:
     """Get relationships from selected entities to other entities that are not within the selected entities,
     sorted by ranking_attribute."""
-    selected_entity_names = [entity.title for entity in selected_entities]
-    source_relationships = [
-        relationship
-        for relationship in relationships
-        if relationship.source in selected_entity_names and relationship.target not in selected_entity_names
-    ]
-    target_relationships = [
-        relationship
-        for relationship in relationships
-        if relationship.target in selected_entity_names and relationship.source not in selected_entity_names
-    ]
+    selected_entity_names = {entity.title for entity in selected_entities}
+    source_relationships, target_relationships = RelationshipIndex.from_relationships(
+        relationships
+    ).out_network(selected_entity_names)
     selected_relationships = source_relationships + target_relationships
     return sort_relationships_by_ranking_attribute(
         selected_relationships, selected_entities, ranking_attribute
@@ -57,44 +190,43 @@ def get_out_network_relationships(
 
 def get_candidate_relationships(
     selected_entities: typing.List[_model.Entity],
-    relationships: typing.List[_model.Relationship],
+    relationships: typing.Union[typing.List[_model.Relationship], RelationshipIndex],
 ) -> typing.List[_model.Relationship]:
     """Get all relationships that are associated with the selected entities."""
-    selected_entity_names = [entity.title for entity in selected_entities]
-    return [
-        relationship
-        for relationship in relationships
-        if relationship.source in selected_entity_names or relationship.target in selected_entity_names
-    ]
+    selected_entity_names = {entity.title for entity in selected_entities}
+    return RelationshipIndex.from_relationships(relationships).adjacent(selected_entity_names)
 
 
 def get_entities_from_relationships(
     relationships: typing.List[_model.Relationship], entities: typing.List[_model.Entity]
 ) -> typing.List[_model.Entity]:
     """Get all entities that are associated with the selected relationships."""
-    selected_entity_names = [relationship.source for relationship in relationships] + [
+    selected_entity_names = {relationship.source for relationship in relationships} | {
         relationship.target for relationship in relationships
-    ]
+    }
     return [entity for entity in entities if entity.title in selected_entity_names]
 
 
 def calculate_relationship_combined_rank(
     relationships: typing.List[_model.Relationship],
     entities: typing.List[_model.Entity],
-    ranking_attribute: str = "rank",
-) -> typing.List[_model.Relationship]:
-    """Calculate default rank for a relationship based on the combined rank of source and target entities."""
+) -> typing.Dict[str, int]:
+    """
+    Calculate default rank for a relationship based on the combined rank of source and target entities.
+
+    The ranks are returned by relationship ID rather than stored in the relationship attributes, as they depend on
+    the given entities and the relationships are shared by concurrent context builds.
+    """
     entity_mappings = {entity.title: entity for entity in entities}
 
+    ranks: typing.Dict[str, int] = {}
     for relationship in relationships:
-        if relationship.attributes is None:
-            relationship.attributes = {}
         source = entity_mappings.get(relationship.source)
         target = entity_mappings.get(relationship.target)
         source_rank = source.rank if source and source.rank else 0
         target_rank = target.rank if target and target.rank else 0
-        relationship.attributes[ranking_attribute] = source_rank + target_rank  # type: ignore
-    return relationships
+        ranks[relationship.id] = source_rank + target_rank
+    return ranks
 
 
 def sort_relationships_by_ranking_attribute(
@@ -123,13 +255,8 @@ def sort_relationships_by_ranking_attribute(
         relationships.sort(key=lambda x: x.weight if x.weight else 0.0, reverse=True)
     else:
         # ranking attribute do not exist, calculate rank = combined ranks of source and target
-        relationships = calculate_relationship_combined_rank(
-            relationships, entities, ranking_attribute
-        )
-        relationships.sort(
-            key=lambda x: int(x.attributes[ranking_attribute]) if x.attributes else 0,
-            reverse=True,
-        )
+        ranks = calculate_relationship_combined_rank(relationships, entities)
+        relationships.sort(key=lambda x: ranks[x.id], reverse=True)
     return relationships
 
 
@@ -9,6 +9,12 @@ from ._base_llm import (
     BaseChatLLM,
     BaseEmbedding,
 )
+from ._cache import (
+    BaseEmbeddingCache,
+    MemoryEmbeddingCache,
+    SqliteEmbeddingCache,
+    embedding_cache_key,
+)
 from ._chat import (
     AsyncChatLLM,
     ChatLLM,
@@ -30,6 +36,10 @@ __all__ = [
     "BaseAsyncEmbedding",
     "BaseChatLLM",
     "BaseEmbedding",
+    "BaseEmbeddingCache",
+    "MemoryEmbeddingCache",
+    "SqliteEmbeddingCache",
+    "embedding_cache_key",
     "ChatLLM",
     "AsyncChatLLM",
     "Embedding",
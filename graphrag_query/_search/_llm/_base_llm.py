@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import abc
+import asyncio
 import typing
 
 import typing_extensions
@@ -142,6 +143,20 @@ class BaseEmbedding(abc.ABC):
         """
         ...
 
+    def embed_many(self, texts: typing.Sequence[str], **kwargs: typing.Any) -> typing.List[_types.EmbeddingResponse_T]:
+        """
+        Generates embeddings for many texts. Implementations should override
+        this to batch the requests; the default embeds the texts one by one.
+
+        Args:
+            texts: The texts to embed.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        return [self.embed(text, **kwargs) for text in texts]
+
     @abc.abstractmethod
     def close(self) -> None:
         """
@@ -185,6 +200,25 @@ class BaseAsyncEmbedding(abc.ABC):
         """
         ...
 
+    async def aembed_many(
+        self,
+        texts: typing.Sequence[str],
+        **kwargs: typing.Any
+    ) -> typing.List[_types.EmbeddingResponse_T]:
+        """
+        Asynchronously generates embeddings for many texts. Implementations
+        should override this to batch the requests; the default embeds the
+        texts concurrently, one request each.
+
+        Args:
+            texts: The texts to embed.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        return list(await asyncio.gather(*[self.aembed(text, **kwargs) for text in texts]))
+
     @abc.abstractmethod
     async def aclose(self) -> None:
         """
@@ -0,0 +1,256 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Caches for query embeddings.
+
+Repeated queries (dashboards, retries, the same question across conversation
+turns) would otherwise cost an embeddings request each time. The caches map a
+key derived from the model, the request options and the normalized text to the
+embedding, bounded by a maximum number of entries with least-recently-used
+eviction and an optional time-to-live.
+
+Classes:
+    BaseEmbeddingCache: Interface of the embedding caches.
+    MemoryEmbeddingCache: An in-process cache.
+    SqliteEmbeddingCache: An on-disk cache backed by a SQLite database.
+
+Functions:
+    embedding_cache_key: Builds the cache key of an embedding request.
+"""
+
+from __future__ import annotations
+
+import abc
+import array
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+import unicodedata
+
+import typing_extensions
+
+from .. import _defaults
+
+
+def embedding_cache_key(model: str, text: str, **kwargs: typing.Any) -> str:
+    """
+    Builds the cache key of an embedding request.
+
+    The text is normalized (NFC, surrounding whitespace stripped and inner
+    whitespace collapsed) so trivially different spellings of a query share an
+    entry; request options that change the embedding (e.g. `dimensions`) are
+    part of the key.
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    options = json.dumps(kwargs, sort_keys=True, default=str) if kwargs else ""
+    return hashlib.sha256(f"{model}\x00{options}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class BaseEmbeddingCache(abc.ABC):
+    """
+    Abstract base class for the embedding caches.
+
+    Implementations must be safe to use from several threads.
+
+    Attributes:
+        _max_entries: The maximum number of entries kept in the cache.
+        _ttl:
+            The number of seconds an entry stays valid, or None if entries do
+            not expire.
+    """
+    _max_entries: int
+    _ttl: typing.Optional[float]
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @property
+    def ttl(self) -> typing.Optional[float]:
+        return self._ttl
+
+    def __init__(self, *, max_entries: typing.Optional[int] = None, ttl: typing.Optional[float] = None) -> None:
+        max_entries = max_entries or _defaults.DEFAULT__EMBEDDING_CACHE__MAX_ENTRIES
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be positive, got {ttl}")
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+    @abc.abstractmethod
+    def get(self, key: str) -> typing.Optional[typing.List[float]]:
+        """Return the cached embedding of a key, or None if missing or expired."""
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, embedding: typing.List[float]) -> None:
+        """Cache the embedding of a key, evicting the least recently used entries."""
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        ...
+
+    @abc.abstractmethod
+    def __len__(self) -> int: ...
+
+    def close(self) -> None:
+        """Release the resources held by the cache."""
+        ...
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(entries={len(self)}, max_entries={self._max_entries}, ttl={self._ttl})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MemoryEmbeddingCache(BaseEmbeddingCache):
+    """
+    An in-process embedding cache.
+
+    Embeddings are stored as packed double arrays (8 bytes per dimension
+    instead of the ~32 of a list of floats) in an ordered dictionary that
+    tracks recency.
+
+    Attributes:
+        _entries:
+            The cached embeddings and their expiry time (monotonic clock),
+            least recently used first.
+        _lock: Guards `_entries`.
+    """
+    _entries: collections.OrderedDict[str, typing.Tuple[typing.Optional[float], array.array]]
+    _lock: threading.Lock
+
+    def __init__(self, *, max_entries: typing.Optional[int] = None, ttl: typing.Optional[float] = None) -> None:
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @typing_extensions.override
+    def get(self, key: str) -> typing.Optional[typing.List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, embedding = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return embedding.tolist()
+
+    @typing_extensions.override
+    def set(self, key: str, embedding: typing.List[float]) -> None:
+        expires_at = time.monotonic() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, array.array("d", embedding))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    @typing_extensions.override
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @typing_extensions.override
+    def __len__(self) -> int:
+        return self._entries.__len__()
+
+
+class SqliteEmbeddingCache(BaseEmbeddingCache):
+    """
+    An on-disk embedding cache backed by a SQLite database, so cached
+    embeddings survive restarts and can be shared by processes on one host.
+
+    Attributes:
+        _path: The path of the database file.
+        _connection: The connection to the database.
+        _lock: Serializes the use of `_connection` across threads.
+    """
+    _path: pathlib.Path
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    def __init__(
+        self,
+        path: typing.Optional[typing.Union[str, os.PathLike[str]]] = None,
+        *,
+        max_entries: typing.Optional[int] = None,
+        ttl: typing.Optional[float] = None,
+    ) -> None:
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._path = pathlib.Path(path or _defaults.DEFAULT__EMBEDDING_CACHE__PATH)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self._lock = threading.Lock()
+
+    @typing_extensions.override
+    def get(self, key: str) -> typing.Optional[typing.List[float]]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT embedding, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, created = row
+            if self._ttl is not None and created + self._ttl <= now:
+                self._connection.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE embeddings SET accessed = ? WHERE key = ?", (now, key))
+        embedding = array.array("d")
+        embedding.frombytes(blob)
+        return embedding.tolist()
+
+    @typing_extensions.override
+    def set(self, key: str, embedding: typing.List[float]) -> None:
+        now = time.time()
+        blob = array.array("d", embedding).tobytes()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    @typing_extensions.override
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings")
+
+    @typing_extensions.override
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @typing_extensions.override
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
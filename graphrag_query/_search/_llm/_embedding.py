@@ -3,6 +3,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import typing
 
 import httpx
@@ -10,7 +12,8 @@ import openai
 import tiktoken
 import typing_extensions
 
-from . import _base_llm, _types
+from . import _base_llm, _cache, _types
+from .. import _defaults
 from ... import _utils, errors as _errors
 
 
@@ -31,11 +34,23 @@ class Embedding(_base_llm.BaseEmbedding):
             one request.
         _token_encoder:
             The token encoder used to calculate token counts for input text.
+        _max_batch_size: The maximum number of inputs sent in one request.
+        _max_batch_tokens: The maximum number of tokens sent in one request.
+        _cache:
+            An optional cache of embeddings keyed by model, request options and
+            normalized text.
+        _cache_hits: The number of embeddings served from the cache.
+        _cache_misses: The number of embeddings requested from the API.
     """
     _model: str
     _client: openai.OpenAI
     _max_tokens: int
     _token_encoder: tiktoken.Encoding
+    _max_batch_size: int
+    _max_batch_tokens: int
+    _cache: typing.Optional[_cache.BaseEmbeddingCache]
+    _cache_hits: int
+    _cache_misses: int
 
     @property
     @typing_extensions.override
@@ -47,6 +62,18 @@ class Embedding(_base_llm.BaseEmbedding):
     def model(self, value: str) -> None:
         self._model = value
 
+    @property
+    def cache(self) -> typing.Optional[_cache.BaseEmbeddingCache]:
+        return self._cache
+
+    @property
+    def cache_hits(self) -> int:
+        return self._cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self._cache_misses
+
     def __init__(
         self,
         *,
@@ -59,6 +86,9 @@ class Embedding(_base_llm.BaseEmbedding):
         http_client: typing.Optional[httpx.Client] = None,
         max_tokens: typing.Optional[int] = None,
         token_encoder: typing.Optional[tiktoken.Encoding] = None,
+        max_batch_size: typing.Optional[int] = None,
+        max_batch_tokens: typing.Optional[int] = None,
+        cache: typing.Optional[_cache.BaseEmbeddingCache] = None,
         **kwargs: typing.Any
     ) -> None:
         """
@@ -78,6 +108,14 @@ class Embedding(_base_llm.BaseEmbedding):
                 Optional. The maximum number of tokens that can be processed in
                 one request.
             token_encoder: Optional. The token encoder used for tokenizing text.
+            max_batch_size:
+                Optional. The maximum number of inputs (chunks) sent in one
+                request.
+            max_batch_tokens:
+                Optional. The maximum number of tokens sent in one request.
+            cache:
+                Optional. A cache for the generated embeddings; repeated texts
+                are then served without calling the API.
             **kwargs: Additional keyword arguments for customization.
         """
         self._client = openai.OpenAI(
@@ -92,13 +130,20 @@ class Embedding(_base_llm.BaseEmbedding):
         self._model = model
         self._max_tokens = max_tokens or 8191
         self._token_encoder = token_encoder or tiktoken.get_encoding("cl100k_base")
+        self._max_batch_size = max_batch_size or _defaults.DEFAULT__EMBEDDING__MAX_BATCH_SIZE
+        self._max_batch_tokens = max(
+            max_batch_tokens or _defaults.DEFAULT__EMBEDDING__MAX_BATCH_TOKENS, self._max_tokens
+        )
+        self._cache = cache
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     @typing_extensions.override
     def embed(self, text: str, **kwargs: typing.Any) -> _types.EmbeddingResponse_T:
         """
         Generates an embedding for the given text. If the text is too long, it
-        is chunked, and embeddings are generated for each chunk. The results are
-        combined into a single embedding.
+        is chunked, and the chunks are embedded in batched requests. The
+        results are combined into a single embedding.
 
         Args:
             text: The text to generate an embedding for.
@@ -107,24 +152,48 @@ class Embedding(_base_llm.BaseEmbedding):
         Returns:
             An EmbeddingResponse containing the generated embeddings.
         """
-        chunk_embeddings: typing.List[typing.List[float]] = []
-        chunk_lens: typing.List[int] = []
-        for chunk in _utils.chunk_text(text, self._max_tokens):
+        return self.embed_many([text], **kwargs)[0]
+
+    @typing_extensions.override
+    def embed_many(self, texts: typing.Sequence[str], **kwargs: typing.Any) -> typing.List[_types.EmbeddingResponse_T]:
+        """
+        Generates embeddings for many texts with as few requests as possible.
+
+        The chunks of all texts that are not cached are packed into batches
+        bounded by `max_batch_size` inputs and `max_batch_tokens` tokens, and
+        each batch is sent as a single request.
+
+        Args:
+            texts: The texts to generate embeddings for.
+            **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        request_kwargs = _utils.filter_kwargs(self._client.embeddings.create, kwargs)
+        plan = _EmbeddingPlan.create(self, texts, request_kwargs)
+        self._cache_hits += plan.cache_hits
+        self._cache_misses += plan.cache_misses
+        for batch in plan.batches:
             try:
-                embedding = self._client.embeddings.create(
-                    input=chunk,
+                response = self._client.embeddings.create(
+                    input=[plan.chunks[i] for i in batch],
                     model=self._model,
-                    **_utils.filter_kwargs(self._client.embeddings.create, kwargs)
-                ).data[0].embedding or []
+                    **request_kwargs
+                )
             except openai.APIError as e:
                 raise _errors.OpenAIAPIError(e) from e
-            chunk_embeddings.append(embedding)
-            chunk_lens.append(chunk.__len__() or 0)
-        return _utils.combine_embeddings(chunk_embeddings, chunk_lens)
+            plan.add_response(batch, response)
+        results = plan.finish()
+        if self._cache is not None:
+            plan.store(self._cache)
+        return results
 
     @typing_extensions.override
     def close(self) -> None:
         self._client.close()
+        if self._cache is not None:
+            self._cache.close()
 
 
 class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
@@ -145,11 +214,23 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
             one request.
         _token_encoder:
             The token encoder used to calculate token counts for input text.
+        _max_batch_size: The maximum number of inputs sent in one request.
+        _max_batch_tokens: The maximum number of tokens sent in one request.
+        _cache:
+            An optional cache of embeddings keyed by model, request options and
+            normalized text.
+        _cache_hits: The number of embeddings served from the cache.
+        _cache_misses: The number of embeddings requested from the API.
     """
     _model: str
     _aclient: openai.AsyncOpenAI
     _max_tokens: int
     _token_encoder: tiktoken.Encoding
+    _max_batch_size: int
+    _max_batch_tokens: int
+    _cache: typing.Optional[_cache.BaseEmbeddingCache]
+    _cache_hits: int
+    _cache_misses: int
 
     @property
     @typing_extensions.override
@@ -161,6 +242,18 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
     def model(self, value: str) -> None:
         self._model = value
 
+    @property
+    def cache(self) -> typing.Optional[_cache.BaseEmbeddingCache]:
+        return self._cache
+
+    @property
+    def cache_hits(self) -> int:
+        return self._cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self._cache_misses
+
     def __init__(
         self,
         *,
@@ -173,6 +266,9 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
         http_client: typing.Optional[httpx.AsyncClient] = None,
         max_tokens: typing.Optional[int] = None,
         token_encoder: typing.Optional[tiktoken.Encoding] = None,
+        max_batch_size: typing.Optional[int] = None,
+        max_batch_tokens: typing.Optional[int] = None,
+        cache: typing.Optional[_cache.BaseEmbeddingCache] = None,
         **kwargs: typing.Any
     ) -> None:
         """
@@ -194,6 +290,14 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
                 Optional. The maximum number of tokens that can be processed in
                 one request.
             token_encoder: Optional. The token encoder used for tokenizing text.
+            max_batch_size:
+                Optional. The maximum number of inputs (chunks) sent in one
+                request.
+            max_batch_tokens:
+                Optional. The maximum number of tokens sent in one request.
+            cache:
+                Optional. A cache for the generated embeddings; repeated texts
+                are then served without calling the API.
             **kwargs: Additional keyword arguments for customization.
         """
         self._aclient = openai.AsyncOpenAI(
@@ -208,13 +312,21 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
         self._model = model
         self._max_tokens = max_tokens or 8191
         self._token_encoder = token_encoder or tiktoken.get_encoding("cl100k_base")
+        self._max_batch_size = max_batch_size or _defaults.DEFAULT__EMBEDDING__MAX_BATCH_SIZE
+        self._max_batch_tokens = max(
+            max_batch_tokens or _defaults.DEFAULT__EMBEDDING__MAX_BATCH_TOKENS, self._max_tokens
+        )
+        self._cache = cache
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     @typing_extensions.override
     async def aembed(self, text: str, **kwargs: typing.Any) -> typing.List[float]:
         """
         Asynchronously generates an embedding for the given text. If the text is
-        too long, it is chunked, and embeddings are generated for each chunk.
-        The results are combined into a single embedding.
+        too long, it is chunked, and the chunks are embedded in batched
+        requests sent concurrently. The results are combined into a single
+        embedding.
 
         Args:
             text: The text to generate an embedding for.
@@ -223,21 +335,196 @@ class AsyncEmbedding(_base_llm.BaseAsyncEmbedding):
         Returns:
             A list of floats representing the combined embeddings.
         """
-        chunk_embeddings: typing.List[typing.List[float]] = []
-        chunk_lens: typing.List[int] = []
-        for chunk in _utils.chunk_text(text, self._max_tokens):
-            try:
-                embedding = (await self._aclient.embeddings.create(
-                    input=chunk,
-                    model=self._model,
-                    **_utils.filter_kwargs(self._aclient.embeddings.create, kwargs)
-                )).data[0].embedding or []
-            except openai.APIError as e:
-                raise _errors.OpenAIAPIError(e) from e
-            chunk_embeddings.append(embedding)
-            chunk_lens.append(chunk.__len__() or 0)
-        return _utils.combine_embeddings(chunk_embeddings, chunk_lens)
+        return (await self.aembed_many([text], **kwargs))[0]
+
+    @typing_extensions.override
+    async def aembed_many(
+        self,
+        texts: typing.Sequence[str],
+        **kwargs: typing.Any
+    ) -> typing.List[_types.EmbeddingResponse_T]:
+        """
+        Asynchronously generates embeddings for many texts with as few requests
+        as possible.
+
+        The chunks of all texts that are not cached are packed into batches
+        bounded by `max_batch_size` inputs and `max_batch_tokens` tokens; the
+        batches are sent concurrently, at most `DEFAULT__CONCURRENT_COROUTINES`
+        at a time. The cache lookups and writes (which may hit a database) run
+        in a worker thread.
+
+        Args:
+            texts: The texts to generate embeddings for.
+            **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        request_kwargs = _utils.filter_kwargs(self._aclient.embeddings.create, kwargs)
+        plan = (
+            _EmbeddingPlan.create(self, texts, request_kwargs) if self._cache is None
+            else await asyncio.to_thread(_EmbeddingPlan.create, self, texts, request_kwargs)
+        )
+        self._cache_hits += plan.cache_hits
+        self._cache_misses += plan.cache_misses
+        semaphore = asyncio.Semaphore(_defaults.DEFAULT__CONCURRENT_COROUTINES)
+
+        async def _request(batch: typing.List[int]) -> None:
+            async with semaphore:
+                try:
+                    response = await self._aclient.embeddings.create(
+                        input=[plan.chunks[i] for i in batch],
+                        model=self._model,
+                        **request_kwargs
+                    )
+                except openai.APIError as e:
+                    raise _errors.OpenAIAPIError(e) from e
+            plan.add_response(batch, response)
+
+        await asyncio.gather(*[_request(batch) for batch in plan.batches])
+        results = plan.finish()
+        if self._cache is not None:
+            await asyncio.to_thread(plan.store, self._cache)
+        return results
 
     @typing_extensions.override
     async def aclose(self) -> None:
         await self._aclient.close()
+        if self._cache is not None:
+            await asyncio.to_thread(self._cache.close)
+
+
+@dataclasses.dataclass
+class _EmbeddingPlan:
+    """
+    The requests needed to embed a list of texts, shared by `Embedding` and
+    `AsyncEmbedding`.
+
+    Attributes:
+        results: The embedding of each input text, None until known.
+        keys: The cache key of each text to embed, or None without a cache.
+        positions: The input positions of each text to embed (duplicates share one).
+        chunks: The chunks of all texts to embed.
+        chunk_lens: The length of each chunk, used to weight the combination.
+        chunk_owner: The text (index into `positions`) each chunk belongs to.
+        chunk_embeddings: The embedding of each chunk, None until received.
+        batches: The chunk indices sent in each request.
+        cache_hits: The number of embeddings served from the cache.
+        cache_misses: The number of texts looked up in the cache but not found.
+    """
+    results: typing.List[typing.Optional[typing.List[float]]]
+    keys: typing.List[typing.Optional[str]]
+    positions: typing.List[typing.List[int]]
+    chunks: typing.List[str]
+    chunk_lens: typing.List[int]
+    chunk_owner: typing.List[int]
+    chunk_embeddings: typing.List[typing.Optional[typing.List[float]]]
+    batches: typing.List[typing.List[int]]
+    cache_hits: int
+    cache_misses: int
+
+    @classmethod
+    def create(
+        cls,
+        embedder: typing.Union[Embedding, AsyncEmbedding],
+        texts: typing.Sequence[str],
+        request_kwargs: typing.Dict[str, typing.Any],
+    ) -> _EmbeddingPlan:
+        """
+        Serve what the embedder's cache holds, then chunk the remaining texts
+        and pack the chunks into token-bounded batches.
+
+        The embedder itself is only read, so that the async embedder can build
+        the plan in a worker thread; the cache counts are returned in the plan.
+        """
+        results: typing.List[typing.Optional[typing.List[float]]] = [None] * len(texts)
+        keys: typing.List[typing.Optional[str]] = []
+        positions: typing.List[typing.List[int]] = []
+        seen: typing.Dict[str, int] = {}
+        pending_texts: typing.List[str] = []
+        cache_hits = cache_misses = 0
+        for position, text in enumerate(texts):
+            if text in seen:
+                positions[seen[text]].append(position)
+                continue
+            key = None
+            if embedder._cache is not None:
+                key = _cache.embedding_cache_key(embedder._model, text, **request_kwargs)
+                cached = embedder._cache.get(key)
+                if cached is not None:
+                    cache_hits += 1
+                    results[position] = cached
+                    continue
+                cache_misses += 1
+            seen[text] = len(positions)
+            keys.append(key)
+            positions.append([position])
+            pending_texts.append(text)
+
+        chunks: typing.List[str] = []
+        chunk_lens: typing.List[int] = []
+        chunk_tokens: typing.List[int] = []
+        chunk_owner: typing.List[int] = []
+        for owner, text in enumerate(pending_texts):
+            tokens = embedder._token_encoder.encode(text)
+            for start in range(0, len(tokens), embedder._max_tokens):
+                chunk_tokens_ = tokens[start:start + embedder._max_tokens]
+                chunk = embedder._token_encoder.decode(chunk_tokens_)
+                chunks.append(chunk)
+                chunk_lens.append(chunk.__len__() or 0)
+                chunk_tokens.append(len(chunk_tokens_))
+                chunk_owner.append(owner)
+
+        batches: typing.List[typing.List[int]] = []
+        batch: typing.List[int] = []
+        batch_tokens = 0
+        for index, n_tokens in enumerate(chunk_tokens):
+            if batch and (
+                len(batch) >= embedder._max_batch_size
+                or batch_tokens + n_tokens > embedder._max_batch_tokens
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += n_tokens
+        if batch:
+            batches.append(batch)
+
+        return cls(
+            results=results,
+            keys=keys,
+            positions=positions,
+            chunks=chunks,
+            chunk_lens=chunk_lens,
+            chunk_owner=chunk_owner,
+            chunk_embeddings=[None] * len(chunks),
+            batches=batches,
+            cache_hits=cache_hits,
+            cache_misses=cache_misses,
+        )
+
+    def add_response(self, batch: typing.List[int], response: typing.Any) -> None:
+        """Record the embeddings returned for a batch of chunks."""
+        for item in response.data:
+            self.chunk_embeddings[batch[item.index]] = item.embedding or []
+
+    def finish(self) -> typing.List[typing.List[float]]:
+        """Combine the chunk embeddings of each text."""
+        owned: typing.List[typing.List[int]] = [[] for _ in self.positions]
+        for index, owner in enumerate(self.chunk_owner):
+            owned[owner].append(index)
+        for owner, indices in enumerate(owned):
+            embedding = _utils.combine_embeddings(
+                [typing.cast(typing.List[float], self.chunk_embeddings[i]) for i in indices],
+                [self.chunk_lens[i] for i in indices],
+            )
+            for position in self.positions[owner]:
+                self.results[position] = embedding
+        return typing.cast(typing.List[typing.List[float]], self.results)
+
+    def store(self, cache: _cache.BaseEmbeddingCache) -> None:
+        """Cache the embeddings combined by `finish`."""
+        for owner, key in enumerate(self.keys):
+            embedding = self.results[self.positions[owner][0]]
+            if key is not None and embedding:
+                cache.set(key, embedding)
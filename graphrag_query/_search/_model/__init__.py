@@ -11,6 +11,13 @@ from ._entity import Entity
 from ._identified import Identified
 from ._named import Named
 from ._relationship import Relationship
+from ._store import (
+    EmbeddingMatrix,
+    LazyColumn,
+    ModelStore,
+    ModelView,
+    prefetch,
+)
 from ._text_unit import TextUnit
 
 __all__ = [
@@ -23,4 +30,9 @@ __all__ = [
     "CommunityReport",
     "Document",
     "Identified",
+    "EmbeddingMatrix",
+    "ModelStore",
+    "ModelView",
+    "LazyColumn",
+    "prefetch",
 ]
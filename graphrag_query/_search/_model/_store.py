@@ -0,0 +1,501 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Compact, column-oriented storage for the data models.
+
+A list of pydantic models keeps a `__dict__` and a fields-set per item and
+every embedding as a list of Python floats (roughly 24 bytes per dimension).
+`ModelStore` keeps the same data as one Python list per scalar field and one
+contiguous NumPy matrix per embedding field, and hands out lightweight slotted
+views that expose the model attributes, so code written against the models
+keeps working.
+
+Classes:
+    EmbeddingMatrix: Row-indexed embeddings of one field in a single matrix.
+    ModelView: Base class of the attribute-compatible views over a store row.
+    ModelStore: Struct-of-arrays store for a list of models.
+    LazyColumn: A scalar column fetched on demand, with a bounded cache.
+
+Functions:
+    prefetch: Fetch the lazy values of a field for a list of views at once.
+"""
+
+from __future__ import annotations
+
+import collections
+import threading
+import typing
+
+import numpy as np
+import pydantic
+import typing_extensions
+
+_Model_T = typing.TypeVar("_Model_T", bound=pydantic.BaseModel)
+
+_EMBEDDING_ANNOTATION = typing.Optional[typing.List[float]]
+
+_Column = typing.Union[typing.List[typing.Any], "LazyColumn"]
+
+
+class EmbeddingMatrix:
+    """
+    Row-indexed embeddings of one field kept in a single contiguous matrix.
+
+    Attributes:
+        _matrix:
+            A (rows, dimensions) matrix holding the embeddings; rows without an
+            embedding are zero.
+        _present: A boolean mask of the rows that have an embedding.
+    """
+    _matrix: np.ndarray
+    _present: np.ndarray
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """A read-only view of the embedding matrix."""
+        view = self._matrix.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def present(self) -> np.ndarray:
+        """A read-only view of the mask of rows that have an embedding."""
+        view = self._present.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def dimensions(self) -> int:
+        return self._matrix.shape[1]
+
+    def __init__(self, matrix: np.ndarray, present: np.ndarray) -> None:
+        if matrix.ndim != 2 or present.shape != (matrix.shape[0],):
+            raise ValueError(
+                f"Expected a (rows, dimensions) matrix and a (rows,) mask, got {matrix.shape} and {present.shape}"
+            )
+        self._matrix = matrix
+        self._present = present.astype(bool, copy=False)
+
+    @classmethod
+    def from_lists(
+        cls,
+        values: typing.Sequence[typing.Optional[typing.Sequence[float]]],
+        dtype: typing.Any = np.float32,
+    ) -> EmbeddingMatrix:
+        """
+        Build a matrix from a sequence of optional embeddings.
+
+        Raises:
+            ValueError: If the embeddings do not all have the same dimensions.
+        """
+        present = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+        dimensions = {len(value) for value in values if value is not None}
+        if len(dimensions) > 1:
+            raise ValueError(f"Embeddings have inconsistent dimensions: {sorted(dimensions)}")
+        matrix = np.zeros((len(values), dimensions.pop() if dimensions else 0), dtype=dtype)
+        for row, value in enumerate(values):
+            if value is not None:
+                matrix[row] = value
+        return cls(matrix, present)
+
+    def __len__(self) -> int:
+        return self._matrix.shape[0]
+
+    def get(self, row: int) -> typing.Optional[np.ndarray]:
+        """Return the embedding of a row as a read-only array, or None."""
+        if not self._present[row]:
+            return None
+        view = self._matrix[row]
+        view.flags.writeable = False
+        return view
+
+    def get_list(self, row: int) -> typing.Optional[typing.List[float]]:
+        """Return the embedding of a row as a list of floats, or None."""
+        return self._matrix[row].tolist() if self._present[row] else None
+
+    def set(self, row: int, value: typing.Optional[typing.Sequence[float]]) -> None:
+        """
+        Set (or clear, with None) the embedding of a row.
+
+        Raises:
+            ValueError: If the embedding does not match the matrix dimensions.
+        """
+        if value is None:
+            self._matrix[row] = 0
+            self._present[row] = False
+            return
+        if len(self) > 0 and self.dimensions == 0 and not self._present.any():
+            # first embedding of an all-empty matrix decides the dimensions
+            self._matrix = np.zeros((len(self), len(value)), dtype=self._matrix.dtype)
+        if len(value) != self.dimensions:
+            raise ValueError(f"Expected an embedding of {self.dimensions} dimensions, got {len(value)}")
+        self._matrix[row] = value
+        self._present[row] = True
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + self._present.nbytes
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(rows={len(self)}, dimensions={self.dimensions}, "
+            f"dtype={self._matrix.dtype})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class ModelView:
+    """
+    A slotted, attribute-compatible view over one row of a `ModelStore`.
+
+    Every model field is exposed as a property that reads from (and writes to)
+    the store, so the view can stand in for the model it was built from.
+    Embedding fields are returned as lists of floats, as on the model; use
+    `ModelStore.embeddings` for the underlying matrix.
+
+    Attributes:
+        _store: The store the row belongs to.
+        _row: The row index in the store.
+    """
+    __slots__ = ("_store", "_row")
+
+    _store: ModelStore
+    _row: int
+
+    def __init__(self, store: ModelStore, row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def store(self) -> ModelStore:
+        return self._store
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    def to_model(self) -> pydantic.BaseModel:
+        """Materialize the row as an instance of the store's model type."""
+        return self._store.to_model(self._row)
+
+    def model_dump(self) -> typing.Dict[str, typing.Any]:
+        """Return the row as a dictionary of field values."""
+        return self._store.row_values(self._row)
+
+    @typing_extensions.override
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ModelView):
+            return self.model_dump() == other.model_dump()
+        if isinstance(other, pydantic.BaseModel):
+            return self.model_dump() == other.model_dump()
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self._store.model_type.model_fields
+            if name not in self._store.embedding_fields
+        )
+        return f"{self.__class__.__name__}({fields})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class ModelStore(typing.Generic[_Model_T]):
+    """
+    A struct-of-arrays store for a list of models of one type.
+
+    Scalar fields are kept as one Python list per field (or as a `LazyColumn`
+    whose values are read from a file on demand) and embedding fields
+    (`Optional[List[float]]`) as one `EmbeddingMatrix` per field. The rows are
+    exposed through slotted `ModelView` objects that have the same attributes
+    as the model.
+
+    Attributes:
+        _model_type: The model type the rows were built from.
+        _columns: The scalar field values, one list (or lazy column) per field.
+        _embeddings: The embedding matrices, one per embedding field.
+        _views: The views over each row, in row order.
+    """
+    _model_type: typing.Type[_Model_T]
+    _columns: typing.Dict[str, _Column]
+    _embeddings: typing.Dict[str, EmbeddingMatrix]
+    _views: typing.List[ModelView]
+
+    @property
+    def model_type(self) -> typing.Type[_Model_T]:
+        return self._model_type
+
+    @property
+    def embedding_fields(self) -> typing.List[str]:
+        return list(self._embeddings)
+
+    @property
+    def views(self) -> typing.List[_Model_T]:
+        """The views over each row, typed as the model for drop-in use."""
+        return typing.cast(typing.List[_Model_T], self._views)
+
+    def __init__(
+        self,
+        model_type: typing.Type[_Model_T],
+        columns: typing.Dict[str, _Column],
+        embeddings: typing.Dict[str, EmbeddingMatrix],
+    ) -> None:
+        lengths = {len(values) for values in columns.values()} | {len(matrix) for matrix in embeddings.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have inconsistent lengths: {sorted(lengths)}")
+        missing = set(model_type.model_fields) - set(columns) - set(embeddings)
+        if missing:
+            raise ValueError(f"Missing columns for fields: {sorted(missing)}")
+        self._model_type = model_type
+        self._columns = columns
+        self._embeddings = embeddings
+        view_type = self._make_view_type()
+        self._views = [view_type(self, row) for row in range(lengths.pop() if lengths else 0)]
+
+    @classmethod
+    def from_models(
+        cls,
+        model_type: typing.Type[_Model_T],
+        models: typing.Iterable[pydantic.BaseModel],
+        *,
+        embedding_dtype: typing.Any = np.float32,
+    ) -> ModelStore[_Model_T]:
+        """
+        Build a store from models (or views) of `model_type`.
+
+        Embedding fields are packed into `embedding_dtype` matrices; a field
+        whose embeddings have inconsistent dimensions is kept as a list column.
+        """
+        models = list(models)
+        columns: typing.Dict[str, typing.List[typing.Any]] = {}
+        embeddings: typing.Dict[str, EmbeddingMatrix] = {}
+        for name, field in model_type.model_fields.items():
+            values = [getattr(model, name) for model in models]
+            if field.annotation == _EMBEDDING_ANNOTATION:
+                try:
+                    embeddings[name] = EmbeddingMatrix.from_lists(values, dtype=embedding_dtype)
+                    continue
+                except ValueError:
+                    pass
+            columns[name] = values
+        return cls(model_type, columns, embeddings)
+
+    def __len__(self) -> int:
+        return self._views.__len__()
+
+    def __iter__(self) -> typing.Iterator[_Model_T]:
+        return iter(self.views)
+
+    def __getitem__(self, row: int) -> _Model_T:
+        return typing.cast(_Model_T, self._views[row])
+
+    def column(self, name: str) -> _Column:
+        """Return the values of a scalar field, in row order."""
+        return self._columns[name]
+
+    def with_columns(self, **columns: _Column) -> ModelStore[_Model_T]:
+        """
+        Return a store over the same rows with some scalar columns replaced
+        (e.g. by lazy columns); the other columns and the embeddings are
+        shared with this store, the views are new.
+        """
+        unknown = set(columns) - set(self._columns)
+        if unknown:
+            raise ValueError(f"Not scalar fields of {self._model_type.__name__}: {sorted(unknown)}")
+        return ModelStore(self._model_type, {**self._columns, **columns}, self._embeddings)
+
+    def embeddings(self, name: str) -> EmbeddingMatrix:
+        """Return the embedding matrix of an embedding field."""
+        return self._embeddings[name]
+
+    def row_values(self, row: int) -> typing.Dict[str, typing.Any]:
+        """Return the field values of a row, with embeddings as lists."""
+        return {
+            name: (
+                self._embeddings[name].get_list(row) if name in self._embeddings else self._columns[name][row]
+            )
+            for name in self._model_type.model_fields
+        }
+
+    def to_model(self, row: int) -> _Model_T:
+        """Materialize a row as an instance of the model type."""
+        return self._model_type.model_construct(**self.row_values(row))
+
+    def to_models(self) -> typing.List[_Model_T]:
+        """Materialize every row as an instance of the model type."""
+        return [self.to_model(row) for row in range(len(self))]
+
+    def _make_view_type(self) -> typing.Type[ModelView]:
+        namespace: typing.Dict[str, typing.Any] = {"__slots__": ()}
+        for name in self._model_type.model_fields:
+            if name in self._embeddings:
+                namespace[name] = _embedding_property(self._embeddings[name])
+            else:
+                namespace[name] = _column_property(self._columns[name])
+        return type(f"{self._model_type.__name__}View", (ModelView,), namespace)
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(model_type={self._model_type.__name__}, rows={len(self)}, "
+            f"embedding_fields={self.embedding_fields})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def _column_property(column: _Column) -> property:
+    def _get(view: ModelView) -> typing.Any:
+        return column[view._row]
+
+    def _set(view: ModelView, value: typing.Any) -> None:
+        column[view._row] = value
+
+    return property(_get, _set)
+
+
+def _embedding_property(matrix: EmbeddingMatrix) -> property:
+    def _get(view: ModelView) -> typing.Optional[typing.List[float]]:
+        return matrix.get_list(view._row)
+
+    def _set(view: ModelView, value: typing.Optional[typing.Sequence[float]]) -> None:
+        matrix.set(view._row, value)
+
+    return property(_get, _set)
+
+
+class LazyColumn:
+    """
+    A scalar column whose values are fetched on demand, for fields too large
+    to keep in memory for every row (e.g. the text of text units).
+
+    Values are read through `fetch` (which reads a batch of rows from a file)
+    and the most recently used ones are kept in a bounded LRU cache, so the
+    memory held scales with the working set rather than with the column.
+    Values assigned to rows are kept in an overlay that takes precedence over
+    the file, so views of the column can be written to like any other.
+
+    Attributes:
+        _fetch: Reads the values of a list of rows, returned in the same order.
+        _length: The number of rows.
+        _max_entries: The maximum number of cached values.
+        _cache: The cached values, least recently used first.
+        _overlay: The values assigned to rows.
+        _lock: Guards the cache and the overlay.
+    """
+    _fetch: typing.Callable[[typing.List[int]], typing.Sequence[typing.Any]]
+    _length: int
+    _max_entries: int
+    _cache: collections.OrderedDict[int, typing.Any]
+    _overlay: typing.Dict[int, typing.Any]
+    _lock: threading.Lock
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    def __init__(
+        self,
+        fetch: typing.Callable[[typing.List[int]], typing.Sequence[typing.Any]],
+        length: int,
+        *,
+        max_entries: int = 4096,
+    ) -> None:
+        self._fetch = fetch
+        self._length = length
+        self._max_entries = max_entries
+        self._cache = collections.OrderedDict()
+        self._overlay = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, row: int) -> typing.Any:
+        row = range(self._length)[row]
+        with self._lock:
+            if row in self._overlay:
+                return self._overlay[row]
+            if row in self._cache:
+                self._cache.move_to_end(row)
+                return self._cache[row]
+        value = self._fetch([row])[0]
+        self._remember({row: value})
+        return value
+
+    def __setitem__(self, row: int, value: typing.Any) -> None:
+        row = range(self._length)[row]
+        with self._lock:
+            self._overlay[row] = value
+            self._cache.pop(row, None)
+
+    def __iter__(self) -> typing.Iterator[typing.Any]:
+        """Iterate over every value, fetched in one batch that bypasses the cache."""
+        values = self._fetch(list(range(self._length))) if self._length > 0 else []
+        with self._lock:
+            overlay = dict(self._overlay)
+        for row, value in enumerate(values):
+            yield overlay.get(row, value)
+
+    def prefetch(self, rows: typing.Iterable[int]) -> None:
+        """Fetch the values of the rows that are not cached, in one batch."""
+        with self._lock:
+            missing = sorted({
+                row for row in rows if row not in self._overlay and row not in self._cache
+            })
+        if missing:
+            self._remember(dict(zip(missing, self._fetch(missing))))
+
+    def clear(self) -> None:
+        """Drop the cached values (assigned values are kept)."""
+        with self._lock:
+            self._cache.clear()
+
+    def _remember(self, values: typing.Dict[int, typing.Any]) -> None:
+        with self._lock:
+            for row, value in values.items():
+                if row not in self._overlay:
+                    self._cache[row] = value
+                    self._cache.move_to_end(row)
+            while self._cache.__len__() > self._max_entries:
+                self._cache.popitem(last=False)
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(rows={self._length}, cached={self._cache.__len__()}, "
+            f"max_entries={self._max_entries})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def prefetch(models: typing.Iterable[typing.Any], field: str) -> None:
+    """
+    Fetch the values of `field` for the given models in one batch per store,
+    if they are views of stores where the field is a `LazyColumn`; other models
+    are ignored.
+    """
+    rows: typing.Dict[int, typing.Tuple[LazyColumn, typing.List[int]]] = {}
+    for model in models:
+        if isinstance(model, ModelView):
+            column = model.store._columns.get(field)
+            if isinstance(column, LazyColumn):
+                rows.setdefault(id(column), (column, []))[1].append(model.row)
+    for column, column_rows in rows.values():
+        column.prefetch(column_rows)
@@ -62,4 +62,5 @@ class SearchResult(pydantic.BaseModel):
     usage: typing.Optional[Usage] = None
     """Usage statistics for the completion request."""
 
-    thinking: bool
+    thinking: bool = False
+    """Whether the content is the model's reasoning rather than its answer."""
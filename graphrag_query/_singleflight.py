@@ -0,0 +1,289 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Single-flight coalescing of identical in-flight queries.
+
+When the same question arrives several times while it is still being answered
+(a popular question hitting a server from many users at once), each duplicate
+would run its own embedding, context building and LLM calls. A `SingleFlight`
+runs one execution per key at a time and hands its result to every caller
+that asked for the key in the meantime. Streamed results are broadcast: each
+caller gets its own iterator over the chunks of the one upstream stream,
+starting with the chunks already produced when it joined.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import typing
+
+import typing_extensions
+
+_T = typing.TypeVar("_T")
+
+
+@dataclasses.dataclass
+class SingleFlightStats:
+    """Counters of a `SingleFlight`."""
+
+    requests: int = 0
+    """Number of calls made."""
+
+    executed: int = 0
+    """Number of calls that started an execution."""
+
+    coalesced: int = 0
+    """Number of calls that joined an execution already in flight."""
+
+    in_flight: int = 0
+    """Number of executions currently in flight."""
+
+
+def single_flight_key(*parts: typing.Any) -> str:
+    """Builds the key of a call from JSON-serializable parts (other values are keyed by `str`)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Flight(typing.Generic[_T]):
+    """
+    One execution in flight.
+
+    Attributes:
+        task: The task running the execution.
+        waiters: The number of callers awaiting the task.
+    """
+    task: asyncio.Task[_T]
+    waiters: int
+
+    def __init__(self, task: asyncio.Task[_T]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class StreamBroadcast(typing.Generic[_T]):
+    """
+    Fans one upstream asynchronous iterator out to several subscribers.
+
+    A pump task reads the upstream iterator and buffers its items; every
+    subscriber replays the buffer and then follows the live items. Callers are
+    counted from the moment they join (see `join`), not from their first read:
+    when the last of them leaves before the end, `on_done` is called first (so
+    that no new caller joins the abandoned stream) and then the pump is
+    cancelled so the stream stops consuming tokens.
+
+    Attributes:
+        _items: The items read from the upstream iterator so far.
+        _done: Whether the upstream iterator is exhausted (or failed).
+        _error: The exception raised by the upstream iterator, if any.
+        _changed: Notified when an item is read or the upstream ends.
+        _subscribers: The number of joined callers that have not finished.
+        _on_done: Called once, when the stream ends or is abandoned.
+        _pump: The task reading the upstream iterator.
+    """
+    _items: typing.List[_T]
+    _done: bool
+    _error: typing.Optional[BaseException]
+    _changed: asyncio.Condition
+    _subscribers: int
+    _on_done: typing.Optional[typing.Callable[[], None]]
+    _pump: asyncio.Task[None]
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def __init__(
+        self,
+        upstream: typing.AsyncIterator[_T],
+        on_done: typing.Optional[typing.Callable[[], None]] = None,
+    ) -> None:
+        self._items = []
+        self._done = False
+        self._error = None
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._on_done = on_done
+        self._pump = asyncio.ensure_future(self._run(upstream))
+
+    async def _run(self, upstream: typing.AsyncIterator[_T]) -> None:
+        try:
+            async for item in upstream:
+                async with self._changed:
+                    self._items.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self._error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            aclose = getattr(upstream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._done = True
+            self._retire()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _retire(self) -> None:
+        on_done, self._on_done = self._on_done, None
+        if on_done is not None:
+            on_done()
+
+    def join(self, count: int = 1) -> None:
+        """
+        Counts `count` callers that will subscribe later (or `leave`), so that
+        the stream is not abandoned before they do.
+        """
+        self._subscribers += count
+
+    def leave(self) -> None:
+        """Uncounts a joined caller; the stream is abandoned if it was the last one."""
+        self._subscribers -= 1
+        if self._subscribers == 0 and not self._pump.done():
+            self._retire()
+            self._pump.cancel()
+
+    def subscribe(self, *, joined: bool = False) -> typing.AsyncIterator[_T]:
+        """
+        Returns an iterator over every item of the stream, from the first one.
+        Pass `joined=True` if the caller was already counted with `join`.
+        """
+        if not joined:
+            self.join()
+        return self._follow()
+
+    async def _follow(self) -> typing.AsyncGenerator[_T, None]:
+        position = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: position < self._items.__len__() or self._done)
+                    items = self._items[position:]
+                    done = self._done
+                for item in items:
+                    yield item
+                position += items.__len__()
+                if done and position >= self._items.__len__():
+                    break
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.leave()
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(items={self._items.__len__()}, subscribers={self._subscribers}, "
+            f"done={self._done})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Results are shared, not copied: every caller of a coalesced execution gets
+    the same object. Failures are shared too. An execution is cancelled only
+    when every caller awaiting it has been cancelled.
+
+    Attributes:
+        _flights: The executions in flight, by key.
+        _streams: The stream broadcasts in flight, by key.
+        _stats: The counters of the calls made so far.
+    """
+    _flights: typing.Dict[str, _Flight[typing.Any]]
+    _streams: typing.Dict[str, StreamBroadcast[typing.Any]]
+    _stats: SingleFlightStats
+
+    @property
+    def stats(self) -> SingleFlightStats:
+        """A snapshot of the counters."""
+        return dataclasses.replace(self._stats, in_flight=self._flights.__len__() + self._streams.__len__())
+
+    def __init__(self) -> None:
+        self._flights = {}
+        self._streams = {}
+        self._stats = SingleFlightStats()
+
+    async def do(self, key: str, func: typing.Callable[[], typing.Awaitable[_T]]) -> _T:
+        """Awaits `func()`, or the execution in flight with the same key."""
+        return await self._wait(self._join(key, func))
+
+    def _join(self, key: str, func: typing.Callable[[], typing.Awaitable[_T]]) -> _Flight[_T]:
+        """Returns the execution in flight with the key, starting `func()` if there is none."""
+        self._stats.requests += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self._stats.executed += 1
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self._stats.coalesced += 1
+        return flight
+
+    async def do_stream(
+        self,
+        key: str,
+        func: typing.Callable[[], typing.Awaitable[typing.AsyncIterator[_T]]],
+    ) -> typing.AsyncIterator[_T]:
+        """
+        Returns an iterator over the stream returned by `func()`, or a new
+        subscription to the stream in flight with the same key.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is not None:
+            self._stats.requests += 1
+            self._stats.coalesced += 1
+            return broadcast.subscribe()
+
+        async def _open() -> StreamBroadcast[_T]:
+            upstream = await func()
+            opened: StreamBroadcast[_T] = StreamBroadcast(upstream, on_done=lambda: self._close_stream(key, opened))
+            self._streams[key] = opened
+            # every caller awaiting the opening joins now, before any of them can read (and leave)
+            opened.join(opening.waiters)
+            return opened
+
+        # callers arriving while the stream is being opened share the opening as well
+        opening = self._join(f"stream:{key}", _open)
+        try:
+            broadcast = await self._wait(opening)
+        except asyncio.CancelledError:
+            if opening.task.done() and not opening.task.cancelled() and opening.task.exception() is None:
+                # cancelled after the stream was opened with this caller joined
+                opening.task.result().leave()
+            raise
+        return broadcast.subscribe(joined=True)
+
+    def _close_stream(self, key: str, broadcast: StreamBroadcast[typing.Any]) -> None:
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    @staticmethod
+    async def _wait(flight: _Flight[_T]) -> _T:
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return f"{self.__class__.__name__}(stats={self.stats})"
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -5,9 +5,12 @@ from __future__ import annotations
 
 from . import _text as text
 from ._text import (
+    TokenCounter,
     chunk_text,
     combine_embeddings,
+    estimate_tokens,
     num_tokens,
+    text_digest,
 )
 from ._utils import (
     deserialize_json,
@@ -20,5 +23,8 @@ __all__ = [
     "filter_kwargs",
     "chunk_text",
     "combine_embeddings",
+    "estimate_tokens",
     "num_tokens",
+    "text_digest",
+    "TokenCounter",
 ]
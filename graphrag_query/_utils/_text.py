@@ -3,8 +3,10 @@
 
 from __future__ import annotations
 
-import typing
+import hashlib
 import itertools
+import threading
+import typing
 
 import numpy as np
 import tiktoken
@@ -38,7 +40,128 @@ def combine_embeddings(embeddings: typing.List[typing.List[float]], lengths: typ
     return embeddings_.tolist()
 
 
-def num_tokens(text: str, token_encoder: typing.Optional[tiktoken.Encoding] = None) -> int:
-    """Return the number of tokens in the given text."""
+def num_tokens(
+    text: str,
+    token_encoder: typing.Optional[typing.Union[tiktoken.Encoding, TokenCounter]] = None,
+) -> int:
+    """
+    Return the number of tokens in the given text.
+
+    A `TokenCounter` may be passed in place of the encoder to use its cached
+    (or estimated) counts.
+    """
+    if isinstance(token_encoder, TokenCounter):
+        return token_encoder(text)
     token_encoder = token_encoder or tiktoken.get_encoding("cl100k_base")
     return token_encoder.encode(text).__len__()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Return a fast estimate of the number of tokens in the given text, assuming
+    about four characters per token as for English text with BPE encoders.
+    """
+    return (text.__len__() + 3) // 4
+
+
+def text_digest(text: str) -> bytes:
+    """Return the 16-byte digest under which the token count of a text is precomputed."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCounter:
+    """
+    Counts the tokens of texts with a fixed encoder, remembering the counts.
+
+    The context tables are rebuilt on every query from mostly the same rows
+    (community reports, text units, entity and relationship descriptions), so
+    the counts of rows seen by earlier queries are looked up instead of being
+    re-encoded. Counts computed ahead of time (e.g. by a compiled index
+    snapshot) can be handed over with `precompute`; they are keyed by the
+    `text_digest` of the text, so they cost 16 bytes per row rather than a copy
+    of the text. In estimate mode the counts are approximated from the text
+    length instead, which is cheaper but may over- or under-fill the budgets.
+
+    Attributes:
+        _token_encoder: The encoder used to count tokens.
+        _estimate: Whether counts are estimated rather than encoded.
+        _max_entries:
+            The maximum number of remembered counts; the oldest are dropped
+            first.
+        _counts: The remembered counts, keyed by text.
+        _precomputed: The counts computed ahead of time, keyed by text digest.
+        _lock: Guards the eviction of remembered counts.
+    """
+    _token_encoder: tiktoken.Encoding
+    _estimate: bool
+    _max_entries: int
+    _counts: typing.Dict[str, int]
+    _precomputed: typing.Dict[bytes, int]
+    _lock: threading.Lock
+
+    @property
+    def token_encoder(self) -> tiktoken.Encoding:
+        return self._token_encoder
+
+    @property
+    def estimate(self) -> bool:
+        return self._estimate
+
+    def __init__(
+        self,
+        token_encoder: typing.Optional[tiktoken.Encoding] = None,
+        *,
+        estimate: bool = False,
+        max_entries: int = 262144,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self._token_encoder = token_encoder or tiktoken.get_encoding("cl100k_base")
+        self._estimate = estimate
+        self._max_entries = max_entries
+        self._counts = {}
+        self._precomputed = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str) -> int:
+        if self._estimate:
+            return estimate_tokens(text)
+        count = self._counts.get(text)
+        if count is None:
+            count = self._precomputed.get(text_digest(text)) if self._precomputed else None
+            if count is None:
+                count = self._token_encoder.encode(text).__len__()
+            with self._lock:
+                if self._counts.__len__() >= self._max_entries:
+                    del self._counts[next(iter(self._counts))]
+                self._counts[text] = count
+        return count
+
+    def __len__(self) -> int:
+        return self._counts.__len__()
+
+    def clear(self) -> None:
+        """Forget all remembered counts (the precomputed counts are kept)."""
+        with self._lock:
+            self._counts.clear()
+
+    def precompute(self, counts: typing.Mapping[bytes, int]) -> None:
+        """
+        Add token counts computed ahead of time, keyed by the `text_digest` of
+        their text. They must have been counted with the same encoding.
+        """
+        self._precomputed.update(counts)
+
+    def digests(self) -> typing.Dict[bytes, int]:
+        """Return the remembered counts keyed by the `text_digest` of their text, for `precompute`."""
+        with self._lock:
+            return {text_digest(text): count for text, count in self._counts.items()}
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(encoding={self._token_encoder.name}, estimate={self._estimate}, "
+            f"entries={self._counts.__len__()})"
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
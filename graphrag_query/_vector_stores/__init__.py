@@ -9,6 +9,7 @@ from ._base_vector_store import (
     VectorStoreSearchResult,
 )
 from ._lancedb import LanceDBVectorStore
+from ._numpy import NumpyVectorStore
 
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "VectorStoreDocument",
     "VectorStoreSearchResult",
     "LanceDBVectorStore",
+    "NumpyVectorStore",
 ]
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import abc
+import asyncio
 import dataclasses
 import typing
 
@@ -78,6 +79,33 @@ class BaseVectorStore(abc.ABC):
         """Perform ANN search by text."""
         ...
 
+    async def asimilarity_search_by_vector(
+        self,
+        query_embedding: typing.List[float],
+        k: int = 10,
+        **kwargs: typing.Any
+    ) -> typing.List[VectorStoreSearchResult]:
+        """
+        Perform ANN search by vector without blocking the event loop.
+
+        The default implementation runs `similarity_search_by_vector` in a
+        worker thread; stores with a native async client should override it.
+        """
+        return await asyncio.to_thread(self.similarity_search_by_vector, query_embedding, k, **kwargs)
+
+    async def asimilarity_search_by_text(
+        self,
+        text: str,
+        text_embedder: typing.Callable[[str], typing.Awaitable[typing.List[float]]],
+        k: int = 10,
+        **kwargs: typing.Any
+    ) -> typing.List[VectorStoreSearchResult]:
+        """Perform ANN search by text with an asynchronous text embedder."""
+        query_embedding = await text_embedder(text)
+        if not query_embedding:
+            return []
+        return await self.asimilarity_search_by_vector(query_embedding, k, **kwargs)
+
     @abc.abstractmethod
     def filter_by_id(self, include_ids: typing.Union[typing.List[str], typing.List[int]]) -> typing.Any:
         """Build a query filter to filter documents by id."""
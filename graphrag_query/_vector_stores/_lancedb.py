@@ -3,26 +3,67 @@
 
 from __future__ import annotations
 
+import array
+import contextlib
+import hashlib
 import json
+import os
 import typing
 import typing_extensions
 
 import lancedb  # type: ignore
 import pyarrow as pa  # type: ignore
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore
+
 from . import _base_vector_store
 
+_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string()),
+        pa.field("text", pa.string()),
+        pa.field("vector", pa.list_(pa.float64())),
+        pa.field("attributes", pa.string()),
+    ]
+)
+
+# bump to invalidate the versioned tables written by older releases
+_TABLE_FORMAT_VERSION = 1
+
 
 class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
     """The LanceDB vector storage implementation."""
     collection_name: str
+    uri: str
     db_connection: lancedb.DBConnection  # type: ignore
     document_collection: lancedb.table.Table  # type: ignore
     query_filter: typing.Optional[str] = None
+    nprobes: typing.Optional[int] = None
+    refine_factor: typing.Optional[int] = None
 
-    def __init__(self, collection_name: str, uri: str = "./lancedb", **kwargs: typing.Any) -> None:
-        """Initialize the LanceDB vector storage."""
+    def __init__(
+        self,
+        collection_name: str,
+        uri: str = "./lancedb",
+        *,
+        nprobes: typing.Optional[int] = None,
+        refine_factor: typing.Optional[int] = None,
+        **kwargs: typing.Any,
+    ) -> None:
+        """
+        Initialize the LanceDB vector storage.
+
+        `nprobes` and `refine_factor` tune the searches of tables with an
+        approximate index (see `load_documents_versioned`); they default to
+        LanceDB's settings.
+        """
         super().__init__(collection_name, **kwargs)
+        self.uri = uri
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
         self.db_connection = lancedb.connect(uri)  # type: ignore
 
     @typing_extensions.override
@@ -30,23 +71,7 @@ class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
         self, documents: typing.List[_base_vector_store.VectorStoreDocument], overwrite: bool = True
     ) -> None:
         """Load documents into vector storage."""
-        data = [
-            {
-                "id":         document.id,
-                "text":       document.text,
-                "vector":     document.vector,
-                "attributes": json.dumps(document.attributes),
-            } for document in documents if document.vector is not None
-        ]
-
-        schema = pa.schema(
-            [
-                pa.field("id", pa.string()),
-                pa.field("text", pa.string()),
-                pa.field("vector", pa.list_(pa.float64())),
-                pa.field("attributes", pa.string()),
-            ]
-        )
+        data = _to_records(documents)
         if overwrite:
             if data.__len__():
                 self.document_collection = self.db_connection.create_table(
@@ -54,7 +79,7 @@ class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
                 )
             else:
                 self.document_collection = self.db_connection.create_table(
-                    self.collection_name, schema=schema, mode="overwrite"
+                    self.collection_name, schema=_SCHEMA, mode="overwrite"
                 )
         else:
             # add data to existing table
@@ -64,6 +89,94 @@ class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
             if data.__len__():
                 self.document_collection.add(data)
 
+    def load_documents_versioned(
+        self,
+        documents: typing.List[_base_vector_store.VectorStoreDocument],
+        *,
+        index_min_rows: typing.Optional[int] = 100_000,
+        index_type: str = "IVF_PQ",
+    ) -> bool:
+        """
+        Load documents into a table versioned by their content, reusing the
+        table written by an earlier run (or another process) if the documents
+        have not changed.
+
+        The table is named `<collection_name>-<content hash>`, so unchanged
+        inputs map to the same table and are only opened, while changed inputs
+        get a new table. Creation is serialized across processes on one host
+        with a lock file next to the table (for local URIs, where `fcntl` is
+        available), so concurrently booting workers write the table once.
+        Tables of older versions are left in place; see `drop_stale_versions`.
+
+        Args:
+            documents: The documents to load.
+            index_min_rows:
+                The number of rows from which an approximate nearest neighbor
+                index is built over the vectors, or None to always search
+                exhaustively.
+            index_type:
+                The LanceDB index type, e.g. "IVF_PQ" or "IVF_HNSW_SQ".
+
+        Returns:
+            True if the table was written, False if an existing one was reused.
+        """
+        data = _to_records(documents)
+        table_name = f"{self.collection_name}-{_content_hash(data)[:16]}"
+        with self._creation_lock(table_name):
+            created = table_name not in self.db_connection.table_names()
+            if created:
+                self.document_collection = self.db_connection.create_table(
+                    table_name, **({"data": data} if data.__len__() else {"schema": _SCHEMA})
+                )
+            else:
+                self.document_collection = self.db_connection.open_table(table_name)
+            if (
+                index_min_rows is not None
+                and data.__len__() >= index_min_rows
+                and not self.document_collection.to_lance().list_indices()
+            ):
+                self._create_vector_index(data.__len__(), len(data[0]["vector"]), index_type)
+        return created
+
+    def drop_stale_versions(self) -> typing.List[str]:
+        """
+        Drop the tables of this collection written by `load_documents_versioned`
+        for other contents than the loaded one, and return their names.
+        """
+        current = getattr(self, "document_collection", None)
+        current_name = current.name if current is not None else None
+        stale = [
+            name for name in self.db_connection.table_names()
+            if name.startswith(f"{self.collection_name}-") and name != current_name
+        ]
+        for name in stale:
+            self.db_connection.drop_table(name)
+        return stale
+
+    def _create_vector_index(self, num_rows: int, dimensions: int, index_type: str) -> None:
+        # sqrt(n) partitions and ~16 dimensions per PQ sub-vector, as recommended by LanceDB
+        num_sub_vectors = next(
+            n for n in (dimensions // 16, dimensions // 8, dimensions // 4, 1) if n and dimensions % n == 0
+        )
+        self.document_collection.create_index(
+            num_partitions=max(1, int(num_rows ** 0.5)),
+            num_sub_vectors=num_sub_vectors,
+            index_type=index_type,
+        )
+
+    @contextlib.contextmanager
+    def _creation_lock(self, table_name: str) -> typing.Iterator[None]:
+        if fcntl is None or "://" in self.uri:
+            yield
+            return
+        os.makedirs(self.uri, exist_ok=True)
+        with open(os.path.join(self.uri, f".{table_name}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     @typing_extensions.override
     def filter_by_id(self, include_ids: typing.List[str] | typing.List[int]) -> typing.Optional[str]:
         """Build a query filter to filter documents by id."""
@@ -83,13 +196,15 @@ class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
         self, query_embedding: typing.List[float], k: int = 10, **kwargs: typing.Any
     ) -> typing.List[_base_vector_store.VectorStoreSearchResult]:
         """Perform a vector-based similarity search."""
+        query = self.document_collection.search(query=query_embedding)
+        if self.nprobes is not None:
+            query = query.nprobes(self.nprobes)
+        if self.refine_factor is not None:
+            query = query.refine_factor(self.refine_factor)
         if self.query_filter:
-            docs = (
-                self.document_collection.search(query=query_embedding)
-                .where(self.query_filter, prefilter=True).limit(k).to_list()
-            )
+            docs = query.where(self.query_filter, prefilter=True).limit(k).to_list()
         else:
-            docs = self.document_collection.search(query=query_embedding).limit(k).to_list()
+            docs = query.limit(k).to_list()
         return [
             _base_vector_store.VectorStoreSearchResult(
                 document=_base_vector_store.VectorStoreDocument(
@@ -115,3 +230,24 @@ class LanceDBVectorStore(_base_vector_store.BaseVectorStore):
         if query_embedding:
             return self.similarity_search_by_vector(query_embedding, k)
         return []
+
+
+def _to_records(
+    documents: typing.List[_base_vector_store.VectorStoreDocument],
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    return [
+        {
+            "id":         document.id,
+            "text":       document.text,
+            "vector":     document.vector,
+            "attributes": json.dumps(document.attributes),
+        } for document in documents if document.vector is not None
+    ]
+
+
+def _content_hash(records: typing.List[typing.Dict[str, typing.Any]]) -> str:
+    digest = hashlib.sha256(f"{_TABLE_FORMAT_VERSION}".encode())
+    for record in records:
+        digest.update(f"{record['id']}\x00{record['text']}\x00{record['attributes']}\x00".encode("utf-8"))
+        digest.update(array.array("d", record["vector"]).tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,224 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import typing
+import typing_extensions
+
+import numpy as np
+
+from . import _base_vector_store
+
+
+class NumpyVectorStore(_base_vector_store.BaseVectorStore):
+    """
+    An in-process vector storage doing exact (brute-force) search with NumPy.
+
+    The embeddings are normalized and kept in one contiguous float32 matrix, so
+    a search is a single matrix-vector product followed by a partial sort. For
+    indexes of up to a few hundred thousand documents this is faster than a
+    round trip to an on-disk store, and nothing is written to disk. Scores are
+    cosine similarities.
+
+    Attributes:
+        _ids: The document ids, in row order.
+        _rows: The row of each document id.
+        _texts: The document texts, in row order.
+        _attributes: The document attributes, in row order.
+        _matrix: The (documents, dimensions) matrix of normalized embeddings.
+        _mask:
+            A boolean mask of the rows searches are restricted to, or None to
+            search every row.
+    """
+    _ids: typing.List[typing.Union[str, int]]
+    _rows: typing.Dict[typing.Union[str, int], int]
+    _texts: typing.List[typing.Optional[str]]
+    _attributes: typing.List[typing.Dict[str, typing.Any]]
+    _matrix: np.ndarray
+    _mask: typing.Optional[np.ndarray]
+
+    def __init__(self, collection_name: str, **kwargs: typing.Any) -> None:
+        """Initialize the NumPy vector storage."""
+        super().__init__(collection_name, **kwargs)
+        self._ids = []
+        self._rows = {}
+        self._texts = []
+        self._attributes = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._mask = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """A read-only view of the normalized embedding matrix."""
+        view = self._matrix.view()
+        view.flags.writeable = False
+        return view
+
+    def __len__(self) -> int:
+        return self._ids.__len__()
+
+    @typing_extensions.override
+    def load_documents(
+        self, documents: typing.List[_base_vector_store.VectorStoreDocument], overwrite: bool = True
+    ) -> None:
+        """
+        Load documents into vector storage.
+
+        Documents without a vector are skipped.
+
+        Raises:
+            ValueError: If the vectors do not all have the same dimensions.
+        """
+        documents = [document for document in documents if document.vector is not None]
+        if overwrite:
+            self._reset()
+        if not documents:
+            return
+
+        matrix = np.asarray([document.vector for document in documents], dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Document vectors have inconsistent dimensions")
+        self._append(
+            [document.id for document in documents],
+            [document.text for document in documents],
+            [document.attributes for document in documents],
+            matrix,
+        )
+
+    def load_matrix(
+        self,
+        ids: typing.Sequence[typing.Union[str, int]],
+        texts: typing.Sequence[typing.Optional[str]],
+        attributes: typing.Sequence[typing.Dict[str, typing.Any]],
+        matrix: np.ndarray,
+        overwrite: bool = True,
+    ) -> None:
+        """
+        Load documents whose vectors are given as the rows of a matrix.
+
+        Unlike `load_documents`, the vectors are not converted from lists of
+        floats; the matrix is copied (it may be read-only, e.g. memory-mapped)
+        and normalized in one pass.
+
+        Raises:
+            ValueError:
+                If the matrix is not (documents, dimensions) or does not match
+                the dimensions of the loaded documents.
+        """
+        if matrix.ndim != 2 or not (ids.__len__() == texts.__len__() == attributes.__len__() == matrix.shape[0]):
+            raise ValueError(f"Expected a ({ids.__len__()}, dimensions) matrix, got {matrix.shape}")
+        if overwrite:
+            self._reset()
+        if matrix.shape[0] == 0:
+            return
+        self._append(list(ids), list(texts), list(attributes), np.array(matrix, dtype=np.float32))
+
+    def _reset(self) -> None:
+        self._ids, self._rows, self._texts, self._attributes = [], {}, [], []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._mask = None
+
+    def _append(
+        self,
+        ids: typing.List[typing.Union[str, int]],
+        texts: typing.List[typing.Optional[str]],
+        attributes: typing.List[typing.Dict[str, typing.Any]],
+        matrix: np.ndarray,
+    ) -> None:
+        """Append documents; `matrix` is owned by the store from now on and normalized in place."""
+        if self._matrix.shape[0] > 0 and matrix.shape[1] != self._matrix.shape[1]:
+            raise ValueError(
+                f"Expected vectors of {self._matrix.shape[1]} dimensions, got {matrix.shape[1]}"
+            )
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+        offset = self._ids.__len__()
+        for row, id_ in enumerate(ids, start=offset):
+            self._rows[id_] = row
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._attributes.extend(attributes)
+        self._matrix = matrix if offset == 0 else np.ascontiguousarray(np.vstack([self._matrix, matrix]))
+        if self._mask is not None:
+            self._mask = np.concatenate([self._mask, np.zeros(matrix.shape[0], dtype=bool)])
+
+    @typing_extensions.override
+    def filter_by_id(
+        self, include_ids: typing.Union[typing.List[str], typing.List[int]]
+    ) -> typing.Optional[np.ndarray]:
+        """
+        Restrict searches to the documents with the given ids, or lift the
+        restriction if no ids are given. Returns the mask of searched rows.
+        """
+        if len(include_ids) == 0:
+            self._mask = None
+        else:
+            self._mask = np.zeros(self._ids.__len__(), dtype=bool)
+            rows = [self._rows[id_] for id_ in include_ids if id_ in self._rows]
+            self._mask[rows] = True
+        return self._mask
+
+    @typing_extensions.override
+    def similarity_search_by_vector(
+        self, query_embedding: typing.List[float], k: int = 10, **kwargs: typing.Any
+    ) -> typing.List[_base_vector_store.VectorStoreSearchResult]:
+        """Perform an exact cosine similarity search."""
+        if k <= 0 or self._ids.__len__() == 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if self._mask is None:
+            candidates = None
+            scores = self._matrix @ query
+        else:
+            candidates = np.flatnonzero(self._mask)
+            scores = self._matrix[candidates] @ query
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+            # ties are broken by row order, as with a full sort
+            top = top[np.lexsort((top, -scores[top]))]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        rows = top if candidates is None else candidates[top]
+
+        return [
+            _base_vector_store.VectorStoreSearchResult(
+                document=_base_vector_store.VectorStoreDocument(
+                    id=self._ids[row],
+                    text=self._texts[row],
+                    vector=self._matrix[row].tolist(),
+                    attributes=self._attributes[row],
+                ),
+                score=float(score),
+            ) for row, score in zip(rows.tolist(), scores[top].tolist())
+        ]
+
+    @typing_extensions.override
+    def similarity_search_by_text(
+        self,
+        text: str,
+        text_embedder: typing.Callable[[str], typing.List[float]],
+        k: int = 10,
+        **kwargs: typing.Any
+    ) -> typing.List[_base_vector_store.VectorStoreSearchResult]:
+        """Perform a similarity search using a given input text."""
+        query_embedding = text_embedder(text)
+        if query_embedding:
+            return self.similarity_search_by_vector(query_embedding, k)
+        return []
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(collection_name={self.collection_name}, documents={self._ids.__len__()}, "
+            f"dimensions={self._matrix.shape[1]})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import typing
 
+from . import _batch, _singleflight
 from ._search import _types
 from ._search._engine import _base_engine
 from ._search._llm import _types as _llm_types
@@ -21,6 +22,11 @@ __all__ = [
     'Response_T',
     'StreamResponse_T',
     'AsyncStreamResponse_T',
+    'BatchItem',
+    'BatchSummary',
+    'BatchRun',
+    'AsyncBatchRun',
+    'SingleFlightStats',
 ]
 
 Logger: typing.TypeAlias = _base_engine.Logger
@@ -33,3 +39,10 @@ Response_T: typing.TypeAlias = typing.Union[Response, ResponseVerbose]
 _Response_Chunk_T: typing.TypeAlias = typing.Union[ResponseChunk, ResponseChunkVerbose]
 StreamResponse_T: typing.TypeAlias = typing.Iterator[_Response_Chunk_T]
 AsyncStreamResponse_T: typing.TypeAlias = typing.AsyncIterator[_Response_Chunk_T]
+
+BatchItem: typing.TypeAlias = _batch.BatchItem
+BatchSummary: typing.TypeAlias = _batch.BatchSummary
+BatchRun: typing.TypeAlias = _batch.BatchRun
+AsyncBatchRun: typing.TypeAlias = _batch.AsyncBatchRun
+
+SingleFlightStats: typing.TypeAlias = _singleflight.SingleFlightStats
@@ -0,0 +1,28 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Gunicorn configuration of the GraphRAG OpenAI API server.
+
+With `GRAPH_RAG_OPENAI__PRELOAD_INDEX=true`, the application (and with it the
+index) is loaded once in the master process and the workers are forked from
+it, sharing the index pages copy-on-write instead of each loading their own
+copy (in part: see `server.common.graphrag.preload_index`).
+"""
+
+import gc
+
+from server import config
+
+wsgi_app = "server:create_app()"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = config.get_config().preload_index
+
+
+def when_ready(server):
+    if preload_app:
+        # Move the preloaded objects to the permanent generation, so the garbage collector of the workers never
+        # writes to their headers (which would copy the shared pages into every worker). Their reference counts are
+        # still written when the workers use them, so only the pages of the NumPy buffers stay fully shared.
+        gc.freeze()
+        server.log.info(f"Preloaded index frozen: {gc.get_freeze_count()} objects shared with the workers")
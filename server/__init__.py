@@ -3,6 +3,10 @@
 
 from __future__ import annotations
 
+import contextlib
+import datetime
+import typing
+
 import fastapi
 import tabulate
 
@@ -15,6 +19,7 @@ from server.common import (
     graphrag,
     log,
     middleware,
+    response_cache,
 )
 
 
@@ -28,9 +33,14 @@ def create_app() -> fastapi.FastAPI:
         rotation=_config.log_rotation,
         retention=_config.log_retention,
     )
-    graphrag.init_client(_config.graphrag_config_file)
-
-    app = fastapi.FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+    if _config.preload_index:
+        # load the index now (in the gunicorn master when `preload_app` is set) and create the clients once the
+        # workers are forked
+        graphrag.preload_index(_config.graphrag_config_file)
+        app = fastapi.FastAPI(docs_url=None, redoc_url=None, openapi_url=None, lifespan=_lifespan)
+    else:
+        _init_worker(_config)
+        app = fastapi.FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
     handler.init_handler(app)
     middleware.init_middleware(app, api_keys=_config.api_keys)
     router.init_router(app, prefix=_config.app_route_prefix)
@@ -38,3 +48,32 @@ def create_app() -> fastapi.FastAPI:
     print(tabulate.tabulate(_config.dict().items(), headers=["Configurations", "Values"], tablefmt="fancy_grid"))
 
     return app
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(_: fastapi.FastAPI) -> typing.AsyncIterator[None]:
+    _init_worker(config.get_config())
+    yield
+
+
+def _init_worker(_config: config.Config) -> None:
+    graphrag.init_client(
+        _config.graphrag_config_file,
+        engine_max_concurrency={
+            'local': _config.local_max_concurrency,
+            'global': _config.global_max_concurrency,
+        },
+        engine_max_queue={
+            'local': _config.local_max_queue,
+            'global': _config.global_max_queue,
+        },
+        global_map_concurrency=_config.global_map_concurrency,
+    )
+    if _config.response_cache_enabled:
+        response_cache.init_completion_cache(
+            max_entries=_config.response_cache_max_entries,
+            max_bytes=_config.response_cache_max_bytes,
+            ttl=datetime.timedelta(seconds=_config.response_cache_ttl),
+            expiry_interval=datetime.timedelta(seconds=_config.response_cache_expiry_interval),
+            replay_stream=_config.response_cache_replay_stream,
+        )
@@ -3,7 +3,10 @@
 
 from __future__ import annotations
 
+import collections
 import datetime
+import sys
+import threading
 import time
 import typing
 
@@ -12,15 +15,61 @@ import typing_extensions
 
 class Cache(typing.MutableMapping[str, typing.Any]):
     """
-    Threading-unsafe in-memory cache with optional TTL support.
+    Thread-safe in-memory cache with optional TTL support and LRU eviction.
+
+    Every operation runs under a lock for a short, non-blocking critical
+    section, so one cache can be shared by threads and by the coroutines of an
+    event loop. When the cache holds more than `max_entries` entries or more
+    than `max_bytes` bytes (as measured by `sizeof`), the least recently used
+    entries are evicted. Expired entries are dropped when accessed, by
+    `clear_expired`, or periodically once `start_expiry` has been called.
 
     Attributes:
-        _cache (typing.Dict[str, typing.Tuple[typing.Any, float, typing.Optional[datetime.timedelta]]]):
-            The cache dictionary containing the cached values, timestamps, and TTLs.
+        _cache (collections.OrderedDict[str, typing.Tuple[typing.Any, float, typing.Optional[datetime.timedelta]]]):
+            The cache dictionary containing the cached values, timestamps, and
+            TTLs, least recently used first.
+        _sizes (typing.Dict[str, int]): The size of each cached value.
+        _nbytes (int): The total size of the cached values.
+        _max_entries (typing.Optional[int]): The maximum number of entries, or None if unbounded.
+        _max_bytes (typing.Optional[int]): The maximum total size of the values, or None if unbounded.
+        _sizeof (typing.Callable[[typing.Any], int]): Measures the size of a value in bytes.
+        _lock (threading.RLock): Guards the attributes above.
+        _expiry_stop (typing.Optional[threading.Event]): Stops the background expiry thread, if running.
     """
 
-    def __init__(self) -> None:
-        self._cache: typing.Dict[str, typing.Tuple[typing.Any, float, typing.Optional[datetime.timedelta]]] = {}
+    def __init__(
+        self,
+        *,
+        max_entries: typing.Optional[int] = None,
+        max_bytes: typing.Optional[int] = None,
+        sizeof: typing.Callable[[typing.Any], int] = sys.getsizeof,
+    ) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        self._cache: collections.OrderedDict[
+            str, typing.Tuple[typing.Any, float, typing.Optional[datetime.timedelta]]
+        ] = collections.OrderedDict()
+        self._sizes: typing.Dict[str, int] = {}
+        self._nbytes = 0
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.RLock()
+        self._expiry_stop: typing.Optional[threading.Event] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    @property
+    def max_entries(self) -> typing.Optional[int]:
+        return self._max_entries
+
+    @property
+    def max_bytes(self) -> typing.Optional[int]:
+        return self._max_bytes
 
     @typing_extensions.override
     def __setitem__(self, key: str, value: typing.Any) -> None:
@@ -36,77 +85,133 @@ class Cache(typing.MutableMapping[str, typing.Any]):
 
     @typing_extensions.override
     def __contains__(self, key: object) -> bool:
-        return self.exists(key.__str__()) and self.get(key.__str__()) is not None
+        with self._lock:
+            return self.exists(key.__str__()) and self.get(key.__str__()) is not None
 
     @typing_extensions.override
     def __len__(self) -> int:
-        return self._cache.__len__()
+        with self._lock:
+            return self._cache.__len__()
 
     @typing_extensions.override
     def __iter__(self) -> typing.Iterator[str]:
-        return self._cache.__iter__()
+        with self._lock:
+            return list(self._cache).__iter__()
 
     @typing_extensions.override
     def __repr__(self) -> str:
-        return self._cache.__repr__()
+        with self._lock:
+            return self._cache.__repr__()
 
     @typing_extensions.override
     def __str__(self) -> str:
-        return self._cache.__str__()
+        with self._lock:
+            return self._cache.__str__()
 
     def set(self, key: str, value: typing.Any, ttl: typing.Optional[datetime.timedelta] = None) -> None:
-        self._cache[key] = (value, time.time(), ttl)
+        size = self._sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if self._max_bytes is not None and size > self._max_bytes:
+                return
+            self._cache[key] = (value, time.time(), ttl)
+            self._sizes[key] = size
+            self._nbytes += size
+            self._evict()
 
     @typing_extensions.override
     def get(self, key: str, default: typing.Optional[typing.Any] = None) -> typing.Any:
-        if key in self._cache:
-            value, timestamp, ttl = self._cache[key]
-            if ttl is None or time.time() - timestamp < ttl.total_seconds():
-                return value
-            else:
-                del self._cache[key]
-        return default
+        with self._lock:
+            if key in self._cache:
+                value, timestamp, ttl = self._cache[key]
+                if ttl is None or time.time() - timestamp < ttl.total_seconds():
+                    self._cache.move_to_end(key)
+                    return value
+                else:
+                    self._pop(key)
+            return default
 
     def getdel(self, key: str) -> typing.Any:
-        value = self.get(key)
-        if value is not None:
-            del self._cache[key]
-        return value
+        with self._lock:
+            value = self.get(key)
+            if value is not None:
+                self._pop(key)
+            return value
 
     def delete(self, key: str) -> None:
-        if key in self._cache:
-            del self._cache[key]
+        with self._lock:
+            self._pop(key)
 
     @typing_extensions.override
     def clear(self) -> None:
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._sizes.clear()
+            self._nbytes = 0
 
     def clear_expired(self) -> None:
-        self._cache = {
-            k: v for k, v in self._cache.items() if v[2] is None or time.time() - v[1] < v[2].total_seconds()
-        }
+        now = time.time()
+        with self._lock:
+            expired = [
+                k for k, v in self._cache.items() if v[2] is not None and now - v[1] >= v[2].total_seconds()
+            ]
+            for k in expired:
+                self._pop(k)
 
     def exists(self, key: str) -> bool:
         return key in self._cache
 
     def expire(self, key: str, ttl: datetime.timedelta) -> None:
-        if key in self._cache:
-            value, timestamp, _ = self._cache[key]
-            self._cache[key] = (value, timestamp, ttl)
-        else:
-            raise KeyError(f"Key '{key}' does not exist in the cache.")
+        with self._lock:
+            if key in self._cache:
+                value, timestamp, _ = self._cache[key]
+                self._cache[key] = (value, timestamp, ttl)
+            else:
+                raise KeyError(f"Key '{key}' does not exist in the cache.")
 
     def incr(self, key: str) -> int:
+        with self._lock:
+            if key in self._cache:
+                value, _, _ = self._cache[key]
+                if not isinstance(value, int):
+                    raise ValueError("Value is not an integer.")
+                value += 1
+                self.set(key, value)
+                return value
+            else:
+                self.set(key, 1)
+                return 1
+
+    def start_expiry(self, interval: datetime.timedelta) -> None:
+        """Drop expired entries every `interval` on a background daemon thread, until `stop_expiry`."""
+        with self._lock:
+            if self._expiry_stop is not None:
+                return
+            stop = self._expiry_stop = threading.Event()
+
+        def _run() -> None:
+            while not stop.wait(interval.total_seconds()):
+                self.clear_expired()
+
+        threading.Thread(target=_run, name="cache-expiry", daemon=True).start()
+
+    def stop_expiry(self) -> None:
+        with self._lock:
+            if self._expiry_stop is not None:
+                self._expiry_stop.set()
+                self._expiry_stop = None
+
+    def _pop(self, key: str) -> None:
         if key in self._cache:
-            value, _, _ = self._cache[key]
-            if not isinstance(value, int):
-                raise ValueError("Value is not an integer.")
-            value += 1
-            self._cache[key] = (value, time.time(), None)
-            return value
-        else:
-            self._cache[key] = (1, time.time(), None)
-            return 1
+            del self._cache[key]
+            self._nbytes -= self._sizes.pop(key)
+
+    def _evict(self) -> None:
+        while self._cache and (
+            (self._max_entries is not None and self._cache.__len__() > self._max_entries)
+            or (self._max_bytes is not None and self._nbytes > self._max_bytes)
+        ):
+            self._pop(next(self._cache.__iter__()))
 
 
 _cache = Cache()
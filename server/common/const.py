@@ -9,6 +9,9 @@ class Constants:
     REQUEST_ID_HEADER = "x-request-id"
     AUTHORIZATION_HEADER = "authorization"
     IP_HEADER = "x-forwarded-for"
+    ENGINE_HEADER = "x-graphrag-engine"
+    RETRY_AFTER_HEADER = "retry-after"
+    CACHE_HEADER = "x-graphrag-cache"
 
     # Logging Tags
     SYS_LOGGING_TAG = "SYSTEM"
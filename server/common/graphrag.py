@@ -3,22 +3,99 @@
 
 from __future__ import annotations
 
+import asyncio
+import gc
 import os
 import pathlib
+import time
 import typing
 
 import graphrag_query
 from graphrag_query import types
+from server.common import limiter
+
+Engine_T: typing.TypeAlias = typing.Literal['local', 'global']
+
+ENGINES: typing.Tuple[Engine_T, ...] = ('local', 'global')
 
 _client: graphrag_query.AsyncGraphRAGClient
+_preloaded: typing.Optional[graphrag_query.LocalContextBuilder] = None
+_limiters: typing.Dict[Engine_T, limiter.ConcurrencyLimiter]
+_created: int
 
 
-def init_client(config_file: typing.Union[str, os.PathLike[str], pathlib.Path]) -> None:
-    global _client
-    _client = graphrag_query.AsyncGraphRAGClient.from_config_file(config_file)
+def preload_index(config_file: typing.Union[str, os.PathLike[str], pathlib.Path]) -> None:
+    """
+    Load the local context of the index once, before the server forks its
+    workers, so that `init_client` in each worker shares it instead of loading
+    it again.
+
+    Only the context builder is loaded, not a client, so the master holds no
+    connections, threads or cache databases for the workers to inherit. The
+    records are repacked into compact column stores (embeddings in float32
+    matrices) and the entity embeddings are searched with the in-process NumPy
+    store, whereas the LanceDB runtime does not survive a fork.
+
+    The sharing is partial. The pages of the NumPy buffers are never written
+    once loaded, so the workers keep sharing them. The records, though, are
+    `ModelView` objects (one Python object per row, like the values of the
+    scalar columns), whose reference counts are written whenever a worker
+    reads them, copying their pages into that worker; `gc.freeze()` (see
+    `gunicorn.conf.py`) only stops the garbage collector from writing to them
+    too.
+    """
+    global _preloaded
+    _preloaded = graphrag_query.load_local_context_builder(
+        graphrag_query.GraphRAGConfig.from_config_file(config_file),
+        compact_models=True,
+        store__backend='numpy',
+    )
+    # drop the loading garbage before the pages are shared
+    gc.collect()
+
+
+def init_client(
+    config_file: typing.Union[str, os.PathLike[str], pathlib.Path],
+    *,
+    engine_max_concurrency: typing.Mapping[Engine_T, int],
+    engine_max_queue: typing.Mapping[Engine_T, int],
+    global_map_concurrency: int,
+) -> None:
+    """
+    Create the client of this worker and the concurrency limiter of each
+    engine.
+
+    Every global search of the worker runs its map and reduce calls under one
+    bounded semaphore of `global_map_concurrency` slots, so concurrent requests
+    share the budget instead of each fanning out to its own. If the index was
+    loaded by `preload_index`, the client shares it.
+    """
+    global _client, _limiters, _created
+    _client = graphrag_query.AsyncGraphRAGClient(
+        config=graphrag_query.GraphRAGConfig.from_config_file(config_file),
+        local_context_builder=_preloaded,
+        global_map_semaphore=asyncio.BoundedSemaphore(global_map_concurrency),
+    )
+    _limiters = {
+        engine: limiter.ConcurrencyLimiter(
+            engine,
+            max_concurrency=engine_max_concurrency[engine],
+            max_queue=engine_max_queue[engine],
+        ) for engine in ENGINES
+    }
+    _created = int(time.time())
 
 
 def get_client(logger: typing.Optional[types.Logger]) -> graphrag_query.AsyncGraphRAGClient:
     global _client
     _client.logger = logger
     return _client
+
+
+def get_limiter(engine: Engine_T) -> limiter.ConcurrencyLimiter:
+    return _limiters[engine]
+
+
+def get_created() -> int:
+    """The time (in seconds since the epoch) the client of this worker was created."""
+    return _created
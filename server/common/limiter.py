@@ -0,0 +1,125 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import typing
+
+import typing_extensions
+
+from server.common import errors
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of requests running at once in one worker.
+
+    Requests beyond `max_concurrency` wait for a slot in arrival order. At most
+    `max_queue` requests may wait; a request arriving when the queue is full is
+    rejected right away with `TooManyRequestsError` instead of piling up behind
+    slow ones.
+
+    Attributes:
+        _name: The name of the limited resource, used in error messages.
+        _max_concurrency: The maximum number of requests running at once.
+        _max_queue: The maximum number of requests waiting for a slot.
+        _semaphore: The semaphore holding the slots.
+        _running: The number of requests holding a slot.
+        _waiting: The number of requests waiting for a slot.
+    """
+    _name: str
+    _max_concurrency: int
+    _max_queue: int
+    _semaphore: asyncio.Semaphore
+    _running: int
+    _waiting: int
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    @property
+    def max_queue(self) -> int:
+        return self._max_queue
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def __init__(self, name: str, *, max_concurrency: int, max_queue: int) -> None:
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be positive, got {max_concurrency}")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must not be negative, got {max_queue}")
+        self._name = name
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._running = 0
+        self._waiting = 0
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot.
+
+        Raises:
+            TooManyRequestsError: If every slot is taken and the queue is full.
+        """
+        if self._semaphore.locked() and self._waiting >= self._max_queue:
+            raise errors.TooManyRequestsError(f"Too many concurrent requests for '{self._name}'")
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+
+    def release(self) -> None:
+        """Release a slot taken with `acquire`."""
+        self._running -= 1
+        self._semaphore.release()
+
+    def release_once(self) -> typing.Callable[[], None]:
+        """
+        Return a function releasing a slot taken with `acquire` on its first
+        call only, so that every path ending a request may call it.
+        """
+        released = False
+
+        def _release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.release()
+
+        return _release
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> typing.AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @typing_extensions.override
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(name={self._name}, max_concurrency={self._max_concurrency}, "
+            f"max_queue={self._max_queue}, running={self._running}, waiting={self._waiting})"
+        )
+
+    @typing_extensions.override
+    def __repr__(self) -> str:
+        return self.__str__()
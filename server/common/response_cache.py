@@ -0,0 +1,112 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import hashlib
+import json
+import typing
+import unicodedata
+
+from server import dto
+from server.common import cache
+
+# Request fields that do not change the answer (`model` is replaced by the engine it resolves to)
+_IGNORED_FIELDS = {'messages', 'model', 'stream', 'stream_options', 'user', 'metadata', 'store'}
+
+_completion_cache: typing.Optional[cache.Cache] = None
+_ttl: typing.Optional[datetime.timedelta] = None
+_replay_stream: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedCompletion:
+    """A complete chat completion, as cached and replayed to clients."""
+    content: typing.Optional[str]
+    refusal: typing.Optional[str]
+    finish_reason: typing.Optional[str]
+    created: int
+    model: str
+    system_fingerprint: typing.Optional[str]
+    usage: typing.Any
+
+    @property
+    def nbytes(self) -> int:
+        """An estimate of the memory held by the completion."""
+        return (
+            256 + len((self.content or '').encode('utf-8')) + len((self.refusal or '').encode('utf-8'))
+            + len(self.model) + len(self.system_fingerprint or '')
+        )
+
+
+def is_deterministic(request: dto.CompletionCreateRequest) -> bool:
+    """
+    Whether a request asks for a reproducible answer that may be served from
+    the cache: a temperature of 0, a single choice, and no tools or log
+    probabilities.
+    """
+    return (
+        request.temperature == 0
+        and (request.n is None or request.n == 1)
+        and not request.tools
+        and request.tool_choice is None
+        and not request.logprobs
+        and request.top_logprobs is None
+    )
+
+
+def completion_key(engine: str, request: dto.CompletionCreateRequest) -> typing.Optional[str]:
+    """
+    The cache key of a request, or None if it must not be cached.
+
+    The key hashes the engine, the messages with their whitespace and Unicode
+    normalized, and every request parameter that can change the answer.
+    """
+    if not is_deterministic(request):
+        return None
+    messages = [
+        (msg['role'], ' '.join(unicodedata.normalize('NFC', str(msg.get('content') or '')).split()))
+        for msg in request.messages
+    ]
+    params = request.model_dump(exclude=_IGNORED_FIELDS, exclude_none=True)
+    payload = json.dumps([engine, messages, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def init_completion_cache(
+    *,
+    max_entries: int,
+    max_bytes: int,
+    ttl: datetime.timedelta,
+    expiry_interval: datetime.timedelta,
+    replay_stream: bool,
+) -> None:
+    """Create the completion cache of this worker and start its background expiry."""
+    global _completion_cache, _ttl, _replay_stream
+    _completion_cache = cache.Cache(
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        sizeof=lambda completion: typing.cast(CachedCompletion, completion).nbytes,
+    )
+    _completion_cache.start_expiry(expiry_interval)
+    _ttl = ttl
+    _replay_stream = replay_stream
+
+
+def get_completion(key: typing.Optional[str], *, stream: bool) -> typing.Optional[CachedCompletion]:
+    """
+    The cached completion of a key, or None if the cache is disabled, the key
+    is None or missing, or the request streams and streams are not replayed.
+    """
+    if _completion_cache is None or key is None or (stream and not _replay_stream):
+        return None
+    return _completion_cache.get(key)
+
+
+def set_completion(key: typing.Optional[str], completion: CachedCompletion) -> None:
+    """Cache a completion that ended normally, if the cache is enabled and the key is not None."""
+    if _completion_cache is None or key is None or completion.finish_reason not in ('stop', 'length'):
+        return
+    _completion_cache.set(key, completion, ttl=_ttl)
@@ -60,6 +60,53 @@ class Config(pydantic_settings.BaseSettings):
             min_length=1, max_length=50, pattern=r".*\.(json|yaml|toml|yml)"
         )
     ] = None
+    preload_index: bool = False
+
+    # Engine Configurations
+    default_engine: typing.Annotated[
+        str,
+        pydantic.Field(..., pattern=r"^(local|global)$")
+    ] = "local"
+    local_max_concurrency: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 32
+    local_max_queue: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=0)
+    ] = 128
+    global_max_concurrency: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 4
+    global_max_queue: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=0)
+    ] = 16
+    global_map_concurrency: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 16
+
+    # Response Cache Configurations
+    response_cache_enabled: bool = False
+    response_cache_max_entries: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 1024
+    response_cache_max_bytes: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 64 * 1024 * 1024
+    response_cache_ttl: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 600
+    response_cache_expiry_interval: typing.Annotated[
+        int,
+        pydantic.Field(..., ge=1)
+    ] = 60
+    response_cache_replay_stream: bool = True
 
     # Model Configurations
     model_config = pydantic_settings.SettingsConfigDict(
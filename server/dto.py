@@ -100,6 +100,18 @@ class CompletionCreateRequest(pydantic.BaseModel):
     user: typing.Optional[str] = None
 
 
+class Model(pydantic.BaseModel):
+    id: str
+    created: int
+    object: typing.Literal["model"]
+    owned_by: str
+
+
+class ModelListResponse(pydantic.BaseModel):
+    object: typing.Literal["list"]
+    data: typing.List[Model]
+
+
 class ErrorResponse(pydantic.BaseModel):
     message: str
     code: typing.Optional[typing.Union[int, str]] = None
@@ -22,7 +22,10 @@ def init_handler(app: fastapi.FastAPI):
             content=dto.ErrorResponse(
                 message=exc.message,
                 code=exc.status_code
-            ).dict()
+            ).dict(),
+            headers={
+                const.Constants.RETRY_AFTER_HEADER: str(exc.retry_after)
+            } if isinstance(exc, errors.TooManyRequestsError) else None
         )
 
     @app.exception_handler(fastapi.exceptions.RequestValidationError)
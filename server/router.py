@@ -7,101 +7,265 @@ import typing
 
 import fastapi
 import openai
+from starlette import background
 
 import graphrag_query
-from server import dto
-from server.common import const, context, errors, graphrag, utils
+from server import config, dto
+from server.common import const, context, errors, graphrag, response_cache, utils
 
 _root = fastapi.APIRouter()
 
 
-async def _parse_stream_response(response: graphrag_query.types.AsyncStreamResponse_T) -> typing.AsyncIterator[str]:
+def _resolve_engine(model: str, engine_header: typing.Optional[str]) -> graphrag.Engine_T:
+    """
+    Select the engine of a request: the engine header if set, else the model
+    if it names an engine, else the configured default engine.
+    """
+    if engine_header:
+        if engine_header not in graphrag.ENGINES:
+            raise errors.BadRequestError(
+                f"Unknown engine '{engine_header}', expected one of: {', '.join(graphrag.ENGINES)}"
+            )
+        return typing.cast(graphrag.Engine_T, engine_header)
+    if model in graphrag.ENGINES:
+        return typing.cast(graphrag.Engine_T, model)
+    return typing.cast(graphrag.Engine_T, config.get_config().default_engine)
+
+
+async def _parse_stream_response(
+    response: graphrag_query.types.AsyncStreamResponse_T,
+    on_close: typing.Callable[[], None],
+    on_complete: typing.Callable[[response_cache.CachedCompletion], None],
+) -> typing.AsyncIterator[str]:
+    try:
+        async for data in _format_stream_response(response, on_complete):
+            yield data
+    finally:
+        on_close()
+
+
+async def _format_stream_response(
+    response: graphrag_query.types.AsyncStreamResponse_T,
+    on_complete: typing.Callable[[response_cache.CachedCompletion], None],
+) -> typing.AsyncIterator[str]:
     id_ = utils.gen_id(const.Constants.CHAT_ID_PREFIX)
+    contents: typing.List[str] = []
+    refusals: typing.List[str] = []
+    chunk: typing.Optional[graphrag_query.SearchResultChunk] = None
     async for chunk in response:
         chunk = typing.cast(graphrag_query.SearchResultChunk, chunk)
-        data = dto.ChatCompletionChunkResponse(
-            id=id_,
-            choices=[dto.ChunkChoice(
-                finish_reason=chunk.choice.finish_reason,
-                index=0,
-                delta=dto.ChatCompletionMessage(
-                    content=chunk.choice.delta.content,
-                    refusal=chunk.choice.delta.refusal,
-                    role='assistant',
-                    function_call=None,
-                    tool_calls=None
-                ),
-            )],
+        contents.append(chunk.choice.delta.content or '')
+        refusals.append(chunk.choice.delta.refusal or '')
+        yield _format_chunk(
+            id_,
             created=chunk.created,
             model=chunk.model,
-            object='chat.completion.chunk',
             system_fingerprint=chunk.system_fingerprint,
             usage=chunk.usage,
-        ).model_dump_json(exclude_none=True).__str__()
-        yield f'data: {data}\n\n'
+            content=chunk.choice.delta.content,
+            refusal=chunk.choice.delta.refusal,
+            finish_reason=chunk.choice.finish_reason,
+        )
 
     yield 'data: [DONE]\n\n'
+    if chunk is not None:
+        on_complete(response_cache.CachedCompletion(
+            content=''.join(contents),
+            refusal=''.join(refusals) or None,
+            finish_reason=chunk.choice.finish_reason,
+            created=chunk.created,
+            model=chunk.model,
+            system_fingerprint=chunk.system_fingerprint,
+            usage=chunk.usage,
+        ))
+
+
+async def _replay_stream_response(completion: response_cache.CachedCompletion) -> typing.AsyncIterator[str]:
+    id_ = utils.gen_id(const.Constants.CHAT_ID_PREFIX)
+    for content, refusal, finish_reason, usage in [
+        (completion.content, completion.refusal, None, None),
+        (None, None, completion.finish_reason, completion.usage),
+    ]:
+        yield _format_chunk(
+            id_,
+            created=completion.created,
+            model=completion.model,
+            system_fingerprint=completion.system_fingerprint,
+            usage=usage,
+            content=content,
+            refusal=refusal,
+            finish_reason=finish_reason,
+        )
+
+    yield 'data: [DONE]\n\n'
+
+
+def _format_chunk(
+    id_: str,
+    *,
+    created: int,
+    model: str,
+    system_fingerprint: typing.Optional[str],
+    usage: typing.Any,
+    content: typing.Optional[str],
+    refusal: typing.Optional[str],
+    finish_reason: typing.Optional[str],
+) -> str:
+    data = dto.ChatCompletionChunkResponse(
+        id=id_,
+        choices=[dto.ChunkChoice(
+            finish_reason=finish_reason,
+            index=0,
+            delta=dto.ChatCompletionMessage(
+                content=content,
+                refusal=refusal,
+                role='assistant',
+                function_call=None,
+                tool_calls=None
+            ),
+        )],
+        created=created,
+        model=model,
+        object='chat.completion.chunk',
+        system_fingerprint=system_fingerprint,
+        usage=usage,
+    ).model_dump_json(exclude_none=True).__str__()
+    return f'data: {data}\n\n'
+
+
+def _completion_response(
+    completion: response_cache.CachedCompletion,
+    *,
+    cache_status: typing.Optional[str],
+) -> fastapi.responses.JSONResponse:
+    return fastapi.responses.JSONResponse(
+        dto.ChatCompletionResponse(
+            id=utils.gen_id(const.Constants.CHAT_ID_PREFIX),
+            choices=[dto.Choice(
+                finish_reason=completion.finish_reason,
+                index=0,
+                message=dto.ChatCompletionMessage(
+                    content=completion.content,
+                    refusal=completion.refusal,
+                    role='assistant',
+                ),
+            )],
+            created=completion.created,
+            model=completion.model,
+            object='chat.completion',
+            system_fingerprint=completion.system_fingerprint,
+            usage=completion.usage,
+        ).model_dump_json(exclude_none=True),
+        headers={const.Constants.CACHE_HEADER: cache_status} if cache_status else None,
+    )
+
+
+@_root.get('/models')
+async def list_models():
+    return fastapi.responses.JSONResponse(
+        dto.ModelListResponse(
+            object='list',
+            data=[
+                dto.Model(id=engine, created=graphrag.get_created(), object='model', owned_by='graphrag')
+                for engine in graphrag.ENGINES
+            ],
+        ).model_dump(exclude_none=True)
+    )
 
 
 @_root.post('/chat/completions')
-async def chat_completions(request: dto.CompletionCreateRequest):
+async def chat_completions(
+    request: dto.CompletionCreateRequest,
+    engine_header: typing.Annotated[
+        typing.Optional[str], fastapi.Header(alias=const.Constants.ENGINE_HEADER)
+    ] = None,
+):
     logger = context.get_logger_with_context(tag=const.Constants.ROUTER_LOGGING_TAG)
     with logger.catch(reraise=True, message="Failed to execute chat completions", exclude=errors.BaseAppError):
+        engine = _resolve_engine(request.model, engine_header)
+        cache_key = response_cache.completion_key(engine, request)
+        cache_status = 'miss' if cache_key else None
+        cached = response_cache.get_completion(cache_key, stream=request.stream)
+        if cached is not None:
+            if request.stream:
+                return fastapi.responses.StreamingResponse(
+                    _replay_stream_response(cached),
+                    media_type='text/event-stream; charset=utf-8',
+                    headers={const.Constants.CACHE_HEADER: 'hit'},
+                )
+            return _completion_response(cached, cache_status='hit')
+
+        limiter = graphrag.get_limiter(engine)
         client = graphrag.get_client(logger)
-        response = await client.chat(
-            engine='local',
-            message=request.messages,
-            stream=request.stream,
-            verbose=False,
-            frequency_penalty=request.frequency_penalty or openai.NOT_GIVEN,
-            function_call=request.function_call or openai.NOT_GIVEN,
-            functions=request.functions or openai.NOT_GIVEN,
-            logit_bias=request.logit_bias or openai.NOT_GIVEN,
-            logprobs=request.logprobs or openai.NOT_GIVEN,
-            max_completion_tokens=request.max_completion_tokens or openai.NOT_GIVEN,
-            max_tokens=request.max_tokens or openai.NOT_GIVEN,
-            metadata=request.metadata or openai.NOT_GIVEN,
-            n=request.n or openai.NOT_GIVEN,
-            parallel_tool_calls=request.parallel_tool_calls or openai.NOT_GIVEN,
-            presence_penalty=request.presence_penalty or openai.NOT_GIVEN,
-            response_format=request.response_format or openai.NOT_GIVEN,
-            seed=request.seed or openai.NOT_GIVEN,
-            service_tier=request.service_tier or openai.NOT_GIVEN,
-            stop=request.stop or openai.NOT_GIVEN,
-            store=request.store or openai.NOT_GIVEN,
-            stream_options=request.stream_options or openai.NOT_GIVEN,
-            temperature=request.temperature or openai.NOT_GIVEN,
-            tool_choice=request.tool_choice or openai.NOT_GIVEN,
-            tools=request.tools or openai.NOT_GIVEN,
-            top_logprobs=request.top_logprobs or openai.NOT_GIVEN,
-            top_p=request.top_p or openai.NOT_GIVEN,
-            user=request.user or openai.NOT_GIVEN
-        )
+        await limiter.acquire()
+        release = limiter.release_once()
+        try:
+            response = await _chat(client, engine, request)
+        except BaseException:
+            release()
+            raise
         if request.stream:
+            # the slot is held until the stream is exhausted or the client disconnects; a generator abandoned on
+            # disconnect only runs its finally when collected, so the background task (run once the response is
+            # over, whichever way) releases the slot too
             return fastapi.responses.StreamingResponse(
-                _parse_stream_response(response),
-                media_type='text/event-stream; charset=utf-8'
-            )
-        else:
-            return fastapi.responses.JSONResponse(
-                dto.ChatCompletionResponse(
-                    id=utils.gen_id(const.Constants.CHAT_ID_PREFIX),
-                    choices=[dto.Choice(
-                        finish_reason=response.choice.finish_reason,
-                        index=0,
-                        message=dto.ChatCompletionMessage(
-                            content=response.choice.message.content,
-                            refusal=response.choice.message.refusal,
-                            role='assistant',
-                        ),
-                    )],
-                    created=response.created,
-                    model=response.model,
-                    object='chat.completion',
-                    system_fingerprint=response.system_fingerprint,
-                    usage=response.usage,
-                ).model_dump_json(exclude_none=True)
+                _parse_stream_response(
+                    response,
+                    release,
+                    lambda completion: response_cache.set_completion(cache_key, completion),
+                ),
+                media_type='text/event-stream; charset=utf-8',
+                headers={const.Constants.CACHE_HEADER: cache_status} if cache_status else None,
+                background=background.BackgroundTask(release),
             )
+        release()
+        completion = response_cache.CachedCompletion(
+            content=response.choice.message.content,
+            refusal=response.choice.message.refusal,
+            finish_reason=response.choice.finish_reason,
+            created=response.created,
+            model=response.model,
+            system_fingerprint=response.system_fingerprint,
+            usage=response.usage,
+        )
+        response_cache.set_completion(cache_key, completion)
+        return _completion_response(completion, cache_status=cache_status)
+
+
+async def _chat(
+    client: graphrag_query.AsyncGraphRAGClient,
+    engine: graphrag.Engine_T,
+    request: dto.CompletionCreateRequest,
+) -> typing.Union[graphrag_query.types.Response_T, graphrag_query.types.AsyncStreamResponse_T]:
+    return await client.chat(
+        engine=engine,
+        message=request.messages,
+        stream=request.stream,
+        verbose=False,
+        frequency_penalty=request.frequency_penalty or openai.NOT_GIVEN,
+        function_call=request.function_call or openai.NOT_GIVEN,
+        functions=request.functions or openai.NOT_GIVEN,
+        logit_bias=request.logit_bias or openai.NOT_GIVEN,
+        logprobs=request.logprobs or openai.NOT_GIVEN,
+        max_completion_tokens=request.max_completion_tokens or openai.NOT_GIVEN,
+        max_tokens=request.max_tokens or openai.NOT_GIVEN,
+        metadata=request.metadata or openai.NOT_GIVEN,
+        n=request.n or openai.NOT_GIVEN,
+        parallel_tool_calls=request.parallel_tool_calls or openai.NOT_GIVEN,
+        presence_penalty=request.presence_penalty or openai.NOT_GIVEN,
+        response_format=request.response_format or openai.NOT_GIVEN,
+        seed=request.seed or openai.NOT_GIVEN,
+        service_tier=request.service_tier or openai.NOT_GIVEN,
+        stop=request.stop or openai.NOT_GIVEN,
+        store=request.store or openai.NOT_GIVEN,
+        stream_options=request.stream_options or openai.NOT_GIVEN,
+        temperature=request.temperature if request.temperature is not None else openai.NOT_GIVEN,
+        tool_choice=request.tool_choice or openai.NOT_GIVEN,
+        tools=request.tools or openai.NOT_GIVEN,
+        top_logprobs=request.top_logprobs or openai.NOT_GIVEN,
+        top_p=request.top_p if request.top_p is not None else openai.NOT_GIVEN,
+        user=request.user or openai.NOT_GIVEN
+    )
 
 
 def init_router(app: fastapi.FastAPI, prefix: str = '') -> None:
@@ -1,2 +1,209 @@
 # Copyright (c) 2024 Microsoft Corporation.
 # Licensed under the MIT License.
+
+from __future__ import annotations
+
+import pathlib
+import random
+import typing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from graphrag_query._search import _model
+
+
+class WordEncoder:
+    """
+    A stand-in for a tiktoken encoding that counts one token per
+    whitespace-separated word, so the tests run without downloading the BPE
+    ranks.
+    """
+
+    def encode(self, text: str) -> typing.List[str]:
+        return text.split()
+
+    def decode(self, tokens: typing.List[str]) -> str:
+        return " ".join(tokens)
+
+
+class Graph(typing.NamedTuple):
+    entities: typing.List[_model.Entity]
+    relationships: typing.List[_model.Relationship]
+    text_units: typing.List[_model.TextUnit]
+    community_reports: typing.List[_model.CommunityReport]
+    covariates: typing.Dict[str, typing.List[_model.Covariate]]
+
+
+def make_graph(
+    seed: int = 0,
+    *,
+    num_entities: int = 40,
+    num_relationships: int = 120,
+    num_text_units: int = 60,
+    num_communities: int = 8,
+    num_claims: int = 50,
+) -> Graph:
+    """
+    Build a random knowledge graph; about half of the relationships carry a
+    `rank` attribute and the others fall back to the combined entity ranks.
+    """
+    rng = random.Random(seed)
+
+    def _words(n: int) -> str:
+        return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "omega"]) for _ in range(n))
+
+    entities = [
+        _model.Entity(
+            id=f"e{i}",
+            short_id=str(i),
+            title=f"ENTITY_{i}",
+            description=_words(rng.randint(3, 12)),
+            rank=rng.randint(0, 9),
+            community_ids=[f"c{rng.randrange(num_communities)}" for _ in range(rng.randint(1, 2))],
+            text_unit_ids=[f"t{rng.randrange(num_text_units)}" for _ in range(rng.randint(1, 4))],
+        )
+        for i in range(num_entities)
+    ]
+    relationships = []
+    for i in range(num_relationships):
+        source, target = rng.sample(entities, 2)
+        relationships.append(_model.Relationship(
+            id=f"r{i}",
+            short_id=str(i),
+            source=source.title,
+            target=target.title,
+            weight=float(rng.randint(1, 5)),
+            description=_words(rng.randint(2, 10)),
+            text_unit_ids=[f"t{rng.randrange(num_text_units)}" for _ in range(rng.randint(1, 3))],
+            attributes={"rank": rng.randint(0, 18)} if rng.random() < 0.5 else None,
+        ))
+    text_units = [
+        _model.TextUnit(
+            id=f"t{i}",
+            short_id=str(i),
+            text=_words(rng.randint(5, 30)),
+            relationship_ids=[f"r{rng.randrange(num_relationships)}" for _ in range(rng.randint(0, 4))],
+        )
+        for i in range(num_text_units)
+    ]
+    community_reports = [
+        _model.CommunityReport(
+            id=f"c{i}",
+            short_id=str(i),
+            title=f"Community {i}",
+            community_id=f"c{i}",
+            summary=_words(rng.randint(5, 20)),
+            full_content=_words(rng.randint(10, 40)),
+            rank=float(rng.randint(1, 10)),
+        )
+        for i in range(num_communities)
+    ]
+    claims = [
+        _model.Covariate(
+            id=f"v{i}",
+            short_id=str(i),
+            subject_id=rng.choice(entities).title,
+            attributes={"description": _words(rng.randint(2, 8))},
+        )
+        for i in range(num_claims)
+    ]
+    return Graph(entities, relationships, text_units, community_reports, {"Claims": claims})
+
+
+class CountingEncoder(WordEncoder):
+    """A `WordEncoder` named like an encoding that records the texts it encodes."""
+
+    name = "words"
+
+    def __init__(self) -> None:
+        self.encoded: typing.List[str] = []
+
+    def encode(self, text: str) -> typing.List[str]:
+        self.encoded.append(text)
+        return super().encode(text)
+
+
+def write_index(directory: pathlib.Path, seed: int = 0, *, num_entities: int = 12) -> None:
+    """
+    Write a small index as the Parquet files of the indexer: two levels of
+    communities, each entity in community `i % 2` and then `2 + i % 4`.
+    """
+    rng = random.Random(seed)
+
+    def _words(n: int) -> str:
+        return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "omega"]) for _ in range(n))
+
+    titles = [f"ENTITY_{i}" for i in range(num_entities)]
+    pd.DataFrame({
+        "title": titles * 2,
+        "degree": [rng.randint(0, 9) for _ in range(num_entities)] * 2,
+        "community": [i % 2 for i in range(num_entities)] + [2 + i % 4 for i in range(num_entities)],
+        "level": [0] * num_entities + [1] * num_entities,
+    }).to_parquet(directory / "create_final_nodes.parquet")
+    pd.DataFrame({
+        "id": [f"e{i}" for i in range(num_entities)],
+        "name": titles,
+        "type": [rng.choice(["PERSON", "GEO"]) for _ in range(num_entities)],
+        "human_readable_id": list(range(num_entities)),
+        "description": [_words(rng.randint(3, 10)) for _ in range(num_entities)],
+        "description_embedding": [np.array([rng.random() for _ in range(8)]) for _ in range(num_entities)],
+        "text_unit_ids": [np.array([f"t{rng.randrange(10)}" for _ in range(2)], dtype=object)
+                          for _ in range(num_entities)],
+    }).to_parquet(directory / "create_final_entities.parquet")
+    pd.DataFrame({
+        "community": [str(i) for i in range(6)],
+        "level": [0, 0, 1, 1, 1, 1],
+        "title": [f"Community {i}" for i in range(6)],
+        "summary": [_words(rng.randint(5, 20)) for _ in range(6)],
+        "full_content": [_words(rng.randint(10, 40)) for _ in range(6)],
+        "rank": [float(rng.randint(1, 10)) for _ in range(6)],
+    }).to_parquet(directory / "create_final_community_reports.parquet")
+    pd.DataFrame({
+        "id": [f"t{i}" for i in range(10)],
+        "text": [_words(rng.randint(5, 30)) for _ in range(10)],
+        "n_tokens": [rng.randint(5, 30) for _ in range(10)],
+        "relationship_ids": [np.array([f"r{rng.randrange(20)}"], dtype=object) for _ in range(10)],
+    }).to_parquet(directory / "create_final_text_units.parquet")
+    pd.DataFrame({
+        "id": [f"r{i}" for i in range(20)],
+        "human_readable_id": [str(i) for i in range(20)],
+        "source": [rng.choice(titles) for _ in range(20)],
+        "target": [rng.choice(titles) for _ in range(20)],
+        "description": [_words(rng.randint(2, 8)) for _ in range(20)],
+        "weight": [float(rng.randint(1, 5)) for _ in range(20)],
+        "rank": [rng.randint(0, 18) for _ in range(20)],
+        "text_unit_ids": [np.array([f"t{rng.randrange(10)}"], dtype=object) for _ in range(20)],
+    }).to_parquet(directory / "create_final_relationships.parquet")
+    pd.DataFrame({
+        "id": [str(i) for i in range(8)],
+        "human_readable_id": [str(i) for i in range(8)],
+        "covariate_type": ["claim"] * 8,
+        "subject_id": [rng.choice(titles) for _ in range(8)],
+        "subject_type": ["entity"] * 8,
+        "object_id": [rng.choice(titles) for _ in range(8)],
+        "status": [rng.choice(["TRUE", "SUSPECTED"]) for _ in range(8)],
+        "start_date": ["2024-01-01"] * 8,
+        "end_date": ["2024-12-31"] * 8,
+        "description": [_words(rng.randint(2, 8)) for _ in range(8)],
+    }).to_parquet(directory / "create_final_covariates.parquet")
+
+
+def assert_same_context(actual: typing.Any, expected: typing.Any) -> None:
+    """Assert that two `build_context` results have the same text and records."""
+    (actual_text, actual_records), (expected_text, expected_records) = actual, expected
+    assert actual_text == expected_text
+    assert actual_records.keys() == expected_records.keys()
+    for name, records in expected_records.items():
+        pd.testing.assert_frame_equal(actual_records[name], records)
+
+
+@pytest.fixture
+def word_encoder() -> WordEncoder:
+    return WordEncoder()
+
+
+@pytest.fixture
+def graph() -> Graph:
+    return make_graph()
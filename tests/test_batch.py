@@ -0,0 +1,73 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import random
+import sys
+
+import pytest
+
+from graphrag_query import _batch
+from graphrag_query._search._context._builders import _context_builders
+from graphrag_query._vector_stores import NumpyVectorStore, VectorStoreDocument
+
+from .conftest import WordEncoder, make_graph
+
+
+def test_plan_deduplicates_messages() -> None:
+    messages = [
+        [{"role": "user", "content": "a"}],
+        [{"role": "user", "content": "b"}],
+        [{"content": "a", "role": "user"}],
+    ]
+    plan = _batch.BatchPlan.create(messages)
+
+    assert list(plan.indices.values()) == [[0, 2], [1]]
+    items = plan.items(next(iter(plan.queries)), None, None, 0.5)
+    assert [(item.index, item.deduplicated) for item in items] == [(0, False), (2, True)]
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_local_batch_shares_one_builder() -> None:
+    rng = random.Random(3)
+    graph = make_graph(seed=3)
+    store = NumpyVectorStore("entities")
+    store.load_documents([
+        VectorStoreDocument(id=entity.id, text=entity.description, vector=[rng.gauss(0, 1) for _ in range(8)])
+        for entity in graph.entities
+    ])
+    builder = _context_builders.LocalContextBuilder(
+        entities=graph.entities,
+        entity_text_embeddings=store,
+        text_embedder=None,  # type: ignore[arg-type]
+        text_units=graph.text_units,
+        community_reports=graph.community_reports,
+        relationships=graph.relationships,
+        covariates=graph.covariates,
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+    )
+    queries = {f"query {i}": [rng.gauss(0, 1) for _ in range(8)] for i in range(48)}
+
+    def _run(key: str):
+        query = plan.queries[key][0]["content"]
+        return builder.build_context(query=query, query_embedding=queries[query], data_max_tokens=300)
+
+    plan = _batch.BatchPlan.create([[{"role": "user", "content": query}] for query in queries])
+    expected = {key: _run(key) for key in plan.queries}
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        items = list(_batch.run_batch(plan, _run, max_workers=16))
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert sorted(item.index for item in items) == list(range(len(queries)))
+    for key, indices in plan.indices.items():
+        item = next(item for item in items if item.index == indices[0])
+        assert item.error is None
+        text, data = item.response
+        assert text == expected[key][0]
+        assert data.keys() == expected[key][1].keys()
+        assert all(data[name].equals(expected[key][1][name]) for name in data)
@@ -0,0 +1,112 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import concurrent.futures
+import itertools
+import random
+import sys
+
+import pytest
+
+from graphrag_query._search._context import _builders
+from graphrag_query._search._context._builders import _community_context
+
+from .conftest import Graph, WordEncoder
+
+
+def _build(graph: Graph, **kwargs):
+    return _community_context.build_community_context(
+        community_reports=graph.community_reports,
+        entities=graph.entities,
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+        single_batch=False,
+        data_max_tokens=60,
+        **kwargs,
+    )
+
+
+def test_community_weights_are_not_written_into_reports(graph: Graph) -> None:
+    text, data = _build(graph)
+
+    assert all(report.attributes is None for report in graph.community_reports)
+    reports = data["reports"]
+    assert "occurrence weight" in reports.columns
+    assert reports["occurrence weight"].max() == 1.0
+    assert all(batch.splitlines()[0].split("|") == list(reports.columns) for batch in text)
+
+
+def test_community_weights_follow_the_entities(graph: Graph) -> None:
+    _, data = _build(graph, normalize_community_weight=False)
+
+    text_units = {}
+    for entity in graph.entities:
+        for community_id in entity.community_ids or []:
+            text_units.setdefault(community_id, set()).update(entity.text_unit_ids or [])
+    reports = data["reports"].set_index("id")
+    for report in graph.community_reports:
+        assert reports.loc[report.short_id, "occurrence weight"] == len(text_units.get(report.community_id, ()))
+
+
+def test_concurrent_builds_agree(graph: Graph) -> None:
+    expected_text, expected_data = _build(graph)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: _build(graph), range(64)))
+    finally:
+        sys.setswitchinterval(interval)
+    for text, data in results:
+        assert text == expected_text
+        assert data["reports"].equals(expected_data["reports"])
+
+
+_BATCH_PARAMETERS = [
+    dict(shuffle_data=shuffle_data, include_community_weight=include_weight, normalize_community_weight=normalize,
+         include_community_rank=include_rank)
+    for shuffle_data, include_weight, normalize, include_rank in itertools.product([True, False], repeat=4)
+]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cached_batches_match_a_fresh_build(graph: Graph, seed: int) -> None:
+    builder = _builders.GlobalContextBuilder(
+        community_reports=graph.community_reports,
+        entities=graph.entities,
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+        random_state=seed,
+    )
+    defaults = dict(
+        use_community_summary=True,
+        column_delimiter="|",
+        min_community_rank=0,
+        community_rank_name="rank",
+        community_weight_name="occurrence",
+        data_max_tokens=60,
+        context_name="Reports",
+    )
+    # every parameter set twice, in a random order, so cached and uncached builds of the others come between
+    parameters = _BATCH_PARAMETERS * 2
+    random.Random(seed).shuffle(parameters)
+    for kwargs in parameters:
+        text, data = builder._build_community_batches(**defaults, **kwargs)
+        expected_text, expected_data = _community_context.build_community_context(
+            community_reports=graph.community_reports,
+            entities=graph.entities,
+            token_encoder=WordEncoder(),  # type: ignore[arg-type]
+            single_batch=False,
+            random_state=seed,
+            **defaults,
+            **kwargs,
+        )
+        assert text == expected_text
+        assert data.keys() == expected_data.keys()
+        assert data["reports"].equals(expected_data["reports"])
+        # what a caller does with the records of one query does not reach the next
+        data["reports"] = data["reports"].iloc[:1]
+        data["extra"] = data.pop("reports")
+    assert len(builder._batch_cache) == len(_BATCH_PARAMETERS)
+    assert [report.id for report in builder.community_reports] == [report.id for report in graph.community_reports]
+    assert all(report.attributes is None for report in graph.community_reports)
@@ -0,0 +1,182 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import typing
+
+import pandas as pd
+import pytest
+
+from graphrag_query._search import _model
+from graphrag_query._search._engine import _global
+from graphrag_query._search._input._retrieval import _community_reports
+
+from .conftest import WordEncoder
+
+
+def _hierarchy(
+    parents: typing.Dict[str, str],
+    ranks: typing.Dict[str, float],
+) -> _community_reports.CommunityHierarchy:
+    """A hierarchy whose reports have their community ID as short ID."""
+    return _community_reports.CommunityHierarchy(
+        [
+            _model.CommunityReport(id=community_id, short_id=community_id, title=community_id,
+                                   community_id=community_id, rank=rank)
+            for community_id, rank in ranks.items()
+        ],
+        parents,
+    )
+
+
+def _result(*points: typing.Tuple[str, int]) -> typing.Any:
+    return _global._cached_map_result(
+        [{"answer": answer, "score": score} for answer, score in points],
+        model="m", context="", created=0, verbose=False,
+    )
+
+
+def _records(*batches: typing.List[str]) -> pd.DataFrame:
+    """The records of batches of reports, given by short ID."""
+    return pd.DataFrame({
+        "id": [short_id for batch in batches for short_id in batch],
+        "batch": [index for index, batch in enumerate(batches) for _ in batch],
+    })
+
+
+def test_report_references() -> None:
+    answer = "Theme one [Data: Reports (2, 7, 64, +more)]; theme two [Data: Entities (3), Reports(5)]."
+    assert [match.group(1) for match in _global._REPORT_REFERENCES.finditer(answer)] == ["2, 7, 64, +more", "5"]
+
+    hierarchy = _hierarchy({}, {"2": 1, "7": 1, "5": 1})
+    refs = [ref.strip() for match in _global._REPORT_REFERENCES.finditer(answer) for ref in match.group(1).split(",")]
+    # "+more" and reports outside the hierarchy resolve to nothing
+    assert [hierarchy.resolve(ref) for ref in refs] == ["2", "7", None, None, "5"]
+
+
+def test_hierarchy_skips_communities_without_a_report() -> None:
+    # r1 has no report: its child c3 hangs from r0; x0 names a missing parent; z0 climbs into a cycle
+    hierarchy = _hierarchy(
+        {"r1": "r0", "c3": "r1", "c1": "r0", "c2": "r0", "g1": "c1", "x0": "missing", "z0": "m0", "m0": "m1",
+         "m1": "m0"},
+        {"r0": 1, "c1": 2, "c2": 5, "c3": 3, "g1": 1, "x0": 9, "z0": 4},
+    )
+    assert hierarchy.roots == ["x0", "z0", "r0"]
+    assert hierarchy.children("r0") == ["c2", "c3", "c1"]
+    assert hierarchy.children("c1") == ["g1"] and hierarchy.children("g1") == []
+    assert hierarchy.parents["c3"] == "r0" and "r0" not in hierarchy.parents
+    assert hierarchy.depth() == 3
+    assert len(hierarchy) == 7 and "r1" not in hierarchy
+    assert hierarchy.resolve("c3") == "c3" and hierarchy.resolve("missing") is None
+    assert hierarchy.get("c2").rank == 5
+
+
+def test_fit_budget_keeps_the_leading_contexts_within_budget() -> None:
+    contexts = ["a b c", "d e", "f g h i", "j"]
+    kwargs = dict(token_encoder=WordEncoder())
+    assert _global._fit_budget(contexts, map_calls=0, map_tokens=0, max_map_calls=None, max_map_tokens=None,
+                               **kwargs) == (contexts, 0)
+    assert _global._fit_budget(contexts, map_calls=5, map_tokens=0, max_map_calls=7, max_map_tokens=None,
+                               **kwargs) == (contexts[:2], 0)
+    assert _global._fit_budget(contexts, map_calls=5, map_tokens=0, max_map_calls=5, max_map_tokens=None,
+                               **kwargs) == ([], 0)
+    # a context over the token budget ends the level, even if a later one would fit
+    assert _global._fit_budget(contexts, map_calls=0, map_tokens=3, max_map_calls=None, max_map_tokens=9,
+                               **kwargs) == (contexts[:2], 8)
+    assert _global._fit_budget(contexts, map_calls=0, map_tokens=3, max_map_calls=1, max_map_tokens=9,
+                               **kwargs) == (contexts[:1], 6)
+
+
+def test_expand_communities_by_citation_or_whole_batch() -> None:
+    hierarchy = _hierarchy(
+        {"a0": "r0", "a1": "r1", "b1": "r1", "a2": "r2", "a3": "r3"},
+        {"r0": 1, "r1": 1, "r2": 1, "r3": 1, "a0": 1, "a1": 2, "b1": 1, "a2": 1, "a3": 1},
+    )
+    records = _records(["r0", "r1"], ["r2", "r3"])
+
+    # a key point citing reports expands them only (a citation outside its batch is ignored)
+    expanded = _global._expand_communities(
+        hierarchy, records, {0: _result(("cites r1 [Data: Reports (r1, r2, +more)]", 70))}, threshold=50,
+    )
+    assert expanded == ["a1", "b1"]
+
+    # a key point citing nothing expands its whole batch; the best scoring communities come first
+    expanded = _global._expand_communities(
+        hierarchy, records, {0: _result(("no citation", 60)), 1: _result(("cites r3 [Data: Reports (r3)]", 90))},
+        threshold=50,
+    )
+    assert expanded == ["a3", "a0", "a1", "b1"]
+
+    # the results are matched to their batch by key, not by position
+    assert _global._expand_communities(hierarchy, records, {1: _result(("no citation", 60))}, threshold=50) == [
+        "a2", "a3",
+    ]
+
+
+def test_expand_communities_filters_by_threshold() -> None:
+    hierarchy = _hierarchy({"a0": "r0", "a1": "r1"}, {"r0": 1, "r1": 1, "a0": 1, "a1": 1})
+    records = _records(["r0"], ["r1"])
+    results = {0: _result(("below", 49), ("cites r0 [Data: Reports (r0)]", 0)), 1: _result(("at", 50))}
+    assert _global._expand_communities(hierarchy, records, results, threshold=50) == ["a1"]
+    assert _global._expand_communities(hierarchy, records, results, threshold=0) == ["a1", "a0"]
+    assert _global._expand_communities(hierarchy, records, results, threshold=51) == []
+    assert _global._expand_communities(hierarchy, None, results, threshold=0) == []
+    assert _global._expand_communities(hierarchy, pd.DataFrame(), results, threshold=0) == []
+
+
+class _ContextBuilder:
+    """Renders one batch of two words per community."""
+
+    def __init__(self, hierarchy: _community_reports.CommunityHierarchy) -> None:
+        self.community_hierarchy = hierarchy
+        self.levels: typing.List[typing.List[str]] = []
+
+    def build_context(self, conversation_history, community_ids, **kwargs):
+        self.levels.append(list(community_ids))
+        contexts = [f"batch {community_id}" for community_id in community_ids]
+        return contexts, {"reports": _records(*([community_id] for community_id in community_ids))}
+
+
+@pytest.mark.parametrize("max_map_calls, max_map_tokens, levels, mapped", [
+    (None, None, [["r0", "r1", "r2"], ["a0", "b0", "a1"], ["g0"]], 7),
+    (4, None, [["r0", "r1", "r2"], ["a0", "b0", "a1"], ["g0"]], 4),
+    (None, 10, [["r0", "r1", "r2"], ["a0", "b0", "a1"], ["g0"]], 5),
+    (3, None, [["r0", "r1", "r2"], ["a0", "b0", "a1"]], 3),
+])
+def test_drill_down_stops_at_the_budgets(max_map_calls, max_map_tokens, levels, mapped) -> None:
+    hierarchy = _hierarchy(
+        {"a0": "r0", "b0": "r0", "a1": "r1", "g0": "a0"},
+        {"r0": 3, "r1": 2, "r2": 1, "a0": 2, "b0": 1, "a1": 1, "g0": 1},
+    )
+    builder = _ContextBuilder(hierarchy)
+    drill_down = _global._DrillDown(
+        builder,  # type: ignore[arg-type]
+        conversation_history=None,
+        max_map_calls=max_map_calls,
+        max_map_tokens=max_map_tokens,
+        threshold=50,
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+    )
+    # every batch but that of r2 has a key point citing nothing
+    while drill_down.contexts:
+        drill_down.advance({
+            index: _result(("relevant", 0 if context == "batch r2" else 80))
+            for index, context in enumerate(drill_down.contexts)
+        })
+    assert builder.levels == levels
+    assert len(drill_down.map_results) == mapped
+
+
+def test_drill_down_needs_a_hierarchy() -> None:
+    builder = _ContextBuilder(_hierarchy({}, {}))
+    builder.community_hierarchy = None  # type: ignore[assignment]
+    with pytest.raises(ValueError):
+        _global._DrillDown(
+            builder,  # type: ignore[arg-type]
+            conversation_history=None,
+            max_map_calls=None,
+            max_map_tokens=None,
+            threshold=50,
+            token_encoder=WordEncoder(),  # type: ignore[arg-type]
+        )
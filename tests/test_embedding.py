@@ -0,0 +1,104 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import types
+import typing
+
+import numpy as np
+import pytest
+
+from graphrag_query import _utils
+from graphrag_query._search._llm import _embedding
+
+from .conftest import WordEncoder
+
+_MAX_TOKENS = 3
+_MAX_BATCH_SIZE = 4
+_MAX_BATCH_TOKENS = 7
+
+
+def _text(start: int, n: int) -> str:
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+
+# texts of 4, 1 and 3 chunks of at most 3 words, with repeats
+_TEXTS = [_text(0, 10), _text(10, 2), _text(20, 7), _text(0, 10), _text(30, 1), _text(10, 2)]
+
+
+def _chunk_embedding(chunk: str) -> typing.List[float]:
+    return [float(len(chunk)), float(sum(map(ord, chunk)) % 17), 1.0]
+
+
+def _expected(text: str) -> typing.List[float]:
+    words = text.split()
+    chunks = [" ".join(words[i:i + _MAX_TOKENS]) for i in range(0, len(words), _MAX_TOKENS)]
+    return _utils.combine_embeddings([_chunk_embedding(chunk) for chunk in chunks], [len(chunk) for chunk in chunks])
+
+
+class _Embeddings:
+    """Embeds each chunk by its text, answering the items of a batch in reverse order."""
+
+    def __init__(self) -> None:
+        self.inputs: typing.List[typing.List[str]] = []
+        self.requests = 0
+
+    def _response(self, input):
+        self.inputs.append(list(input))
+        items = [types.SimpleNamespace(index=i, embedding=_chunk_embedding(chunk)) for i, chunk in enumerate(input)]
+        return types.SimpleNamespace(data=items[::-1])
+
+    def create(self, *, input, model, **kwargs):
+        return self._response(input)
+
+    async def acreate(self, *, input, model, **kwargs):
+        # the first batches are answered last
+        self.requests += 1
+        await asyncio.sleep(0.01 * (10 - self.requests))
+        return self._response(input)
+
+
+def _embed_many(texts: typing.List[str], asynchronous: bool) -> typing.Tuple[
+    typing.List[typing.List[float]], _Embeddings
+]:
+    embeddings = _Embeddings()
+    kwargs = dict(model="m", api_key="x", token_encoder=WordEncoder(), max_tokens=_MAX_TOKENS,
+                  max_batch_size=_MAX_BATCH_SIZE, max_batch_tokens=_MAX_BATCH_TOKENS)
+    if not asynchronous:
+        embedder = _embedding.Embedding(**kwargs)  # type: ignore[arg-type]
+        embedder._client = types.SimpleNamespace(embeddings=embeddings, close=lambda: None)  # type: ignore[assignment]
+        return embedder.embed_many(texts), embeddings
+
+    async def _close() -> None:
+        pass
+
+    async def _main():
+        aembedder = _embedding.AsyncEmbedding(**kwargs)  # type: ignore[arg-type]
+        aembedder._aclient = types.SimpleNamespace(  # type: ignore[assignment]
+            embeddings=types.SimpleNamespace(create=embeddings.acreate), close=_close
+        )
+        return await aembedder.aembed_many(texts)
+
+    return asyncio.run(_main()), embeddings
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_embed_many_batches_the_chunks_and_reassembles_them_in_order(asynchronous: bool) -> None:
+    results, embeddings = _embed_many(_TEXTS, asynchronous)
+    np.testing.assert_allclose(results, [_expected(text) for text in _TEXTS])
+
+    # the 8 chunks of the 4 distinct texts are packed across texts, within both bounds
+    chunks = [chunk for batch in embeddings.inputs for chunk in batch]
+    assert sorted(chunks) == sorted(
+        " ".join(text.split()[i:i + _MAX_TOKENS])
+        for text in dict.fromkeys(_TEXTS) for i in range(0, len(text.split()), _MAX_TOKENS)
+    )
+    assert len(embeddings.inputs) < len(chunks)
+    for batch in embeddings.inputs:
+        assert len(batch) <= _MAX_BATCH_SIZE
+        assert sum(len(chunk.split()) for chunk in batch) <= _MAX_BATCH_TOKENS
+
+    # a text embeds the same alone as along others
+    np.testing.assert_allclose(results[2], _embed_many([_TEXTS[2]], asynchronous)[0][0])
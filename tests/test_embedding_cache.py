@@ -0,0 +1,158 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+import types
+
+import pytest
+
+from graphrag_query._search._llm import _cache, _embedding
+
+from .conftest import WordEncoder
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    def _create(**kwargs) -> _cache.BaseEmbeddingCache:
+        if request.param == "memory":
+            return _cache.MemoryEmbeddingCache(**kwargs)
+        return _cache.SqliteEmbeddingCache(tmp_path / "embeddings.sqlite", **kwargs)
+    return _create
+
+
+def test_key_normalizes_the_text_only() -> None:
+    key = _cache.embedding_cache_key("m", "hello world")
+    assert _cache.embedding_cache_key("m", "  hello \n world ") == key
+    assert _cache.embedding_cache_key("m", "Hello world") != key
+    assert _cache.embedding_cache_key("n", "hello world") != key
+    assert _cache.embedding_cache_key("m", "hello world", dimensions=8) != key
+
+
+def test_get_and_set(cache) -> None:
+    c = cache()
+    assert c.get("a") is None
+    c.set("a", [0.1, -0.2, 1 / 3])
+    assert c.get("a") == [0.1, -0.2, 1 / 3]
+    assert len(c) == 1
+    c.clear()
+    assert len(c) == 0
+    c.close()
+
+
+def test_least_recently_used_entries_are_evicted(cache) -> None:
+    c = cache(max_entries=2)
+    c.set("a", [1.0])
+    time.sleep(0.01)
+    c.set("b", [2.0])
+    time.sleep(0.01)
+    assert c.get("a") == [1.0]
+    time.sleep(0.01)
+    c.set("c", [3.0])
+
+    assert len(c) == 2
+    assert c.get("b") is None
+    assert c.get("a") == [1.0] and c.get("c") == [3.0]
+    c.close()
+
+
+def test_expired_entries_are_dropped(cache) -> None:
+    c = cache(ttl=0.05)
+    c.set("a", [1.0])
+    time.sleep(0.1)
+    assert c.get("a") is None
+    c.close()
+
+
+@pytest.mark.parametrize("kwargs", [{"max_entries": -1}, {"ttl": 0}])
+def test_invalid_bounds(cache, kwargs) -> None:
+    with pytest.raises(ValueError):
+        cache(**kwargs)
+
+
+def test_sqlite_cache_survives_reopening(tmp_path) -> None:
+    c = _cache.SqliteEmbeddingCache(tmp_path / "embeddings.sqlite")
+    c.set("a", [0.5, 0.25])
+    c.close()
+    c = _cache.SqliteEmbeddingCache(tmp_path / "embeddings.sqlite")
+    assert c.get("a") == [0.5, 0.25]
+    c.close()
+
+
+class _Embeddings:
+    def __init__(self) -> None:
+        self.inputs = []
+
+    def _response(self, input, **kwargs):
+        self.inputs.append(list(input))
+        return types.SimpleNamespace(data=[
+            types.SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(input)
+        ])
+
+    def create(self, *, input, model, **kwargs):
+        return self._response(input)
+
+    async def acreate(self, *, input, model, **kwargs):
+        return self._response(input)
+
+
+class _RecordingCache(_cache.SqliteEmbeddingCache):
+    threads: set
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, embedding):
+        self.threads.add(threading.get_ident())
+        super().set(key, embedding)
+
+
+def test_embed_many_serves_repeated_texts_from_the_cache(tmp_path) -> None:
+    cache = _cache.SqliteEmbeddingCache(tmp_path / "embeddings.sqlite")
+    embedder = _embedding.Embedding(model="m", api_key="x", token_encoder=WordEncoder(), cache=cache)
+    embeddings = _Embeddings()
+    embedder._client = types.SimpleNamespace(embeddings=embeddings, close=lambda: None)
+
+    first = embedder.embed_many(["a b", "c", "a b"])
+    second = embedder.embed_many(["a  b", "d"])
+
+    assert embeddings.inputs == [["a b", "c"], ["d"]]
+    assert second[0] == first[0]
+    assert (embedder.cache_hits, embedder.cache_misses) == (1, 3)
+    embedder.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(cache)
+
+
+def test_async_embed_many_uses_the_cache_off_the_event_loop(tmp_path) -> None:
+    cache = _RecordingCache(tmp_path / "embeddings.sqlite")
+    cache.threads = set()
+    embedder = _embedding.AsyncEmbedding(model="m", api_key="x", token_encoder=WordEncoder(), cache=cache)
+    embeddings = _Embeddings()
+
+    async def _close() -> None:
+        pass
+
+    embedder._aclient = types.SimpleNamespace(
+        embeddings=types.SimpleNamespace(create=embeddings.acreate), close=_close
+    )
+
+    async def _main():
+        first = await embedder.aembed_many(["a b", "c"])
+        second = await embedder.aembed_many(["a b", "d"])
+        await embedder.aclose()
+        return threading.get_ident(), first, second
+
+    loop_thread, first, second = asyncio.run(_main())
+
+    assert embeddings.inputs == [["a b", "c"], ["d"]]
+    assert second[0] == first[0]
+    assert (embedder.cache_hits, embedder.cache_misses) == (1, 3)
+    assert cache.threads and loop_thread not in cache.threads
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(cache)
@@ -0,0 +1,90 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import random
+import typing
+import uuid
+
+import pytest
+
+from graphrag_query import _vector_stores
+from graphrag_query._search import _model
+from graphrag_query._search._context._builders import _entity_extraction
+from graphrag_query._search._input._retrieval import _entities
+
+
+def _make_entities(seed: int, num_entities: int = 60) -> typing.List[_model.Entity]:
+    rng = random.Random(seed)
+    entities = []
+    for i in range(num_entities):
+        entity_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        entities.append(_model.Entity(
+            # UUIDs stored with and without dashes, as in older and newer indexes
+            id=entity_id if rng.random() < 0.5 else entity_id.replace("-", ""),
+            short_id=str(i),
+            # repeated titles
+            title=f"ENTITY_{rng.randrange(num_entities // 2)}",
+            rank=rng.randint(0, 5),
+        ))
+    # the same UUID, once without and then with dashes
+    dashed = str(uuid.UUID(int=rng.getrandbits(128)))
+    entities.insert(5, _model.Entity(id=dashed.replace("-", ""), short_id="stripped", title="STRIPPED"))
+    entities.append(_model.Entity(id=dashed, short_id="dashed", title="DASHED"))
+    return entities
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_lookups_match_a_full_scan(seed: int) -> None:
+    entities = _make_entities(seed)
+    index = _entities.EntityIndex(entities)
+    assert len(index) == len(entities)
+    assert list(index) == entities
+
+    values = [entity.id for entity in entities]
+    values += [str(uuid.UUID(hex=value)) for value in values]  # every id with dashes
+    values += ["missing", str(uuid.uuid4())]
+    for value in values:
+        assert index.get_by_key("id", value) is _entities.get_entity_by_key(entities, "id", value)
+    for entity in entities:
+        assert index.get_by_key("short_id", entity.short_id) is _entities.get_entity_by_key(
+            entities, "short_id", entity.short_id
+        )
+        assert index.get_by_key("title", entity.title) is _entities.get_entity_by_key(entities, "title", entity.title)
+        assert index.get_by_name(entity.title) == _entities.get_entity_by_name(entities, entity.title)
+    assert index.get_by_name("MISSING") == []
+
+    for k in [0, 1, 7, len(entities) + 1]:
+        assert index.top_ranked(k) == sorted(entities, key=lambda entity: entity.rank or 0, reverse=True)[:k]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_map_query_to_entities_resolves_hits_like_a_scan(seed: int) -> None:
+    entities = _make_entities(seed)
+    rng = random.Random(seed)
+    store = _vector_stores.NumpyVectorStore("entities")
+    store.load_documents([
+        # the store may hold the ids with dashes
+        _vector_stores.VectorStoreDocument(
+            id=str(uuid.UUID(hex=entity.id)) if rng.random() < 0.5 else entity.id,
+            text=entity.title,
+            vector=[rng.random() for _ in range(8)],
+        )
+        for entity in entities
+    ])
+    index = _entities.EntityIndex(entities)
+
+    for _ in range(10):
+        kwargs = dict(
+            query="q",
+            text_embedding_vectorstore=store,
+            text_embedder=None,  # the query embedding is given
+            query_embedding=[rng.random() for _ in range(8)],
+            include_entity_names=rng.sample([entity.title for entity in entities], 2),
+            exclude_entity_names=rng.sample([entity.title for entity in entities], 5),
+            k=rng.randint(1, 10),
+        )
+        expected = _entity_extraction.map_query_to_entities(all_entities=list(entities), **kwargs)
+        assert len(expected) > len(kwargs["include_entity_names"])
+        assert _entity_extraction.map_query_to_entities(all_entities=index, **kwargs) == expected
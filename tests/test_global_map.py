@@ -0,0 +1,327 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import gc
+import threading
+import time
+import typing
+
+import openai.types.chat as openai_chat
+import pandas as pd
+import pytest
+import tiktoken
+
+from graphrag_query import errors
+from graphrag_query._search import _model
+from graphrag_query._search._engine import _global
+from graphrag_query._search._input._retrieval import _community_reports
+
+from .conftest import WordEncoder
+
+
+class _FailingChatLLM:
+    """Fails every call, all at once when the `calls`-th call arrives."""
+
+    model = "m"
+
+    def __init__(self, calls: int) -> None:
+        self.calls = calls
+        self.arrived = 0
+        self.failing: typing.Optional[asyncio.Event] = None
+
+    async def achat(self, msg, stream=False, **kwargs):
+        self.failing = self.failing or asyncio.Event()
+        self.arrived += 1
+        if self.arrived == self.calls:
+            self.failing.set()
+        await self.failing.wait()
+        raise RuntimeError(f"call {self.arrived} failed")
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _Embedding:
+    def close(self) -> None:
+        pass
+
+
+def test_failures_finishing_together_are_all_retrieved(monkeypatch) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    llm = _FailingChatLLM(6)
+    engine = _global.AsyncGlobalSearchEngine(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=object(),  # type: ignore[arg-type]
+        map_sys_prompt="{{ context_data }}",
+    )
+    unhandled = []
+
+    async def _main() -> None:
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        try:
+            await engine._map_all(
+                query="q", contexts=[f"ctx {i}" for i in range(6)], verbose=False, map_sys_prompt=None, chat_llm=llm,
+            )
+        except RuntimeError:
+            pass
+        else:
+            pytest.fail("The map failures were not raised")
+        # the unretrieved exceptions are reported when their tasks are collected
+        gc.collect()
+        await asyncio.sleep(0)
+        await engine.aclose()
+
+    asyncio.run(_main())
+    assert unhandled == []
+
+
+def _completion(content: str) -> openai_chat.ChatCompletion:
+    return openai_chat.ChatCompletion(
+        id="x", created=0, model="m", object="chat.completion",
+        choices=[openai_chat.chat_completion.Choice(
+            index=0, finish_reason="stop",
+            message=openai_chat.ChatCompletionMessage(role="assistant", content=content),
+        )],
+    )
+
+
+class _BatchChatLLM:
+    """Answers each batch by `answers`, after the delay of the batch in `delays`."""
+
+    model = "m"
+
+    def __init__(self, answers: typing.Dict[str, str], delays: typing.Dict[str, float]) -> None:
+        self.answers = answers
+        self.delays = delays
+        self.batches: typing.List[str] = []
+
+    async def achat(self, msg, stream=False, **kwargs):
+        batch = msg[0]["content"]
+        self.batches.append(batch)
+        await asyncio.sleep(self.delays.get(batch, 0))
+        return _completion(self.answers.get(batch, '{"points": []}'))
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _ContextBuilder:
+    """Renders one batch per community, named after the community."""
+
+    def __init__(self, hierarchy: _community_reports.CommunityHierarchy) -> None:
+        self.community_hierarchy = hierarchy
+
+    def build_context(self, conversation_history, community_ids, **kwargs):
+        records = pd.DataFrame({
+            "id": [self.community_hierarchy.get(community_id).short_id for community_id in community_ids],
+            "batch": range(len(community_ids)),
+        })
+        return list(community_ids), {"reports": records}
+
+
+def test_drill_down_credits_key_points_to_their_batch_past_a_dropped_map_call(monkeypatch) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    reports = [
+        _model.CommunityReport(id=community_id, short_id=str(i), title=community_id, community_id=community_id,
+                               rank=float(10 - i))
+        for i, community_id in enumerate(["r0", "r1", "r2", "a0", "a1", "a2"])
+    ]
+    hierarchy = _community_reports.CommunityHierarchy(reports, {"a0": "r0", "a1": "r1", "a2": "r2"})
+    # the first batch misses the deadline: the key point of the second must still expand its own community
+    llm = _BatchChatLLM({"r1": '{"points": [{"description": "relevant", "score": 80}]}'}, {"r0": 10})
+    engine = _global.AsyncGlobalSearchEngine(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=_ContextBuilder(hierarchy),  # type: ignore[arg-type]
+        map_sys_prompt="{{ context_data }}",
+    )
+
+    async def _main() -> typing.List[typing.Any]:
+        try:
+            return await engine._drill_down(
+                query="q", conversation_history=None, verbose=False, map_sys_prompt=None, chat_llm=llm,
+                max_map_calls=None, max_map_tokens=None, drill_down_threshold=50, map_deadline=0.05,
+            )
+        finally:
+            await engine.aclose()
+
+    with pytest.warns(errors.GraphRAGWarning, match="deadline"):
+        map_results = asyncio.run(_main())
+    assert sorted(llm.batches[:3]) == ["r0", "r1", "r2"]
+    assert llm.batches[3:] == ["a1"]
+    assert [result.choice.message.content for result in map_results] == [
+        [{"answer": "relevant", "score": 80}], [], [],
+    ]
+
+
+@pytest.mark.parametrize("fill_threshold, mapped", [(50, [0, 1]), (0, [0])])
+def test_only_key_points_above_the_fill_threshold_end_the_map_phase(monkeypatch, fill_threshold, mapped) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    llm = _BatchChatLLM(
+        {
+            "low": '{"points": [{"description": "barely relevant", "score": 10}]}',
+            "high": '{"points": [{"description": "relevant", "score": 90}]}',
+            "slow": '{"points": [{"description": "relevant too", "score": 90}]}',
+        },
+        {"high": 0.01, "slow": 10},
+    )
+    engine = _global.AsyncGlobalSearchEngine(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=object(),  # type: ignore[arg-type]
+        map_sys_prompt="{{ context_data }}",
+    )
+
+    async def _main() -> typing.Dict[int, typing.Any]:
+        try:
+            # any single key point fills the reduce context
+            return await engine._map_all(
+                query="q", contexts=["low", "high", "slow"], verbose=False, map_sys_prompt=None, chat_llm=llm,
+                fill_tokens=5, fill_threshold=fill_threshold,
+            )
+        finally:
+            await engine.aclose()
+
+    assert list(asyncio.run(_main())) == mapped
+
+
+@pytest.mark.parametrize("quorum", [0, -0.5, 1.5])
+def test_reduce_quorum_outside_the_unit_interval_is_rejected(monkeypatch, quorum) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    llm = _BatchChatLLM({}, {})
+    kwargs = dict(
+        chat_llm=llm, embedding=_Embedding(), context_builder=object(), map_sys_prompt="{{ context_data }}",
+    )
+    with pytest.raises(ValueError):
+        _global.AsyncGlobalSearchEngine(reduce_quorum=quorum, **kwargs)  # type: ignore[arg-type]
+
+    engine = _global.AsyncGlobalSearchEngine(reduce_quorum=1, **kwargs)  # type: ignore[arg-type]
+
+    async def _main() -> None:
+        try:
+            await engine._map_all(
+                query="q", contexts=["a"], verbose=False, map_sys_prompt=None, chat_llm=llm, quorum=quorum,
+            )
+        finally:
+            await engine.aclose()
+
+    with pytest.raises(ValueError):
+        asyncio.run(_main())
+    assert llm.batches == []
+
+
+class _ThreadedChatLLM:
+    """
+    Answers each batch with a key point naming it, after `delays[batch]`
+    seconds; the `failing` batches raise instead, once `failed` is set for
+    those waiting on it, and the `blocked` ones wait for `release`.
+    """
+
+    model = "m"
+
+    def __init__(
+        self,
+        delays: typing.Optional[typing.Dict[str, float]] = None,
+        failing: typing.Optional[typing.Dict[str, bool]] = None,
+        blocked: typing.Optional[typing.Set[str]] = None,
+    ) -> None:
+        self.delays = delays or {}
+        self.failing = failing or {}
+        self.blocked = blocked or set()
+        self.failed = threading.Event()
+        self.release = threading.Event()
+        self.batches: typing.List[str] = []
+
+    def chat(self, msg, stream=False, **kwargs):
+        batch = msg[0]["content"]
+        self.batches.append(batch)
+        time.sleep(self.delays.get(batch, 0))
+        if batch in self.blocked:
+            self.release.wait(10)
+        if batch in self.failing:
+            if self.failing[batch]:
+                self.failed.wait(10)
+                time.sleep(0.01)
+            else:
+                self.failed.set()
+            raise RuntimeError(f"{batch} failed")
+        return _completion('{"points": [{"description": "%s", "score": 50}]}' % batch)
+
+    def close(self) -> None:
+        pass
+
+
+def _threaded_engine(monkeypatch, llm: _ThreadedChatLLM, concurrent_threads: int) -> _global.GlobalSearchEngine:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    return _global.GlobalSearchEngine(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=object(),  # type: ignore[arg-type]
+        map_sys_prompt="{{ context_data }}",
+        concurrent_threads=concurrent_threads,
+    )
+
+
+def test_thread_pool_map_keeps_the_order_of_the_contexts(monkeypatch) -> None:
+    contexts = [f"batch {i}" for i in range(8)]
+    # the later batches return first
+    llm = _ThreadedChatLLM(delays={context: 0.005 * (8 - i) for i, context in enumerate(contexts)})
+    engine = _threaded_engine(monkeypatch, llm, 8)
+    results = engine._map_all(query="q", contexts=contexts, verbose=False, map_sys_prompt=None, chat_llm=llm)
+    assert [result.choice.message.content[0]["answer"] for result in results] == contexts
+    assert sorted(llm.batches) == contexts
+    engine.close()
+
+
+def test_thread_pool_map_raises_the_first_failure_in_context_order(monkeypatch) -> None:
+    # batch 3 fails first, then batch 1
+    llm = _ThreadedChatLLM(failing={"batch 1": True, "batch 3": False})
+    engine = _threaded_engine(monkeypatch, llm, 4)
+    with pytest.raises(RuntimeError, match="batch 1 failed"):
+        engine._map_all(
+            query="q", contexts=[f"batch {i}" for i in range(4)], verbose=False, map_sys_prompt=None, chat_llm=llm,
+        )
+    engine.close()
+
+
+def test_thread_pool_map_cancels_the_pending_calls(monkeypatch) -> None:
+    llm = _ThreadedChatLLM(failing={"batch 0": False}, blocked={"batch 1"})
+    engine = _threaded_engine(monkeypatch, llm, 1)
+    futures: typing.List[concurrent.futures.Future] = []
+    submit = engine._executor.submit
+
+    def _submit(*args, **kwargs):
+        futures.append(submit(*args, **kwargs))
+        return futures[-1]
+
+    monkeypatch.setattr(engine._executor, "submit", _submit)
+    with pytest.raises(RuntimeError, match="batch 0 failed"):
+        engine._map_all(
+            query="q", contexts=[f"batch {i}" for i in range(6)], verbose=False, map_sys_prompt=None, chat_llm=llm,
+        )
+    # the single thread may have started batch 1 before the failure was raised, but no later batch
+    assert all(future.cancelled() for future in futures[2:])
+    llm.release.set()
+    engine.close()
+    assert llm.batches[0] == "batch 0" and set(llm.batches) <= {"batch 0", "batch 1"}
+
+
+def test_close_shuts_the_thread_pool_down(monkeypatch) -> None:
+    llm = _ThreadedChatLLM(blocked={"batch 0"})
+    engine = _threaded_engine(monkeypatch, llm, 1)
+    running = engine._executor.submit(llm.chat, [{"content": "batch 0"}])
+    queued = engine._executor.submit(llm.chat, [{"content": "batch 1"}])
+    while not llm.batches:
+        time.sleep(0.001)
+    engine.close()
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        engine._executor.submit(llm.chat, [{"content": "batch 2"}])
+    llm.release.set()
+    assert running.result().choices[0].finish_reason == "stop"
+    assert llm.batches == ["batch 0"]
@@ -0,0 +1,71 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import threading
+import typing
+
+import numpy as np
+
+from graphrag_query import _vector_stores
+
+
+def _documents(seed: int = 0) -> typing.List[_vector_stores.VectorStoreDocument]:
+    vectors = np.random.default_rng(seed).standard_normal((20, 4))
+    return [
+        _vector_stores.VectorStoreDocument(id=f"d{i}", text=f"text {i}", vector=vector.tolist(),
+                                           attributes={"row": i})
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _search(store: _vector_stores.LanceDBVectorStore) -> typing.List[str]:
+    return [result.document.id for result in store.similarity_search_by_vector([1.0, 0.0, 0.0, 0.0], k=5)]
+
+
+def test_versioned_table_is_reused_until_the_documents_change(tmp_path) -> None:
+    uri = str(tmp_path / "lancedb")
+    store = _vector_stores.LanceDBVectorStore("entities", uri)
+    assert store.load_documents_versioned(_documents())
+    table_name = store.document_collection.name
+    assert table_name.startswith("entities-")
+    expected = _search(store)
+
+    # another store (as another process would) opens the table written for the same documents
+    reopened = _vector_stores.LanceDBVectorStore("entities", uri)
+    assert not reopened.load_documents_versioned(_documents())
+    assert reopened.document_collection.name == table_name
+    assert reopened.document_collection.count_rows() == 20
+    assert _search(reopened) == expected
+
+    # any change to the documents writes a new table
+    changed = _documents()
+    changed[3].attributes = {"row": 3, "changed": True}
+    assert reopened.load_documents_versioned(changed)
+    assert reopened.document_collection.name != table_name
+    assert reopened.load_documents_versioned(_documents(1))
+    assert not reopened.load_documents_versioned(_documents(1))
+
+    # the older versions are left in place until dropped
+    names = reopened.db_connection.table_names()
+    current = reopened.document_collection.name
+    assert len(names) == 3 and table_name in names
+    assert sorted(reopened.drop_stale_versions()) == sorted(name for name in names if name != current)
+    assert reopened.db_connection.table_names() == [current]
+    assert not reopened.load_documents_versioned(_documents(1))
+
+
+def test_concurrent_loads_write_the_table_once(tmp_path) -> None:
+    uri = str(tmp_path / "lancedb")
+    created: typing.List[bool] = []
+
+    def _load() -> None:
+        created.append(_vector_stores.LanceDBVectorStore("entities", uri).load_documents_versioned(_documents()))
+
+    threads = [threading.Thread(target=_load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(created) == [False, False, False, True]
@@ -0,0 +1,120 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import concurrent.futures
+import random
+import sys
+import typing
+
+import pandas as pd
+import pytest
+
+from graphrag_query._search import _model
+from graphrag_query._search._context._loaders import _lazy
+
+
+class _Fetcher:
+    """Fetches `value {row}` for the rows asked, recording every batch."""
+
+    def __init__(self) -> None:
+        self.batches: typing.List[typing.List[int]] = []
+
+    def __call__(self, rows: typing.List[int]) -> typing.List[str]:
+        self.batches.append(list(rows))
+        return [f"value {row}" for row in rows]
+
+
+def test_lazy_column_caches_the_most_recently_used_values() -> None:
+    fetch = _Fetcher()
+    column = _model.LazyColumn(fetch, 10, max_entries=2)
+    assert len(column) == 10
+    assert column[0] == "value 0"
+    assert column[-1] == "value 9"
+    assert column[0] == "value 0"
+    assert fetch.batches == [[0], [9]]
+
+    # 0 is the most recently used: 9 is evicted
+    assert column[5] == "value 5"
+    assert column[0] == "value 0"
+    assert column[9] == "value 9"
+    assert fetch.batches == [[0], [9], [5], [9]]
+
+    column.clear()
+    assert column[0] == "value 0"
+    assert fetch.batches[-1] == [0]
+    with pytest.raises(IndexError):
+        column[10]
+
+
+def test_lazy_column_assigned_values_take_precedence() -> None:
+    fetch = _Fetcher()
+    column = _model.LazyColumn(fetch, 5)
+    column[2] = "assigned"
+    column.clear()
+    assert column[2] == "assigned"
+    assert list(column) == ["value 0", "value 1", "assigned", "value 3", "value 4"]
+    assert fetch.batches == [[0, 1, 2, 3, 4]]
+
+    column.prefetch([4, 2, 1, 4])
+    assert fetch.batches[-1] == [1, 4]
+    assert column[1] == "value 1" and column[4] == "value 4"
+    assert len(fetch.batches) == 2
+
+
+def test_lazy_column_concurrent_reads() -> None:
+    column = _model.LazyColumn(_Fetcher(), 200, max_entries=16)
+    rows = [random.Random(0).randrange(200) for _ in range(4000)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            values = list(executor.map(column.__getitem__, rows))
+    finally:
+        sys.setswitchinterval(interval)
+    assert values == [f"value {row}" for row in rows]
+
+
+@pytest.fixture
+def text_units_file(tmp_path) -> typing.Tuple[str, pd.DataFrame]:
+    df = pd.DataFrame({
+        "id": [f"t{i}" for i in range(50)],
+        "text": [f"the text of unit {i}" for i in range(50)],
+        "n_tokens": list(range(50)),
+    })
+    path = str(tmp_path / "text_units.parquet")
+    # small row groups, so that the reads span several of them
+    df.to_parquet(path, row_group_size=7)
+    return path, df
+
+
+def test_parquet_row_reader_reads_rows_in_the_order_given(text_units_file) -> None:
+    path, df = text_units_file
+    reader = _lazy.ParquetRowReader(path, ["text", "missing", "id"])
+    assert reader.columns == ["text", "id"]
+    assert len(reader) == 50
+    assert reader.num_row_groups == 8
+
+    rng = random.Random(0)
+    for _ in range(20):
+        rows = [rng.randrange(50) for _ in range(rng.randint(1, 30))]
+        pd.testing.assert_frame_equal(reader.read(rows), df.iloc[rows][["text", "id"]].reset_index(drop=True))
+    assert reader.read([]).empty
+    with pytest.raises(IndexError):
+        reader.read([50])
+    with pytest.raises(IndexError):
+        reader.read([-1])
+
+
+def test_lazy_text_units(text_units_file) -> None:
+    path, df = text_units_file
+    text_units = [_model.TextUnit(id=text_unit_id, short_id=str(i), text="") for i, text_unit_id in enumerate(df["id"])]
+    views = _lazy.lazy_text_units(text_units, path, max_entries=8)
+    assert [view.id for view in views] == list(df["id"])
+    _model.prefetch(views[10:20], "text")
+    assert [view.text for view in views[10:20]] == list(df["text"][10:20])
+    assert views[3].text == df["text"][3]
+
+    with pytest.raises(ValueError):
+        _lazy.lazy_text_units(text_units[:-1], path)
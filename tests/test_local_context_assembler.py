@@ -0,0 +1,214 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import random
+import typing
+
+import pandas as pd
+import pytest
+import tiktoken
+from tiktoken import _educational
+
+from graphrag_query import _utils
+from graphrag_query._search import _model
+from graphrag_query._search._context._builders import _local_context
+
+from .conftest import Graph, WordEncoder, make_graph
+
+
+def _baseline(
+    graph: Graph,
+    selected_entities: typing.List[_model.Entity],
+    token_counter: _utils.TokenCounter,
+    data_max_tokens: int,
+    **kwargs: typing.Any,
+) -> typing.Tuple[typing.List[str], typing.Dict[str, pd.DataFrame]]:
+    """The per-entity rebuild loop `LocalContextAssembler` replaces."""
+    added_entities: typing.List[_model.Entity] = []
+    final_context: typing.List[str] = []
+    final_context_data: typing.Dict[str, pd.DataFrame] = {}
+    for entity in selected_entities:
+        current_context = []
+        current_context_data = {}
+        added_entities.append(entity)
+
+        relationship_context, relationship_context_data = _local_context.build_relationship_context(
+            selected_entities=added_entities,
+            relationships=graph.relationships,
+            token_encoder=token_counter,
+            data_max_tokens=data_max_tokens,
+            context_name="Relationships",
+            **kwargs,
+        )
+        current_context.append(relationship_context)
+        current_context_data["relationships"] = relationship_context_data
+        total_tokens = token_counter(relationship_context)
+
+        for name, covariates in graph.covariates.items():
+            covariate_context, covariate_context_data = _local_context.build_covariates_context(
+                selected_entities=added_entities,
+                covariates=covariates,
+                token_encoder=token_counter,
+                data_max_tokens=data_max_tokens,
+                column_delimiter=kwargs["column_delimiter"],
+                context_name=name,
+            )
+            total_tokens += token_counter(covariate_context)
+            current_context.append(covariate_context)
+            current_context_data[name.lower()] = covariate_context_data
+
+        if total_tokens > data_max_tokens:
+            break
+        final_context = current_context
+        final_context_data = current_context_data
+    return final_context, final_context_data
+
+
+def _assembled(
+    graph: Graph,
+    selected_entities: typing.List[_model.Entity],
+    token_counter: _utils.TokenCounter,
+    data_max_tokens: int,
+    **kwargs: typing.Any,
+) -> typing.Tuple[typing.List[str], typing.Dict[str, pd.DataFrame]]:
+    assembler = _local_context.LocalContextAssembler(
+        relationships=graph.relationships,
+        covariates=graph.covariates,
+        token_encoder=token_counter,
+        data_max_tokens=data_max_tokens,
+        **kwargs,
+    )
+    assembler.prefetch(selected_entities)
+    for entity in selected_entities:
+        total_tokens = assembler.add_entity(entity)
+        if total_tokens > data_max_tokens:
+            break
+        assembler.commit()
+        # the total is that of the whole tables, as the rebuild loop counts it
+        assert total_tokens == sum(token_counter(text) for text in assembler.to_context()[0])
+    return assembler.to_context()
+
+
+def _check_matches_rebuild_loop(graph: Graph, token_counter: _utils.TokenCounter, rng: random.Random) -> None:
+    for _ in range(25):
+        selected_entities = rng.sample(graph.entities, rng.randint(1, 15))
+        data_max_tokens = rng.choice([20, 60, 150, 400, 1200, 8000])
+        kwargs = dict(
+            column_delimiter=rng.choice(["|", ","]),
+            include_relationship_weight=rng.random() < 0.5,
+            top_k_relationships=rng.randint(1, 10),
+            relationship_ranking_attribute=rng.choice(["rank", "weight"]),
+        )
+
+        expected_text, expected_data = _baseline(graph, selected_entities, token_counter, data_max_tokens, **kwargs)
+        text, data = _assembled(graph, selected_entities, token_counter, data_max_tokens, **kwargs)
+
+        assert text == expected_text
+        assert data.keys() == expected_data.keys()
+        for key in data:
+            pd.testing.assert_frame_equal(data[key], expected_data[key])
+
+
+@pytest.mark.parametrize("estimate", [False, True], ids=["encoded", "estimated"])
+@pytest.mark.parametrize("seed", range(8))
+def test_assembler_matches_rebuild_loop(seed: int, estimate: bool) -> None:
+    rng = random.Random(seed)
+    graph = make_graph(seed, num_claims=rng.choice([0, 20, 80]))
+    if rng.random() < 0.3:
+        # a single ranking attribute on every relationship, as in an indexed graph
+        for relationship in graph.relationships:
+            relationship.attributes = {"rank": rng.randint(0, 18)}
+    token_counter = _utils.TokenCounter(WordEncoder(), estimate=estimate)  # type: ignore[arg-type]
+    _check_matches_rebuild_loop(graph, token_counter, rng)
+
+
+# the split patterns of the BPE encodings (see `tiktoken_ext.openai_public`)
+_SPLIT_PATTERNS = {
+    "cl100k_base": (
+        r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|"""
+        r"""\s*[\r\n]|\s+(?!\S)|\s"""
+    ),
+    "o200k_base": "|".join([
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]),
+}
+
+# leading and trailing spaces, unicode, digits and punctuation, where rows may tokenize together
+_TRICKY_WORDS = [
+    "alpha", "Beta", "naïve", "café", "e\u0301clair", "日本語", "Ωmega", "١٢٣", "ÆØÅ", "🙂", "12345", "3.14",
+    "1,000", "it's", "'ll", "-dash", "(paren)", "/path/", "end  ", "  two", " one", "\u00a0nbsp", "x\ty",
+    "line\nbreak",
+]
+
+
+def _tricky_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(_TRICKY_WORDS) for _ in range(rng.randint(0, 4)))
+
+
+def _tricky_row(rng: random.Random) -> str:
+    return "|".join(_tricky_text(rng) for _ in range(rng.randint(1, 4))) + "\n"
+
+
+def _tricky_graph(seed: int) -> Graph:
+    """A random graph whose rows start and end with spaces, unicode, digits and punctuation."""
+    rng = random.Random(seed)
+    graph = make_graph(seed, num_claims=60)
+    titles = {
+        entity.title: f"{_tricky_text(rng)}{entity.short_id}" if rng.random() < 0.5 else entity.title
+        for entity in graph.entities
+    }
+    for entity in graph.entities:
+        entity.title = titles[entity.title]
+    for items in [graph.relationships, *graph.covariates.values()]:
+        for item in items:
+            if rng.random() < 0.5:
+                item.short_id = rng.choice([" ", "  ", "/", "\t", "٣", "é", "'s", "", "("]) + str(item.short_id)
+    for relationship in graph.relationships:
+        relationship.source = titles[relationship.source]
+        relationship.target = titles[relationship.target]
+        relationship.description = _tricky_text(rng)
+    for covariate in graph.covariates["Claims"]:
+        covariate.subject_id = titles[covariate.subject_id]
+        covariate.attributes = {"description": _tricky_text(rng)}
+    return graph
+
+
+@pytest.fixture(scope="module", params=list(_SPLIT_PATTERNS))
+def bpe_encoding(request) -> tiktoken.Encoding:
+    try:
+        return tiktoken.get_encoding(request.param)
+    except Exception:
+        # the ranks cannot be downloaded: train ranks on context-like text with the split pattern of the
+        # encoding, which decides where the token counts of consecutive rows stop adding up
+        rng = random.Random(0)
+        text = "".join(_tricky_row(rng) for _ in range(400))
+        pattern = _SPLIT_PATTERNS[request.param]
+        return tiktoken.Encoding(
+            name=f"{request.param}_trained",
+            pat_str=pattern,
+            mergeable_ranks=_educational.bpe_train(text, 400, pattern, visualise=None),
+            special_tokens={},
+        )
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_assembler_matches_rebuild_loop_with_bpe(seed: int, bpe_encoding: tiktoken.Encoding) -> None:
+    _check_matches_rebuild_loop(_tricky_graph(seed), _utils.TokenCounter(bpe_encoding), random.Random(seed))
+
+
+def test_table_tokens_count_the_whole_text(bpe_encoding: tiktoken.Encoding) -> None:
+    token_counter = _utils.TokenCounter(bpe_encoding)
+    rng = random.Random(0)
+    for _ in range(2000):
+        table = _local_context._ContextTable.start("Claims", ["id", "entity"], "|", token_counter)
+        for _ in range(rng.randint(1, 6)):
+            assert table.append(_tricky_row(rng)[:-1].split("|"), 10 ** 6)
+        assert table.tokens == token_counter(table.to_text())
@@ -0,0 +1,85 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import concurrent.futures
+import random
+import sys
+
+import pytest
+
+from graphrag_query._search._context._builders import _context_builders
+
+from .conftest import WordEncoder, make_graph
+
+
+def _builder(estimate_tokens: bool = False) -> _context_builders.LocalContextBuilder:
+    graph = make_graph(seed=7)
+    return _context_builders.LocalContextBuilder(
+        entities=graph.entities,
+        entity_text_embeddings=None,  # type: ignore[arg-type]
+        text_embedder=None,  # type: ignore[arg-type]
+        text_units=graph.text_units,
+        community_reports=graph.community_reports,
+        relationships=graph.relationships,
+        covariates=graph.covariates,
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+        estimate_tokens=estimate_tokens,
+    )
+
+
+def _build(builder: _context_builders.LocalContextBuilder, entity_ids, max_tokens, ranking_attribute):
+    return builder._build_context_from_entities(
+        selected_entities=[builder._entities[entity_id] for entity_id in entity_ids],
+        data_max_tokens=max_tokens,
+        text_unit_prop=0.4,
+        community_prop=0.3,
+        top_k_relationships=5,
+        include_community_rank=True,
+        include_entity_rank=True,
+        rank_description="number of relationships",
+        include_relationship_weight=True,
+        relationship_ranking_attribute=ranking_attribute,
+        return_candidate_context=False,
+        use_community_summary=True,
+        min_community_rank=0,
+        community_context_name="Reports",
+        column_delimiter="|",
+    )
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_concurrent_builds_match_sequential_builds() -> None:
+    builder = _builder()
+    rng = random.Random(0)
+    entity_ids = list(builder._entities)
+    cases = [
+        (tuple(rng.sample(entity_ids, rng.randint(1, 12))), rng.choice([150, 400, 2000]), rng.choice(["rank", "weight"]))
+        for _ in range(40)
+    ]
+    snapshot = {
+        model.id: model.model_dump()
+        for models in (builder._relationships, builder._text_units, builder._community_reports)
+        for model in models.values()
+    }
+    expected = [_build(builder, *case) for case in cases]
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda case: _build(builder, *case), cases * 10))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for (expected_text, expected_data), (text, data) in zip(expected * 10, results):
+        assert text == expected_text
+        assert expected_data.keys() == data.keys()
+        for key in expected_data:
+            assert expected_data[key].equals(data[key])
+
+    # the builds keep their ranking values to themselves
+    for models in (builder._relationships, builder._text_units, builder._community_reports):
+        for model in models.values():
+            assert model.model_dump() == snapshot[model.id]
@@ -0,0 +1,184 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+import typing
+
+import openai
+import openai.types.chat as openai_chat
+import pytest
+import tiktoken
+
+from graphrag_query._search._engine import _global
+from graphrag_query._search._engine._map_cache import MapResultCache, map_cache_key
+
+from .conftest import WordEncoder
+
+
+def _key(query: str = "what are the themes?", **kwargs) -> str:
+    return map_cache_key(model="m", context="id|title\n1|a\n", query=query, map_sys_prompt="{{ context_data }}", **kwargs)
+
+
+def test_key_normalizes_the_query_only() -> None:
+    assert _key("what  are the\tthemes? ") == _key()
+    assert _key("What are the themes?") != _key()
+    assert _key(temperature=0.5) != _key()
+    assert map_cache_key(model="n", context="id|title\n1|a\n", query="what are the themes?",
+                         map_sys_prompt="{{ context_data }}") != _key()
+
+
+def test_get_set_and_reopen(tmp_path) -> None:
+    points = [{"answer": "a", "score": 80}]
+    cache = MapResultCache(tmp_path / "cache.sqlite")
+    assert cache.get(_key()) is None
+    cache.set(_key(), points)
+    assert cache.get(_key()) == points
+    cache.close()
+
+    reopened = MapResultCache(tmp_path / "cache.sqlite")
+    assert reopened.get(_key()) == points
+    assert len(reopened) == 1
+    reopened.clear()
+    assert len(reopened) == 0
+    reopened.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path) -> None:
+    cache = MapResultCache(tmp_path / "cache.sqlite", max_entries=2)
+    cache.set("a", [])
+    time.sleep(0.01)
+    cache.set("b", [])
+    time.sleep(0.01)
+    assert cache.get("a") == []
+    time.sleep(0.01)
+    cache.set("c", [])
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == [] and cache.get("c") == []
+    cache.close()
+
+
+def test_expired_entries_are_dropped(tmp_path) -> None:
+    cache = MapResultCache(tmp_path / "cache.sqlite", ttl=0.05)
+    cache.set("a", [{"answer": "a", "score": 1}])
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    cache.close()
+
+
+@pytest.mark.parametrize("kwargs", [{"max_entries": -1}, {"ttl": 0}])
+def test_invalid_bounds(tmp_path, kwargs) -> None:
+    with pytest.raises(ValueError):
+        MapResultCache(tmp_path / "cache.sqlite", **kwargs)
+
+
+class _ChatLLM:
+    model = "m"
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.response_formats: typing.List[typing.Any] = []
+
+    def chat(self, msg, stream=False, response_format=openai.NOT_GIVEN, **kwargs):
+        self.calls += 1
+        self.response_formats.append(response_format)
+        return openai_chat.ChatCompletion(
+            id="x", created=0, model="m", object="chat.completion",
+            choices=[openai_chat.chat_completion.Choice(
+                index=0, finish_reason="stop",
+                message=openai_chat.ChatCompletionMessage(
+                    role="assistant", content='{"points": [{"description": "a point", "score": 70}]}'
+                ),
+            )],
+        )
+
+    async def achat(self, msg, stream=False, **kwargs):
+        return self.chat(msg, stream=stream, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _Embedding:
+    def close(self) -> None:
+        pass
+
+
+class _RecordingCache(MapResultCache):
+    threads: set
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, points):
+        self.threads.add(threading.get_ident())
+        super().set(key, points)
+
+
+def test_async_map_uses_the_cache_off_the_event_loop(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    cache = _RecordingCache(tmp_path / "cache.sqlite")
+    cache.threads = set()
+    llm = _ChatLLM()
+    engine = _global.AsyncGlobalSearchEngine(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=object(),  # type: ignore[arg-type]
+        map_cache=cache,
+        map_sys_prompt="{{ context_data }}",
+    )
+
+    async def _main():
+        loop_thread = threading.get_ident()
+        first = await engine._map(query="q", context="ctx", verbose=False, chat_llm=llm)
+        second = await engine._map(query="q", context="ctx", verbose=False, chat_llm=llm)
+        await engine.aclose()
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(_main())
+
+    assert llm.calls == 1
+    assert first.choice.message.content == second.choice.message.content
+    assert cache.threads and loop_thread not in cache.threads
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(cache)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_json_mode_is_part_of_the_key(tmp_path, monkeypatch, asynchronous: bool) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    cache = MapResultCache(tmp_path / "cache.sqlite")
+    llm = _ChatLLM()
+    engine_class = _global.AsyncGlobalSearchEngine if asynchronous else _global.GlobalSearchEngine
+    engine = engine_class(
+        chat_llm=llm,  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=object(),  # type: ignore[arg-type]
+        map_cache=cache,
+        map_sys_prompt="{{ context_data }}",
+    )
+
+    def _map(json_mode: bool):
+        result = engine._map(query="q", context="ctx", verbose=False, chat_llm=llm, json_mode=json_mode)
+        return asyncio.run(result) if asynchronous else result
+
+    for json_mode in [True, False, True, False]:
+        _map(json_mode)
+    assert llm.calls == 2
+    assert llm.response_formats == [{"type": "json_object"}, openai.NOT_GIVEN]
+    assert len(cache) == 2
+    if asynchronous:
+        asyncio.run(engine.aclose())
+    else:
+        engine.close()
@@ -0,0 +1,99 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import random
+import typing
+
+import numpy as np
+import pydantic
+import pytest
+
+from graphrag_query._search import _model
+from graphrag_query._search._context._loaders import _utils
+
+from .conftest import make_graph
+
+_EMBEDDING_FIELDS = {
+    _model.Entity: ["description_embedding", "name_embedding", "graph_embedding"],
+    _model.Relationship: ["description_embedding"],
+    _model.TextUnit: ["text_embedding"],
+    _model.CommunityReport: ["summary_embedding", "full_content_embedding"],
+}
+
+
+def _with_embeddings(models: typing.List[pydantic.BaseModel], seed: int) -> typing.List[pydantic.BaseModel]:
+    """
+    Give the models embeddings of 6 dimensions (none for about a quarter of
+    them), in multiples of 1/64 so that float32 holds them exactly.
+    """
+    rng = random.Random(seed)
+    for model in models:
+        for name in _EMBEDDING_FIELDS[type(model)]:
+            if rng.random() < 0.75:
+                setattr(model, name, [rng.randint(-64, 64) / 64 for _ in range(6)])
+    return models
+
+
+@pytest.mark.parametrize("model_type, name", [
+    (_model.Entity, "entities"),
+    (_model.Relationship, "relationships"),
+    (_model.TextUnit, "text_units"),
+    (_model.CommunityReport, "community_reports"),
+])
+def test_views_match_the_models_field_by_field(model_type, name) -> None:
+    models = _with_embeddings(getattr(make_graph(), name), seed=1)
+    views = _utils.compact(model_type, models)
+    store = _utils.model_store_of(views)
+    assert store is not None and len(store) == len(models)
+    assert store.embedding_fields == _EMBEDDING_FIELDS[model_type]
+
+    for model, view in zip(models, views):
+        assert isinstance(view, _model.ModelView)
+        for field in model_type.model_fields:
+            assert getattr(view, field) == getattr(model, field), field
+        assert view == model and view.model_dump() == model.model_dump()
+        assert view.to_model().model_dump() == model.model_dump()
+
+    # the embeddings are the rows of one float32 matrix per field, zero where missing
+    for field in store.embedding_fields:
+        matrix = store.embeddings(field)
+        assert matrix.matrix.dtype == np.float32 and matrix.matrix.shape == (len(models), 6)
+        for row, model in enumerate(models):
+            expected = getattr(model, field)
+            assert matrix.present[row] == (expected is not None)
+            assert matrix.matrix[row].tolist() == (expected if expected is not None else [0.0] * 6)
+
+    # views already compact are returned as is
+    assert _utils.compact(model_type, views) is views
+
+
+def test_views_write_through_to_the_store() -> None:
+    entities = _with_embeddings(make_graph().entities, seed=2)
+    views = _utils.compact(_model.Entity, entities)
+    store = _utils.model_store_of(views)
+    assert store is not None
+    view = views[3]
+    view.description = "changed"
+    view.description_embedding = [0.5] * 6
+    view.name_embedding = None
+    assert store.column("description")[3] == "changed"
+    assert store.embeddings("description_embedding").matrix[3].tolist() == [0.5] * 6
+    assert not store.embeddings("name_embedding").present[3]
+    assert view.to_model().description == "changed" and view.to_model().name_embedding is None
+    with pytest.raises(ValueError):
+        view.description_embedding = [0.5] * 5
+    # the other views are untouched
+    assert views[2].model_dump() == entities[2].model_dump()
+
+
+def test_inconsistent_embeddings_are_kept_as_a_column() -> None:
+    entities = make_graph().entities[:3]
+    entities[0].description_embedding = [0.25, 0.5]
+    entities[1].description_embedding = [0.25, 0.5, 0.75]
+    store = _model.ModelStore.from_models(_model.Entity, entities)
+    assert "description_embedding" not in store.embedding_fields
+    assert [view.description_embedding for view in store] == [[0.25, 0.5], [0.25, 0.5, 0.75], None]
+    assert "name_embedding" in store.embedding_fields and store.embeddings("name_embedding").dimensions == 0
+    assert [view.model_dump() for view in store] == [entity.model_dump() for entity in entities]
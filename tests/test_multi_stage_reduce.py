@@ -0,0 +1,177 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import typing
+
+import openai.types.chat as openai_chat
+import pytest
+import tiktoken
+
+from graphrag_query._search._engine import _global
+
+from .conftest import WordEncoder
+
+
+def _key_point(analyst: int, score: int, answer: str = "a point") -> typing.Dict[str, typing.Any]:
+    # formatted for the reduce phase, a key point has 5 words besides its answer
+    return {"analyst": analyst, "answer": answer, "score": score}
+
+
+def _completion(content: str) -> openai_chat.ChatCompletion:
+    return openai_chat.ChatCompletion(
+        id="x", created=0, model="m", object="chat.completion",
+        choices=[openai_chat.chat_completion.Choice(
+            index=0, finish_reason="stop",
+            message=openai_chat.ChatCompletionMessage(role="assistant", content=content),
+        )],
+    )
+
+
+def _answer(system_prompt: str) -> str:
+    """
+    Answers a map prompt with a key point scored by the number of its batch,
+    and a reduce prompt with a summary of its key points and their scores.
+    """
+    if system_prompt.startswith("MAP"):
+        score = 10 * (int(system_prompt.split()[-1]) + 1)
+        return json.dumps({"points": [{"description": "a point", "score": score}]})
+    scores = re.findall(r"Importance score: (\d+)", system_prompt)
+    return f"summary of {' '.join(scores)}"
+
+
+class _ChatLLM:
+    model = "m"
+
+    def __init__(self) -> None:
+        self.reduce_prompts: typing.List[str] = []
+
+    def chat(self, msg, stream=False, **kwargs):
+        if msg[0]["content"].startswith("REDUCE"):
+            self.reduce_prompts.append(msg[0]["content"])
+        return _completion(_answer(msg[0]["content"]))
+
+    async def achat(self, msg, stream=False, **kwargs):
+        return self.chat(msg, stream=stream, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _Embedding:
+    def close(self) -> None:
+        pass
+
+
+class _ContextBuilder:
+    community_hierarchy = None
+
+    def __init__(self, num_batches: int) -> None:
+        self.num_batches = num_batches
+
+    def build_context(self, conversation_history, **kwargs):
+        return [f"batch {i}" for i in range(self.num_batches)], {}
+
+
+def _engine(monkeypatch, data_max_tokens: int, num_batches: int = 0, asynchronous: bool = False):
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoder())
+    engine_class = _global.AsyncGlobalSearchEngine if asynchronous else _global.GlobalSearchEngine
+    return engine_class(
+        chat_llm=_ChatLLM(),  # type: ignore[arg-type]
+        embedding=_Embedding(),  # type: ignore[arg-type]
+        context_builder=_ContextBuilder(num_batches),  # type: ignore[arg-type]
+        map_sys_prompt="MAP {{ context_data }}",
+        reduce_sys_prompt="REDUCE {{ report_data }}",
+        max_data_tokens=data_max_tokens,
+        allow_general_knowledge=False,
+    )
+
+
+def test_chunk_key_points() -> None:
+    key_points = [_key_point(i, 90 - i, "a point") for i in range(5)]
+    key_points.insert(2, _key_point(9, 50, " ".join(["word"] * 20)))
+    chunks = _global._chunk_key_points(key_points, 15, WordEncoder())  # type: ignore[arg-type]
+    # two 7-token key points fit in 15 tokens; the 25-token one gets a chunk of its own
+    assert [[key_point["analyst"] for key_point in chunk] for chunk in chunks] == [[0, 1], [9], [2, 3], [4]]
+    assert _global._chunk_key_points([], 15, WordEncoder()) == []  # type: ignore[arg-type]
+
+
+def test_stage_key_points_keep_the_best_score_and_drop_empty_answers() -> None:
+    chunks = [
+        [_key_point(0, 80), _key_point(1, 30)],
+        [_key_point(2, 60)],
+        [_key_point(3, 50), _key_point(4, 90)],
+    ]
+    assert _global._stage_key_points(chunks, ["first", " \n", "third"]) == [
+        {"analyst": 0, "answer": "first", "score": 80},
+        {"analyst": 2, "answer": "third", "score": 90},
+    ]
+
+
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def test_reduce_stages(monkeypatch, asynchronous: bool) -> None:
+    engine = _engine(monkeypatch, 20, asynchronous=asynchronous)
+    llm = engine.chat_llm
+    key_points = [_key_point(i, 80 - 10 * i) for i in range(8)]
+
+    def _reduce_stages(key_points):
+        reduce_stages = engine._reduce_stages(key_points, query="q", reduce_sys_prompt=None, chat_llm=llm)
+        return asyncio.run(reduce_stages) if asynchronous else reduce_stages
+
+    # 8 key points of 7 tokens in 4 chunks, then 4 answers of 9 tokens in 2 chunks, then 2 answers in 1 chunk
+    assert _reduce_stages(key_points) == [
+        {"analyst": 0, "answer": "summary of 80 60", "score": 80},
+        {"analyst": 1, "answer": "summary of 40 20", "score": 40},
+    ]
+    assert sorted(prompt.count("----Analyst") for prompt in llm.reduce_prompts) == [2, 2, 2, 2, 2, 2]
+
+    # no two key points fit in one chunk: the stages end at once
+    llm.reduce_prompts.clear()
+    large = [_key_point(i, 50, " ".join(["word"] * 20)) for i in range(3)]
+    assert _reduce_stages(large) == large
+    assert llm.reduce_prompts == []
+
+    # a single key point is not reduced either
+    assert _reduce_stages(key_points[:1]) == key_points[:1]
+    assert llm.reduce_prompts == []
+    if not asynchronous:
+        engine.close()
+
+
+def test_reduce_stages_end_when_the_answers_exceed_the_limit(monkeypatch) -> None:
+    engine = _engine(monkeypatch, 20)
+    llm = engine.chat_llm
+    # 12 key points of 5 tokens in 3 chunks, whose answers of 11 tokens cannot share a chunk
+    key_points = [_key_point(i, 21 - i, "") for i in range(12)]
+    staged = engine._reduce_stages(key_points, query="q", reduce_sys_prompt=None, chat_llm=llm)
+    assert staged == [
+        {"analyst": 0, "answer": "summary of 21 20 19 18", "score": 21},
+        {"analyst": 1, "answer": "summary of 17 16 15 14", "score": 17},
+        {"analyst": 2, "answer": "summary of 13 12 11 10", "score": 13},
+    ]
+    assert len(llm.reduce_prompts) == 3
+    engine.close()
+
+
+def test_multi_stage_search(monkeypatch) -> None:
+    engine = _engine(monkeypatch, 20, num_batches=8, asynchronous=True)
+    llm = engine.chat_llm
+
+    async def _main():
+        try:
+            return await engine.asearch("q", conversation_history=None, multi_stage_reduce=True)
+        finally:
+            await engine.aclose()
+
+    result = asyncio.run(_main())
+    # the map key points are scored 10 to 80, reduced in two stages to 2 key points, then to the answer
+    assert result.choice.message.content == "summary of 80 40"
+    assert len(llm.reduce_prompts) == 7
+    assert "Importance score: 80" in llm.reduce_prompts[-1] and "Importance score: 40" in llm.reduce_prompts[-1]
@@ -0,0 +1,110 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+import pytest
+
+from graphrag_query import _vector_stores
+
+
+def _documents(vectors: np.ndarray, prefix: str = "d") -> typing.List[_vector_stores.VectorStoreDocument]:
+    return [
+        _vector_stores.VectorStoreDocument(id=f"{prefix}{i}", text=f"text {i}", vector=vector.tolist(),
+                                           attributes={"row": i})
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _reference(vectors: np.ndarray, query: np.ndarray, k: int, rows: typing.Optional[typing.List[int]] = None):
+    """The rows of the `k` most similar vectors by a full stable sort of the cosine similarities."""
+    rows = list(range(len(vectors))) if rows is None else rows
+    norms = np.linalg.norm(vectors[rows], axis=1)
+    scores = (vectors[rows] @ query) / np.where(norms > 0, norms, 1) / np.linalg.norm(query)
+    return [rows[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_search_matches_a_full_sort(seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    # few distinct vectors (and a zero vector), so that scores tie
+    vectors = rng.integers(-2, 3, (200, 6)).astype(np.float32)
+    vectors[17] = 0
+    store = _vector_stores.NumpyVectorStore("entities")
+    store.load_documents(_documents(vectors))
+    assert len(store) == 200
+    assert np.allclose(np.linalg.norm(store.matrix[[0, 1, 2]], axis=1), 1)
+
+    for _ in range(20):
+        query = rng.standard_normal(6).astype(np.float32)
+        for k in [1, 5, 37, 200, 500]:
+            results = store.similarity_search_by_vector(query.tolist(), k=k)
+            assert [result.document.id for result in results] == [f"d{row}" for row in _reference(vectors, query, k)]
+            assert [result.score for result in results] == sorted((result.score for result in results), reverse=True)
+    assert store.similarity_search_by_vector(query.tolist(), k=0) == []
+
+    # the best match of a document's vector is that vector (or an earlier duplicate of it), normalized
+    result = store.similarity_search_by_vector(vectors[3].tolist(), k=1)[0]
+    assert np.allclose(result.document.vector, store.matrix[3])
+    assert result.score == pytest.approx(1.0)
+
+
+def test_filter_by_id_restricts_the_search() -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 4)).astype(np.float32)
+    store = _vector_stores.NumpyVectorStore("entities")
+    store.load_documents(_documents(vectors))
+    query = rng.standard_normal(4).astype(np.float32)
+
+    included = [3, 7, 11, 40]
+    mask = store.filter_by_id([f"d{row}" for row in included] + ["missing"])
+    assert mask is not None and np.flatnonzero(mask).tolist() == included
+    results = store.similarity_search_by_vector(query.tolist(), k=3)
+    assert [result.document.id for result in results] == [f"d{row}" for row in _reference(vectors, query, 3, included)]
+
+    # documents appended after the filter are not searched
+    store.load_documents(_documents(vectors[:2], prefix="new"), overwrite=False)
+    assert len(store.similarity_search_by_vector(query.tolist(), k=10)) == 4
+
+    assert store.filter_by_id([]) is None
+    assert len(store.similarity_search_by_vector(query.tolist(), k=100)) == 52
+
+
+def test_load_matrix_copies_a_read_only_matrix(tmp_path) -> None:
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((30, 8)).astype(np.float32)
+    np.save(tmp_path / "vectors.npy", vectors)
+    matrix = np.load(tmp_path / "vectors.npy", mmap_mode="r")
+
+    store = _vector_stores.NumpyVectorStore("entities")
+    store.load_matrix([f"d{i}" for i in range(30)], [None] * 30, [{}] * 30, matrix)
+    assert np.array_equal(np.load(tmp_path / "vectors.npy"), vectors)
+    assert not store.matrix.flags.writeable
+
+    query = rng.standard_normal(8).astype(np.float32)
+    from_documents = _vector_stores.NumpyVectorStore("entities")
+    from_documents.load_documents(_documents(vectors))
+    assert [result.document.id for result in store.similarity_search_by_vector(query.tolist(), k=5)] == [
+        result.document.id for result in from_documents.similarity_search_by_vector(query.tolist(), k=5)
+    ]
+
+
+def test_invalid_and_empty_loads() -> None:
+    store = _vector_stores.NumpyVectorStore("entities")
+    assert store.similarity_search_by_vector([1.0, 0.0], k=3) == []
+    store.load_documents([_vector_stores.VectorStoreDocument(id="a", text=None, vector=None)])
+    assert len(store) == 0
+
+    with pytest.raises(ValueError):
+        store.load_documents([
+            _vector_stores.VectorStoreDocument(id="a", text=None, vector=[1.0, 0.0]),
+            _vector_stores.VectorStoreDocument(id="b", text=None, vector=[1.0]),
+        ])
+    store.load_documents(_documents(np.eye(2, dtype=np.float32)))
+    with pytest.raises(ValueError):
+        store.load_documents(_documents(np.eye(3, dtype=np.float32)), overwrite=False)
+    with pytest.raises(ValueError):
+        store.load_matrix(["a"], [None], [{}], np.eye(2, dtype=np.float32))
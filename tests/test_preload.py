@@ -0,0 +1,86 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import pathlib
+import random
+
+import pytest
+import tiktoken
+
+import graphrag_query
+from graphrag_query._search import _model
+from graphrag_query._search._context import _builders
+from graphrag_query._search._context._loaders import _context_loaders
+
+from .conftest import CountingEncoder, assert_same_context, write_index
+
+
+class _Embedding:
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _ChatLLM:
+    model = "m"
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _config(directory: pathlib.Path) -> graphrag_query.GraphRAGConfig:
+    return graphrag_query.GraphRAGConfig(
+        chat_llm={"model": "m", "api_key": "k"},
+        embedding={"model": "e", "api_key": "k"},
+        logging={"enabled": False},
+        context={"directory": str(directory)},
+        local_search={
+            "community_level": 1,
+            "store_uri": str(directory / "lancedb"),
+            "encoding_model": "words",
+            "kwargs": {"store__backend": "numpy"},
+        },
+        global_search={},
+    )
+
+
+@pytest.mark.parametrize("snapshot", [False, True], ids=["parquet", "snapshot"])
+def test_load_local_context_builder_as_the_client_does(monkeypatch, tmp_path, snapshot: bool) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: CountingEncoder())
+    write_index(tmp_path)
+    directory = tmp_path
+    if snapshot:
+        directory = tmp_path / "snapshot"
+        _context_loaders.SnapshotContextLoader.compile(
+            _context_loaders.LocalContextLoader.from_parquet_directory(tmp_path), directory,
+            community_level=1, encoding_model="words",
+        )
+    config = _config(directory)
+
+    async def _client_builder() -> _builders.LocalContextBuilder:
+        client = graphrag_query.AsyncGraphRAGClient(
+            config=config, chat_llm=_ChatLLM(), embedding=_Embedding(), coalesce=False,  # type: ignore[arg-type]
+        )
+        await client.close()
+        return client.local_context_builder
+
+    expected = asyncio.run(_client_builder())
+    loaded = graphrag_query.load_local_context_builder(config)
+    compact = graphrag_query.load_local_context_builder(config, compact_models=True)
+
+    rng = random.Random(2)
+    for _ in range(3):
+        kwargs = dict(query="q", query_embedding=[rng.random() for _ in range(8)], data_max_tokens=1500)
+        assert_same_context(loaded.build_context(**kwargs), expected.build_context(**kwargs))
+        assert_same_context(compact.build_context(**kwargs), expected.build_context(**kwargs))
+    assert isinstance(next(iter(compact.entities.values())), _model.ModelView)
+    assert isinstance(next(iter(loaded.entities.values())), _model.ModelView) == snapshot
+    assert bool(loaded.token_counter._precomputed) == snapshot
@@ -0,0 +1,75 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import random
+import typing
+
+import pytest
+
+from graphrag_query._search import _model
+from graphrag_query._search._input._retrieval import _relationships
+
+from .conftest import make_graph
+
+
+def _ids(relationships: typing.Iterable[_model.Relationship]) -> typing.List[str]:
+    return [relationship.id for relationship in relationships]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_lookups_match_a_full_scan(seed: int) -> None:
+    # few entities, so that pairs repeat and many entities are both sources and targets
+    graph = make_graph(seed, num_entities=12, num_relationships=80)
+    relationships = graph.relationships
+    index = _relationships.RelationshipIndex(relationships)
+    rng = random.Random(seed)
+    names = [entity.title for entity in graph.entities] + ["MISSING"]
+
+    assert len(index) == len(relationships)
+    assert _ids(index) == _ids(relationships)
+    for relationship in relationships:
+        assert index.get(relationship.id) is relationship
+    assert index.get("missing") is None
+
+    for name in names:
+        assert _ids(index.get_by_source(name)) == _ids(r for r in relationships if r.source == name)
+        assert _ids(index.get_by_target(name)) == _ids(r for r in relationships if r.target == name)
+        assert _ids(index.get_by_entity(name)) == _ids(r for r in relationships if name in (r.source, r.target))
+        for other in names:
+            first = next((r for r in relationships if (r.source, r.target) == (name, other)), None)
+            assert index.get_by_pair(name, other) is first
+
+    for text_unit in graph.text_units:
+        assert _ids(index.get_by_text_unit(text_unit.id)) == _ids(
+            r for r in relationships if text_unit.id in (r.text_unit_ids or [])
+        )
+
+    for _ in range(20):
+        selected = set(rng.sample(names, rng.randint(0, 6)))
+        assert _ids(index.in_network(selected)) == _ids(
+            r for r in relationships if r.source in selected and r.target in selected
+        )
+        outgoing, incoming = index.out_network(selected)
+        assert _ids(outgoing) == _ids(r for r in relationships if r.source in selected and r.target not in selected)
+        assert _ids(incoming) == _ids(r for r in relationships if r.target in selected and r.source not in selected)
+        assert _ids(index.adjacent(selected)) == _ids(
+            r for r in relationships if r.source in selected or r.target in selected
+        )
+
+
+def test_retrieval_functions_accept_a_list_or_an_index() -> None:
+    graph = make_graph(1, num_entities=15, num_relationships=60)
+    index = _relationships.RelationshipIndex.from_relationships(graph.relationships)
+    assert _relationships.RelationshipIndex.from_relationships(index) is index
+    rng = random.Random(1)
+
+    for _ in range(10):
+        selected = rng.sample(graph.entities, rng.randint(1, 5))
+        for function in [
+            _relationships.get_in_network_relationships,
+            _relationships.get_out_network_relationships,
+            _relationships.get_candidate_relationships,
+        ]:
+            assert _ids(function(selected, index)) == _ids(function(selected, list(graph.relationships)))
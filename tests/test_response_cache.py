@@ -0,0 +1,202 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import typing
+
+import pytest
+
+pytest.importorskip("fastapi")  # the server package imports it
+
+import graphrag_query  # noqa: E402
+from server import dto, router  # noqa: E402
+from server.common import const, graphrag, limiter, response_cache  # noqa: E402
+
+
+def _request(content: str = "What is GraphRAG?", **kwargs: typing.Any) -> dto.CompletionCreateRequest:
+    return dto.CompletionCreateRequest(
+        messages=[{"role": "user", "content": content}],
+        **{"model": "local", "temperature": 0, **kwargs},
+    )
+
+
+@pytest.fixture
+def completion_cache(monkeypatch) -> typing.Iterator[None]:
+    """A fresh completion cache replaying streams, dropped after the test."""
+    for name in ["_completion_cache", "_ttl", "_replay_stream"]:
+        monkeypatch.setattr(response_cache, name, getattr(response_cache, name))
+    response_cache.init_completion_cache(
+        max_entries=16,
+        max_bytes=1 << 20,
+        ttl=datetime.timedelta(hours=1),
+        expiry_interval=datetime.timedelta(hours=1),
+        replay_stream=True,
+    )
+    try:
+        yield
+    finally:
+        typing.cast(response_cache.cache.Cache, response_cache._completion_cache).stop_expiry()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"temperature": None},
+    {"temperature": 0.7},
+    {"n": 2},
+    {"logprobs": True},
+    {"top_logprobs": 3},
+    {"tool_choice": "none"},
+    {"tools": [{"type": "function", "function": {"name": "f"}}]},
+])
+def test_nondeterministic_requests_have_no_key(kwargs) -> None:
+    request = _request(**kwargs)
+    assert not response_cache.is_deterministic(request)
+    assert response_cache.completion_key("local", request) is None
+
+
+def test_completion_key_normalizes_the_messages() -> None:
+    assert response_cache.is_deterministic(_request(n=1))
+    key = response_cache.completion_key("local", _request("  Café \n au   lait "))
+    assert key is not None
+    # whitespace, the Unicode form and the fields that do not change the answer are ignored
+    assert response_cache.completion_key("local", _request("Café au lait")) == key
+    assert response_cache.completion_key(
+        "local", _request("Café au lait", model="gpt-4o", stream=True, user="u", metadata={"k": "v"}, store=True)
+    ) == key
+    # the engine, the content and the parameters that change the answer are not
+    assert response_cache.completion_key("global", _request("Café au lait")) != key
+    assert response_cache.completion_key("local", _request("Cafe au lait")) != key
+    assert response_cache.completion_key("local", _request("Café au lait", max_tokens=10)) != key
+    assert response_cache.completion_key("local", _request("Café au lait", seed=1)) != key
+    assert response_cache.completion_key("local", dto.CompletionCreateRequest(
+        model="local", temperature=0, messages=[{"role": "system", "content": "Café au lait"}],
+    )) != key
+
+
+def _chunk(
+    content: typing.Optional[str],
+    finish_reason: typing.Optional[str] = None,
+) -> graphrag_query.SearchResultChunk:
+    return graphrag_query.SearchResultChunk(
+        created=0,
+        model="m",
+        choice={"finish_reason": finish_reason, "delta": {"content": content}},
+        thinking=False,
+    )
+
+
+class _Client:
+    """Answers every chat with the given chunks (or their joined content), counting the calls."""
+
+    def __init__(self, chunks: typing.List[graphrag_query.SearchResultChunk]) -> None:
+        self.chunks = chunks
+        self.calls = 0
+
+    async def chat(self, *, stream: bool, **kwargs: typing.Any) -> typing.Any:
+        self.calls += 1
+        if stream:
+            return self._stream()
+        return graphrag_query.SearchResult(
+            created=0,
+            model="m",
+            choice={
+                "finish_reason": self.chunks[-1].choice.finish_reason,
+                "message": {"content": "".join(chunk.choice.delta.content or "" for chunk in self.chunks)},
+            },
+        )
+
+    async def _stream(self) -> typing.AsyncIterator[graphrag_query.SearchResultChunk]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.fixture
+def client(monkeypatch) -> _Client:
+    client = _Client([_chunk("Graph"), _chunk("RAG"), _chunk(None, "stop")])
+    monkeypatch.setattr(graphrag, "get_client", lambda logger: client)
+    monkeypatch.setattr(
+        graphrag, "get_limiter", lambda engine: limiter.ConcurrencyLimiter(engine, max_concurrency=1, max_queue=0)
+    )
+    return client
+
+
+def _chat(request: dto.CompletionCreateRequest, *, consume: typing.Optional[int] = None) -> typing.Tuple[
+    typing.Optional[str], typing.List[str]
+]:
+    """
+    Run a chat request, returning its cache status and its body (the events
+    of a stream, of which only `consume` are read if given).
+    """
+
+    async def _main():
+        response = await router.chat_completions(request, engine_header=None)
+        status = response.headers.get(const.Constants.CACHE_HEADER)
+        if not request.stream:
+            return status, [bytes(response.body).decode()]
+        events = []
+        async for event in response.body_iterator:
+            events.append(event)
+            if consume is not None and len(events) == consume:
+                break
+        await response.body_iterator.aclose()
+        return status, events
+
+    return asyncio.run(_main())
+
+
+def _content(events: typing.List[str]) -> str:
+    chunks = [json.loads(event[len("data: "):]) for event in events if event != "data: [DONE]\n\n"]
+    return "".join(chunk["choices"][0]["delta"].get("content") or "" for chunk in chunks)
+
+
+@pytest.mark.usefixtures("completion_cache")
+def test_complete_answers_are_cached_and_replayed(client) -> None:
+    status, body = _chat(_request())
+    assert status == "miss" and json.loads(body[0])["choices"][0]["message"]["content"] == "GraphRAG"
+    status, body = _chat(_request(" What is  GraphRAG?\n"))
+    assert status == "hit" and json.loads(body[0])["choices"][0]["message"]["content"] == "GraphRAG"
+    assert client.calls == 1
+
+    # a finished stream is cached too, and replayed as a stream
+    status, events = _chat(_request("Who made GraphRAG?", stream=True))
+    assert status == "miss" and _content(events) == "GraphRAG" and events[-1] == "data: [DONE]\n\n"
+    status, events = _chat(_request("Who made GraphRAG?", stream=True))
+    assert status == "hit" and _content(events) == "GraphRAG" and events[-1] == "data: [DONE]\n\n"
+    assert json.loads(events[-2][len("data: "):])["choices"][0]["finish_reason"] == "stop"
+    assert client.calls == 2
+
+
+@pytest.mark.usefixtures("completion_cache")
+def test_nondeterministic_requests_are_not_cached(client) -> None:
+    for stream in [False, True]:
+        for _ in range(2):
+            status, _ = _chat(_request(stream=stream, temperature=0.7))
+            assert status is None
+    assert client.calls == 4
+    assert len(typing.cast(response_cache.cache.Cache, response_cache._completion_cache)) == 0
+
+
+@pytest.mark.usefixtures("completion_cache")
+@pytest.mark.parametrize("finish_reason", [None, "content_filter"])
+def test_unfinished_completions_are_not_cached(client, finish_reason) -> None:
+    client.chunks[-1] = _chunk(None, finish_reason)
+    for stream in [False, True]:
+        for _ in range(2):
+            status, _ = _chat(_request(stream=stream))
+            assert status == "miss"
+    assert client.calls == 4
+
+
+@pytest.mark.usefixtures("completion_cache")
+def test_abandoned_streams_are_not_cached(client) -> None:
+    # the client disconnects after the first chunk
+    status, events = _chat(_request(stream=True), consume=1)
+    assert status == "miss" and _content(events) == "Graph"
+    status, events = _chat(_request(stream=True))
+    assert status == "miss" and _content(events) == "GraphRAG"
+    assert client.calls == 2
+    status, _ = _chat(_request(stream=True))
+    assert status == "hit" and client.calls == 2
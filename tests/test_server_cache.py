@@ -0,0 +1,107 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import datetime
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")  # the server package imports it
+
+from server.common import cache  # noqa: E402
+
+
+def test_entries_are_evicted_least_recently_used_first() -> None:
+    lru = cache.Cache(max_entries=3)
+    for key in "abc":
+        lru.set(key, key.upper())
+    assert lru.get("a") == "A"  # a is now the most recently used
+    lru.set("d", "D")
+    assert list(lru) == ["c", "a", "d"]
+    lru.set("c", "C2")  # setting a key makes it the most recently used too
+    lru.set("e", "E")
+    assert list(lru) == ["d", "c", "e"]
+    assert len(lru) == 3 and "a" not in lru and lru.get("c") == "C2"
+
+
+def test_bytes_are_accounted_and_bound() -> None:
+    lru = cache.Cache(max_bytes=10, sizeof=len)
+    lru.set("a", "xxx")
+    lru.set("b", "yyyy")
+    assert lru.nbytes == 7
+    lru.set("a", "x")  # replacing a value accounts for its new size only
+    assert lru.nbytes == 5
+
+    # b is evicted, the least recently used, until the new value fits
+    lru.set("c", "zzzzzzz")
+    assert list(lru) == ["a", "c"] and lru.nbytes == 8
+    lru.set("d", "ww")
+    assert list(lru) == ["a", "c", "d"] and lru.nbytes == 10
+
+    # a value larger than the bound is not cached, and drops the value it replaces
+    lru.set("d", "v" * 11)
+    assert list(lru) == ["a", "c"] and lru.nbytes == 8
+
+    lru.delete("c")
+    assert lru.getdel("a") == "x" and lru.getdel("missing") is None
+    assert lru.nbytes == 0 and len(lru) == 0
+    lru.set("e", "eee")
+    lru.clear()
+    assert lru.nbytes == 0 and list(lru) == []
+
+
+def test_expired_entries_are_dropped() -> None:
+    ttl_cache = cache.Cache(sizeof=len)
+    ttl_cache.set("short", "s", ttl=datetime.timedelta(milliseconds=50))
+    ttl_cache.set("long", "l", ttl=datetime.timedelta(hours=1))
+    ttl_cache.set("forever", "f")
+    time.sleep(0.1)
+    # still held (and counted) until dropped
+    assert len(ttl_cache) == 3 and ttl_cache.nbytes == 3
+    ttl_cache.clear_expired()
+    assert list(ttl_cache) == ["long", "forever"] and ttl_cache.nbytes == 2
+
+    ttl_cache.set("short", "s", ttl=datetime.timedelta(milliseconds=50))
+    ttl_cache.start_expiry(datetime.timedelta(milliseconds=20))
+    ttl_cache.start_expiry(datetime.timedelta(hours=1))  # already running
+    try:
+        deadline = time.monotonic() + 5
+        while "short" in list(ttl_cache) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(ttl_cache) == ["long", "forever"]
+    finally:
+        ttl_cache.stop_expiry()
+
+
+def test_len_waits_for_the_lock() -> None:
+    lru = cache.Cache(max_entries=2)
+    lru.set("a", 1)
+    held, release = threading.Event(), threading.Event()
+
+    def _hold() -> None:
+        with lru._lock:
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=_hold)
+    holder.start()
+    held.wait()
+    lengths = []
+    reader = threading.Thread(target=lambda: lengths.append(len(lru)))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive() and lengths == []
+    release.set()
+    reader.join()
+    holder.join()
+    assert lengths == [1]
+
+
+def test_invalid_bounds() -> None:
+    with pytest.raises(ValueError):
+        cache.Cache(max_entries=0)
+    with pytest.raises(ValueError):
+        cache.Cache(max_bytes=0)
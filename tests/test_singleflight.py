@@ -0,0 +1,232 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import asyncio
+import typing
+
+import pytest
+
+from graphrag_query import _singleflight
+
+
+class _Upstream:
+    """An upstream stream yielding `0..count-1`, one item per `release` call."""
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.released = asyncio.Semaphore(0)
+        self.closed = False
+
+    def release(self, count: int = 1) -> None:
+        for _ in range(count):
+            self.released.release()
+
+    async def _items(self) -> typing.AsyncGenerator[int, None]:
+        try:
+            for item in range(self.count):
+                await self.released.acquire()
+                yield item
+        finally:
+            self.closed = True
+
+    def __aiter__(self) -> typing.AsyncIterator[int]:
+        return self._items()
+
+
+async def _settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_do_coalesces_concurrent_calls() -> None:
+    calls = 0
+
+    async def _func() -> object:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def _main() -> typing.List[object]:
+        flight = _singleflight.SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", _func) for _ in range(5)), flight.do("other", _func))
+        assert flight.stats == _singleflight.SingleFlightStats(requests=6, executed=2, coalesced=4, in_flight=0)
+        return results
+
+    results = asyncio.run(_main())
+    assert calls == 2
+    assert all(result is results[0] for result in results[:5])
+    assert results[5] is not results[0]
+
+
+def test_do_shares_failures_and_cancels_only_with_the_last_caller() -> None:
+    async def _fail() -> None:
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    async def _main() -> None:
+        flight = _singleflight.SingleFlight()
+        results = await asyncio.gather(flight.do("key", _fail), flight.do("key", _fail), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+        started = asyncio.Event()
+
+        async def _slow() -> str:
+            started.set()
+            await asyncio.sleep(10)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("slow", _slow))
+        second = asyncio.ensure_future(flight.do("slow", _slow))
+        await started.wait()
+        execution = flight._flights["slow"].task
+        first.cancel()
+        await _settle()
+        assert not execution.cancelled()
+        second.cancel()
+        await _settle()
+        assert execution.cancelled()
+
+    asyncio.run(_main())
+
+
+def test_stream_is_broadcast_to_every_caller() -> None:
+    async def _main() -> None:
+        flight = _singleflight.SingleFlight()
+        upstream = _Upstream(4)
+        opened = 0
+
+        async def _open() -> typing.AsyncIterator[int]:
+            nonlocal opened
+            opened += 1
+            return aiter(upstream)
+
+        async def _collect() -> typing.List[int]:
+            return [item async for item in await flight.do_stream("key", _open)]
+
+        first = asyncio.ensure_future(_collect())
+        await _settle()
+        upstream.release(2)
+        await _settle()
+        # joins after two items were read: they are replayed
+        second = asyncio.ensure_future(_collect())
+        await _settle()
+        upstream.release(2)
+        assert await first == await second == [0, 1, 2, 3]
+        assert opened == 1
+        assert upstream.closed
+        assert flight.stats.in_flight == 0
+
+    asyncio.run(_main())
+
+
+def test_abandoned_stream_is_cancelled() -> None:
+    async def _main() -> None:
+        flight = _singleflight.SingleFlight()
+        upstream = _Upstream(10)
+
+        async def _open() -> typing.AsyncIterator[int]:
+            return aiter(upstream)
+
+        stream = await flight.do_stream("key", _open)
+        upstream.release()
+        assert await anext(stream) == 0
+        await stream.aclose()  # type: ignore[attr-defined]
+        await _settle()
+        assert upstream.closed
+        assert flight.stats.in_flight == 0
+
+    asyncio.run(_main())
+
+
+def test_joined_caller_keeps_the_stream_alive() -> None:
+    async def _main() -> typing.List[int]:
+        upstream = _Upstream(3)
+        broadcast = _singleflight.StreamBroadcast(aiter(upstream))
+        # a caller joins (e.g. while the stream is being opened) and subscribes later
+        broadcast.join()
+        leaver = broadcast.subscribe()
+        upstream.release()
+        assert await anext(leaver) == 0
+        await leaver.aclose()  # type: ignore[attr-defined]
+        await _settle()
+        assert not upstream.closed
+        upstream.release(2)
+        return [item async for item in broadcast.subscribe(joined=True)]
+
+    assert asyncio.run(_main()) == [0, 1, 2]
+
+
+def test_caller_after_abandonment_opens_a_new_stream() -> None:
+    async def _main() -> None:
+        flight = _singleflight.SingleFlight()
+        upstreams: typing.List[_Upstream] = []
+        closing = asyncio.Event()
+
+        class _SlowClose(_Upstream):
+            def __aiter__(self) -> typing.AsyncIterator[int]:
+                items = self._items()
+
+                class _Iterator:
+                    def __aiter__(self) -> typing.AsyncIterator[int]:
+                        return self
+
+                    async def __anext__(self) -> int:
+                        return await anext(items)
+
+                    async def aclose(self) -> None:
+                        # the abandoned pump is still closing its upstream when the next caller arrives
+                        await closing.wait()
+                        await items.aclose()
+
+                return _Iterator()
+
+        async def _open() -> typing.AsyncIterator[int]:
+            upstreams.append(_Upstream(2) if upstreams else _SlowClose(2))
+            return aiter(upstreams[-1])
+
+        stream = await flight.do_stream("key", _open)
+        upstreams[0].release()
+        assert await anext(stream) == 0
+        await stream.aclose()  # type: ignore[attr-defined]
+
+        second = await flight.do_stream("key", _open)
+        assert len(upstreams) == 2
+        upstreams[1].release(2)
+        assert [item async for item in second] == [0, 1]
+        closing.set()
+        await _settle()
+        assert flight.stats.in_flight == 0
+
+    asyncio.run(_main())
+
+
+def test_cancelled_joiner_releases_its_slot() -> None:
+    async def _main() -> None:
+        flight = _singleflight.SingleFlight()
+        upstream = _Upstream(10)
+        opening = asyncio.Event()
+
+        async def _open() -> typing.AsyncIterator[int]:
+            await opening.wait()
+            return aiter(upstream)
+
+        first = asyncio.ensure_future(flight.do_stream("key", _open))
+        second = asyncio.ensure_future(flight.do_stream("key", _open))
+        await _settle()
+        # the second caller is cancelled once the stream is opened, before it resumes and subscribes
+        flight._flights["stream:key"].task.add_done_callback(lambda _: second.cancel())
+        opening.set()
+        stream = await first
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        upstream.release()
+        assert await anext(stream) == 0
+        await stream.aclose()  # type: ignore[attr-defined]
+        await _settle()
+        assert upstream.closed
+        assert flight.stats.in_flight == 0
+
+    asyncio.run(_main())
@@ -0,0 +1,80 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import pathlib
+import random
+import sys
+
+import pytest
+import tiktoken
+
+from graphrag_query._search._context import _builders
+from graphrag_query._search._context._builders import _source_context
+from graphrag_query._search._context._loaders import _context_loaders
+
+from .conftest import CountingEncoder, WordEncoder, assert_same_context, write_index
+
+
+def _to_context_builder(loader, store_uri: pathlib.Path) -> _builders.LocalContextBuilder:
+    return loader.to_context_builder(
+        community_level=1,
+        embedder=None,  # the query embedding is given
+        store_coll_name="entities",
+        store_uri=str(store_uri),
+        encoding_model="words",
+        store__backend="numpy",
+    )
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+def test_snapshot_builds_the_context_of_the_parquet_files(monkeypatch, tmp_path, lazy: bool) -> None:
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: CountingEncoder())
+    write_index(tmp_path)
+    parquet_loader = _context_loaders.LocalContextLoader.from_parquet_directory(tmp_path)
+    _context_loaders.SnapshotContextLoader.compile(
+        parquet_loader, tmp_path / "snapshot", community_level=1, encoding_model="words",
+    )
+    snapshot_loader = _context_loaders.SnapshotContextLoader.from_directory(tmp_path / "snapshot", lazy=lazy)
+    assert snapshot_loader.community_level == 1 and snapshot_loader.encoding_model == "words"
+    with pytest.raises(ValueError):
+        snapshot_loader.to_context_builder(0, None, "entities", str(tmp_path), "words")  # type: ignore[arg-type]
+
+    expected = _to_context_builder(parquet_loader, tmp_path)
+    actual = _to_context_builder(snapshot_loader, tmp_path)
+
+    rng = random.Random(1)
+    for _ in range(5):
+        kwargs = dict(query="q", query_embedding=[rng.random() for _ in range(8)],
+                      data_max_tokens=rng.choice([200, 400, 1500]),
+                      include_community_rank=True, include_relationship_weight=True)
+        assert_same_context(actual.build_context(**kwargs), expected.build_context(**kwargs))
+
+    # the rows of global search and the text units are counted already, as the Parquet builder counts them
+    encoder = actual.token_encoder
+    assert isinstance(encoder, CountingEncoder)
+    encoder.encoded.clear()
+    global_expected = _builders.GlobalContextBuilder(
+        community_reports=list(expected.community_reports.values()),
+        entities=list(expected.entities.values()),
+        token_encoder=WordEncoder(),  # type: ignore[arg-type]
+    )
+    global_actual = _builders.GlobalContextBuilder.from_local_context_builder(actual)
+    assert_same_context(global_actual.build_context(), global_expected.build_context())
+    text_unit_context = dict(shuffle_data=False, data_max_tokens=sys.maxsize)
+    _source_context.build_text_unit_context(
+        text_units=list(expected.text_units.values()), token_encoder=global_expected.token_counter, **text_unit_context,
+    )
+    _source_context.build_text_unit_context(
+        text_units=list(actual.text_units.values()), token_encoder=actual.token_counter, **text_unit_context,
+    )
+    assert encoder.encoded == []
+    expected_counts = global_expected.token_counter.digests()
+    assert {digest: actual.token_counter._precomputed[digest] for digest in expected_counts} == expected_counts
+
+    # the counts are not used with another encoding
+    other = snapshot_loader.to_context_builder(1, None, "entities", str(tmp_path), "other",  # type: ignore[arg-type]
+                                               store__backend="numpy")
+    _builders.GlobalContextBuilder.from_local_context_builder(other).build_context()
+    assert other.token_encoder.encoded  # type: ignore[union-attr]
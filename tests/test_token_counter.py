@@ -0,0 +1,103 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import concurrent.futures
+import random
+import sys
+import typing
+
+import pytest
+
+from graphrag_query import _utils
+
+from .conftest import WordEncoder
+
+
+class _CountingEncoder(WordEncoder):
+    name = "words"
+
+    def __init__(self) -> None:
+        self.encoded: typing.List[str] = []
+
+    def encode(self, text: str) -> typing.List[str]:
+        self.encoded.append(text)
+        return super().encode(text)
+
+
+def _texts(seed: int, count: int) -> typing.List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(["a", "bb", "ccc"]) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+
+def test_counts_are_remembered() -> None:
+    encoder = _CountingEncoder()
+    counter = _utils.TokenCounter(encoder)  # type: ignore[arg-type]
+    texts = _texts(0, 200)
+    for text in texts + texts:
+        assert counter(text) == len(text.split())
+        assert _utils.num_tokens(text, counter) == len(text.split())
+    assert sorted(encoder.encoded) == sorted(set(texts))
+    assert len(counter) == len(set(texts))
+
+    counter.clear()
+    assert len(counter) == 0
+    counter(texts[0])
+    assert encoder.encoded.count(texts[0]) == 2
+
+
+def test_oldest_counts_are_evicted_first() -> None:
+    encoder = _CountingEncoder()
+    counter = _utils.TokenCounter(encoder, max_entries=2)  # type: ignore[arg-type]
+    for text in ["one", "two words", "three more words"]:
+        counter(text)
+    assert len(counter) == 2
+    counter("two words")
+    counter("one")
+    assert encoder.encoded == ["one", "two words", "three more words", "one"]
+
+
+@pytest.mark.parametrize("max_entries", [0, -1])
+def test_invalid_max_entries(max_entries: int) -> None:
+    with pytest.raises(ValueError):
+        _utils.TokenCounter(WordEncoder(), max_entries=max_entries)  # type: ignore[arg-type]
+
+
+def test_precomputed_counts_are_not_encoded_again() -> None:
+    texts = _texts(1, 50)
+    counter = _utils.TokenCounter(WordEncoder())  # type: ignore[arg-type]
+    for text in texts:
+        counter(text)
+    digests = counter.digests()
+    assert digests == {_utils.text_digest(text): len(text.split()) for text in texts}
+
+    encoder = _CountingEncoder()
+    warm = _utils.TokenCounter(encoder)  # type: ignore[arg-type]
+    warm.precompute(digests)
+    assert [warm(text) for text in texts] == [len(text.split()) for text in texts]
+    assert warm("a new text") == 3
+    assert encoder.encoded == ["a new text"]
+
+
+def test_estimate_mode_never_encodes() -> None:
+    encoder = _CountingEncoder()
+    counter = _utils.TokenCounter(encoder, estimate=True)  # type: ignore[arg-type]
+    for text in _texts(2, 50):
+        assert counter(text) == _utils.estimate_tokens(text) == (len(text) + 3) // 4
+    assert encoder.encoded == []
+    assert len(counter) == 0
+
+
+def test_concurrent_counts() -> None:
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        counter = _utils.TokenCounter(WordEncoder(), max_entries=64)  # type: ignore[arg-type]
+        texts = _texts(3, 500)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            counts = list(executor.map(counter, texts * 8))
+    finally:
+        sys.setswitchinterval(interval)
+    assert counts == [len(text.split()) for text in texts * 8]
+    assert len(counter) <= 64